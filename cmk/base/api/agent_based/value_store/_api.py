@@ -3,7 +3,6 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-import json
 from ast import literal_eval
 from collections.abc import (
     Iterator,
@@ -99,11 +98,11 @@ class ValueStoreManager:
     STORAGE_PATH = Path(cmk.utils.paths.counters_dir)
 
     def __init__(self, host_name: HostName) -> None:
-        self._value_store: DiskSyncedMapping[_ValueStoreKey, str] = DiskSyncedMapping.make(
-            path=self.STORAGE_PATH / host_name,
-            log_debug=lambda x: logger.debug("value store: %s", x),
-            serializer=lambda d: json.dumps(list(d.items())),
-            deserializer=lambda raw: {tuple(k): v for k, v in json.loads(raw)},
+        self._value_store: DiskSyncedMapping[_ValueStoreKey, str] = (
+            DiskSyncedMapping.make_journaled(
+                path=self.STORAGE_PATH / host_name,
+                log_debug=lambda x: logger.debug("value store: %s", x),
+            )
         )
         self.active_service_interface: MutableMapping[str, Any] | None = None
         self._host_name = host_name
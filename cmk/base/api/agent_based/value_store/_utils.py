@@ -3,6 +3,9 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import json
+import mmap
+import os
 from collections.abc import (
     Callable,
     Collection,
@@ -10,6 +13,7 @@ from collections.abc import (
     Iterator,
     Mapping,
     MutableMapping,
+    Sequence,
 )
 from pathlib import Path
 from typing import Final, Self, TypeVar
@@ -127,6 +131,143 @@ class _StaticDiskSyncedMapping(Mapping[_TKey, _TValue]):
                 raise MKGeneralException from exc
 
 
+class _JournaledDiskSyncedMapping(Mapping[_TKey, _TValue]):
+    """Represents the values stored on disk, in a journal
+
+    Same as `_StaticDiskSyncedMapping`, but rather than rewriting the whole
+    file, every sync appends the keys it changed or removed. Once the journal
+    holds as many outdated records as current ones, it is compacted, that is:
+    rewritten with the current values only.
+
+    Keys must be tuples and values JSON serializable. Every sync writes one
+    line of JSON, the list of its records: `[key, value]`, or `[key]` for a
+    removed key. A line that is not terminated by a newline has not been
+    written completely and is ignored, the next sync overwrites it.
+
+    Reading is incremental: as long as the journal has not been compacted,
+    only the lines appended since the last sync are read.
+    Files written by `_StaticDiskSyncedMapping` with the JSON serializer
+    are read and replaced by a journal on the first change.
+    """
+
+    MAGIC: Final = b"# Checkmk value store journal 1\n"
+
+    def __init__(self, *, path: Path, log_debug: Callable[[str], None]) -> None:
+        self._path: Final = path
+        self._log_debug = log_debug
+        self._data: dict[_TKey, _TValue] = {}
+        # The journal we have read so far: file identity, size and number of records
+        self._file_id: tuple[int, int] | None = None
+        self._size = 0
+        self._records = 0
+        self.disksync()
+
+    def __getitem__(self, key: _TKey) -> _TValue:
+        return self._data.__getitem__(key)
+
+    def __iter__(self) -> Iterator[_TKey]:
+        return self._data.__iter__()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def disksync(
+        self,
+        *,
+        removed: Collection[_TKey] = (),
+        updated: Collection[tuple[_TKey, _TValue]] = (),
+    ) -> None:
+        """Re-load and write the changes of the stored values
+
+        See `_StaticDiskSyncedMapping.disksync()`.
+        """
+        self._log_debug("synchronizing")
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+
+        with store.locked(self._path):
+            try:
+                self._load()
+                records: list[list[object]] = []
+                for key in removed:
+                    if key in self._data:
+                        del self._data[key]
+                        records.append([key])
+                for key, value in updated:
+                    if key not in self._data or self._data[key] != value:
+                        self._data[key] = value
+                        records.append([key, value])
+                if not records:
+                    return
+
+                if self._file_id is None or self._records + len(records) > 2 * len(self._data):
+                    self._log_debug("compacting journal")
+                    self._compact()
+                else:
+                    self._log_debug(f"appending {len(records)} records to journal")
+                    self._append(records)
+            except Exception as exc:
+                # Our view no longer matches the file, re-read it next time.
+                self._file_id = None
+                raise MKGeneralException from exc
+
+    def _load(self) -> None:
+        with self._path.open("rb") as journal:
+            stat = os.fstat(journal.fileno())
+            if (stat.st_dev, stat.st_ino) != self._file_id or stat.st_size < self._size:
+                self._log_debug("loading from disk")
+                self._data, self._file_id, self._size, self._records = {}, None, 0, 0
+            elif stat.st_size == self._size:
+                self._log_debug("already loaded")
+                return
+            if not stat.st_size:
+                return
+            with mmap.mmap(journal.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                if not self._size:
+                    if content[: len(self.MAGIC)] != self.MAGIC:
+                        # Written by _StaticDiskSyncedMapping, rewrite it on the next change.
+                        self._data = {tuple(k): v for k, v in json.loads(content[:])}  # type: ignore[misc]
+                        return
+                    self._size = len(self.MAGIC)
+                self._file_id = (stat.st_dev, stat.st_ino)
+                end = content.rfind(b"\n", self._size) + 1
+                if end > self._size:
+                    self._replay(content[self._size : end])
+                    self._size = end
+
+    def _replay(self, lines: bytes) -> None:
+        for line in lines.splitlines():
+            try:
+                records = [(tuple(key), value) for key, *value in json.loads(line)]
+            except (TypeError, ValueError):
+                self._log_debug(f"skipping invalid line {line!r}")
+                continue
+            self._records += len(records)
+            for key, value in records:
+                if value:
+                    self._data[key] = value[0]  # type: ignore[index]
+                else:
+                    self._data.pop(key, None)  # type: ignore[arg-type]
+
+    def _append(self, records: Sequence[object]) -> None:
+        raw = f"{json.dumps(records)}\n".encode()
+        with self._path.open("r+b") as journal:
+            # Drop an incompletely written line, if any.
+            journal.truncate(self._size)
+            journal.seek(self._size)
+            journal.write(raw)
+        self._size += len(raw)
+        self._records += len(records)
+
+    def _compact(self) -> None:
+        raw = self.MAGIC + f"{json.dumps(list(self._data.items()))}\n".encode()
+        store.save_bytes_to_file(self._path, raw)
+        stat = self._path.stat()
+        self._file_id = (stat.st_dev, stat.st_ino)
+        self._size = len(raw)
+        self._records = len(self._data)
+
+
 class DiskSyncedMapping(MutableMapping[_TKey, _TValue]):  # pylint: disable=too-many-ancestors
     """Implements the overlay logic between dynamic and static value store"""
 
@@ -149,11 +290,20 @@ class DiskSyncedMapping(MutableMapping[_TKey, _TValue]):  # pylint: disable=too-
             ),
         )
 
+    @classmethod
+    def make_journaled(cls, *, path: Path, log_debug: Callable[[str], None]) -> Self:
+        return cls(
+            dynamic=_DynamicDiskSyncedMapping(),
+            static=_JournaledDiskSyncedMapping(path=path, log_debug=log_debug),
+        )
+
     def __init__(
         self,
         *,
         dynamic: _DynamicDiskSyncedMapping[_TKey, _TValue],
-        static: _StaticDiskSyncedMapping[_TKey, _TValue],
+        static: (
+            _StaticDiskSyncedMapping[_TKey, _TValue] | _JournaledDiskSyncedMapping[_TKey, _TValue]
+        ),
     ) -> None:
         self._dynamic = dynamic
         self.static = static
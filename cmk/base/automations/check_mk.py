@@ -1177,6 +1177,7 @@ class AutomationRenameHosts(Automation):
 
         # SNMP walks
         if self._rename_host_file(snmpwalks_dir, oldname, newname):
+            self._rename_host_file(snmpwalks_dir, oldname + ".idx", newname + ".idx")
             actions.append("snmpwalk")
 
         # HW/SW Inventory
@@ -10,6 +10,7 @@ from __future__ import annotations
 import functools
 import itertools
 import logging
+import signal
 import time
 from collections.abc import Callable, Container, Iterable, Iterator, Mapping, Sequence
 from dataclasses import dataclass
@@ -41,7 +42,15 @@ from cmk.utils.timeperiod import timeperiod_active
 
 from cmk.snmplib import SNMPBackendEnum, SNMPRawData
 
-from cmk.fetchers import Fetcher, get_raw_data, Mode, SNMPScanConfig, TLSConfig
+from cmk.fetchers import (
+    fetch_snmp_concurrently,
+    Fetcher,
+    get_raw_data,
+    Mode,
+    SNMPFetcher,
+    SNMPScanConfig,
+    TLSConfig,
+)
 from cmk.fetchers.config import make_persisted_section_dir
 from cmk.fetchers.filecache import FileCache, FileCacheOptions, MaxAge
 
@@ -131,15 +140,49 @@ def _fetch_all(
     ]
 ]:
     console.verbose(f"{tty.yellow}+{tty.normal} FETCHING DATA")
-    return [
-        _do_fetch(
+    jobs = [
+        (
             source.source_info(),
             source.file_cache(simulation=simulation, file_cache_options=file_cache_options),
             source.fetcher(),
-            mode=mode,
         )
         for source in sources
     ]
+    concurrent = {
+        index: (file_cache, fetcher)
+        for index, (_source_info, file_cache, fetcher) in enumerate(jobs)
+        if isinstance(fetcher, SNMPFetcher)
+        and fetcher.snmp_config.snmp_backend is SNMPBackendEnum.ASYNC
+    }
+    if len(concurrent) < 2:
+        return [
+            _do_fetch(source_info, file_cache, fetcher, mode=mode)
+            for source_info, file_cache, fetcher in jobs
+        ]
+
+    console.debug(f"  Fetching {len(concurrent)} SNMP sources concurrently")
+    with CPUTracker(console.debug) as tracker:
+        fetched = dict(
+            zip(
+                concurrent,
+                fetch_snmp_concurrently(
+                    list(concurrent.values()),
+                    mode,
+                    # The alarm signal only interrupts the main thread, not the fetching threads
+                    timeout=signal.getitimer(signal.ITIMER_REAL)[0] or None,
+                ),
+            )
+        )
+    # The CPU time of the concurrent fetches can not be told apart, share it evenly
+    duration = tracker.duration / len(concurrent)
+    return [
+        (
+            (source_info, fetched[index], duration)
+            if index in concurrent
+            else _do_fetch(source_info, file_cache, fetcher, mode=mode)
+        )
+        for index, (source_info, file_cache, fetcher) in enumerate(jobs)
+    ]
 
 
 def _do_fetch(
@@ -617,7 +660,7 @@ def _compute_final_check_parameters(
             predictions=make_updated_predictions(
                 prediction_store,
                 partial(
-                    livestatus.get_rrd_data,
+                    livestatus.get_rrd_data_batch,
                     livestatus.LocalConnection(),
                     host_name,
                     service.description,
@@ -62,6 +62,7 @@ from cmk.utils.log import console
 from cmk.utils.macros import replace_macros_in_str
 from cmk.utils.regex import regex
 from cmk.utils.rulesets import ruleset_matcher, RuleSetName, tuple_rulesets
+from cmk.utils.rulesets.matching_cache import RulesetMatchingCacheStore
 from cmk.utils.rulesets.ruleset_matcher import LabelManager, RulesetMatcher, RulesetName, RuleSpec
 from cmk.utils.sectionname import SectionName
 from cmk.utils.servicename import Item, ServiceName
@@ -570,6 +571,7 @@ def load_packed_config(config_path: ConfigPath) -> None:
     _initialize_config()
     globals().update(PackedConfigStore.from_serial(config_path).read())
     _perform_post_config_loading_actions()
+    use_ruleset_matching_cache(config_path, get_config_cache())
 
 
 def _initialize_config() -> None:
@@ -779,6 +781,18 @@ def get_derived_config_variable_names() -> set[str]:
 def save_packed_config(config_path: ConfigPath, config_cache: ConfigCache) -> None:
     """Create and store a precompiled configuration for Checkmk helper processes"""
     PackedConfigStore.from_serial(config_path).write(PackedConfigGenerator(config_cache).generate())
+    RulesetMatchingCacheStore.from_serial(config_path).write(
+        config_cache.ruleset_matcher.ruleset_optimizer.dump_matching_cache()
+    )
+
+
+def use_ruleset_matching_cache(config_path: ConfigPath, config_cache: ConfigCache) -> None:
+    """Reuse the ruleset matching results stored along with the given configuration
+
+    Hosts and rules that did not change since then are not matched again."""
+    config_cache.ruleset_matcher.ruleset_optimizer.use_matching_cache(
+        RulesetMatchingCacheStore.from_serial(config_path).read()
+    )
 
 
 class PackedConfigGenerator:
@@ -3046,12 +3060,16 @@ class ConfigCache:
                 return SNMPBackendEnum.INLINE
             if host_backend == "classic":
                 return SNMPBackendEnum.CLASSIC
+            if host_backend == "async":
+                return SNMPBackendEnum.ASYNC
             raise MKGeneralException(f"Bad Host SNMP Backend configuration: {host_backend}")
 
         if with_inline_snmp and snmp_backend_default == "inline":
             return SNMPBackendEnum.INLINE
         if snmp_backend_default == "classic":
             return SNMPBackendEnum.CLASSIC
+        if snmp_backend_default == "async":
+            return SNMPBackendEnum.ASYNC
         # Note: in the above case we raise here.
         # I am not sure if this different behavior is intentional.
         return SNMPBackendEnum.CLASSIC
@@ -23,7 +23,7 @@ import cmk.utils.config_path
 import cmk.utils.password_store
 import cmk.utils.paths
 from cmk.utils import config_warnings, ip_lookup
-from cmk.utils.config_path import VersionedConfigPath
+from cmk.utils.config_path import LATEST_CONFIG, VersionedConfigPath
 from cmk.utils.hostaddress import HostAddress, HostName
 from cmk.utils.labels import Labels
 from cmk.utils.licensing.handler import LicensingHandler
@@ -402,6 +402,9 @@ def _create_core_config(
     passwords = config_cache.collect_passwords()
     cmk.utils.password_store.save(passwords, cmk.utils.password_store.pending_password_store_path())
 
+    # Only match the rules again for hosts and rules changed since the last activation
+    config.use_ruleset_matching_cache(LATEST_CONFIG, config_cache)
+
     config_path = next(VersionedConfigPath.current())
     with config_path.create(is_cmc=core.is_cmc()), _backup_objects_file(core):
         core.create_config(
@@ -61,6 +61,7 @@ default_host_group = "check_mk"
 check_max_cachefile_age = 0  # per default do not use cache files when checking
 cluster_max_cachefile_age = 90  # secs.
 piggyback_max_cachefile_age = 3600  # secs
+compress_data_source_cache = False
 # Ruleset for translating piggyback host names
 piggyback_translation: list[RuleSpec[TranslationOptions]] = []
 # Ruleset for translating service names
@@ -85,7 +86,7 @@ http_proxies: dict[str, dict[str, str]] = {}
 # SNMP communities and encoding
 
 # Global config for SNMP Backend
-snmp_backend_default: Literal["inline", "classic"] = "inline"
+snmp_backend_default: Literal["inline", "classic", "async"] = "inline"
 # Deprecated: Replaced by snmp_backend_hosts
 use_inline_snmp: bool = True
 
@@ -8,6 +8,7 @@ import enum
 import itertools
 import logging
 import os
+import sqlite3
 import subprocess
 import sys
 import time
@@ -44,6 +45,7 @@ from cmk.utils.diagnostics import (
 )
 from cmk.utils.everythingtype import EVERYTHING
 from cmk.utils.hostaddress import HostAddress, HostName, Hosts
+from cmk.utils.inventory_index import InventoryIndex
 from cmk.utils.log import console, section
 from cmk.utils.paths import configuration_lockfile
 from cmk.utils.rulesets.ruleset_matcher import RulesetMatcher
@@ -190,6 +192,8 @@ def parse_snmp_backend(backend: object) -> SNMPBackendEnum | None:
             return SNMPBackendEnum.CLASSIC
         case "stored-walk":
             return SNMPBackendEnum.STORED_WALK
+        case "async":
+            return SNMPBackendEnum.ASYNC
         case _:
             raise ValueError(backend)
 
@@ -277,7 +281,9 @@ modes.register_general_option(
 def _handle_fetcher_options(
     options: Mapping[str, object], *, defaults: FileCacheOptions | None = None
 ) -> FileCacheOptions:
-    file_cache_options = defaults or FileCacheOptions()
+    file_cache_options = dataclasses.replace(
+        defaults or FileCacheOptions(), compressed=config.compress_data_source_cache
+    )
 
     if options.get("cache", False):
         file_cache_options = dataclasses.replace(
@@ -324,7 +330,7 @@ _SNMP_BACKEND_OPTION: Final = Option(
     long_option="snmp-backend",
     short_help="Override default SNMP backend",
     argument=True,
-    argument_descr="inline|classic|stored-walk",
+    argument_descr="inline|classic|stored-walk|async",
 )
 
 # .
@@ -2815,10 +2821,32 @@ def _execute_active_check_inventory(
                 tree=result.inventory_tree,
                 meta=make_meta(do_archive=save_tree_actions.do_archive),
             )
+        if save_tree_actions.do_archive or save_tree_actions.do_save:
+            _update_inventory_index(
+                host_name, result.inventory_tree if save_tree_actions.do_save else None
+            )
 
     return result.check_results
 
 
+def _update_inventory_index(host_name: HostName, tree: MutableTree | None) -> None:
+    index = InventoryIndex(cmk.utils.paths.inventory_index_file)
+    try:
+        if tree is None:
+            index.remove(host_name)
+        else:
+            index.update(
+                host_name,
+                tree,
+                mtime_ns=Path(cmk.utils.paths.inventory_output_dir, str(host_name))
+                .stat()
+                .st_mtime_ns,
+            )
+    except (OSError, sqlite3.Error) as e:
+        # The index is an optimization only: outdated entries are never used
+        console.verbose(f"Cannot update the inventory index: {e}")
+
+
 class _SaveTreeActions(NamedTuple):
     do_archive: bool
     do_save: bool
@@ -3142,6 +3170,29 @@ modes.register(
     )
 )
 
+
+def mode_rebuild_inventory_index() -> None:
+    count = InventoryIndex(cmk.utils.paths.inventory_index_file).rebuild(
+        Path(cmk.utils.paths.inventory_output_dir)
+    )
+    console.verbose(f"Indexed the inventory trees of {count} hosts.")
+
+
+modes.register(
+    Mode(
+        long_option="rebuild-inventory-index",
+        handler_function=mode_rebuild_inventory_index,
+        short_help="Rebuild the index of the HW/SW Inventory trees",
+        long_help=[
+            "Index the current HW/SW Inventory trees of all hosts from scratch. "
+            "The index is used by the inventory filters of the views and is "
+            "updated by the inventory check, so this is only needed if it got lost."
+        ],
+        needs_config=False,
+        needs_checks=False,
+    )
+)
+
 # .
 #   .--version-------------------------------------------------------------.
 #   |                                     _                                |
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Reverse lookup from hosts and services to the aggregations they are part of
+
+The lookup is written once after each compilation and read by every GUI
+process. It is a single file, memory mapped by the readers:
+
+    header | string offsets | entries | references | strings
+
+All host names, service descriptions and aggregation references are interned
+into one sorted string table, so comparing two string IDs is the same as
+comparing the strings. The entries are (host ID, service ID, first reference,
+number of references), sorted by host and service, and are looked up by binary
+search. A new lookup replaces the old one atomically, readers keep the mapping
+they opened and never need a lock.
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import tempfile
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Final, Self
+
+__all__ = ["BIAggregationLookup", "LookupElement"]
+
+LookupElement = tuple[str, str, str, str]  # host name, service description, aggr ID, branch title
+
+
+class BIAggregationLookup:
+    _MAGIC: Final = b"CMKBIL01"
+    # magic, number of strings, entries and references, size of the strings
+    _HEADER: Final = struct.Struct("<8sQQQQ")
+    _ENTRY_SIZE: Final = 4
+
+    def __init__(self, data: mmap.mmap | bytes) -> None:
+        magic, num_strings, num_entries, num_references, strings_size = self._HEADER.unpack_from(
+            data
+        )
+        if magic != self._MAGIC:
+            raise ValueError("Unknown format of the aggregation lookup")
+
+        offsets_start = self._HEADER.size
+        entries_start = offsets_start + 8 * (num_strings + 1)
+        references_start = entries_start + 4 * self._ENTRY_SIZE * num_entries
+        strings_start = references_start + 4 * num_references
+        if len(data) != strings_start + strings_size:
+            raise ValueError("Truncated aggregation lookup")
+
+        view = memoryview(data)
+        self._data: Final = data
+        self._string_offsets: Final = view[offsets_start:entries_start].cast("Q")
+        self._entries: Final = view[entries_start:references_start].cast("I")
+        self._references: Final = view[references_start:strings_start].cast("I")
+        self._strings: Final = view[strings_start:]
+
+    @classmethod
+    def load(cls, path: Path) -> Self | None:
+        """The lookup stored in path, None if there is no usable one"""
+        try:
+            with path.open("rb") as lookup_file:
+                return cls(mmap.mmap(lookup_file.fileno(), 0, access=mmap.ACCESS_READ))
+        except (OSError, ValueError, struct.error):
+            return None
+
+    @classmethod
+    def save(cls, path: Path, elements: Iterable[LookupElement]) -> None:
+        references_by_element: dict[tuple[str, str], set[str]] = {}
+        for host_name, service_description, aggr_id, branch_title in elements:
+            references_by_element.setdefault((host_name, service_description), set()).add(
+                f"{aggr_id}\t{branch_title}"
+            )
+
+        strings = sorted(
+            {
+                string
+                for (host_name, service_description), references in references_by_element.items()
+                for string in (host_name, service_description, *references)
+            },
+            key=lambda string: string.encode("utf-8"),
+        )
+        string_ids = {string: string_id for string_id, string in enumerate(strings)}
+
+        encoded_strings = [string.encode("utf-8") for string in strings]
+        string_offsets = [0]
+        for encoded_string in encoded_strings:
+            string_offsets.append(string_offsets[-1] + len(encoded_string))
+
+        entries: list[int] = []
+        references: list[int] = []
+        for (host_name, service_description), element_references in sorted(
+            references_by_element.items(),
+            key=lambda item: (string_ids[item[0][0]], string_ids[item[0][1]]),
+        ):
+            entries.extend(
+                (
+                    string_ids[host_name],
+                    string_ids[service_description],
+                    len(references),
+                    len(element_references),
+                )
+            )
+            references.extend(sorted(string_ids[reference] for reference in element_references))
+
+        # Readers may map the current file at any time: never write to it, replace it
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=path.parent, prefix=f".{path.name}.new", delete=False
+        ) as tmp:
+            tmp.write(
+                cls._HEADER.pack(
+                    cls._MAGIC,
+                    len(strings),
+                    len(references_by_element),
+                    len(references),
+                    string_offsets[-1],
+                )
+            )
+            tmp.write(struct.pack(f"<{len(string_offsets)}Q", *string_offsets))
+            tmp.write(struct.pack(f"<{len(entries)}I", *entries))
+            tmp.write(struct.pack(f"<{len(references)}I", *references))
+            tmp.writelines(encoded_strings)
+        os.replace(tmp.name, path)
+
+    def _string(self, string_id: int) -> bytes:
+        return bytes(
+            self._strings[self._string_offsets[string_id] : self._string_offsets[string_id + 1]]
+        )
+
+    def _string_id(self, string: str) -> int | None:
+        encoded_string = string.encode("utf-8")
+        num_strings = len(self._string_offsets) - 1
+        string_id = bisect.bisect_left(range(num_strings), encoded_string, key=self._string)
+        if string_id < num_strings and self._string(string_id) == encoded_string:
+            return string_id
+        return None
+
+    def _entry(self, host_name: str, service_description: str) -> int | None:
+        if (host_id := self._string_id(host_name)) is None:
+            return None
+        if (service_id := self._string_id(service_description)) is None:
+            return None
+
+        num_entries = len(self._entries) // self._ENTRY_SIZE
+        key = (host_id, service_id)
+        entry = bisect.bisect_left(range(num_entries), key, key=self._entry_key)
+        if entry < num_entries and self._entry_key(entry) == key:
+            return entry
+        return None
+
+    def _entry_key(self, entry: int) -> tuple[int, int]:
+        start = entry * self._ENTRY_SIZE
+        return self._entries[start], self._entries[start + 1]
+
+    def __contains__(self, element: tuple[str, str]) -> bool:
+        return self._entry(*element) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries) // self._ENTRY_SIZE
+
+    def aggregations(self, host_name: str, service_description: str) -> Sequence[tuple[str, str]]:
+        """The IDs and branch titles of the aggregations the host or service is part of"""
+        if (entry := self._entry(host_name, service_description)) is None:
+            return []
+        start = entry * self._ENTRY_SIZE
+        first_reference, num_references = self._entries[start + 2], self._entries[start + 3]
+        aggregations = []
+        for string_id in self._references[first_reference : first_reference + num_references]:
+            aggr_id, branch_title = self._string(string_id).decode("utf-8").split("\t", 1)
+            aggregations.append((aggr_id, branch_title))
+        return aggregations
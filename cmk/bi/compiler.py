@@ -12,21 +12,20 @@ import time
 from pathlib import Path
 from typing import TypedDict
 
-from redis import Redis
-
 from cmk.ccc import store
 from cmk.ccc.exceptions import MKGeneralException
 from cmk.ccc.i18n import _
 
+from cmk.utils.hostaddress import HostName
 from cmk.utils.log import logger
 from cmk.utils.paths import default_config_dir
-from cmk.utils.redis import get_redis_client
 
 from cmk.bi.aggregation import BIAggregation
+from cmk.bi.aggregation_lookup import BIAggregationLookup
 from cmk.bi.data_fetcher import BIStructureFetcher, get_cache_dir, SiteProgramStart
 from cmk.bi.lib import SitesCallback
 from cmk.bi.packs import BIAggregationPacks
-from cmk.bi.searcher import BISearcher
+from cmk.bi.searcher import BISearchDependencies, BISearcher
 from cmk.bi.trees import BICompiledAggregation, BICompiledRule, FrozenBIInfo
 from cmk.bi.type_defs import frozen_aggregations_dir
 
@@ -37,7 +36,13 @@ class ConfigStatus(TypedDict):
     online_sites: set[SiteProgramStart]
 
 
+class CompilationState(TypedDict):
+    program_starts: set[SiteProgramStart]
+    dependencies: dict[str, BISearchDependencies]
+
+
 path_compiled_aggregations = Path(get_cache_dir(), "compiled_aggregations")
+path_aggregation_lookup = Path(get_cache_dir(), "aggregation_lookup")
 
 
 class BICompiler:
@@ -49,9 +54,10 @@ class BICompiler:
         self._compiled_aggregations: dict[str, BICompiledAggregation] = {}
         self._path_compilation_lock = Path(get_cache_dir(), "compilation.LOCK")
         self._path_compilation_timestamp = Path(get_cache_dir(), "last_compilation")
+        self._path_compilation_state = Path(get_cache_dir(), "compilation_state")
         path_compiled_aggregations.mkdir(parents=True, exist_ok=True)
 
-        self._redis_client: Redis[str] | None = None
+        self._aggregation_lookup: BIAggregationLookup | None = None
         self._setup()
 
     def _setup(self) -> None:
@@ -219,18 +225,56 @@ class BICompiler:
                 return
 
             self.prepare_for_compilation(current_configstatus["online_sites"])
+            previous_state = self._load_compilation_state()
+            changed_hosts = self._get_changed_hosts(current_configstatus, previous_state)
+            changed_hosts_searcher = BISearcher()
+            if changed_hosts is not None:
+                changed_hosts_searcher.set_hosts(
+                    {
+                        host_name: host_data
+                        for host_name, host_data in self._bi_structure_fetcher.hosts.items()
+                        if host_name in changed_hosts
+                    }
+                )
 
-            # Compile the raw tree
+            # Compile the raw tree. Aggregations whose searches do not depend on any of the
+            # changed hosts are taken over from the last compilation
+            compilation_state: CompilationState = {
+                "program_starts": current_configstatus["online_sites"],
+                "dependencies": {},
+            }
+            compiled_aggr_ids = []
             all_aggregations_by_id: dict[str, BIAggregation] = {
                 x.id: x for x in self._bi_packs.get_all_aggregations()
             }
             for aggregation in all_aggregations_by_id.values():
+                dependencies = previous_state["dependencies"].get(aggregation.id)
+                if (
+                    changed_hosts is not None
+                    and dependencies is not None
+                    and not dependencies.affected_by(changed_hosts, changed_hosts_searcher)
+                    and (compiled_aggregation := self._load_compiled_aggregation(aggregation.id))
+                ):
+                    self._compiled_aggregations[aggregation.id] = compiled_aggregation
+                    compilation_state["dependencies"][aggregation.id] = dependencies
+                    continue
+
                 start = time.time()
-                self._compiled_aggregations[aggregation.id] = aggregation.compile(self.bi_searcher)
+                with self.bi_searcher.record_dependencies() as dependencies:
+                    self._compiled_aggregations[aggregation.id] = aggregation.compile(
+                        self.bi_searcher
+                    )
+                compilation_state["dependencies"][aggregation.id] = dependencies
+                compiled_aggr_ids.append(aggregation.id)
                 self._logger.debug(f"Compilation of {aggregation.id} took {time.time() - start:f}")
+            self._logger.debug(
+                "Compiled %d of %d aggregations"
+                % (len(compiled_aggr_ids), len(all_aggregations_by_id))
+            )
             self._verify_aggregation_title_uniqueness(self._compiled_aggregations)
 
-            for aggr_id, compiled_aggr in self._compiled_aggregations.items():
+            for aggr_id in compiled_aggr_ids:
+                compiled_aggr = self._compiled_aggregations[aggr_id]
                 start = time.time()
                 result = compiled_aggr.serialize()
                 self._logger.debug(
@@ -241,6 +285,7 @@ class BICompiler:
 
             self._compiled_aggregations = self._manage_frozen_branches(self._compiled_aggregations)
             self._generate_part_of_aggregation_lookup(self._compiled_aggregations)
+            self._save_data(self._path_compilation_state, compilation_state)
 
         known_sites = {kv[0]: kv[1] for kv in current_configstatus.get("known_sites", set())}
         self._cleanup_vanished_aggregations()
@@ -249,6 +294,40 @@ class BICompiler:
             str(self._path_compilation_timestamp), str(current_configstatus["configfile_timestamp"])
         )
 
+    def compilation_token(self) -> tuple[int, int]:
+        """Changes whenever compiled or frozen aggregations are written or removed"""
+        try:
+            frozen_aggregations_mtime = frozen_aggregations_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            frozen_aggregations_mtime = 0
+        return path_compiled_aggregations.stat().st_mtime_ns, frozen_aggregations_mtime
+
+    def _load_compilation_state(self) -> CompilationState:
+        return store.load_object_from_pickle_file(
+            self._path_compilation_state,
+            default=CompilationState(program_starts=set(), dependencies={}),
+        )
+
+    def _get_changed_hosts(
+        self, current_configstatus: ConfigStatus, previous_state: CompilationState
+    ) -> set[HostName] | None:
+        """The hosts changed since the last compilation, None if everything has to be compiled"""
+        if current_configstatus["configfile_timestamp"] > self._get_compilation_timestamp():
+            return None
+        if not previous_state["dependencies"]:
+            return None
+        return self._bi_structure_fetcher.get_changed_hosts(
+            previous_state["program_starts"], current_configstatus["online_sites"]
+        )
+
+    def _load_compiled_aggregation(self, aggr_id: str) -> BICompiledAggregation | None:
+        schema = store.load_object_from_pickle_file(
+            path_compiled_aggregations.joinpath(aggr_id), default={}
+        )
+        if not schema:
+            return None
+        return BIAggregation.create_trees_from_schema(schema)
+
     def _cleanup_vanished_aggregations(self) -> None:
         valid_aggregations = list(self._compiled_aggregations.keys())
         for path_object in path_compiled_aggregations.iterdir():
@@ -355,69 +434,42 @@ class BICompiler:
     def _save_data(self, filepath: Path, data: dict) -> None:
         store.save_bytes_to_file(filepath, pickle.dumps(data))
 
-    def _get_redis_client(self) -> Redis[str]:
-        if self._redis_client is None:
-            self._redis_client = get_redis_client()
-        return self._redis_client
-
     def is_part_of_aggregation(self, host_name: str, service_description: str) -> bool:
-        self._check_redis_lookup_integrity()
-        return bool(
-            self._get_redis_client().exists(
-                f"bi:aggregation_lookup:{host_name}:{service_description}"
-            )
-        )
-
-    def _check_redis_lookup_integrity(self):
-        client = self._get_redis_client()
-        if client.exists("bi:aggregation_lookup"):
-            return True
-
-        # The following scenario only happens if the redis daemon loses its data
-        # In the normal workflow the lookup cache is updated after the compilation phase
-        # What happens if multiple apache process want to read the cache at the same time:
-        # - One apache gets the lock, updates the cache
-        # - The other apache wait till the cache has been updated
-        lookup_lock = client.lock("bi:aggregation_lookup_lock")
-        try:
-            lookup_lock.acquire()
-            if not client.exists("bi:aggregation_lookup"):
-                self.load_compiled_aggregations()
+        return (host_name, service_description) in self._get_aggregation_lookup()
+
+    def _get_aggregation_lookup(self) -> BIAggregationLookup:
+        # The lookup is replaced after each compilation. This process keeps using the mapped
+        # lookup it has opened, the next one picks up the new lookup without any locking
+        if self._aggregation_lookup is not None:
+            return self._aggregation_lookup
+
+        if (lookup := BIAggregationLookup.load(path_aggregation_lookup)) is None:
+            # The lookup is missing if nothing has been compiled yet or it has been removed
+            self.load_compiled_aggregations()
+            if (lookup := BIAggregationLookup.load(path_aggregation_lookup)) is None:
                 self._generate_part_of_aggregation_lookup(self._compiled_aggregations)
-            return None
-        finally:
-            if lookup_lock.owned():
-                lookup_lock.release()
-
-    def _generate_part_of_aggregation_lookup(self, compiled_aggregations):
-        part_of_aggregation_map: dict[str, list[str]] = {}
-        for aggr_id, compiled_aggregation in compiled_aggregations.items():
-            for branch in compiled_aggregation.branches:
-                for _site, host_name, service_description in branch.required_elements():
-                    # This information can be used to selectively load the relevant compiled
-                    # aggregation for any host/service. Right now it is only an indicator if this
-                    # host/service is part of an aggregation
-                    key = f"bi:aggregation_lookup:{host_name}:{service_description}"
-                    part_of_aggregation_map.setdefault(key, []).append(
-                        f"{aggr_id}\t{branch.properties.title}"
-                    )
-
-        client = self._get_redis_client()
-
-        # The main task here is to add/update/remove keys without causing other processes
-        # to wait for the updated data. There is no tempfile -> live mechanism.
-        # Updates are done on the live data via pipeline, using transactions.
-
-        # Fetch existing keys
-        existing_keys = set(client.scan_iter("bi:aggregation_lookup:*"))
-
-        # Update keys
-        pipeline = client.pipeline()
-        for key, values in part_of_aggregation_map.items():
-            pipeline.sadd(key, *values)
-        pipeline.set("bi:aggregation_lookup", "1")
+                lookup = BIAggregationLookup.load(path_aggregation_lookup)
+        if lookup is None:
+            raise MKGeneralException(
+                _("Can not read the BI aggregation lookup %s") % path_aggregation_lookup
+            )
 
-        if obsolete_keys := existing_keys - set(part_of_aggregation_map.keys()):
-            pipeline.delete(*obsolete_keys)
+        self._aggregation_lookup = lookup
+        return lookup
 
-        pipeline.execute()
+    def _generate_part_of_aggregation_lookup(
+        self, compiled_aggregations: dict[str, BICompiledAggregation]
+    ) -> None:
+        # This information can be used to selectively load the relevant compiled aggregation
+        # for any host/service. Right now it is only an indicator if this host/service is part
+        # of an aggregation
+        BIAggregationLookup.save(
+            path_aggregation_lookup,
+            (
+                (host_name, str(service_description), aggr_id, branch.properties.title)
+                for aggr_id, compiled_aggregation in compiled_aggregations.items()
+                for branch in compiled_aggregation.branches
+                for _site, host_name, service_description in branch.required_elements()
+            ),
+        )
+        self._aggregation_lookup = None
@@ -114,10 +114,7 @@ class BIComputer:
     ) -> list[tuple[BICompiledAggregation, list[NodeResultBundle]]]:
         results = []
         for compiled_aggregation, branches in required_aggregations:
-            node_result_bundles = compiled_aggregation.compute_branches(
-                branches,
-                self._bi_status_fetcher,
-            )
+            node_result_bundles = self._compute_branches(compiled_aggregation, branches)
 
             # Postprocess results. Custom user plugins may add additional information for each node
             node_result_bundles = list(
@@ -130,6 +127,38 @@ class BIComputer:
             results.append((compiled_aggregation, node_result_bundles))
         return results
 
+    def _compute_branches(
+        self, compiled_aggregation: BICompiledAggregation, branches: list[BICompiledRule]
+    ) -> list[NodeResultBundle]:
+        status_cache = self._bi_status_fetcher.status_cache
+        generation = self._bi_status_fetcher.states_generation
+        if status_cache is None or generation is None:
+            return compiled_aggregation.compute_branches(branches, self._bi_status_fetcher)
+
+        # The result of a branch only changes along with the states of its hosts. Branches
+        # with assumed states are computed for this request only
+        assumed_state_ids = set(self._bi_status_fetcher.assumed_states)
+        node_result_bundles = []
+        for branch in branches:
+            if assumed_state_ids.intersection(branch.required_elements()):
+                node_result_bundles.extend(
+                    compiled_aggregation.compute_branches([branch], self._bi_status_fetcher)
+                )
+                continue
+
+            key = (compiled_aggregation.id, branch.properties.title)
+            cached_result = status_cache.results.get(key)
+            if cached_result is None or status_cache.changed_since(
+                branch.get_required_hosts(), cached_result[0]
+            ):
+                cached_result = (
+                    generation,
+                    compiled_aggregation.compute_branches([branch], self._bi_status_fetcher),
+                )
+                status_cache.results[key] = cached_result
+            node_result_bundles.extend(cached_result[1])
+        return node_result_bundles
+
     def get_filtered_aggregation_branches(
         self,
         compiled_aggregation: BICompiledAggregation,
@@ -5,9 +5,11 @@
 
 import marshal
 import os
+import threading
 import time
-from collections.abc import Mapping
+from collections.abc import Hashable, Iterable, Mapping
 from pathlib import Path
+from typing import Any, Final
 
 from livestatus import LivestatusColumn, LivestatusOutputFormat, LivestatusResponse, SiteId
 
@@ -101,6 +103,19 @@ class BIStructureFetcher:
             self._fetch_missing_data(missing_program_starts)
 
         self._read_cached_data(required_program_starts)
+        self._drop_unrequired_sites({site_id for site_id, _timestamp in required_program_starts})
+
+    def _drop_unrequired_sites(self, required_sites: set[SiteId]) -> None:
+        # Keep the hosts in line with the data a new process would read
+        if not (dropped_sites := self._have_sites - required_sites):
+            return
+        for host_name in [
+            host_name
+            for host_name, host_data in self._hosts.items()
+            if host_data.site_id in dropped_sites
+        ]:
+            del self._hosts[host_name]
+        self._have_sites -= dropped_sites
 
     def _fetch_missing_data(self, missing_program_starts: set) -> None:
         only_sites = {kv[0]: kv[1] for kv in missing_program_starts}
@@ -233,6 +248,14 @@ class BIStructureFetcher:
         # ("alias", str),
         # ("name", str),
 
+        # Hosts that were removed from the site
+        for host_name in [
+            host_name
+            for host_name, host_data in self._hosts.items()
+            if host_data.site_id == site_id and host_name not in hosts
+        ]:
+            del self._hosts[host_name]
+
         for host_name, values in hosts.items():
             site_id, tags, labels, folder, services, children, parents, alias, name = values
             self._hosts[host_name] = BIHostData(
@@ -249,6 +272,47 @@ class BIStructureFetcher:
 
         self._have_sites.add(site_id)
 
+    def get_changed_hosts(
+        self,
+        previous_program_starts: set[SiteProgramStart],
+        program_starts: set[SiteProgramStart],
+    ) -> set[HostName] | None:
+        """Compare the cached structure data of two sets of program starts
+
+        Returns the hosts that were added, removed or changed, or None if the data of a
+        changed site is no longer cached.
+        """
+        previous_sites = dict(previous_program_starts)
+        sites = dict(program_starts)
+        cached_files = {
+            program_start: path_object for path_object, program_start in self._get_site_data_files()
+        }
+
+        def load_site_data(site_id: SiteId, timestamp: int | None) -> dict | None:
+            if timestamp is None:
+                return {}
+            if (path_object := cached_files.get((site_id, timestamp))) is None:
+                return None
+            try:
+                return self._marshal_load_data(path_object)
+            except (OSError, EOFError, ValueError, TypeError):
+                return None
+
+        changed_hosts: set[HostName] = set()
+        for site_id in previous_sites.keys() | sites.keys():
+            if previous_sites.get(site_id) == sites.get(site_id):
+                continue
+            previous_hosts = load_site_data(site_id, previous_sites.get(site_id))
+            hosts = load_site_data(site_id, sites.get(site_id))
+            if previous_hosts is None or hosts is None:
+                return None
+            changed_hosts.update(
+                host_name
+                for host_name in previous_hosts.keys() | hosts.keys()
+                if previous_hosts.get(host_name) != hosts.get(host_name)
+            )
+        return changed_hosts
+
     def cleanup_orphaned_files(self, known_sites: Mapping[SiteId, int]) -> None:
         for path_object, (site_id, timestamp) in self._get_site_data_files():
             try:
@@ -301,7 +365,77 @@ class BIStructureFetcher:
 #   +----------------------------------------------------------------------+
 
 
+class BIStatusCache:
+    """The status rows of the hosts of BI aggregations, kept between computations
+
+    After a full refresh only the hosts whose own state or the state of one of
+    their services changed since the last refresh are fetched again. Changes
+    which do not change a state, e.g. acknowledgements, downtimes or plugin
+    outputs, are picked up by the next full refresh after max_age seconds.
+
+    Each host remembers the generation of the cache in which its row changed
+    last. A result computed from the rows of a generation stays valid as long
+    as none of its hosts changed in a later generation.
+    """
+
+    # Tolerate some clock skew between this and the monitoring sites
+    CLOCK_SKEW: Final = 2.0
+
+    def __init__(self, max_age: float = 60.0) -> None:
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.rows: BIStatusInfo = {}
+        self.generation = 0
+        self.last_refresh = 0.0
+        self.last_full_refresh = 0.0
+        self.results: dict[Hashable, tuple[int, Any]] = {}
+        self._compilation_token: Hashable = None
+        self._known_hosts: set[BIHostSpec] = set()
+        self._generations: dict[BIHostSpec, int] = {}
+
+    def use_compilation(self, compilation_token: Hashable) -> None:
+        """Results computed from other compiled aggregations are dropped"""
+        if compilation_token != self._compilation_token:
+            self.results.clear()
+            self._compilation_token = compilation_token
+
+    @property
+    def known_hosts(self) -> set[BIHostSpec]:
+        """The hosts with a row or known to have no row"""
+        return self._known_hosts
+
+    def changed_since(self, hosts: Iterable[BIHostSpec], generation: int) -> bool:
+        return any(self._generations.get(host, 0) > generation for host in hosts)
+
+    def update(self, rows: BIStatusInfo, fetched_hosts: set[BIHostSpec]) -> None:
+        """Take over the rows of the fetched hosts, the ones without a row are gone"""
+        generation = self.generation + 1
+        for host in fetched_hosts | rows.keys():
+            row = rows.get(host)
+            self._known_hosts.add(host)
+            if row == self.rows.get(host):
+                continue
+            if row is None:
+                del self.rows[host]
+            else:
+                self.rows[host] = row
+            self._generations[host] = self.generation = generation
+
+    def forget(self, hosts: Iterable[BIHostSpec]) -> None:
+        generation = self.generation + 1
+        for host in hosts:
+            self._known_hosts.discard(host)
+            if self.rows.pop(host, None) is not None:
+                self._generations[host] = self.generation = generation
+
+
 class BIStatusFetcher(ABCBIStatusFetcher):
+    def __init__(self, sites_callback: SitesCallback, status_cache: BIStatusCache | None = None):
+        super().__init__(sites_callback)
+        self.status_cache = status_cache
+        # The generation of the status cache the states are taken from
+        self.states_generation: int | None = None
+
     def set_assumed_states(self, assumed_states: dict) -> None:
         # Streamline format to site, host, service (may be None)
         self.assumed_states = {}
@@ -312,7 +446,14 @@ class BIStatusFetcher(ABCBIStatusFetcher):
                 self.assumed_states[key] = state
 
     def update_states(self, required_elements: set[RequiredBIElement]) -> None:
-        self.states = self._get_status_info(required_elements)
+        if self.status_cache is None:
+            self.states = self._get_status_info(required_elements)
+            return
+
+        with self.status_cache.lock:
+            self._update_status_cache(self.status_cache, required_elements)
+            self.states = dict(self.status_cache.rows)
+            self.states_generation = self.status_cache.generation
 
     def update_states_filtered(
         self,
@@ -326,14 +467,72 @@ class BIStatusFetcher(ABCBIStatusFetcher):
         self.states = self._get_status_info_filtered(
             filter_header, only_sites, limit, host_columns, bygroup, required_aggregations
         )
+        self.states_generation = None
 
     def cleanup(self) -> None:
         self.states.clear()
+        self.states_generation = None
         self.assumed_states.clear()
 
+    def _update_status_cache(
+        self, status_cache: BIStatusCache, required_elements: set[RequiredBIElement]
+    ) -> None:
+        now = time.time()
+        required_hosts = {BIHostSpec(site, host) for site, host, _service in required_elements}
+        if now - status_cache.last_full_refresh > status_cache.max_age:
+            status_cache.forget(status_cache.known_hosts - required_hosts)
+            fetch_hosts = required_hosts
+            status_cache.last_full_refresh = now
+        else:
+            online_sites = {
+                site_id
+                for site_id, online in self.sites_callback.all_sites_with_id_and_online()
+                if online
+            }
+            status_cache.forget(
+                {host for host in status_cache.known_hosts if host.site_id not in online_sites}
+            )
+            fetch_hosts = (required_hosts - status_cache.known_hosts) | (
+                self._get_changed_hosts(
+                    status_cache.last_refresh - status_cache.CLOCK_SKEW,
+                    {host.site_id for host in status_cache.known_hosts},
+                )
+                & status_cache.known_hosts
+            )
+
+        status_cache.update(self._get_host_status_info(fetch_hosts), fetch_hosts)
+        status_cache.last_refresh = now
+
+    def _get_changed_hosts(self, since: float, sites: set[SiteId]) -> set[BIHostSpec]:
+        """The hosts whose own state or the state of one of their services changed"""
+        if not sites:
+            return set()
+
+        state_change_filter = (
+            "Filter: last_state_change >= %d\n"
+            "Filter: last_hard_state_change >= %d\n"
+            "Filter: has_been_checked = 0\n"
+            "Or: 3\n"
+        ) % (since, since)
+        changed_hosts = set()
+        for query in [
+            "GET hosts\nColumns: name\n" + state_change_filter,
+            # Group the services by their host
+            "GET services\nColumns: host_name\n" + state_change_filter + "Stats: state >= 0\n",
+        ]:
+            changed_hosts.update(
+                BIHostSpec(row[0], row[1]) for row in self.sites_callback.query(query, list(sites))
+            )
+        return changed_hosts
+
     # Get all status information for the required_hosts
     def _get_status_info(self, required_elements: set[RequiredBIElement]) -> BIStatusInfo:
-        if not required_elements:
+        return self._get_host_status_info(
+            {BIHostSpec(site, host) for site, host, _service in required_elements}
+        )
+
+    def _get_host_status_info(self, required_hosts: set[BIHostSpec]) -> BIStatusInfo:
+        if not required_hosts:
             # There is no reason to start a query if no elements are required
             # Even worse, without any required_elements the query would have no filter restrictions
             # and return all hosts
@@ -343,7 +542,7 @@ class BIStatusFetcher(ABCBIStatusFetcher):
         req_hosts: set[HostName] = set()
         req_sites: set[SiteId] = set()
 
-        for site, host, _service in required_elements:
+        for site, host in required_hosts:
             req_hosts.add(host)
             req_sites.add(site)
 
@@ -434,6 +434,10 @@ class ABCBISearcher(ABC):
     ) -> tuple[list[BIHostData], dict]:
         raise NotImplementedError()
 
+    @abstractmethod
+    def search_host_name_matches(self, pattern: str) -> tuple[list[BIHostData], dict]:
+        raise NotImplementedError()
+
     @abstractmethod
     def get_service_description_matches(
         self, host_matches: list[BIHostSearchMatch], pattern: str
@@ -3,7 +3,9 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-from collections.abc import Iterable, Mapping
+from collections.abc import Iterable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from typing import Any
 
 from cmk.utils.labels import LabelGroups
@@ -34,19 +36,82 @@ from cmk.bi.lib import ABCBISearcher, BIHostData, BIHostSearchMatch, BIServiceSe
 #   +----------------------------------------------------------------------+
 
 
+@dataclass
+class BISearchDependencies:
+    """The hosts the results of the searches depend on
+
+    The host conditions and host name patterns were evaluated on all hosts. Whether a
+    host matches them only depends on the host itself. So a changed host can only change
+    the results if it is named here or if it matches one of the conditions or patterns.
+    """
+
+    host_names: set[str] = field(default_factory=set)
+    host_conditions: list[dict] = field(default_factory=list)
+    host_name_patterns: set[str] = field(default_factory=set)
+
+    def affected_by(self, changed_host_names: Iterable[str], changed_hosts: "BISearcher") -> bool:
+        """Changed hosts that no longer exist are not part of changed_hosts"""
+        if not self.host_names.isdisjoint(changed_host_names):
+            return True
+        return any(changed_hosts.search_hosts(c) for c in self.host_conditions) or any(
+            changed_hosts.search_host_name_matches(p)[0] for p in self.host_name_patterns
+        )
+
+
+class _BIRecordedHosts(dict[str, BIHostData]):
+    """The hosts of the searcher, the names of looked up hosts are recorded"""
+
+    def __init__(self, hosts: Mapping[str, BIHostData]) -> None:
+        super().__init__(hosts)
+        self.looked_up: set[str] | None = None
+
+    def __getitem__(self, host_name: str) -> BIHostData:
+        if self.looked_up is not None:
+            self.looked_up.add(host_name)
+        return super().__getitem__(host_name)
+
+    def __contains__(self, host_name: object) -> bool:
+        if self.looked_up is not None and isinstance(host_name, str):
+            self.looked_up.add(host_name)
+        return super().__contains__(host_name)
+
+    def get(self, host_name: str, default: Any = None) -> Any:
+        if self.looked_up is not None:
+            self.looked_up.add(host_name)
+        return super().get(host_name, default)
+
+
 class BISearcher(ABCBISearcher):
+    def __init__(self) -> None:
+        super().__init__()
+        self.hosts: _BIRecordedHosts = _BIRecordedHosts({})
+        self._dependencies: BISearchDependencies | None = None
+
     def set_hosts(self, hosts: dict[str, BIHostData]) -> None:
         self.cleanup()
         # The key may be a pattern / regex, so `str` is the correct type for the key.
-        self.hosts = hosts
+        self.hosts = _BIRecordedHosts(hosts)
 
     def cleanup(self) -> None:
         # Note: Do not call clear() on hosts
         #       This would clear the reference we've got on set_hosts
-        self.hosts = {}
+        self.hosts = _BIRecordedHosts({})
         self._host_regex_match_cache.clear()
         self._host_regex_miss_cache.clear()
 
+    @contextmanager
+    def record_dependencies(self) -> Iterator[BISearchDependencies]:
+        """Record the hosts the searches within the context depend on"""
+        dependencies = BISearchDependencies()
+        hosts = self.hosts
+        self._dependencies = dependencies
+        hosts.looked_up = dependencies.host_names
+        try:
+            yield dependencies
+        finally:
+            self._dependencies = None
+            hosts.looked_up = None
+
     def search_hosts(self, conditions: dict) -> list[BIHostSearchMatch]:
         hosts, matched_re_groups = self.filter_host_choice(
             list(self.hosts.values()), conditions["host_choice"]
@@ -54,7 +119,20 @@ class BISearcher(ABCBISearcher):
         matched_hosts = self.filter_host_folder(hosts, conditions["host_folder"])
         matched_hosts = self.filter_host_tags(matched_hosts, conditions["host_tags"])
         matched_hosts = self.filter_host_labels(matched_hosts, conditions["host_label_groups"])
-        return [BIHostSearchMatch(x, matched_re_groups[x.name]) for x in matched_hosts]
+        search_matches = [BIHostSearchMatch(x, matched_re_groups[x.name]) for x in matched_hosts]
+        if self._dependencies is not None:
+            self._dependencies.host_conditions.append(conditions)
+            self._dependencies.host_names.update(x.host.name for x in search_matches)
+        return search_matches
+
+    def search_host_name_matches(self, pattern: str) -> tuple[list[BIHostData], dict]:
+        host_matches, matched_re_groups = self.get_host_name_matches(
+            list(self.hosts.values()), pattern
+        )
+        if self._dependencies is not None:
+            self._dependencies.host_name_patterns.add(pattern)
+            self._dependencies.host_names.update(x.name for x in host_matches)
+        return host_matches, matched_re_groups
 
     def filter_host_choice(
         self,
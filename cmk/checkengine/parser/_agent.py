@@ -525,7 +525,7 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
     ) -> HostSections[AgentRawDataSection]:
         now = int(time.time())
 
-        raw_sections, piggyback_sections = self._parse_host_section(raw_data)
+        raw_sections, piggyback_sections = self._parse_host_section(raw_data, selection)
         section_info = {
             header.name: header
             for header, _ in raw_sections
@@ -567,11 +567,13 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
                     ).encode(header.encoding)
                 yield from (bytes(line) for line in content)
 
-        sections = {
-            name: content
-            for name, content in decode_sections(raw_sections).items()
-            if selection is NO_SELECTION or name in selection
-        }
+        sections = decode_sections(
+            [
+                section
+                for section in raw_sections
+                if selection is NO_SELECTION or section.header.name in selection
+            ]
+        )
         piggybacked_raw_data = {
             header.hostname: list(
                 flatten_piggyback_section(
@@ -613,8 +615,13 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
     def _parse_host_section(
         self,
         raw_data: AgentRawData,
+        selection: SectionNameCollection = NO_SELECTION,
     ) -> tuple[ImmutableSection, Mapping[PiggybackMarker, ImmutableSection]]:
-        """Split agent output in chunks, splits lines by whitespaces."""
+        """Split agent output in chunks, splits lines by whitespaces.
+
+        Only the header lines are fed to the parser in any case. The lines of
+        the sections are skipped, unless the section is selected.
+        """
         parser: ParserState = NOOPParser(
             self.hostname,
             [],
@@ -623,7 +630,41 @@ class AgentParser(Parser[AgentRawData, AgentRawDataSection]):
             encoding_fallback=self.encoding_fallback,
             logger=self._logger,
         )
-        for line in raw_data.split(b"\n"):
-            parser = parser(line.rstrip(b"\r"))
+        body_start = 0
+        for header_start, header_end in _header_lines(raw_data):
+            parser = _parse_body(parser, raw_data, body_start, header_start, selection)
+            parser = parser(raw_data[header_start:header_end].rstrip(b"\r"))
+            body_start = header_end + 1
+        parser = _parse_body(parser, raw_data, body_start, len(raw_data), selection)
 
         return parser.sections, parser.piggyback_sections
+
+
+def _header_lines(raw_data: bytes) -> Iterator[tuple[int, int]]:
+    """The start and end offsets of all section and piggyback header lines"""
+    start = 0 if raw_data.startswith(b"<<<") else raw_data.find(b"\n<<<") + 1
+    while start or raw_data.startswith(b"<<<", start):
+        if (end := raw_data.find(b"\n", start)) == -1:
+            end = len(raw_data)
+        if raw_data[start:end].rstrip(b"\r").endswith(b">>>"):
+            yield start, end
+        if not (start := raw_data.find(b"\n<<<", end) + 1):
+            return
+
+
+def _parse_body(
+    parser: ParserState,
+    raw_data: bytes,
+    start: int,
+    end: int,
+    selection: SectionNameCollection,
+) -> ParserState:
+    if start >= end or not (
+        isinstance(parser, HostSectionParser | PiggybackSectionParser)
+        and (selection is NO_SELECTION or parser.current_section.name in selection)
+    ):
+        # The other states ignore the lines anyway
+        return parser
+    for line in raw_data[start:end].split(b"\n"):
+        parser = parser(line.rstrip(b"\r"))
+    return parser
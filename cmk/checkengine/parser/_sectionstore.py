@@ -4,18 +4,133 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import logging
-from collections.abc import Callable
+import struct
+from collections.abc import Callable, Iterator, Mapping
 from pathlib import Path
-from typing import Final, Generic, TypeVar
+from typing import Final, Generic, NamedTuple, TypeVar
 
 import cmk.ccc.store as _store
 
+from cmk.utils import binarycodec
 from cmk.utils.sectionname import MutableSectionMap, SectionMap, SectionName
 
 __all__ = ["SectionStore"]
 
 _T = TypeVar("_T")
 
+_MAGIC: Final = b"CMKSECT1"
+# created at, valid until, length of the name and length of the content
+_RECORD: Final = struct.Struct("<qqII")
+
+
+class _Record(NamedTuple):
+    created_at: int
+    valid_until: int
+    content: bytes
+
+
+class _PersistedSections(MutableSectionMap[tuple[int, int, _T]]):
+    """The persisted sections, each one is decoded on first access
+
+    The sections keep their encoded form as long as they are not replaced,
+    so storing them again does not encode them again. A section that cannot
+    be decoded is dropped, as if it had not been persisted.
+    """
+
+    def __init__(self, records: Mapping[SectionName, _Record], logger: logging.Logger) -> None:
+        self._records: Final = dict(records)
+        self._sections: Final[dict[SectionName, tuple[int, int, _T]]] = {}
+        self._logger: Final = logger
+
+    def __getitem__(self, section_name: SectionName) -> tuple[int, int, _T]:
+        if (section := self._sections.get(section_name)) is not None:
+            return section
+        record = self._records[section_name]
+        try:
+            content = binarycodec.decode(record.content)
+        except ValueError as e:
+            self._logger.debug("Ignoring invalid persisted section %r: %s", section_name, e)
+            del self._records[section_name]
+            raise KeyError(section_name) from e
+        section = self._sections[section_name] = (record.created_at, record.valid_until, content)
+        return section
+
+    def __setitem__(self, section_name: SectionName, section: tuple[int, int, _T]) -> None:
+        self._records.pop(section_name, None)
+        self._sections[section_name] = section
+
+    def __delitem__(self, section_name: SectionName) -> None:
+        if section_name not in self:
+            raise KeyError(section_name)
+        self._records.pop(section_name, None)
+        self._sections.pop(section_name, None)
+
+    def __contains__(self, section_name: object) -> bool:
+        return section_name in self._records or section_name in self._sections
+
+    def __iter__(self) -> Iterator[SectionName]:
+        # Decoding a section must not change the iteration.
+        return iter(
+            [*self._records, *(name for name in self._sections if name not in self._records)]
+        )
+
+    def __len__(self) -> int:
+        return len(self._records.keys() | self._sections.keys())
+
+    def lifetime(self, section_name: SectionName) -> tuple[int, int]:
+        if (record := self._records.get(section_name)) is not None:
+            return record.created_at, record.valid_until
+        created_at, valid_until, _content = self._sections[section_name]
+        return created_at, valid_until
+
+    def records(self) -> Iterator[tuple[SectionName, _Record]]:
+        for section_name in self:
+            if (record := self._records.get(section_name)) is None:
+                created_at, valid_until, content = self._sections[section_name]
+                record = _Record(created_at, valid_until, binarycodec.encode(content))
+            yield section_name, record
+
+
+def _lifetime(
+    sections: SectionMap[tuple[int, int, object]], section_name: SectionName
+) -> tuple[int, int]:
+    # Spare us decoding the section if we can.
+    if isinstance(sections, _PersistedSections):
+        return sections.lifetime(section_name)
+    created_at, valid_until, _content = sections[section_name]
+    return created_at, valid_until
+
+
+def _pack(records: Iterator[tuple[SectionName, _Record]]) -> bytes:
+    chunks = [_MAGIC]
+    for section_name, record in records:
+        name = str(section_name).encode("utf-8")
+        chunks += (
+            _RECORD.pack(record.created_at, record.valid_until, len(name), len(record.content)),
+            name,
+            record.content,
+        )
+    return b"".join(chunks)
+
+
+def _unpack(raw: bytes) -> dict[SectionName, _Record]:
+    records = {}
+    offset = len(_MAGIC)
+    try:
+        while offset < len(raw):
+            created_at, valid_until, name_size, content_size = _RECORD.unpack_from(raw, offset)
+            offset += _RECORD.size
+            name = raw[offset : offset + name_size].decode("utf-8")
+            offset += name_size
+            content = raw[offset : offset + content_size]
+            offset += content_size
+            if offset > len(raw):
+                raise ValueError("truncated record")
+            records[SectionName(name)] = _Record(created_at, valid_until, content)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(e) from e
+    return records
+
 
 class SectionStore(Generic[_T]):
     def __init__(
@@ -38,15 +153,42 @@ class SectionStore(Generic[_T]):
             return
 
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        _store.save_object_to_pickle_file(
+        _store.save_bytes_to_file(
             self.path,
-            {str(k): v for k, v in sections.items()},
+            _pack(
+                sections.records()
+                if isinstance(sections, _PersistedSections)
+                else (
+                    (name, _Record(created_at, valid_until, binarycodec.encode(content)))
+                    for name, (created_at, valid_until, content) in sections.items()
+                )
+            ),
         )
         self._logger.debug("Stored persisted sections: %s", ", ".join(str(s) for s in sections))
 
     def load(self) -> MutableSectionMap[tuple[int, int, _T]]:
-        raw_sections_data = _store.load_object_from_pickle_file(self.path, default={})
-        return {SectionName(k): v for k, v in raw_sections_data.items()}
+        return self._load()
+
+    def load_lifetimes(self) -> MutableSectionMap[tuple[int, int]]:
+        """The creation time and validity of the persisted sections, without their content"""
+        persisted_sections = self._load()
+        return {name: persisted_sections.lifetime(name) for name in persisted_sections}
+
+    def _load(self) -> _PersistedSections[_T]:
+        raw = _store.load_bytes_from_file(self.path)
+        if raw.startswith(_MAGIC):
+            try:
+                return _PersistedSections(_unpack(raw), self._logger)
+            except ValueError as e:
+                self._logger.debug("Ignoring invalid persisted sections: %s", e)
+                return _PersistedSections({}, self._logger)
+
+        persisted_sections = _PersistedSections[_T]({}, self._logger)
+        if raw:
+            # Migrate the pickled sections of earlier versions.
+            pickled: Mapping[str, tuple[int, int, _T]] = _store.PickleSerializer().deserialize(raw)
+            persisted_sections.update({SectionName(k): v for k, v in pickled.items()})
+        return persisted_sections
 
     def update(
         self,
@@ -94,7 +236,7 @@ class SectionStore(Generic[_T]):
 
         if not keep_outdated:
             for section_name in tuple(persisted_sections):
-                (_created_at, valid_until, _section_content) = persisted_sections[section_name]
+                _created_at, valid_until = _lifetime(persisted_sections, section_name)
                 if section_outdated(valid_until, now):
                     store_sections = True
                     del persisted_sections[section_name]
@@ -109,15 +251,8 @@ class SectionStore(Generic[_T]):
         cache_info: MutableSectionMap[tuple[int, int]],
         persisted_sections: MutableSectionMap[tuple[int, int, _T]],
     ) -> SectionMap[_T]:
-        cache_info.update(
-            {
-                section_name: (created_at, valid_until - created_at)
-                for section_name, (created_at, valid_until, *_rest) in persisted_sections.items()
-                if section_name not in sections
-            }
-        )
         result: MutableSectionMap[_T] = dict(sections.items())
-        for section_name, entry in persisted_sections.items():
+        for section_name in persisted_sections:
             # Don't overwrite sections that have been received from the source with this call
             if section_name in sections:
                 self._logger.debug(
@@ -126,6 +261,9 @@ class SectionStore(Generic[_T]):
                 )
                 continue
 
+            if (section := persisted_sections.get(section_name)) is None:
+                continue
             self._logger.debug("Using persisted section %r", section_name)
-            result[section_name] = entry[-1]
+            created_at, valid_until, result[section_name] = section
+            cache_info[section_name] = (created_at, valid_until - created_at)
         return result
@@ -337,6 +337,8 @@ class ConfigFromWATO(TypedDict):
     rules: Collection[Rule]
     sqlite_housekeeping_interval: int
     sqlite_freelist_size: int
+    sqlite_write_batch_size: int
+    sqlite_write_interval: int
     snmp_credentials: Collection[SNMPCredential]
     socket_queue_len: int
     statistics_interval: int
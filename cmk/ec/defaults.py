@@ -56,6 +56,8 @@ def default_config() -> ConfigFromWATO:
         housekeeping_interval=60,
         sqlite_housekeeping_interval=3600,  # seconds ValueSpec Age
         sqlite_freelist_size=50 * 1024 * 1024,  # bytes ValueSpec FIlesize
+        sqlite_write_batch_size=1000,  # history entries
+        sqlite_write_interval=500,  # milliseconds
         statistics_interval=5,
         history_lifetime=365,  # days
         history_rotation="daily",
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Staged processing of the incoming messages
+
+The receiving thread only hands over the received data to the pipeline, so it
+is able to drain the sockets even under burst load. A pool of workers parses
+and classifies the data, i.e. does the rule matching. The results are applied
+one after another in the order they have been received by a single thread,
+which is the only one of the pipeline changing the event status.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import Logger
+from typing import Final, Generic, NamedTuple, TypeVar
+
+from .perfcounters import Perfcounters
+
+_ItemT = TypeVar("_ItemT")
+_ResultT = TypeVar("_ResultT")
+
+
+class _Pending(NamedTuple, Generic[_ResultT]):
+    received: float
+    result: Future[_ResultT]
+
+
+class EventPipeline(Generic[_ItemT, _ResultT]):
+    def __init__(
+        self,
+        logger: Logger,
+        perfcounters: Perfcounters,
+        classify: Callable[[_ItemT], _ResultT],
+        apply: Callable[[_ResultT], None],
+        num_workers: int,
+        queue_size: int,
+    ) -> None:
+        self._logger = logger
+        self._perfcounters = perfcounters
+        self._classify = classify
+        self._apply = apply
+        self.num_workers: Final = num_workers
+        self.queue_size: Final = queue_size
+        # Received but not yet applied items, bounding the work in progress
+        self._pending: queue.Queue[_Pending[_ResultT]] = queue.Queue(maxsize=queue_size)
+        self._executor: ThreadPoolExecutor | None = None
+        self._apply_thread: threading.Thread | None = None
+        self._terminate_event = threading.Event()
+
+    @property
+    def queue_length(self) -> int:
+        return self._pending.qsize()
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.num_workers, thread_name_prefix="EventWorker"
+        )
+        self._apply_thread = threading.Thread(target=self._apply_results, name="EventStatusStage")
+        self._apply_thread.start()
+
+    def submit(self, item: _ItemT) -> bool:
+        """Hand over an item to the workers, returns False if it had to be dropped"""
+        if self._executor is None:
+            raise RuntimeError("event pipeline not started")
+        if self._pending.full():
+            self._perfcounters.count("queue_drops")
+            return False
+        received = time.time()
+        result = self._executor.submit(self._timed_classify, item)
+        try:
+            self._pending.put_nowait(_Pending(received, result))
+        except queue.Full:
+            result.cancel()
+            self._perfcounters.count("queue_drops")
+            return False
+        return True
+
+    def shutdown(self) -> None:
+        """Stops the pipeline after all pending items have been applied"""
+        if self._executor is None or self._apply_thread is None:
+            return
+        self._terminate_event.set()
+        self._apply_thread.join()
+        self._executor.shutdown()
+        self._executor = None
+        self._apply_thread = None
+        self._terminate_event.clear()
+
+    def _timed_classify(self, item: _ItemT) -> _ResultT:
+        before = time.time()
+        result = self._classify(item)
+        self._perfcounters.count_time("classify", time.time() - before)
+        return result
+
+    def _apply_results(self) -> None:
+        while True:
+            try:
+                pending = self._pending.get(timeout=0.5)
+            except queue.Empty:
+                if self._terminate_event.is_set():
+                    return
+                continue
+
+            try:
+                result = pending.result.result()
+                before = time.time()
+                self._apply(result)
+                now = time.time()
+                self._perfcounters.count_time("apply", now - before)
+                self._perfcounters.count_time("pipeline", now - pending.received)
+            except Exception:
+                self._logger.exception("Exception in event status stage")
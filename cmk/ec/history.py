@@ -10,7 +10,7 @@ from collections.abc import Iterable, Iterator, Sequence
 from contextlib import contextmanager
 from logging import getLogger, Logger
 from pathlib import Path
-from typing import Any, Literal
+from typing import Any, Literal, NamedTuple
 
 from .config import Config
 from .event import Event
@@ -35,6 +35,15 @@ HistoryWhat = Literal[
 ]
 
 
+class HistoryWriteStatus(NamedTuple):
+    """Statistics of the history backends writing their entries in batches"""
+
+    pending: int = 0
+    written: int = 0
+    batches: int = 0
+    write_time: float = 0.0
+
+
 class History(ABC):
     @abstractmethod
     def flush(self) -> None: ...
@@ -51,6 +60,9 @@ class History(ABC):
     @abstractmethod
     def close(self) -> None: ...
 
+    def write_status(self) -> HistoryWriteStatus:
+        return HistoryWriteStatus()
+
 
 class TimedHistory(History):
     """Decorate History methods with timing information."""
@@ -89,6 +101,9 @@ class TimedHistory(History):
         with self._timing("close"):
             return self._history.close()
 
+    def write_status(self) -> HistoryWriteStatus:
+        return self._history.write_status()
+
 
 def _log_event(
     config: Config, logger: Logger, event: Event, what: HistoryWhat, who: str, addinfo: str
@@ -2,13 +2,27 @@
 # Copyright (C) 2023 Checkmk GmbH - License: GNU General Public License v2
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
-"""EC History sqlite backend."""
+"""EC History sqlite backend.
 
+The history is partitioned into segments of one day, each one a table of its
+own named after the start of the day ("history_<timestamp>"). Queries only
+read the segments matching their time filters, housekeeping simply drops the
+expired segments. The segments have secondary indexes on the columns the GUI
+filters on.
+
+New entries are written behind by a thread of their own in batches, so adding
+an entry never waits for the disk.
+"""
+
+import bisect
+import contextlib
 import itertools
 import json
+import math
 import sqlite3
+import threading
 import time
-from collections.abc import Iterable, Sequence
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import dataclass
 from datetime import timedelta
 from logging import Logger
@@ -17,7 +31,7 @@ from typing import Final, Literal
 
 from .config import Config
 from .event import Event
-from .history import History, HistoryWhat
+from .history import History, HistoryWhat, HistoryWriteStatus
 from .query import Columns, QueryFilter, QueryGET
 from .settings import Options, Paths, Settings
 
@@ -54,21 +68,77 @@ TABLE_COLUMNS: Final = (
     "match_groups_syslog_application",
 )
 
-INDEXED_COLUMNS: Final = (
-    "time",
-    "id",
-    "host",
+# Text columns are compared case insensitively by the "=~" and "in" operators
+TEXT_COLUMNS: Final = frozenset(
+    {
+        "what",
+        "who",
+        "addinfo",
+        "text",
+        "comment",
+        "host",
+        "contact",
+        "application",
+        "rule_id",
+        "phase",
+        "owner",
+        "ipaddress",
+        "orig_host",
+        "contact_groups_precedence",
+        "core_host",
+    }
 )
 
+# The filters of the GUI are combined with a time range most of the time
+INDEXED_COLUMNS: Final = {
+    "time": "time",
+    "id": "id",
+    "host": "host COLLATE NOCASE, time",
+    "rule_id": "rule_id COLLATE NOCASE, time",
+    "state": "state, time",
+    "application": "application COLLATE NOCASE, time",
+}
+
+SEGMENT_DURATION: Final = 86400
+
 SQLITE_PRAGMAS = {
     "PRAGMA journal_mode=WAL;": "WAL mode for concurrent reads and writes",
     "PRAGMA synchronous = NORMAL;": "Writes should not blocked by reads",
     "PRAGMA busy_timeout = 2000;": "2 seconds timeout for busy handler. Avoids database is locked errors",
 }
 
-SQLITE_INDEXES = [
-    f"CREATE INDEX IF NOT EXISTS idx_{column} ON history ({column});" for column in INDEXED_COLUMNS
-]
+_TABLE_SCHEMA: Final = """(
+    line INTEGER PRIMARY KEY,
+    time REAL,
+    what TEXT,
+    who TEXT,
+    addinfo TEXT,
+    id INTEGER,
+    count INTEGER,
+    text TEXT,
+    first REAL,
+    last REAL,
+    comment TEXT,
+    sl INTEGER,
+    host TEXT,
+    contact TEXT,
+    application TEXT,
+    pid INTEGER,
+    priority INTEGER,
+    facility INTEGER,
+    rule_id TEXT,
+    state INTEGER,
+    phase TEXT,
+    owner TEXT,
+    match_groups JSON,
+    contact_groups JSON,
+    ipaddress TEXT,
+    orig_host TEXT,
+    contact_groups_precedence TEXT,
+    core_host TEXT,
+    host_in_downtime BOOL,
+    match_groups_syslog_application JSON
+)"""
 
 
 def configure_sqlite_types() -> None:
@@ -87,49 +157,92 @@ def configure_sqlite_types() -> None:
     sqlite3.register_adapter(tuple, json.dumps)
 
 
+def segment_start(timestamp: float) -> int:
+    return int(timestamp // SEGMENT_DURATION * SEGMENT_DURATION)
+
+
+def segment_table(start: int) -> str:
+    return f"history_{start}"
+
+
+def _segment_statements(start: int) -> Iterator[str]:
+    table = segment_table(start)
+    yield f'CREATE TABLE IF NOT EXISTS "{table}" {_TABLE_SCHEMA};'
+    for column, index_columns in INDEXED_COLUMNS.items():
+        yield f'CREATE INDEX IF NOT EXISTS "idx_{table}_{column}" ON "{table}" ({index_columns});'
+
+
+def _column_name(f: QueryFilter) -> str:
+    if f.column_name.startswith("event_") or f.column_name.startswith("history_"):
+        column_name = f.column_name.replace("event_", "").replace("history_", "")
+    else:
+        raise ValueError(f"Filter {f.column_name} not implemented for SQLite")
+
+    if column_name not in TABLE_COLUMNS:
+        raise ValueError(f"Filter {f.column_name} not implemented for SQLite")
+    return column_name
+
+
 def filters_to_sqlite_query(filters: Iterable[QueryFilter]) -> tuple[str, list[object]]:
     """
-    Construct the sqlite filtering specification.
+    Construct the WHERE clause of the sqlite query for the given filters.
 
-    Used in SQLiteHistory.get() method.
-    Always return all columns, since they are filtered elsewhere.
+    Used in SQLiteHistory.get() method. The clause selects a superset of the
+    matching entries: Regex filters are not part of it and text columns are
+    compared case insensitively, so that the indexes can be used. The exact
+    filtering is done on the resulting rows.
     """
-    query_columns: set[str] = set()
     query_conditions: list[str] = []
     query_arguments: list[object] = []
 
     for f in filters:
-        adjusted_column_name = ""
+        column_name = _column_name(f)
+        collation = " COLLATE NOCASE" if column_name in TEXT_COLUMNS else ""
+
+        # Regular expressions are not supported by sqlite out of the box
+        sqlite_filter: str | None = {
+            "=": f"{column_name} = ?{collation}",
+            ">": f"{column_name} > ?",
+            "<": f"{column_name} < ?",
+            ">=": f"{column_name} >= ?",
+            "<=": f"{column_name} <= ?",
+            "~": None,
+            "=~": f"{column_name} = ?{collation}",
+            "~~": None,
+            "in": f"{column_name}{collation} IN",
+        }[f.operator_name]
 
-        if f.column_name.startswith("event_") or f.column_name.startswith("history_"):
-            adjusted_column_name = f.column_name.replace("event_", "").replace("history_", "")
+        if sqlite_filter is None:
+            continue
+        if f.operator_name == "in":
+            query_conditions.append(f"{sqlite_filter} ({', '.join('?' * len(f.argument))})")
+            query_arguments.extend(f.argument)
         else:
-            raise ValueError(f"Filter {f.column_name} not implemented for SQLite")
-
-        if adjusted_column_name not in TABLE_COLUMNS:
-            raise ValueError(f"Filter {f.column_name} not implemented for SQLite")
-
-        sqlite_filter: str = {
-            "=": f"{adjusted_column_name} {f.operator_name} ?",
-            ">": f"{adjusted_column_name} {f.operator_name} ?",
-            "<": f"{adjusted_column_name} {f.operator_name} ?",
-            ">=": f"{adjusted_column_name} {f.operator_name} ?",
-            "<=": f"{adjusted_column_name} {f.operator_name} ?",
-            "~": f"{adjusted_column_name} LIKE '%?%'",
-            "=~": f"{adjusted_column_name} LIKE '%?%'",
-            "~~": f"{adjusted_column_name} LIKE '%?%'",
-            "in": f"{adjusted_column_name} in '%?%'",
-        }[f.operator_name]
+            query_conditions.append(sqlite_filter)
+            query_arguments.append(f.argument)
 
-        query_columns.add(adjusted_column_name)
-        query_conditions.append(sqlite_filter)
-        query_arguments.append(f.argument)
     return (
-        f'SELECT * FROM history {"WHERE" if query_arguments else ""} {" AND ".join(query_conditions)};',  # nosec B608 # BNS:6b6392
+        f'WHERE {" AND ".join(query_conditions)}' if query_conditions else "",
         query_arguments,
     )
 
 
+def filters_to_time_range(filters: Iterable[QueryFilter]) -> tuple[float, float]:
+    """The time range (inclusive) the entries matching the filters are in"""
+    lower, upper = -math.inf, math.inf
+    for f in filters:
+        if _column_name(f) != "time":
+            continue
+        match f.operator_name:
+            case "=":
+                lower, upper = max(lower, f.argument), min(upper, f.argument)
+            case ">" | ">=":
+                lower = max(lower, f.argument)
+            case "<" | "<=":
+                upper = min(upper, f.argument)
+    return lower, upper
+
+
 @dataclass
 class SQLiteSettings:
     paths: Paths
@@ -159,6 +272,16 @@ class SQLiteHistory(History):
         self._history_columns = history_columns
         self._last_housekeeping = 0.0
         self._page_size = 4096
+        # Serializes the writers, the line numbers are assigned by us
+        self._lock = threading.Lock()
+        # The added entries not written yet, guarded by the condition
+        self._pending: list[Sequence[object]] = []
+        self._pending_condition = threading.Condition()
+        self._writer: threading.Thread | None = None
+        self._closed = False
+        self._written = 0
+        self._batches = 0
+        self._write_time = 0.0
 
         if isinstance(self._settings.database, Path):
             self._settings.database.parent.mkdir(parents=True, exist_ok=True)
@@ -179,116 +302,209 @@ class SQLiteHistory(History):
                 connection.execute(pragma_string)
             self._page_size = connection.execute("PRAGMA page_size").fetchone()[0]
 
-        with self.conn as connection:
-            cur = connection.cursor()
-            cur.execute(
-                """CREATE TABLE IF NOT EXISTS
-                    history (
-                        line INTEGER PRIMARY KEY AUTOINCREMENT,
-                        time REAL,
-                        what TEXT,
-                        who TEXT,
-                        addinfo TEXT,
-                        id INTEGER,
-                        count INTEGER,
-                        text TEXT,
-                        first REAL,
-                        last REAL,
-                        comment TEXT,
-                        sl INTEGER,
-                        host TEXT,
-                        contact TEXT,
-                        application TEXT,
-                        pid INTEGER,
-                        priority INTEGER,
-                        facility INTEGER,
-                        rule_id TEXT,
-                        state INTEGER,
-                        phase TEXT,
-                        owner TEXT,
-                        match_groups JSON,
-                        contact_groups JSON,
-                        ipaddress TEXT,
-                        orig_host TEXT,
-                        contact_groups_precedence TEXT,
-                        core_host TEXT,
-                        host_in_downtime BOOL,
-                        match_groups_syslog_application JSON
-                    );"""
+        self._segments: list[int] = sorted(
+            int(row[0].removeprefix("history_"))
+            for row in self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name GLOB 'history_*';"
             )
+        )
+        self._migrate_unpartitioned_history()
+        self._next_line = 1 + max(
+            (
+                self.conn.execute(f'SELECT MAX(line) FROM "{segment_table(start)}";').fetchone()[0]
+                or 0
+                for start in self._segments
+            ),
+            default=0,
+        )
+
+    def _migrate_unpartitioned_history(self) -> None:
+        """Move the entries of the "history" table of previous versions into segments"""
+        if not self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='history';"
+        ).fetchall():
+            return
+
         with self.conn as connection:
-            for index_statement in SQLITE_INDEXES:
-                connection.execute(index_statement)
+            starts = [
+                int(row[0])
+                for row in connection.execute(
+                    f"SELECT DISTINCT CAST(time / {SEGMENT_DURATION} AS INTEGER) * {SEGMENT_DURATION} FROM history;"  # nosec B608 # BNS:6b6392
+                )
+            ]
+            for start in starts:
+                self._create_segment(connection, start)
+                connection.execute(
+                    f'INSERT INTO "{segment_table(start)}" SELECT * FROM history WHERE time >= ? AND time < ?;',  # nosec B608 # BNS:6b6392
+                    (start, start + SEGMENT_DURATION),
+                )
+            connection.execute("DROP TABLE history;")
+        self._logger.info("Moved the history into %d segments", len(starts))
+
+    def _create_segment(self, connection: sqlite3.Connection, start: int) -> None:
+        index = bisect.bisect_left(self._segments, start)
+        if index < len(self._segments) and self._segments[index] == start:
+            return
+        for statement in _segment_statements(start):
+            connection.execute(statement)
+        self._segments.insert(index, start)
+
+    def _drop_segment(self, connection: sqlite3.Connection, start: int) -> None:
+        connection.execute(f'DROP TABLE IF EXISTS "{segment_table(start)}";')
+        self._segments.remove(start)
 
     def flush(self) -> None:
         """Delete all entries the history table."""
-        with self.conn as connection:
-            connection.execute("DELETE FROM history;")
+        with self._lock:
+            with self._pending_condition:
+                self._pending.clear()
+            with self.conn as connection:
+                for start in list(self._segments):
+                    self._drop_segment(connection, start)
 
     def add(self, event: Event, what: HistoryWhat, who: str = "", addinfo: str = "") -> None:
         """Add a single entry to the history table.
 
-        No need to include the line column, as it is autoincremented.
+        The entry is only queued here, it is written by the writer thread.
         """
-        with self.conn as connection:
-            cur = connection.cursor()
-            cur.execute(
-                f"""INSERT INTO
-                    history ({', '.join(TABLE_COLUMNS[1:])})
-                        VALUES ({', '.join(itertools.repeat('?', len(TABLE_COLUMNS[1:])))});""",  # nosec B608 # BNS:6b6392
-                tuple(
-                    itertools.chain(
-                        (time.time(), what, who, addinfo),
-                        [
-                            event.get(colname.removeprefix("event_"), defval)
-                            for colname, defval in self._event_columns
-                        ],
-                    )
-                ),
+        entry = tuple(
+            itertools.chain(
+                (None, time.time(), what, who, addinfo),
+                [
+                    event.get(colname.removeprefix("event_"), defval)
+                    for colname, defval in self._event_columns
+                ],
             )
+        )
+        with self._pending_condition:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+            self._pending.append(entry)
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_behind, name="HistoryWriter", daemon=True
+                )
+                self._writer.start()
+            if len(self._pending) >= self._config["sqlite_write_batch_size"]:
+                self._pending_condition.notify()
 
     def add_entries(self, entries: Sequence[Sequence[object]]) -> None:
         """Add multiple entries to the history table.
 
         Used only by the cmk-update-config during EC history migration to sqlite.
-        The first column is the line number, which is autoincremented, so ignored in TABLE_COLUMNS.
+        The first column is the line number, which is assigned anew.
         """
-        with self.conn as connection:
-            cur = connection.cursor()
-            cur.executemany(
-                f"""INSERT INTO
-                    history ({', '.join(TABLE_COLUMNS[1:])})
-                        VALUES ({', '.join(itertools.repeat('?', len(TABLE_COLUMNS[1:])))});""",  # nosec B608 # BNS:6b6392
-                (entry[1:] for entry in entries),
+        self._write_pending()
+        with self._lock:
+            self._insert(entries)
+
+    def _write_behind(self) -> None:
+        """Write the pending entries every sqlite_write_interval milliseconds
+        or as soon as there are sqlite_write_batch_size of them"""
+        interval = self._config["sqlite_write_interval"] / 1000
+        batch_size = self._config["sqlite_write_batch_size"]
+        while True:
+            with self._pending_condition:
+                self._pending_condition.wait_for(
+                    lambda: self._closed or len(self._pending) >= batch_size, timeout=interval
+                )
+                if self._closed:
+                    return
+            try:
+                self._write_pending()
+            except Exception:
+                self._logger.exception("Exception writing the history")
+
+    def _write_pending(self) -> None:
+        with self._lock:
+            with self._pending_condition:
+                entries, self._pending = self._pending, []
+            if entries:
+                self._insert(entries)
+
+    def _insert(self, entries: Sequence[Sequence[object]]) -> None:
+        """Write the entries in one transaction, self._lock has to be held"""
+        before = time.time()
+        by_segment: dict[int, list[Sequence[object]]] = {}
+        for entry in entries:
+            entry_time = entry[1]
+            assert isinstance(entry_time, int | float)
+            by_segment.setdefault(segment_start(entry_time), []).append(
+                (self._next_line, *entry[1:])
             )
+            self._next_line += 1
+
+        with self.conn as connection:
+            for start, segment_entries in by_segment.items():
+                self._create_segment(connection, start)
+                connection.executemany(
+                    f"""INSERT INTO
+                        "{segment_table(start)}" ({', '.join(TABLE_COLUMNS)})
+                            VALUES ({', '.join(itertools.repeat('?', len(TABLE_COLUMNS)))});""",  # nosec B608 # BNS:6b6392
+                    segment_entries,
+                )
+        self._written += len(entries)
+        self._batches += 1
+        self._write_time += time.time() - before
+
+    def write_status(self) -> HistoryWriteStatus:
+        with self._pending_condition:
+            num_pending = len(self._pending)
+        return HistoryWriteStatus(
+            pending=num_pending,
+            written=self._written,
+            batches=self._batches,
+            write_time=self._write_time,
+        )
 
     def get(self, query: QueryGET) -> Iterable[Sequence[object]]:
-        """Retrieve entries from the history table.
+        """Retrieve entries from the history table, the newest segment first.
 
         Always return all columns, since they are filtered elsewhere.
         """
-        sqlite_query, sqlite_arguments = filters_to_sqlite_query(query.filters)
-        if query.limit:
-            sqlite_query += " LIMIT ?"
-            sqlite_arguments += f" {query.limit + 1}"
-        with self.conn as connection:
-            cur = connection.cursor()
-            cur.execute(sqlite_query, sqlite_arguments)
-            return cur.fetchall()
+        # The pending entries are part of the history already
+        self._write_pending()
+        where, arguments = filters_to_sqlite_query(query.filters)
+        lower, upper = filters_to_time_range(query.filters)
+        rows: list[Sequence[object]] = []
+        for start in reversed(self._segments):
+            if start > upper or start + SEGMENT_DURATION <= lower:
+                continue
+            with contextlib.closing(
+                self.conn.execute(
+                    f'SELECT * FROM "{segment_table(start)}" {where} ORDER BY line DESC;',  # nosec B608 # BNS:6b6392
+                    arguments,
+                )
+            ) as cur:
+                for row in cur:
+                    if not query.filter_row(row):
+                        continue
+                    rows.append(row)
+                    if query.limit is not None and len(rows) >= query.limit:
+                        return rows
+        return rows
 
     def housekeeping(self) -> None:
         """Remove old entries from the history table.
 
-        And performs a vacuum to shrink the database file.
+        Expired segments are dropped as a whole. And performs a vacuum to
+        shrink the database file.
         """
         now = time.time()
         if now - self._last_housekeeping > self._config["sqlite_housekeeping_interval"]:
             delta = now - timedelta(days=self._config["history_lifetime"]).total_seconds()
-            with self.conn as connection:
-                cur = connection.cursor()
-                cur.execute("DELETE FROM history WHERE time <= ?;", (delta,))
-            # should be executed outside of the transaction
-            self._vacuum()
+            with self._lock:
+                with self.conn as connection:
+                    for start in list(self._segments):
+                        if start + SEGMENT_DURATION <= delta:
+                            self._drop_segment(connection, start)
+                        elif start <= delta:
+                            connection.execute(
+                                f'DELETE FROM "{segment_table(start)}" WHERE time <= ?;',  # nosec B608 # BNS:6b6392
+                                (delta,),
+                            )
+                # should be executed outside of the transaction
+                self._vacuum()
             self._last_housekeeping = now
 
     def _vacuum(self) -> None:
@@ -305,6 +521,15 @@ class SQLiteHistory(History):
 
         Used during a new object instantiation,
         to avoid sqlite3.OperationalError: database is locked.
+        The pending entries are written before.
         """
+        with self._pending_condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending_condition.notify()
+        if self._writer is not None:
+            self._writer.join()
+        self._write_pending()
         self.conn.commit()
         self.conn.close()
@@ -32,7 +32,7 @@ from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 from logging import DEBUG, getLogger, Logger
 from pathlib import Path
 from types import FrameType
-from typing import Any, assert_never, IO, Literal, TypedDict
+from typing import Any, assert_never, IO, Literal, NamedTuple, TypedDict
 
 from setproctitle import setthreadtitle
 
@@ -64,6 +64,7 @@ from .config import (
 from .core_queries import HostInfo, query_hosts_scheduled_downtime_depth
 from .crash_reporting import CrashReportStore, ECCrashReport
 from .event import create_events_from_syslog_messages, Event, scrub_string
+from .event_pipeline import EventPipeline
 from .helpers import ECLock, parse_bytes_into_syslog_messages
 from .history import ActiveHistoryPeriod, get_logfile, History, HistoryWhat, quote_tab, TimedHistory
 from .history_file import FileHistory
@@ -81,6 +82,7 @@ from .query import (
     QueryREPLICATE,
     StatusTable,
 )
+from .rule_index import RuleIndex
 from .rule_matcher import compile_rule, match, MatchFailure, MatchResult, MatchSuccess, RuleMatcher
 from .rule_packs import load_active_config
 from .settings import create_settings, FileDescriptor, PortNumber, Settings
@@ -358,6 +360,19 @@ class MKSignalException(MKException):
 #   '----------------------------------------------------------------------'
 
 
+class ClassifiedEvent(NamedTuple):
+    """The outcome of the rule matching of an event, to be applied to the event status"""
+
+    event: Event
+    # All rules hit by the event, including dropping ones
+    hit_rule_ids: Sequence[str]
+    # The rule creating or cancelling an event, None for dropped and orphaned events
+    rule: Rule | None
+    result: MatchSuccess | None
+    dropped: bool
+    classify_duration: float
+
+
 class EventServer(ECServerThread):
     """Processing and classification of incoming events."""
 
@@ -389,8 +404,9 @@ class EventServer(ECServerThread):
 
         self._rules: list[Rule] = []
         self._rule_by_id: dict[str | None, Rule] = {}
-        self._rule_hash: dict[int, dict[int, Any]] = {}
+        self._rule_index = RuleIndex([])
         self._hash_stats: list[list[int]] = []  # facility/priority
+        self._lock_hash_stats = threading.Lock()
         for _unused_facility in range(32):
             self._hash_stats.append([0] * 8)
 
@@ -407,12 +423,23 @@ class EventServer(ECServerThread):
             omd_site_id=omd_site(),
             is_active_time_period=self._time_period.active,
         )
+        self._pipeline: EventPipeline[Iterable[Event], Sequence[ClassifiedEvent]] | None = None
 
         # HACK for testing: The real fix would involve breaking up these huge
         # class monsters.
         if not create_pipes_and_sockets:
             return
 
+        if settings.options.event_workers > 0:
+            self._pipeline = EventPipeline(
+                self._logger.getChild("pipeline"),
+                perfcounters,
+                self.classify_events,
+                self.apply_classified_events,
+                num_workers=settings.options.event_workers,
+                queue_size=settings.options.event_queue_size,
+            )
+
         self.create_pipe()
         self.open_eventsocket()
         self.open_syslog_udp()
@@ -430,6 +457,9 @@ class EventServer(ECServerThread):
                 Perfcounters.status_columns(),
                 cls._replication_columns(),
                 cls._event_limit_columns(),
+                cls._rule_index_columns(),
+                cls._pipeline_columns(),
+                cls._history_write_columns(),
             )
         )
 
@@ -460,6 +490,35 @@ class EventServer(ECServerThread):
             ("status_event_limit_active_overall", False),
         ]
 
+    @classmethod
+    def _rule_index_columns(cls) -> Columns:
+        return [
+            ("status_rule_index_rules", 0),
+            ("status_rule_index_unspecific", 0),
+            ("status_rule_index_prefiltered", 0),
+            ("status_rule_index_lookups", 0),
+            ("status_rule_index_candidates", 0),
+            ("status_rule_index_tried", 0),
+        ]
+
+    @classmethod
+    def _pipeline_columns(cls) -> Columns:
+        return [
+            ("status_event_workers", 0),
+            ("status_event_queue_size", 0),
+            ("status_event_queue_length", 0),
+        ]
+
+    @classmethod
+    def _history_write_columns(cls) -> Columns:
+        return [
+            ("status_history_pending", 0),
+            ("status_history_written", 0),
+            ("status_history_batches", 0),
+            ("status_history_write_time", 0.0),
+            ("status_history_write_throughput", 0.0),
+        ]
+
     def get_status(self) -> Iterable[Sequence[object]]:
         return [
             [
@@ -467,6 +526,9 @@ class EventServer(ECServerThread):
                 *self._perfcounters.get_status(),
                 *self._add_replication_status(),
                 *self._add_event_limit_status(),
+                *self._add_rule_index_status(),
+                *self._add_pipeline_status(),
+                *self._add_history_write_status(),
             ]
         ]
 
@@ -500,6 +562,40 @@ class EventServer(ECServerThread):
             self.is_overall_event_limit_active(),
         ]
 
+    def _add_rule_index_status(self) -> list[object]:
+        return [
+            self._rule_index.num_rules,
+            self._rule_index.num_unspecific,
+            self._rule_index.num_prefiltered,
+            self._rule_index.lookups,
+            self._rule_index.candidates,
+            self._rule_index.tried,
+        ]
+
+    def _add_pipeline_status(self) -> list[object]:
+        if self._pipeline is None:
+            return [0, 0, 0]
+        return [
+            self._pipeline.num_workers,
+            self._pipeline.queue_size,
+            self._pipeline.queue_length,
+        ]
+
+    def _add_history_write_status(self) -> list[object]:
+        status = self._history.write_status()
+        return [
+            status.pending,
+            status.written,
+            status.batches,
+            status.write_time,
+            # Entries per second of writing
+            status.written / status.write_time if status.write_time else 0.0,
+        ]
+
+    def close_history(self) -> None:
+        """Write the pending history entries, the history must not be used afterwards"""
+        self._history.close()
+
     def create_pipe(self) -> None:
         path = self.settings.paths.event_pipe.value
         with contextlib.suppress(Exception):
@@ -657,6 +753,8 @@ class EventServer(ECServerThread):
         return os.open(str(self.settings.paths.event_pipe.value), os.O_RDWR | os.O_NONBLOCK)
 
     def serve(self) -> None:  # pylint: disable=too-many-branches
+        if self._pipeline is not None:
+            self._pipeline.start()
         pipe = self.open_pipe()
         listen_list = [
             f
@@ -744,8 +842,9 @@ class EventServer(ECServerThread):
             # Read events from builtin snmptrap server
             if self._snmp_trap_socket is not None and self._snmp_trap_socket in readable:
                 message, address = self._snmp_trap_socket.recvfrom(65535)
-                self.process_potential_event_instrumented(
-                    self.create_events_from_trap(message, parse_address("SNMP trap", address))
+                # The trap parser is not thread-safe, so parse the trap right here
+                self.receive_events(
+                    list(self.create_events_from_trap(message, parse_address("SNMP trap", address)))
                 )
 
             if spool_files := sorted(
@@ -757,6 +856,9 @@ class EventServer(ECServerThread):
             else:
                 select_timeout = 1  # restore default select timeout
 
+        if self._pipeline is not None:
+            self._pipeline.shutdown()
+
     def create_events_from_trap(self, data: bytes, address: tuple[str, int]) -> Iterator[Event]:
         try:
             if varbinds_and_ipaddress := self._snmp_trap_parser(data, address):
@@ -767,26 +869,47 @@ class EventServer(ECServerThread):
             # possible log spam from a misconfigured/buggy device.
             self._logger.debug("skipping unparsable SNMP trap, reason: %s", e)
 
+    def receive_events(self, events: Iterable[Event]) -> None:
+        """
+        Hands over the (lazily parsed) incoming events to the event pipeline
+        or processes them right away if there is no pipeline.
+        """
+        if self._pipeline is None:
+            self.process_potential_event_instrumented(events)
+        else:
+            self._pipeline.submit(events)
+
     def process_potential_event_instrumented(self, events: Iterable[Event]) -> None:
         """
         Processes incoming data, just a wrapper between the real data and the
         handler function to record some statistics etc.
         """
+        self.apply_classified_events(self.classify_events(events))
+
+    def classify_events(self, events: Iterable[Event]) -> Sequence[ClassifiedEvent]:
+        classified_events = []
         for event in events:
             self._perfcounters.count("messages")
-            before = time.time()
             # In replication slave mode (when not took over), ignore all events
             if not is_replication_slave(self._config) or self._slave_status["mode"] != "sync":
-                self.process_potential_event(event)
+                classified_events.append(self.classify_event(event))
             elif self.settings.options.debug:
                 self._logger.info("Replication: we are in slave mode, ignoring event")
+        return classified_events
+
+    def apply_classified_events(self, classified_events: Iterable[ClassifiedEvent]) -> None:
+        for classified_event in classified_events:
+            before = time.time()
+            self.apply_classified_event(classified_event)
             elapsed = time.time() - before
-            self._perfcounters.count_time("processing", elapsed)
+            self._perfcounters.count_time(
+                "processing", classified_event.classify_duration + elapsed
+            )
 
     def process_syslog_messages(
         self, messages: Iterable[bytes], address: tuple[str, int] | None
     ) -> None:
-        self.process_potential_event_instrumented(
+        self.receive_events(
             create_events_from_syslog_messages(
                 messages, address, self._logger if self._config["debug_rules"] else None
             )
@@ -1130,11 +1253,8 @@ class EventServer(ECServerThread):
         """Precompile regular expressions and similar stuff."""
         self._rules = []
         self._rule_by_id = {}
-        # Speedup-Hash for rule execution
-        self._rule_hash = {}
         count_disabled = 0
         count_rules = 0
-        count_unspecific = 0
 
         # Loop through all rule packs and with through their rules
         for rule_pack in rule_packs:
@@ -1167,68 +1287,27 @@ class EventServer(ECServerThread):
                             rule["id"],
                         )
 
-                    if self._config["rule_optimizer"]:
-                        self.hash_rule(rule)
-                        if (
-                            "match_facility" not in rule
-                            and "match_priority" not in rule
-                            and "cancel_priority" not in rule
-                            and "cancel_application" not in rule
-                        ):
-                            count_unspecific += 1
+        # Speedup-Index for rule execution
+        self._rule_index = RuleIndex(self._rules if self._config["rule_optimizer"] else [])
 
         self._logger.info(
             "Compiled %d active rules (ignoring %d disabled rules)", count_rules, count_disabled
         )
         if self._config["rule_optimizer"]:
             self._logger.info(
-                "Rule hash: %d rules - %d hashed, %d unspecific",
-                len(self._rules),
-                len(self._rules) - count_unspecific,
-                count_unspecific,
+                "Rule hash: %d rules - %d hashed, %d unspecific, %d prefiltered",
+                self._rule_index.num_rules,
+                self._rule_index.num_rules - self._rule_index.num_unspecific,
+                self._rule_index.num_unspecific,
+                self._rule_index.num_prefiltered,
             )
             for facility in list(range(23)) + [31]:
-                if facility in self._rule_hash:
+                if bucket_sizes := self._rule_index.bucket_sizes(facility):
                     stats = [
-                        f"{SyslogPriority(prio)}({len(entries)})"
-                        for prio, entries in self._rule_hash[facility].items()
+                        f"{SyslogPriority(prio)}({count})" for prio, count in bucket_sizes.items()
                     ]
                     self._logger.info(" %-12s: %s", SyslogFacility(facility), " ".join(stats))
 
-    def hash_rule(self, rule: Rule) -> None:
-        """Construct rule hash for faster execution."""
-        facility = rule.get("match_facility")
-        if facility and not rule.get("invert_matching"):
-            self.hash_rule_facility(rule, facility)
-        else:
-            for facility in range(32):  # all syslog facilities
-                self.hash_rule_facility(rule, facility)
-
-    def hash_rule_facility(self, rule: Rule, facility: int) -> None:
-        needed_prios = [False] * 8
-
-        if "match_priority" in rule:
-            prio_from, prio_to = rule["match_priority"]
-            for p in range(prio_to, prio_from + 1):  # Beware: from > to!
-                needed_prios[p] = True
-        else:  # all priorities match
-            needed_prios = [True] * 8  # needed to check this rule for all event priorities
-
-        if "cancel_priority" in rule:
-            prio_from, prio_to = rule["cancel_priority"]
-            for p in range(prio_to, prio_from + 1):  # Beware: from > to!
-                needed_prios[p] = True
-        elif "match_ok" in rule:  # a cancelling rule where all priorities cancel
-            needed_prios = [True] * 8  # needed to check this rule for all event priorities
-
-        if rule.get("invert_matching"):
-            needed_prios = [True] * 8
-
-        prio_hash = self._rule_hash.setdefault(facility, {})
-        for prio, need in enumerate(needed_prios):
-            if need:
-                prio_hash.setdefault(prio, []).append(rule)
-
     def output_hash_stats(self) -> None:
         self._logger.info("Top 20 of facility/priority:")
         entries = []
@@ -1250,20 +1329,23 @@ class EventServer(ECServerThread):
                 (100.0 * count / float(total_count)),
             )
 
-    def process_potential_event(self, event: Event) -> None:  # pylint: disable=too-many-branches
-        self.do_translate_hostname(event)
+    def process_potential_event(self, event: Event) -> None:
+        self.apply_classified_event(self.classify_event(event))
 
-        # Log all incoming messages into a syslog-like text file if that is enabled
-        if self._config["log_messages"]:
-            self.log_message(event)
+    def classify_event(self, event: Event) -> ClassifiedEvent:
+        """Does the rule matching of an event, without changing the event status"""
+        before = time.time()
+        self.do_translate_hostname(event)
 
         # Rule optimizer
         if self._config["rule_optimizer"]:
-            self._hash_stats[event["facility"]][event["priority"]] += 1
-            rule_candidates = self._rule_hash.get(event["facility"], {}).get(event["priority"], [])
+            with self._lock_hash_stats:
+                self._hash_stats[event["facility"]][event["priority"]] += 1
+            rule_candidates = self._rule_index.rule_candidates(event)
         else:
             rule_candidates = self._rules
 
+        hit_rule_ids: list[str] = []
         skip_pack = None
         for rule in rule_candidates:
             # TODO: Rewrite this skipping logic, so it's blindingly obvious, even for mypy.
@@ -1284,7 +1366,7 @@ class EventServer(ECServerThread):
                 if self._config["debug_rules"]:
                     self._logger.info("  matching groups:\n%s", pprint.pformat(result.match_groups))
 
-                self._event_status.count_rule_match(rule["id"])
+                hit_rule_ids.append(rule["id"])
                 if self._config["log_rulehits"]:
                     self._logger.info(
                         "Rule '%s/%s' hit by message %s/%s - '%s'.",
@@ -1302,111 +1384,134 @@ class EventServer(ECServerThread):
                             self._logger.info("  skipping this rule pack (%s)", skip_pack)
                         continue
                     self._perfcounters.count("drops")
-                    return
-
-                if result.cancelling:
-                    self._event_status.cancel_events(
-                        self, self._event_columns, event, result.match_groups, rule
+                    return ClassifiedEvent(
+                        event, hit_rule_ids, None, None, True, time.time() - before
                     )
-                    return
 
-                # Remember the rule id that this event originated from
-                event["rule_id"] = rule["id"]
+                return ClassifiedEvent(
+                    event, hit_rule_ids, rule, result, False, time.time() - before
+                )
 
-                # Attach optional contact group information for visibility
-                # and eventually for notifications
-                self._add_rule_contact_groups_to_event(rule, event)
+        # End of loop over rules.
+        return ClassifiedEvent(event, hit_rule_ids, None, None, False, time.time() - before)
 
-                # Store groups from matching this event. In order to make
-                # persistence easier, we do not save them as list but join
-                # them on ASCII-1.
-                match_groups_message = result.match_groups.get("match_groups_message", ())
-                assert match_groups_message is not False
-                event["match_groups"] = match_groups_message
+    def apply_classified_event(  # pylint: disable=too-many-branches
+        self, classified_event: ClassifiedEvent
+    ) -> None:
+        event = classified_event.event
 
-                match_groups_syslog_application = result.match_groups.get(
-                    "match_groups_syslog_application", ()
-                )
-                assert match_groups_syslog_application is not False
-                event["match_groups_syslog_application"] = match_groups_syslog_application
+        # Log all incoming messages into a syslog-like text file if that is enabled
+        if self._config["log_messages"]:
+            self.log_message(event)
 
-                self.rewrite_event(rule, event, result.match_groups)
+        for rule_id in classified_event.hit_rule_ids:
+            self._event_status.count_rule_match(rule_id)
 
-                # Lookup the monitoring core hosts and add the core host
-                # name to the event when one can be matched.
-                #
-                # Needs to be done AFTER event rewriting, because the rewriting
-                # may change the "host" field.
-                #
-                # For the moment we have no rule/condition matching on this
-                # field. So we only add the core host info for matched events.
-                self._add_core_host_to_new_event(event)
-
-                if "count" in rule:
-                    count = rule["count"]
-                    # Check if a matching event already exists that we need to
-                    # count up. If the count reaches the limit, the event will
-                    # be opened and its rule actions performed.
-                    existing_event = self._event_status.count_event(self, event, count)
-                    if existing_event:
-                        if "delay" in rule:
-                            if self._config["debug_rules"]:
-                                self._logger.info(
-                                    "Event opening will be delayed for %d seconds", rule["delay"]
-                                )
-                            existing_event["delay_until"] = time.time() + rule["delay"]
-                            existing_event["phase"] = "delayed"
-                        else:
-                            event_has_opened(
-                                self._history,
-                                self.settings,
-                                self._config,
-                                self._logger,
-                                self.host_config,
-                                self._event_columns,
-                                rule,
-                                existing_event,
-                            )
+        if classified_event.dropped:
+            return
 
-                        self._history.add(existing_event, "COUNTREACHED")
+        rule, result = classified_event.rule, classified_event.result
+        if rule is None or result is None:
+            if self._config["archive_orphans"]:
+                self._event_status.archive_event(event)
+            return
 
-                        if "delay" not in rule and rule.get("autodelete"):
-                            existing_event["phase"] = "closed"
-                            with self._event_status.lock:
-                                self._event_status.remove_event(existing_event, "AUTODELETE")
-                elif rule.get("expect"):
-                    self._event_status.count_expected_event(self, event)
-                else:
-                    if "delay" in rule:
-                        if self._config["debug_rules"]:
-                            self._logger.info(
-                                "Event opening will be delayed for %d seconds", rule["delay"]
-                            )
-                        event["delay_until"] = time.time() + rule["delay"]
-                        event["phase"] = "delayed"
-                    else:
-                        event["phase"] = "open"
+        if result.cancelling:
+            self._event_status.cancel_events(
+                self, self._event_columns, event, result.match_groups, rule
+            )
+            return
 
-                    if self.new_event_respecting_limits(event) and event["phase"] == "open":
-                        event_has_opened(
-                            self._history,
-                            self.settings,
-                            self._config,
-                            self._logger,
-                            self.host_config,
-                            self._event_columns,
-                            rule,
-                            event,
+        # Remember the rule id that this event originated from
+        event["rule_id"] = rule["id"]
+
+        # Attach optional contact group information for visibility
+        # and eventually for notifications
+        self._add_rule_contact_groups_to_event(rule, event)
+
+        # Store groups from matching this event. In order to make
+        # persistence easier, we do not save them as list but join
+        # them on ASCII-1.
+        match_groups_message = result.match_groups.get("match_groups_message", ())
+        assert match_groups_message is not False
+        event["match_groups"] = match_groups_message
+
+        match_groups_syslog_application = result.match_groups.get(
+            "match_groups_syslog_application", ()
+        )
+        assert match_groups_syslog_application is not False
+        event["match_groups_syslog_application"] = match_groups_syslog_application
+
+        self.rewrite_event(rule, event, result.match_groups)
+
+        # Lookup the monitoring core hosts and add the core host
+        # name to the event when one can be matched.
+        #
+        # Needs to be done AFTER event rewriting, because the rewriting
+        # may change the "host" field.
+        #
+        # For the moment we have no rule/condition matching on this
+        # field. So we only add the core host info for matched events.
+        self._add_core_host_to_new_event(event)
+
+        if "count" in rule:
+            count = rule["count"]
+            # Check if a matching event already exists that we need to
+            # count up. If the count reaches the limit, the event will
+            # be opened and its rule actions performed.
+            existing_event = self._event_status.count_event(self, event, count)
+            if existing_event:
+                if "delay" in rule:
+                    if self._config["debug_rules"]:
+                        self._logger.info(
+                            "Event opening will be delayed for %d seconds", rule["delay"]
                         )
-                        if rule.get("autodelete"):
-                            event["phase"] = "closed"
-                            with self._event_status.lock:
-                                self._event_status.remove_event(event, "AUTODELETE")
-                return
+                    existing_event["delay_until"] = time.time() + rule["delay"]
+                    existing_event["phase"] = "delayed"
+                else:
+                    event_has_opened(
+                        self._history,
+                        self.settings,
+                        self._config,
+                        self._logger,
+                        self.host_config,
+                        self._event_columns,
+                        rule,
+                        existing_event,
+                    )
 
-        # End of loop over rules.
-        if self._config["archive_orphans"]:
-            self._event_status.archive_event(event)
+                self._history.add(existing_event, "COUNTREACHED")
+
+                if "delay" not in rule and rule.get("autodelete"):
+                    existing_event["phase"] = "closed"
+                    with self._event_status.lock:
+                        self._event_status.remove_event(existing_event, "AUTODELETE")
+        elif rule.get("expect"):
+            self._event_status.count_expected_event(self, event)
+        else:
+            if "delay" in rule:
+                if self._config["debug_rules"]:
+                    self._logger.info("Event opening will be delayed for %d seconds", rule["delay"])
+                event["delay_until"] = time.time() + rule["delay"]
+                event["phase"] = "delayed"
+            else:
+                event["phase"] = "open"
+
+            if self.new_event_respecting_limits(event) and event["phase"] == "open":
+                event_has_opened(
+                    self._history,
+                    self.settings,
+                    self._config,
+                    self._logger,
+                    self.host_config,
+                    self._event_columns,
+                    rule,
+                    event,
+                )
+                if rule.get("autodelete"):
+                    event["phase"] = "closed"
+                    with self._event_status.lock:
+                        self._event_status.remove_event(event, "AUTODELETE")
 
     def _add_rule_contact_groups_to_event(self, rule: Rule, event: Event) -> None:
         if rule.get("contact_groups") is None:
@@ -3504,6 +3609,9 @@ def main() -> None:
         logger.log(VERBOSE, "Saving final event state")
         event_status.save_status()
 
+        logger.log(VERBOSE, "Writing pending history entries")
+        event_server.close_history()
+
         logger.log(VERBOSE, "Cleaning up sockets")
         settings.paths.unix_socket.value.unlink()
         settings.paths.event_socket.value.unlink()
@@ -28,6 +28,7 @@ class Perfcounters:
         "overflows",
         "events",
         "connects",
+        "queue_drops",
     ]
 
     # Average processing times
@@ -35,6 +36,9 @@ class Perfcounters:
         "processing": 0.99,  # event processing
         "sync": 0.95,  # Replication sync
         "request": 0.95,  # Client requests
+        "classify": 0.99,  # event pipeline: parsing and rule matching
+        "apply": 0.99,  # event pipeline: changing the event status
+        "pipeline": 0.99,  # event pipeline: from receiving to applying
     }
 
     # TODO: Why aren't self._times / self._rates / ... not initialized with their defaults?
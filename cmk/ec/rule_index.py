@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Index of the compiled rules for finding the rule candidates of an event
+
+The rules are bucketed by syslog facility and priority. Within a bucket, the
+rules with a literal host condition are looked up by host name. The remaining
+candidates are checked against the literals their host, application and text
+patterns require, before their regular expressions are tried by the
+RuleMatcher. The index only ever sorts out rules which can not match (or
+cancel) the event, the order of the rules is always preserved.
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+import threading
+from collections.abc import Iterator, Mapping, Sequence
+from typing import Final, Literal, NamedTuple
+
+from .config import Rule, TextPattern
+from .event import Event
+
+_REGEX_SPECIAL: Final = frozenset(".^$*+?{}[]\\|()")
+
+_Field = Literal["host", "application", "text"]
+
+
+class _Needle(NamedTuple):
+    field: _Field
+    literal: str
+    # A literal found in the lowercased value is sufficient for plain text
+    # patterns. Literals taken from case insensitive regexes are only reliable
+    # for ASCII values, e.g. "K" (Kelvin sign) matches "k" in such a regex.
+    exact: bool
+
+
+class _IndexedRule(NamedTuple):
+    position: int
+    rule: Rule
+    # All of the groups need to be fulfilled, a group by one of its needles
+    needles: tuple[tuple[_Needle, ...], ...]
+
+
+def required_literal(pattern: re.Pattern[str]) -> str:
+    """A lowercased literal which is part of every text the pattern is found in
+
+    This is the literal prefix of the pattern, which is good enough for the
+    typical EC patterns. An empty string is returned if no such literal can
+    be determined, e.g. for alternatives."""
+    if not pattern.flags & re.IGNORECASE or "|" in pattern.pattern:
+        return ""
+    source = pattern.pattern.removeprefix("^")
+    end = 0
+    while end < len(source) and source[end] not in _REGEX_SPECIAL:
+        end += 1
+    if end < len(source) and source[end] in "*?{":
+        end -= 1  # The last character is optional
+    literal = source[:end]
+    return literal.lower() if literal.isascii() else ""
+
+
+def _needles(field: _Field, patterns: Sequence[TextPattern]) -> tuple[_Needle, ...] | None:
+    """The needles one of which is needed for any of the patterns to match"""
+    needles = []
+    for pattern in patterns:
+        if isinstance(pattern, str):
+            needles.append(_Needle(field, pattern, exact=True))
+        elif literal := required_literal(pattern):
+            needles.append(_Needle(field, literal, exact=False))
+        else:
+            return None
+    return tuple(needles) if needles else None
+
+
+def _application_patterns(rule: Rule) -> Sequence[TextPattern]:
+    return [rule[key] for key in ("match_application", "cancel_application") if key in rule]
+
+
+def _text_patterns(rule: Rule) -> Sequence[TextPattern]:
+    # Without "match", every text matches
+    if "match" not in rule:
+        return []
+    return [rule["match"], *([rule["match_ok"]] if "match_ok" in rule else [])]
+
+
+def _needed_priorities(rule: Rule) -> Sequence[bool]:
+    needed_prios = [False] * 8
+
+    if "match_priority" in rule:
+        prio_from, prio_to = rule["match_priority"]
+        for p in range(prio_to, prio_from + 1):  # Beware: from > to!
+            needed_prios[p] = True
+    else:  # all priorities match
+        needed_prios = [True] * 8  # needed to check this rule for all event priorities
+
+    if "cancel_priority" in rule:
+        prio_from, prio_to = rule["cancel_priority"]
+        for p in range(prio_to, prio_from + 1):  # Beware: from > to!
+            needed_prios[p] = True
+    elif "match_ok" in rule:  # a cancelling rule where all priorities cancel
+        needed_prios = [True] * 8  # needed to check this rule for all event priorities
+
+    if rule.get("invert_matching"):
+        needed_prios = [True] * 8
+
+    return needed_prios
+
+
+class _Bucket:
+    def __init__(self) -> None:
+        self.by_host: dict[str, list[_IndexedRule]] = {}
+        self.any_host: list[_IndexedRule] = []
+
+    def __len__(self) -> int:
+        return len(self.any_host) + sum(len(rules) for rules in self.by_host.values())
+
+    def add(self, host: str | None, indexed_rule: _IndexedRule) -> None:
+        if host is None:
+            self.any_host.append(indexed_rule)
+        else:
+            self.by_host.setdefault(host, []).append(indexed_rule)
+
+    def candidates(self, host: str) -> Iterator[_IndexedRule]:
+        if (host_rules := self.by_host.get(host)) is None:
+            return iter(self.any_host)
+        return heapq.merge(host_rules, self.any_host)
+
+
+class RuleIndex:
+    """Finds the rules which may match an event, in the order of the rules"""
+
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        self._buckets: dict[int, dict[int, _Bucket]] = {}
+        self.num_rules: Final = len(rules)
+        self.num_unspecific = 0
+        self.num_prefiltered = 0
+        # Counters of the lookups, the rule candidates are looked up by the event workers
+        self._counters_lock: Final = threading.Lock()
+        self.lookups = 0
+        self.candidates = 0
+        self.tried = 0
+
+        for position, rule in enumerate(rules):
+            self._add_rule(position, rule)
+
+    def _add_rule(self, position: int, rule: Rule) -> None:
+        if (
+            "match_facility" not in rule
+            and "match_priority" not in rule
+            and "cancel_priority" not in rule
+            and "cancel_application" not in rule
+        ):
+            self.num_unspecific += 1
+
+        host: str | None = None
+        needles: list[tuple[_Needle, ...]] = []
+        # An inverted rule matches exactly when its conditions do not match
+        if not rule.get("invert_matching"):
+            host_pattern = rule.get("match_host")
+            if isinstance(host_pattern, str):
+                host = host_pattern
+            elif host_pattern is not None and (host_needles := _needles("host", [host_pattern])):
+                needles.append(host_needles)
+            if application_needles := _needles("application", _application_patterns(rule)):
+                needles.append(application_needles)
+            if text_needles := _needles("text", _text_patterns(rule)):
+                needles.append(text_needles)
+        if host is not None or needles:
+            self.num_prefiltered += 1
+
+        indexed_rule = _IndexedRule(position, rule, tuple(needles))
+        facility = rule.get("match_facility")
+        facilities = [facility] if facility and not rule.get("invert_matching") else range(32)
+        needed_prios = _needed_priorities(rule)
+        for facility in facilities:
+            prio_buckets = self._buckets.setdefault(facility, {})
+            for prio, need in enumerate(needed_prios):
+                if need:
+                    prio_buckets.setdefault(prio, _Bucket()).add(host, indexed_rule)
+
+    def bucket_sizes(self, facility: int) -> Mapping[int, int]:
+        """The number of rules per priority of the given facility"""
+        return {prio: len(bucket) for prio, bucket in self._buckets.get(facility, {}).items()}
+
+    def rule_candidates(self, event: Event) -> Sequence[Rule]:
+        if (bucket := self._buckets.get(event["facility"], {}).get(event["priority"])) is None:
+            with self._counters_lock:
+                self.lookups += 1
+            return []
+
+        values: dict[_Field, str] = {
+            "host": event["host"].lower(),
+            "application": event.get("application", "").lower(),
+            "text": event.get("text", "").lower(),
+        }
+        found: dict[_Needle, bool] = {}
+
+        def is_found(needle: _Needle) -> bool:
+            try:
+                return found[needle]
+            except KeyError:
+                value = values[needle.field]
+                return found.setdefault(
+                    needle,
+                    needle.literal in value or (not needle.exact and not value.isascii()),
+                )
+
+        candidates = list(bucket.candidates(values["host"]))
+        rules = [
+            indexed_rule.rule
+            for indexed_rule in candidates
+            if all(any(is_found(n) for n in group) for group in indexed_rule.needles)
+        ]
+        with self._counters_lock:
+            self.lookups += 1
+            self.candidates += len(candidates)
+            self.tried += len(rules)
+        return rules
@@ -179,6 +179,20 @@ class ECArgumentParser(ArgumentParser):
             action="store_true",
             help="create performance profile for event thread",
         )
+        self.add_argument(
+            "--event-workers",
+            metavar="N",
+            type=int,
+            default=4,
+            help="number of threads processing the received messages, 0 processes them inline",
+        )
+        self.add_argument(
+            "--event-queue-size",
+            metavar="N",
+            type=int,
+            default=10000,
+            help="maximum number of received packets or data chunks waiting for processing",
+        )
 
     @staticmethod
     def _file_descriptor(value: str) -> FileDescriptor:
@@ -220,6 +234,8 @@ class Options(NamedTuple):
     debug: bool
     profile_status: bool
     profile_event: bool
+    event_workers: int
+    event_queue_size: int
 
 
 class Settings(NamedTuple):
@@ -244,6 +260,8 @@ def create_settings(version: str, omd_root: Path, argv: list[str]) -> Settings:
         debug=args.debug,
         profile_status=args.profile_status,
         profile_event=args.profile_event,
+        event_workers=args.event_workers,
+        event_queue_size=args.event_queue_size,
     )
     return Settings(paths=paths, options=options)
 
@@ -16,11 +16,12 @@ from ._ipmi import IPMICredentials, IPMIFetcher
 from ._nofetcher import NoFetcher, NoFetcherError
 from ._piggyback import PiggybackFetcher
 from ._program import ProgramFetcher
-from ._snmp import SNMPFetcher, SNMPScanConfig, SNMPSectionMeta
+from ._snmp import fetch_snmp_concurrently, SNMPFetcher, SNMPScanConfig, SNMPSectionMeta
 from ._tcp import TCPFetcher, TLSConfig
 
 __all__ = [
     "decrypt_by_agent_protocol",
+    "fetch_snmp_concurrently",
     "NoFetcherError",
     "Fetcher",
     "get_raw_data",
@@ -7,16 +7,20 @@ import dataclasses
 import logging
 import time
 from collections.abc import Collection, Iterable, Iterator, Mapping, MutableMapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any, Final
 
 from cmk.ccc import store
 from cmk.ccc.exceptions import MKFetcherError, MKTimeout
 
+import cmk.utils.resulttype as result
+from cmk.utils import binarycodec
 from cmk.utils.sectionname import SectionMap, SectionName
 
 from cmk.snmplib import (
     get_snmp_table,
+    get_snmp_table_walks,
     SNMPBackend,
     SNMPHostConfig,
     SNMPRawData,
@@ -27,10 +31,13 @@ from cmk.snmplib import (
 from cmk.checkengine.parser import SectionStore
 
 from ._abstract import Fetcher, Mode
+from ._api import get_raw_data
 from ._snmpscan import gather_available_raw_section_names, SNMPScanConfig
+from .filecache import FileCache
 from .snmp import make_backend, SNMPPluginStore
+from .snmp_backend import deadline
 
-__all__ = ["SNMPFetcher", "SNMPSectionMeta", "SNMPScanConfig"]
+__all__ = ["fetch_snmp_concurrently", "SNMPFetcher", "SNMPSectionMeta", "SNMPScanConfig"]
 
 
 class WalkCache(MutableMapping[tuple[str, str, bool], SNMPRowInfo]):  # pylint: disable=too-many-ancestors
@@ -42,20 +49,40 @@ class WalkCache(MutableMapping[tuple[str, str, bool], SNMPRowInfo]):  # pylint:
     The fetched data is always saved to a file *if* the respective OID is marked as being cached
     by the plug-in using `OIDCached` (that is: if the save_to_cache attribute of the OID object
     is true).
+
+    The cache files are only read when the OID is looked up, and only the OIDs fetched
+    again are written back.
     """
 
-    __slots__ = ("_store", "_path", "_logger")
+    __slots__ = ("_store", "_path", "_logger", "_cached", "_unchanged")
+
+    _MAGIC: Final = b"CMKOIDS1"
 
     def __init__(self, walk_cache: Path, logger: logging.Logger) -> None:
         self._store: dict[tuple[str, str, bool], SNMPRowInfo] = {}
         self._path = walk_cache
         self._logger = logger
-
-    def _read_row(self, path: Path) -> SNMPRowInfo:
-        return store.load_object_from_file(path, default=None)
+        # The cache files not read yet
+        self._cached: dict[tuple[str, str, bool], Path] = {}
+        self._unchanged: set[tuple[str, str, bool]] = set()
+
+    def _read_row(self, path: Path) -> SNMPRowInfo | None:
+        raw = store.load_bytes_from_file(path)
+        if not raw.startswith(self._MAGIC):
+            # Written by earlier versions
+            return store.DimSerializer.deserialize(raw) if raw else None
+        oids, values = binarycodec.decode(memoryview(raw)[len(self._MAGIC) :])
+        return list(zip(oids, values))
 
     def _write_row(self, path: Path, rowinfo: SNMPRowInfo) -> None:
-        return store.save_object_to_file(path, rowinfo, pretty=False)
+        # Store the OIDs and the values column wise, this is much faster to decode.
+        return store.save_bytes_to_file(
+            path,
+            self._MAGIC
+            + binarycodec.encode(
+                [[oid for oid, _value in rowinfo], [value for _oid, value in rowinfo]]
+            ),
+        )
 
     @staticmethod
     def _oid2name(fetchoid: str, context_hash: str) -> str:
@@ -73,46 +100,63 @@ class WalkCache(MutableMapping[tuple[str, str, bool], SNMPRowInfo]):  # pylint:
         return f"{type(self).__name__}({self._store!r})"
 
     def __getitem__(self, key: tuple[str, str, bool]) -> SNMPRowInfo:
-        return self._store.__getitem__(key)
+        if key in self._store or key not in self._cached:
+            return self._store.__getitem__(key)
+
+        path = self._cached.pop(key)
+        self._logger.debug(f"  Loading {key[0]} from walk cache {path}")
+        try:
+            read_walk = self._read_row(path)
+        except MKTimeout:
+            raise
+        except Exception:
+            self._logger.debug(f"  Failed to load {key[0]} from walk cache {path}")
+            raise KeyError(key)
+
+        if read_walk is None:
+            raise KeyError(key)
+        self._store[key] = read_walk
+        self._unchanged.add(key)
+        return read_walk
 
     def __setitem__(self, key: tuple[str, str, bool], value: SNMPRowInfo) -> None:
+        self._cached.pop(key, None)
+        self._unchanged.discard(key)
         return self._store.__setitem__(key, value)
 
     def __delitem__(self, key: tuple[str, str, bool]) -> None:
-        return self._store.__delitem__(key)
+        if self._cached.pop(key, None) is None:
+            self._store.__delitem__(key)
+        else:
+            self._store.pop(key, None)
+        self._unchanged.discard(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._store or key in self._cached
 
     def __iter__(self) -> Iterator[tuple[str, str, bool]]:
-        return self._store.__iter__()
+        return iter([*self._store, *(key for key in self._cached if key not in self._store)])
 
     def __len__(self) -> int:
-        return self._store.__len__()
+        return len(self._store.keys() | self._cached.keys())
 
     def clear(self) -> None:
         for path in self._iterfiles():
             path.unlink(missing_ok=True)
+        self._cached.clear()
+        self._unchanged.clear()
 
     def load(self) -> None:
-        """Try to read the OIDs data from cache files"""
+        """Look up the cache files, they are read on demand"""
         for path in self._iterfiles():
             fetchoid, context_hash = self._name2oid(path.name)
-
-            self._logger.debug(f"  Loading {fetchoid} from walk cache {path}")
-            try:
-                read_walk = self._read_row(path)
-            except MKTimeout:
-                raise
-            except Exception:
-                self._logger.debug(f"  Failed to load {fetchoid} from walk cache {path}")
-                continue
-
-            if read_walk is not None:
-                self._store[(fetchoid, context_hash, True)] = read_walk
+            self._cached[(fetchoid, context_hash, True)] = path
 
     def save(self) -> None:
         self._path.mkdir(parents=True, exist_ok=True)
 
         for (fetchoid, context_hash, save_flag), rowinfo in self._store.items():
-            if not save_flag:
+            if not save_flag or (fetchoid, context_hash, save_flag) in self._unchanged:
                 continue
 
             path = self._path / self._oid2name(fetchoid, context_hash)
@@ -304,7 +348,7 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
             raise MKFetcherError("missing backend")
 
         now = int(time.time())
-        persisted_sections = self._section_store.load() if mode is Mode.CHECKING else {}
+        persisted_sections = self._section_store.load_lifetimes() if mode is Mode.CHECKING else {}
         section_names = self._get_selection(mode)
         section_names |= self._detect(
             select_from=self._get_detected_sections(mode) - section_names, backend=self._backend
@@ -321,25 +365,37 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
             walk_cache.clear()
             walk_cache_msg = "SNMP walk cache cleared"
 
+        sections_to_fetch = [
+            section_name
+            for section_name in self._sort_section_names(section_names)
+            if section_name not in persisted_sections or now > persisted_sections[section_name][1]
+        ]
+        self._backend.prefetch(
+            walk
+            for section_name in sections_to_fetch
+            for tree in self.plugin_store[section_name].trees
+            for walk in get_snmp_table_walks(
+                section_name=section_name,
+                tree=tree,
+                walk_cache=walk_cache,
+                backend=self._backend,
+            )
+        )
+
         fetched_data: dict[SectionName, SNMPRawDataElem] = {}
-        for section_name in self._sort_section_names(section_names):
-            try:
-                _from, until, _section = persisted_sections[section_name]
-                if now > until:
-                    raise LookupError(section_name)
-            except LookupError:
-                self._logger.debug("%s: Fetching data (%s)", section_name, walk_cache_msg)
-
-                fetched_data[section_name] = [
-                    get_snmp_table(
-                        section_name=section_name,
-                        tree=tree,
-                        walk_cache=walk_cache,
-                        backend=self._backend,
-                        log=self._logger.debug,
-                    )
-                    for tree in self.plugin_store[section_name].trees
-                ]
+        for section_name in sections_to_fetch:
+            self._logger.debug("%s: Fetching data (%s)", section_name, walk_cache_msg)
+
+            fetched_data[section_name] = [
+                get_snmp_table(
+                    section_name=section_name,
+                    tree=tree,
+                    walk_cache=walk_cache,
+                    backend=self._backend,
+                    log=self._logger.debug,
+                )
+                for tree in self.plugin_store[section_name].trees
+            ]
 
         walk_cache.save()
 
@@ -360,3 +416,40 @@ class SNMPFetcher(Fetcher[SNMPRawData]):
             section_names,
             key=lambda x: (not ("cpu" in str(x) or x in cls.CPU_SECTIONS_WITHOUT_CPU_IN_NAME), x),
         )
+
+
+def fetch_snmp_concurrently(
+    jobs: Sequence[tuple[FileCache[SNMPRawData], SNMPFetcher]],
+    mode: Mode,
+    *,
+    max_workers: int = 100,
+    timeout: float | None = None,
+) -> Sequence[result.Result[SNMPRawData, Exception]]:
+    """Fetch the data of many SNMP hosts at once, like `get_raw_data()` does for one
+
+    Every fetcher waits in a thread of its own. The requests of the
+    asynchronous SNMP backend of all hosts are done by the single event loop
+    of the process, so slow or unreachable devices only delay their own
+    results. The other backends are not meant to be used here.
+
+    The fetch of every host is given up after the timeout, its result is an
+    MKTimeout error then.
+
+    The results are in the order of the jobs.
+    """
+    if not jobs:
+        return []
+
+    def fetch(
+        job: tuple[FileCache[SNMPRawData], SNMPFetcher],
+    ) -> result.Result[SNMPRawData, Exception]:
+        try:
+            with deadline(timeout):
+                return get_raw_data(job[0], job[1], mode)
+        except MKTimeout as exc:
+            return result.Error(exc)
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(jobs)), thread_name_prefix="SNMPFetcher"
+    ) as executor:
+        return list(executor.map(fetch, jobs))
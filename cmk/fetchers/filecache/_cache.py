@@ -47,9 +47,12 @@ from __future__ import annotations
 
 import abc
 import enum
+import hashlib
 import logging
 import os
+import struct
 import time
+import zlib
 from collections.abc import Sized
 from dataclasses import dataclass
 from pathlib import Path
@@ -99,9 +102,32 @@ class FileCacheMode(enum.IntFlag):
     DISABLED = enum.auto()
     READ = enum.auto()
     WRITE = enum.auto()
+    # Write the cache files compressed, see `FileCache.write()`
+    COMPRESSED = enum.auto()
     READ_WRITE = READ | WRITE
 
 
+_COMPRESSED_MAGIC: Final = b"CMKZLIB1"
+# magic and digest of the uncompressed data
+_COMPRESSED_HEADER: Final = struct.Struct("<8s16s")
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _read_digest(path: Path) -> bytes | None:
+    try:
+        with path.open("rb") as cache_file:
+            header = cache_file.read(_COMPRESSED_HEADER.size)
+    except OSError:
+        return None
+    if len(header) != _COMPRESSED_HEADER.size:
+        return None
+    magic, digest = _COMPRESSED_HEADER.unpack(header)
+    return digest if magic == _COMPRESSED_MAGIC else None
+
+
 class FileCache(Generic[_TRawData], abc.ABC):
     def __init__(
         self,
@@ -230,10 +256,28 @@ class FileCache(Generic[_TRawData], abc.ABC):
             self._logger.debug("Not using cache (Empty)")
             return None
 
+        if cache_file.startswith(_COMPRESSED_MAGIC):
+            try:
+                _magic, digest = _COMPRESSED_HEADER.unpack_from(cache_file)
+                cache_file = zlib.decompress(cache_file[_COMPRESSED_HEADER.size :])
+                if _digest(cache_file) != digest:
+                    raise ValueError("digest mismatch")
+            except (struct.error, zlib.error, ValueError) as e:
+                self._logger.debug("Not using cache (Broken: %s)", e)
+                # Otherwise it would only be touched if the data does not change.
+                path.unlink(missing_ok=True)
+                return None
+
         self._logger.log(VERBOSE, "Using data from cache file %s", path)
         return self._from_cache_file(cache_file)
 
     def write(self, raw_data: _TRawData, mode: Mode) -> None:
+        """Write the data to the cache file
+
+        In the compressed mode, the cache file also holds the digest of the
+        data. If the data did not change, the cache file is only touched.
+        Either way, the age of the cache file is the age of the data.
+        """
         if FileCacheMode.WRITE not in self.file_cache_mode or not self._do_cache(mode):
             return
 
@@ -245,9 +289,23 @@ class FileCache(Generic[_TRawData], abc.ABC):
         except Exception as e:
             raise MKGeneralException(f"Cannot create directory {path.parent!r}: {e}")
 
+        cache_file = self._to_cache_file(raw_data)
+        if FileCacheMode.COMPRESSED in self.file_cache_mode:
+            digest = _digest(cache_file)
+            if digest == _read_digest(path):
+                self._logger.debug("Data unchanged, touch cache file %s", path)
+                try:
+                    path.touch()
+                    return
+                except OSError as e:
+                    self._logger.debug("Cannot touch cache file %s: %s", path, e)
+            cache_file = _COMPRESSED_HEADER.pack(_COMPRESSED_MAGIC, digest) + zlib.compress(
+                cache_file, 1
+            )
+
         self._logger.debug("Write data to cache file %s", path)
         try:
-            _store.save_bytes_to_file(path, self._to_cache_file(raw_data))
+            _store.save_bytes_to_file(path, cache_file)
         except MKTimeout:
             raise
         except Exception as e:
@@ -291,6 +349,12 @@ class FileCacheOptions:
     use_only_cache: bool = False
     # Set by the --force option from inventory.
     keep_outdated: bool = False
+    # Write the cache files compressed.
+    compressed: bool = False
 
     def file_cache_mode(self) -> FileCacheMode:
-        return FileCacheMode.DISABLED if self.disabled else FileCacheMode.READ_WRITE
+        if self.disabled:
+            return FileCacheMode.DISABLED
+        if self.compressed:
+            return FileCacheMode.READ_WRITE | FileCacheMode.COMPRESSED
+        return FileCacheMode.READ_WRITE
@@ -19,7 +19,7 @@ from cmk.snmplib import (
     SNMPHostConfig,
 )
 
-from .snmp_backend import ClassicSNMPBackend, StoredWalkSNMPBackend
+from .snmp_backend import AsyncSNMPBackend, ClassicSNMPBackend, StoredWalkSNMPBackend
 
 inline: ModuleType | None
 try:
@@ -64,6 +64,9 @@ def make_backend(
     if snmp_config.snmp_backend is SNMPBackendEnum.CLASSIC:
         return ClassicSNMPBackend(snmp_config, logger)
 
+    if snmp_config.snmp_backend is SNMPBackendEnum.ASYNC:
+        return AsyncSNMPBackend(snmp_config, logger)
+
     raise NotImplementedError(f"Unknown SNMP backend: {snmp_config.snmp_backend}")
 
 
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""SNMP backend speaking SNMP itself, using the asyncio API of pysnmp
+
+All walks of a fetch are done concurrently, using GETBULK requests where
+possible. The walks announced by prefetch() are done at once, walk() returns
+their results later on.
+
+The requests of all backends of a process are done by a single thread
+running an event loop, so fetching from many hosts at once only needs a
+thread waiting for the results per host. The SNMP engines, with their UDP
+sockets and their (expensive) MIB builders, are shared by all hosts with the
+same credentials.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import socket
+import threading
+import time
+from collections.abc import Coroutine, Iterable, Iterator, Mapping, Sequence
+from types import TracebackType
+from typing import Any, Final, Self, TypeVar
+
+from pyasn1.type import univ
+from pysnmp.error import PySnmpError  # type: ignore[import-untyped]
+from pysnmp.hlapi import asyncio as hlapi  # type: ignore[import-untyped]
+from pysnmp.proto import errind, rfc1902, rfc1905  # type: ignore[import-untyped]
+
+from cmk.ccc.exceptions import MKGeneralException, MKSNMPError, MKTimeout
+
+from cmk.utils.sectionname import SectionName
+
+from cmk.snmplib import (
+    OID,
+    SNMPBackend,
+    SNMPContext,
+    SNMPContextTimeout,
+    SNMPCredentials,
+    SNMPHostConfig,
+    SNMPRawValue,
+    SNMPRowInfo,
+    SNMPVersion,
+)
+
+__all__ = ["AsyncSNMPBackend", "SNMPEventLoop", "deadline"]
+
+_T = TypeVar("_T")
+
+# Do not flood the device, even if there are lots of walks
+MAX_CONCURRENT_REQUESTS: Final = 10
+
+_AUTH_PROTOCOLS: Final = {
+    "md5": hlapi.usmHMACMD5AuthProtocol,
+    "sha": hlapi.usmHMACSHAAuthProtocol,
+    "SHA-224": hlapi.usmHMAC128SHA224AuthProtocol,
+    "SHA-256": hlapi.usmHMAC192SHA256AuthProtocol,
+    "SHA-384": hlapi.usmHMAC256SHA384AuthProtocol,
+    "SHA-512": hlapi.usmHMAC384SHA512AuthProtocol,
+}
+
+# The AES variants with longer keys are the ones of net-snmp, as used by the
+# classic backend
+_PRIV_PROTOCOLS: Final = {
+    "DES": hlapi.usmDESPrivProtocol,
+    "AES": hlapi.usmAesCfb128Protocol,
+    "AES-192": hlapi.usmAesBlumenthalCfb192Protocol,
+    "AES-256": hlapi.usmAesBlumenthalCfb256Protocol,
+}
+
+_END_OF_WALK: Final = (rfc1905.EndOfMibView, rfc1905.NoSuchObject, rfc1905.NoSuchInstance)
+
+_Walk = tuple[OID, SNMPContext]
+
+# The monotonic time by which the requests of the current thread have to be done
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("_deadline", default=None)
+
+
+@contextlib.contextmanager
+def deadline(timeout: float | None) -> Iterator[None]:
+    """Give up waiting for the event loop with MKTimeout after the timeout
+
+    This is what the alarm signal does for the main thread, which the
+    threads waiting for the event loop do not receive.
+    """
+    token = _deadline.set(None if timeout is None else time.monotonic() + timeout)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _parse_oid(oid: OID) -> tuple[int, ...]:
+    try:
+        return tuple(int(part) for part in oid.strip(".").split("."))
+    except ValueError:
+        raise MKGeneralException(f"Invalid OID {oid}")
+
+
+def raw_value(value: Any) -> SNMPRawValue:
+    """The value as the classic backend gets it from the net-snmp tools"""
+    if isinstance(value, rfc1902.IpAddress):
+        return socket.inet_ntoa(value.asOctets()).encode()
+    if isinstance(value, rfc1902.OctetString):
+        return bytes(value.asOctets())
+    if isinstance(value, rfc1902.ObjectIdentifier):
+        return f".{value}".encode()
+    # Counters, gauges and time ticks are integers, too
+    if isinstance(value, univ.Integer):
+        return str(int(value)).encode()
+    return b""
+
+
+def auth_data(config: SNMPHostConfig) -> hlapi.CommunityData | hlapi.UsmUserData:
+    # See ClassicSNMPBackend._snmp_base_command for the credentials
+    if config.snmp_version is not SNMPVersion.V3:
+        if not isinstance(config.credentials, str):
+            raise TypeError()
+        return hlapi.CommunityData(
+            config.credentials, mpModel=0 if config.snmp_version is SNMPVersion.V1 else 1
+        )
+
+    credentials = config.credentials
+    if not (isinstance(credentials, tuple) and len(credentials) in (2, 4, 6)):
+        raise MKGeneralException(
+            f"Invalid SNMP credentials '{credentials!r}' for host {config.hostname}: "
+            "must be string, 2-tuple, 4-tuple or 6-tuple"
+        )
+    try:
+        match credentials:
+            case (_sec_level, sec_name):
+                return hlapi.UsmUserData(sec_name)
+            case (_sec_level, auth_proto, sec_name, auth_pass):
+                return hlapi.UsmUserData(
+                    sec_name, authKey=auth_pass, authProtocol=_AUTH_PROTOCOLS[auth_proto]
+                )
+            case (_sec_level, auth_proto, sec_name, auth_pass, priv_proto, priv_pass):
+                return hlapi.UsmUserData(
+                    sec_name,
+                    authKey=auth_pass,
+                    privKey=priv_pass,
+                    authProtocol=_AUTH_PROTOCOLS[auth_proto],
+                    privProtocol=_PRIV_PROTOCOLS[priv_proto],
+                )
+    except KeyError as e:
+        raise MKGeneralException(f"Invalid SNMP protocol: {e}")
+    raise AssertionError(credentials)
+
+
+class _Session:
+    """The requests to one host, limited to MAX_CONCURRENT_REQUESTS at a time"""
+
+    def __init__(self, config: SNMPHostConfig, engine: hlapi.SnmpEngine) -> None:
+        self._config = config
+        self._engine = engine
+        self._auth_data = auth_data(config)
+        address = (config.ipaddress or "0.0.0.0", config.port)
+        timeout = float(config.timing.get("timeout", 1))
+        retries = int(config.timing.get("retries", 5))
+        try:
+            self._target = (
+                hlapi.Udp6TransportTarget(address, timeout=timeout, retries=retries)
+                if config.is_ipv6_primary
+                else hlapi.UdpTransportTarget(address, timeout=timeout, retries=retries)
+            )
+        except PySnmpError as e:
+            raise MKSNMPError(f"SNMP Error on {config.ipaddress}: {e}")
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self.requests = 0
+
+    async def _request(
+        self, command: Any, context: SNMPContext, oid: tuple[int, ...], *args: int
+    ) -> Sequence[Any]:
+        async with self._semaphore:
+            self.requests += 1
+            try:
+                error_indication, error_status, error_index, var_bind_table = await command(
+                    self._engine,
+                    self._auth_data,
+                    self._target,
+                    hlapi.ContextData(contextName=context),
+                    *args,
+                    hlapi.ObjectType(hlapi.ObjectIdentity(oid)),
+                    lookupMib=False,
+                )
+            except PySnmpError as e:
+                raise MKSNMPError(f"SNMP Error on {self._config.ipaddress}: {e}")
+
+        if isinstance(error_indication, errind.RequestTimedOut):
+            raise SNMPContextTimeout(
+                f"SNMP Error on {self._config.ipaddress}: {error_indication}"
+                + (f" (context {context!r})" if context else "")
+            )
+        if error_indication:
+            raise MKSNMPError(f"SNMP Error on {self._config.ipaddress}: {error_indication}")
+        if error_status:
+            # SNMPv1 agents report the end of the MIB this way
+            if str(error_status.prettyPrint()) == "noSuchName":
+                return []
+            raise MKSNMPError(
+                f"SNMP Error on {self._config.ipaddress}: {error_status.prettyPrint()}"
+                f" at index {error_index}"
+            )
+        return var_bind_table
+
+    async def get(self, oid: OID, context: SNMPContext) -> SNMPRawValue | None:
+        if oid.endswith(".*"):
+            prefix = _parse_oid(oid[:-2])
+            table = await self._request(hlapi.nextCmd, context, prefix)
+        else:
+            prefix = _parse_oid(oid)
+            table = await self._request(hlapi.getCmd, context, prefix)
+            table = [table] if table else []
+        for row in table:
+            for name, value in row:
+                if isinstance(value, _END_OF_WALK):
+                    return None
+                if oid.endswith(".*") and tuple(name)[: len(prefix)] != prefix:
+                    return None
+                return raw_value(value)
+        return None
+
+    async def walk(self, oid: OID, context: SNMPContext) -> SNMPRowInfo:
+        prefix = _parse_oid(oid)
+        rows: SNMPRowInfo = []
+        current = prefix
+        while True:
+            if self._config.use_bulkwalk:
+                table = await self._request(
+                    hlapi.bulkCmd, context, current, 0, self._config.bulk_walk_size_of
+                )
+            else:
+                table = await self._request(hlapi.nextCmd, context, current)
+            if not table:
+                return rows
+            for row in table:
+                for name, value in row:
+                    name = tuple(name)
+                    # A broken agent might not increase the OIDs, do not loop forever
+                    if (
+                        isinstance(value, _END_OF_WALK)
+                        or name[: len(prefix)] != prefix
+                        or name <= current
+                    ):
+                        return rows
+                    rows.append(("." + ".".join(map(str, name)), raw_value(value)))
+                    current = name
+
+
+class SNMPEventLoop:
+    """An event loop running in a thread of its own, with the SNMP engines"""
+
+    def __init__(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="SNMPEventLoop", daemon=True
+        )
+        self._engines: dict[tuple[SNMPVersion, SNMPCredentials], hlapi.SnmpEngine] = {}
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self.run(self._close_engines())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _close_engines(self) -> None:
+        for engine in self._engines.values():
+            if engine.transportDispatcher is not None:
+                engine.transportDispatcher.closeDispatcher()
+        self._engines.clear()
+
+    def engine(self, config: SNMPHostConfig) -> hlapi.SnmpEngine:
+        """The SNMP engine for the credentials of the host
+
+        Only to be used from within the event loop.
+        """
+        key = (config.snmp_version, config.credentials)
+        try:
+            return self._engines[key]
+        except KeyError:
+            return self._engines.setdefault(key, hlapi.SnmpEngine())
+
+    def run(self, coroutine: Coroutine[Any, Any, _T]) -> _T:
+        """Run the coroutine in the event loop and wait for its result
+
+        Raises MKTimeout if the deadline of the calling thread passes.
+        """
+        if (deadline_ := _deadline.get()) is not None:
+            coroutine = asyncio.wait_for(coroutine, max(0.0, deadline_ - time.monotonic()))
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        try:
+            return future.result()
+        except TimeoutError:
+            if deadline_ is not None and time.monotonic() >= deadline_:
+                raise MKTimeout("Timed out waiting for the SNMP requests") from None
+            raise
+        except BaseException:
+            # For example an MKTimeout of the waiting thread
+            future.cancel()
+            raise
+
+
+_event_loop: SNMPEventLoop | None = None
+_event_loop_lock = threading.Lock()
+
+
+def _process_event_loop() -> SNMPEventLoop:
+    """The event loop shared by all backends of this process, started on demand"""
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            _event_loop = SNMPEventLoop().__enter__()
+        return _event_loop
+
+
+def _forget_event_loop() -> None:
+    # The thread running the event loop does not survive a fork
+    global _event_loop, _event_loop_lock
+    _event_loop = None
+    _event_loop_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_event_loop)
+
+
+class AsyncSNMPBackend(SNMPBackend):
+    def __init__(
+        self,
+        snmp_config: SNMPHostConfig,
+        logger: logging.Logger,
+        *,
+        event_loop: SNMPEventLoop | None = None,
+    ) -> None:
+        super().__init__(snmp_config, logger)
+        self._event_loop: Final = event_loop or _process_event_loop()
+        self._prefetched: dict[_Walk, SNMPRowInfo | MKSNMPError] = {}
+        self.requests = 0
+
+    def _session(self) -> _Session:
+        return _Session(self.config, self._event_loop.engine(self.config))
+
+    def get(self, /, oid: OID, *, context: SNMPContext) -> SNMPRawValue | None:
+        return self._event_loop.run(self._get(oid, context))
+
+    async def _get(self, oid: OID, context: SNMPContext) -> SNMPRawValue | None:
+        session = self._session()
+        try:
+            return await session.get(oid, context)
+        finally:
+            self.requests += session.requests
+
+    def prefetch(self, walks: Iterable[_Walk]) -> None:
+        if todo := [walk for walk in dict.fromkeys(walks) if walk not in self._prefetched]:
+            self._logger.debug("Walking %d OIDs concurrently", len(todo))
+            self._prefetched.update(self.walk_many(todo))
+
+    def walk(
+        self,
+        /,
+        oid: OID,
+        *,
+        context: SNMPContext,
+        section_name: SectionName | None = None,
+        table_base_oid: OID | None = None,
+    ) -> SNMPRowInfo:
+        try:
+            result = self._prefetched.pop((oid, context))
+        except KeyError:
+            self._logger.debug("  Loading %s", oid)
+            result = self.walk_many([(oid, context)])[(oid, context)]
+        if isinstance(result, MKSNMPError):
+            raise result
+        return result
+
+    def walk_many(self, walks: Sequence[_Walk]) -> Mapping[_Walk, SNMPRowInfo | MKSNMPError]:
+        """Do the walks concurrently, the SNMP errors are part of the result"""
+        return self._event_loop.run(self._walk_many(walks))
+
+    async def _walk_many(self, walks: Sequence[_Walk]) -> Mapping[_Walk, SNMPRowInfo | MKSNMPError]:
+        session = self._session()
+        try:
+            results = await asyncio.gather(
+                *(session.walk(oid, context) for oid, context in walks), return_exceptions=True
+            )
+        finally:
+            self.requests += session.requests
+
+        walked: dict[_Walk, SNMPRowInfo | MKSNMPError] = {}
+        for walk, result in zip(walks, results):
+            if isinstance(result, BaseException) and not isinstance(result, MKSNMPError):
+                raise result
+            walked[walk] = result
+        return walked
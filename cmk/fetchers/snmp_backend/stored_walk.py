@@ -4,8 +4,15 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """Abstract classes and types."""
 
+import array
+import bisect
+import contextlib
 import logging
-from collections.abc import Sequence
+import mmap
+import os
+import re
+import struct
+from collections.abc import Iterator, Sequence
 from pathlib import Path
 from typing import Final
 
@@ -17,7 +24,152 @@ from cmk.snmplib import OID, SNMPBackend, SNMPContext, SNMPHostConfig, SNMPRawVa
 
 from ._utils import strip_snmp_value
 
-__all__ = ["StoredWalkSNMPBackend"]
+__all__ = ["StoredWalkSNMPBackend", "WalkIndex"]
+
+
+class WalkIndex:
+    """The records of a stored walk sorted by their OIDs
+
+    The index is a sidecar file next to the walk (`<walk>.idx`), holding the
+    start and end offsets of all records of the walk in the order of their
+    OIDs. It is built once and rebuilt as soon as the walk changes. Both the
+    walk and the index are memory mapped: a lookup only reads the records
+    visited by a binary search.
+    """
+
+    _MAGIC: Final = b"CMKWALK1"
+    # magic, size and mtime of the walk, number of records
+    _HEADER: Final = struct.Struct("<8sQQQ")
+
+    def __init__(self, walk: mmap.mmap | bytes, offsets: memoryview) -> None:
+        self._walk: Final = walk
+        # start and end offsets of the records, in pairs
+        self._offsets: Final = offsets
+
+    @staticmethod
+    def index_path(path: Path) -> Path:
+        return path.with_name(f"{path.name}.idx")
+
+    @classmethod
+    def open(cls, path: Path, logger: logging.Logger) -> "WalkIndex":
+        with path.open("rb") as walk_file:
+            stat = os.fstat(walk_file.fileno())
+            walk = (
+                mmap.mmap(walk_file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b""
+            )
+
+        index_path = cls.index_path(path)
+        try:
+            with index_path.open("rb") as index_file:
+                index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, size, mtime_ns, count = cls._HEADER.unpack_from(index)
+        except (OSError, ValueError, struct.error):
+            pass
+        else:
+            if (magic, size, mtime_ns, len(index)) == (
+                cls._MAGIC,
+                stat.st_size,
+                stat.st_mtime_ns,
+                cls._HEADER.size + 16 * count,
+            ):
+                return cls(walk, memoryview(index)[cls._HEADER.size :].cast("Q"))
+            index.close()
+
+        logger.debug(f"  Indexing {path}")
+        offsets = cls._sorted_records(walk, logger)
+        data = (
+            cls._HEADER.pack(cls._MAGIC, stat.st_size, stat.st_mtime_ns, len(offsets) // 2)
+            + offsets.tobytes()
+        )
+        tmp_path = index_path.with_name(f".{index_path.name}.new")
+        try:
+            tmp_path.write_bytes(data)
+            tmp_path.rename(index_path)
+        except OSError as e:
+            logger.debug(f"  Cannot save {index_path}: {e}")
+        return cls(walk, memoryview(data)[cls._HEADER.size :].cast("Q"))
+
+    @staticmethod
+    def _sorted_records(walk: mmap.mmap | bytes, logger: logging.Logger) -> array.array[int]:
+        # The walks written by Checkmk are sorted already, there is no need to
+        # keep all OIDs in memory for them.
+        offsets = array.array("Q")
+        previous: tuple[int, ...] = ()
+        for start, end in _records(walk):
+            try:
+                oid = _parse_oid(_oid_of(walk, start, end))
+            except ValueError:
+                logger.debug(f"  Skipping invalid OID at offset {start}")
+                continue
+            if oid < previous:
+                break
+            previous = oid
+            offsets.extend((start, end))
+        else:
+            return offsets
+
+        logger.debug("  Sorting the records")
+        records = sorted(
+            (
+                (oid, start, end)
+                for start, end in _records(walk)
+                for oid in _valid_oids(walk, start, end)
+            ),
+            key=lambda record: record[0],
+        )
+        return array.array("Q", (offset for _oid, *record in records for offset in record))
+
+    def __len__(self) -> int:
+        return len(self._offsets) // 2
+
+    def oid(self, index: int) -> tuple[int, ...]:
+        return _parse_oid(
+            _oid_of(self._walk, self._offsets[2 * index], self._offsets[2 * index + 1])
+        )
+
+    def row(self, index: int) -> tuple[OID, SNMPRawValue]:
+        record = self._walk[self._offsets[2 * index] : self._offsets[2 * index + 1]]
+        oid, *value = record.decode("utf-8").split(None, 1)
+        return "." + oid.lstrip("."), strip_snmp_value(value[0] if value else "")
+
+    def walk(self, prefix: tuple[int, ...]) -> Iterator[tuple[OID, SNMPRawValue]]:
+        """The rows of the OID and all OIDs below it"""
+        for index in range(bisect.bisect_left(range(len(self)), prefix, key=self.oid), len(self)):
+            if self.oid(index)[: len(prefix)] != prefix:
+                return
+            yield self.row(index)
+
+
+_OID_END: Final = re.compile(rb"\s")
+
+
+def _records(walk: mmap.mmap | bytes) -> Iterator[tuple[int, int]]:
+    """The start and end offsets of the records in the walk
+
+    Sometimes there are newlines in the data of snmpwalks, so a record spans
+    all lines up to the next one starting with a dot.
+    """
+    start = 0 if walk[:1] == b"." else walk.find(b"\n.") + 1
+    if start == 0 and walk[:1] != b".":
+        return
+    while end := walk.find(b"\n.", start) + 1:
+        yield start, end
+        start = end
+    yield start, len(walk)
+
+
+def _valid_oids(walk: mmap.mmap | bytes, start: int, end: int) -> Iterator[tuple[int, ...]]:
+    with contextlib.suppress(ValueError):
+        yield _parse_oid(_oid_of(walk, start, end))
+
+
+def _oid_of(walk: mmap.mmap | bytes, start: int, end: int) -> bytes:
+    match = _OID_END.search(walk, start, end)
+    return walk[start : match.start() if match else end]
+
+
+def _parse_oid(oid: bytes) -> tuple[int, ...]:
+    return tuple(map(int, oid.strip(b".").split(b".")))
 
 
 class StoredWalkSNMPBackend(SNMPBackend):
@@ -26,6 +178,16 @@ class StoredWalkSNMPBackend(SNMPBackend):
         self.path: Final = path
         if not self.path.exists():
             raise MKSNMPError(f"No snmpwalk file {self.path}")
+        self._index: WalkIndex | None = None
+
+    @property
+    def index(self) -> WalkIndex:
+        if self._index is None:
+            try:
+                self._index = WalkIndex.open(self.path, self._logger)
+            except OSError:
+                raise MKSNMPError(f"No snmpwalk file {self.path}")
+        return self._index
 
     def get(self, /, oid: OID, *, context: SNMPContext) -> SNMPRawValue | None:
         walk = self.walk(oid, context=context)
@@ -57,34 +219,10 @@ class StoredWalkSNMPBackend(SNMPBackend):
             dot_star = False
 
         self._logger.debug(f"  Loading {oid}")
-        lines = self.read_walk_data()
-
-        begin = 0
-        end = len(lines)
-        hit = None
-        while end - begin > 0:
-            current = (begin + end) // 2
-            parts = lines[current].split(None, 1)
-            comp = parts[0]
-            hit = StoredWalkSNMPBackend._compare_oids(oid_prefix, comp)
-            if hit == 0:
-                break
-            if hit == 1:  # we are too low
-                begin = current + 1
-            else:
-                end = current
-
-        if hit != 0:
-            return []  # not found
-
-        rowinfo = StoredWalkSNMPBackend._collect_until(oid, oid_prefix, lines, current, -1)
-        rowinfo.reverse()
-        rowinfo += StoredWalkSNMPBackend._collect_until(oid, oid_prefix, lines, current + 1, 1)
-
+        rows = self.index.walk(self._to_bin_string(oid_prefix))
         if dot_star:
-            return [rowinfo[0]]
-
-        return rowinfo
+            return next(([row] for row in rows if row[0] != f".{oid_prefix}"), [])
+        return list(rows)
 
     @staticmethod
     def read_walk_from_path(path: Path, logger: logging.Logger) -> Sequence[str]:
@@ -124,33 +262,3 @@ class StoredWalkSNMPBackend(SNMPBackend):
             raise
         except Exception:
             raise MKGeneralException(f"Invalid OID {oid}")
-
-    @staticmethod
-    def _collect_until(
-        oid: OID, oid_prefix: OID, lines: Sequence[str], index: int, direction: int
-    ) -> SNMPRowInfo:
-        rows = []
-        # Handle case, where we run after the end of the lines list
-        if index >= len(lines):
-            if direction > 0:
-                return []
-            index -= 1
-        while True:
-            line = lines[index]
-            parts = line.split(None, 1)
-            o = parts[0]
-            if o.startswith("."):
-                o = o[1:]
-            if o == oid or o.startswith(oid_prefix + "."):
-                if len(parts) > 1:
-                    value = parts[1]
-                else:
-                    value = ""
-                # Fix for missing starting oids
-                rows.append(("." + o, strip_snmp_value(value)))
-                index += direction
-                if index < 0 or index >= len(lines):
-                    break
-            else:
-                break
-        return rows
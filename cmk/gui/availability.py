@@ -33,6 +33,7 @@ from cmk.utils.hostaddress import HostName
 from cmk.utils.servicename import ServiceName
 
 from cmk.gui import sites
+from cmk.gui.availability_rollups import AvailabilityRollups, day_boundaries, ROLLUP_COLUMNS
 from cmk.gui.bi import BIManager
 from cmk.gui.data_source import query_livestatus
 from cmk.gui.exceptions import MKUserError
@@ -741,6 +742,24 @@ def get_av_computation_options() -> AVOptionValueSpecs:
                 label=_("Do not merge consecutive phases with equal state"),
             ),
         ),
+        (
+            "use_rollups",
+            "single",
+            True,
+            Checkbox(
+                title=_("Daily rollups"),
+                label=_("Use the daily rollups of the state history"),
+                help=_(
+                    "Take whole days of the time range from the state history which is summed "
+                    "up once a day, instead of processing all its state phases again. This is "
+                    "much faster for long time ranges. The rollups are only used for the "
+                    "availability tables of hosts and services, as long as no output, no "
+                    "timeline, no outage statistics and no short time intervals are shown "
+                    "and no annotations exist for the days. Hosts and services are only "
+                    "included if they are still monitored at the end of the rolled up days."
+                ),
+            ),
+        ),
         (
             "timelimit",
             "single",
@@ -861,6 +880,7 @@ def get_default_avoptions(range_spec: tuple[float, float] | None = None) -> AVOp
         "timeformat": ("perc", "percentage_2", None),
         "short_intervals": 0,
         "dont_merge": False,
+        "use_rollups": False,
         "summary": "sum",
         "show_timeline": False,
         "timelimit": 30,
@@ -976,7 +996,7 @@ def get_availability_rawdata(
 
     time_range: AVTimeRange = avoptions["range"][0]
 
-    av_filter = "Filter: time >= %d\nFilter: time < %d\n" % time_range
+    av_filter = ""
     if av_object:
         tl_site, tl_host, tl_service = av_object
         av_filter += f"Filter: host_name = {lqencode(str(tl_host))}\nFilter: service_description = {lqencode(tl_service)}\n"
@@ -1024,45 +1044,190 @@ def get_availability_rawdata(
     logrow_limit = avoptions["logrow_limit"]
 
     with CPUTracker(logger.debug) as fetch_rows_tracker:
-        data = query_livestatus(
-            Query(
-                QuerySpecification(
-                    table="statehist",
-                    columns=columns,
-                    headers=headers,
-                )
-            ),
-            only_sites=only_sites,
-            limit=logrow_limit or None,
-            auth_domain="read",
+        rollup_range = (
+            None
+            if av_object or include_output or include_long_output
+            else _get_rollup_range(what, only_sites, avoptions)
         )
-
-    columns = ["site"] + columns
-    spans: list[AVSpan] = [dict(zip(columns, span)) for span in data]
-    amount_filtered_rows = len(spans)
+        if rollup_range is None:
+            spans, amount_rows, exceeded_log_row_limit = _query_statehist(
+                columns, headers, time_range, only_sites, logrow_limit
+            )
+        else:
+            spans, amount_rows, exceeded_log_row_limit = _query_statehist_with_rollups(
+                what, columns, headers, time_range, rollup_range, only_sites, logrow_limit
+            )
 
     # When a group filter is set, only care about these groups in the group fields
     with CPUTracker(logger.debug) as filter_rows_tracker:
         if avoptions["grouping"] not in [None, "host"]:
             filter_groups_of_entries(context, avoptions, spans)
 
+    if view_process_tracking:
+        view_process_tracking.amount_unfiltered_rows = amount_rows
+        view_process_tracking.amount_filtered_rows = amount_rows
+        view_process_tracking.amount_rows_after_limit = len(spans)
+        view_process_tracking.duration_fetch_rows = fetch_rows_tracker.duration
+        view_process_tracking.duration_filter_rows = filter_rows_tracker.duration
+
+    return spans_by_object(spans), exceeded_log_row_limit
+
+
+def _query_statehist(
+    columns: list[str],
+    headers: str,
+    time_range: AVTimeRange,
+    only_sites: OnlySites,
+    logrow_limit: int,
+) -> tuple[list[AVSpan], int, bool]:
+    """The spans of the state history in the time range, the number of rows and whether the
+    log row limit was exceeded"""
+    data = query_livestatus(
+        Query(
+            QuerySpecification(
+                table="statehist",
+                columns=columns,
+                headers="Filter: time >= %d\nFilter: time < %d\n" % time_range + headers,
+            )
+        ),
+        only_sites=only_sites,
+        limit=logrow_limit or None,
+        auth_domain="read",
+    )
+    spans: list[AVSpan] = [dict(zip(["site"] + columns, span)) for span in data]
+
     # Now we find out if the log row limit was exceeded or
     # if the log's length is the limit by accident.
     # If this limit was exceeded then we cut off the last element
     # because it might be incomplete.
-    exceeded_log_row_limit: bool = False
     if logrow_limit and len(data) > logrow_limit:
-        exceeded_log_row_limit = True
-        spans = spans[:-1]
+        return spans[:-1], len(data), True
+    return spans, len(data), False
 
-    if view_process_tracking:
-        view_process_tracking.amount_unfiltered_rows = len(data)
-        view_process_tracking.amount_filtered_rows = amount_filtered_rows
-        view_process_tracking.amount_rows_after_limit = len(spans)
-        view_process_tracking.duration_fetch_rows = fetch_rows_tracker.duration
-        view_process_tracking.duration_filter_rows = filter_rows_tracker.duration
 
-    return spans_by_object(spans), exceeded_log_row_limit
+def _get_rollup_range(
+    what: AVObjectType, only_sites: OnlySites, avoptions: AVOptions
+) -> tuple[int, int] | None:
+    """The longest run of whole days in the time range which can be taken from the rollups
+
+    The rollups only hold the summed up durations of the spans, so they can only
+    be used for computations which do not care about single spans or about
+    anything beyond the classification of the spans.
+    """
+    if (
+        not avoptions.get("use_rollups")
+        or what not in ("host", "service")
+        or avoptions["grouping"] not in (None, "host")
+        or avoptions["short_intervals"]
+        or avoptions["show_timeline"]
+        or "use_display_name" in avoptions["labelling"]
+        or "show_alias" in avoptions["labelling"]
+        or all(get_outage_statistic_options(avoptions))
+    ):
+        return None
+
+    if not (boundaries := day_boundaries(*avoptions["range"][0])):
+        return None
+    site_ids = only_sites or [
+        site_id for site_id, status in sites.states().items() if status.get("state") == "online"
+    ]
+    rolled_up_days = AvailabilityRollups(cmk.utils.paths.availability_rollups_file).rolled_up_days(
+        site_ids
+    )
+
+    rollup_range: tuple[int, int] | None = None
+    run_start: int | None = None
+    for day, day_end in zip(boundaries, boundaries[1:]):
+        if (day, day_end) not in rolled_up_days:
+            run_start = None
+            continue
+        if run_start is None:
+            run_start = day
+        if rollup_range is None or day_end - run_start > rollup_range[1] - rollup_range[0]:
+            rollup_range = run_start, day_end
+
+    # Annotations reclassify single spans
+    if rollup_range is not None and any(
+        _annotation_affects_time_range(
+            annotation["from"], annotation["until"], rollup_range[0], rollup_range[1]
+        )
+        for entries in load_annotations().values()
+        for annotation in entries
+    ):
+        return None
+    return rollup_range
+
+
+def _query_statehist_with_rollups(
+    what: AVObjectType,
+    columns: list[str],
+    headers: str,
+    time_range: AVTimeRange,
+    rollup_range: tuple[int, int],
+    only_sites: OnlySites,
+    logrow_limit: int,
+) -> tuple[list[AVSpan], int, bool]:
+    """The spans of the state history, with the rolled up days condensed into one span per
+    object and classification
+
+    Only the edges of the time range are queried from the cores. The objects are
+    the ones found there, so the filters and permissions of the query apply to
+    the rolled up days as well. Objects which were removed before the end of the
+    rolled up days are left out.
+    """
+    from_time, until_time = time_range
+    rollup_start, rollup_end = rollup_range
+
+    head_spans, head_rows, head_exceeded = (
+        _query_statehist(columns, headers, (from_time, rollup_start), only_sites, logrow_limit)
+        if from_time < rollup_start
+        else ([], 0, False)
+    )
+    # Start one second early to also know the objects if the time range ends with the rollups
+    tail_spans, tail_rows, tail_exceeded = _query_statehist(
+        columns, headers, (rollup_end - 1, until_time), only_sites, logrow_limit
+    )
+
+    objects = {
+        (span["site"], span["host_name"], span["service_description"])
+        for span in itertools.chain(head_spans, tail_spans)
+    }
+    rollup_spans: list[AVSpan] = []
+    span_from: dict[tuple[SiteId, HostName, ServiceName], float] = {}
+    for site_id, host_name, service_description, key, duration in AvailabilityRollups(
+        cmk.utils.paths.availability_rollups_file
+    ).durations(
+        {site_id for site_id, _host_name, _service in objects},
+        rollup_start,
+        rollup_end,
+        services=what == "service",
+    ):
+        if (obj := (site_id, host_name, service_description)) not in objects:
+            continue
+        # Consecutive spans, so that they can be merged as usual
+        from_ = span_from.get(obj, rollup_start)
+        span_from[obj] = from_ + duration
+        rollup_spans.append(
+            {
+                "site": site_id,
+                "host_name": host_name,
+                "service_description": service_description,
+                "duration": duration,
+                "from": from_,
+                "until": from_ + duration,
+                **dict(zip(ROLLUP_COLUMNS, key)),
+            }
+        )
+
+    for span in tail_spans:
+        span["from"] = max(span["from"], rollup_end)
+        span["duration"] = span["until"] - span["from"]
+
+    return (
+        head_spans + rollup_spans + [span for span in tail_spans if span["duration"] > 0],
+        head_rows + tail_rows,
+        head_exceeded or tail_exceeded,
+    )
 
 
 def filter_groups_of_entries(
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Daily rollups of the state history for the availability
+
+Computing the availability of a long time range makes the cores replay their
+whole history of that range. The rollup job sums up the state history of each
+completed day once: per host or service and per combination of the columns
+the availability is classified by (state, host down, downtimes, notification
+and service period, flapping). Availability queries take whole days from
+these rollups and only query the cores for the rest of their time range.
+
+The rollups are kept in an sqlite database, one row per object, day and
+classification. A day is only used once it has been rolled up for all the
+sites of a query.
+"""
+
+import contextlib
+import sqlite3
+import time
+from collections.abc import Iterable, Iterator, Sequence
+from datetime import timedelta
+from pathlib import Path
+from typing import Final
+
+from livestatus import MKLivestatusException, SiteId
+
+import cmk.utils.paths
+from cmk.utils.hostaddress import HostName
+from cmk.utils.servicename import ServiceName
+
+from cmk.gui import sites
+from cmk.gui.cron import CronJob, CronJobRegistry
+from cmk.gui.log import logger
+
+__all__ = [
+    "AvailabilityRollups",
+    "day_boundaries",
+    "execute_availability_rollup_job",
+    "register",
+    "ROLLUP_COLUMNS",
+]
+
+# The statehist columns the availability computation classifies the spans by
+ROLLUP_COLUMNS: Final = (
+    "state",
+    "host_down",
+    "in_downtime",
+    "in_host_downtime",
+    "in_notification_period",
+    "in_service_period",
+    "is_flapping",
+)
+
+_KEEP_DAYS: Final = 400
+_DAYS_PER_RUN: Final = 31
+# Give the cores some time to write the history of the last day
+_SETTLING_TIME: Final = 3600
+_QUERY_TIMELIMIT: Final = 120
+
+_SQLITE_PRAGMAS: Final = (
+    # Readers do not block the writer and vice versa
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+)
+
+RollupRow = tuple[SiteId, HostName, ServiceName, tuple[int | None, ...], float]
+
+
+def register(cron_job_registry: CronJobRegistry) -> None:
+    cron_job_registry.register(
+        CronJob(
+            name="execute_availability_rollup_job",
+            callable=execute_availability_rollup_job,
+            interval=timedelta(hours=1),
+            run_in_thread=True,
+        )
+    )
+
+
+def _midnight(timestamp: float, days: int = 0) -> int:
+    tm = time.localtime(timestamp)
+    return int(time.mktime((tm.tm_year, tm.tm_mon, tm.tm_mday + days, 0, 0, 0, 0, 0, -1)))
+
+
+def day_boundaries(from_time: float, until_time: float) -> Sequence[int]:
+    """The starts of the local days lying completely within the time range and the end of the last
+
+    Empty if there is no such day.
+    """
+    day = _midnight(from_time)
+    if day < from_time:
+        day = _midnight(from_time, 1)
+    boundaries = []
+    while day <= until_time:
+        boundaries.append(day)
+        day = _midnight(day, 1)
+    return boundaries if len(boundaries) > 1 else []
+
+
+class AvailabilityRollups:
+    def __init__(self, path: Path) -> None:
+        self.path: Final = path
+
+    @contextlib.contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            for pragma in _SQLITE_PRAGMAS:
+                connection.execute(pragma)
+            with connection:
+                connection.executescript(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS rolled_up_days (
+                        site TEXT NOT NULL, day INTEGER NOT NULL, day_end INTEGER NOT NULL,
+                        PRIMARY KEY (site, day)
+                    ) WITHOUT ROWID;
+                    CREATE TABLE IF NOT EXISTS durations (
+                        site TEXT NOT NULL, day INTEGER NOT NULL,
+                        host_name TEXT NOT NULL, service_description TEXT NOT NULL,
+                        {", ".join(f"{column} INTEGER" for column in ROLLUP_COLUMNS)},
+                        duration REAL NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS durations_by_day ON durations (day, site);
+                    """
+                )
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def save_day(
+        self,
+        site_id: SiteId,
+        day: int,
+        day_end: int,
+        rows: Iterable[Sequence[object]],
+    ) -> None:
+        """Replace the rollup of the day of the site
+
+        The rows are the host name, service description, the values of the
+        ROLLUP_COLUMNS and the summed up duration.
+        """
+        with self._connection() as connection:
+            connection.execute("DELETE FROM durations WHERE site = ? AND day = ?", (site_id, day))
+            connection.executemany(
+                f"INSERT INTO durations VALUES (?, ?, {', '.join('?' * (len(ROLLUP_COLUMNS) + 3))})",
+                ((site_id, day, *row) for row in rows),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO rolled_up_days VALUES (?, ?, ?)", (site_id, day, day_end)
+            )
+
+    def remove_days_before(self, day: int) -> None:
+        with self._connection() as connection:
+            connection.execute("DELETE FROM durations WHERE day < ?", (day,))
+            connection.execute("DELETE FROM rolled_up_days WHERE day < ?", (day,))
+
+    def rolled_up_days(self, site_ids: Iterable[SiteId]) -> set[tuple[int, int]]:
+        """The starts and ends of the days rolled up for all of the sites"""
+        site_ids = set(site_ids)
+        if not site_ids or not self.path.exists():
+            return set()
+        with self._connection() as connection:
+            return set(
+                connection.execute(
+                    "SELECT day, day_end FROM rolled_up_days"
+                    f" WHERE site IN ({', '.join('?' * len(site_ids))})"
+                    " GROUP BY day, day_end HAVING COUNT(*) = ?",
+                    (*site_ids, len(site_ids)),
+                )
+            )
+
+    def durations(
+        self, site_ids: Iterable[SiteId], from_day: int, until_day: int, *, services: bool
+    ) -> Sequence[RollupRow]:
+        """The durations of the hosts or services summed up over the days starting in the range"""
+        site_ids = set(site_ids)
+        if not site_ids or not self.path.exists():
+            return []
+        columns = ", ".join(ROLLUP_COLUMNS)
+        with self._connection() as connection:
+            return [
+                (
+                    SiteId(site_id),
+                    HostName(host_name),
+                    ServiceName(service_description),
+                    tuple(key),
+                    duration,
+                )
+                for site_id, host_name, service_description, *key, duration in connection.execute(
+                    f"SELECT site, host_name, service_description, {columns}, SUM(duration)"
+                    " FROM durations WHERE day >= ? AND day < ?"
+                    f" AND site IN ({', '.join('?' * len(site_ids))})"
+                    f" AND service_description {'!=' if services else '='} ''"
+                    f" GROUP BY site, host_name, service_description, {columns}"
+                    " ORDER BY site, host_name, service_description",
+                    (from_day, until_day, *site_ids),
+                )
+            ]
+
+
+def execute_availability_rollup_job() -> None:
+    """Roll up the completed days of the state history not rolled up yet, newest first"""
+    rollups = AvailabilityRollups(cmk.utils.paths.availability_rollups_file)
+    now = time.time()
+    if not (boundaries := day_boundaries(now - _KEEP_DAYS * 86400, now - _SETTLING_TIME)):
+        return
+    rollups.remove_days_before(boundaries[0])
+
+    for site_id, site_status in sites.states().items():
+        if site_status.get("state") != "online":
+            continue
+        rolled_up_days = rollups.rolled_up_days([site_id])
+        missing_days = [
+            (day, day_end)
+            for day, day_end in zip(boundaries, boundaries[1:])
+            if (day, day_end) not in rolled_up_days
+        ]
+        for day, day_end in missing_days[::-1][:_DAYS_PER_RUN]:
+            try:
+                rows = _query_day(site_id, day, day_end)
+            except MKLivestatusException as e:
+                logger.warning("Cannot roll up the state history of site %s: %s", site_id, e)
+                break
+            # A site going down during the query answers with no history at all
+            if site_id in sites.live().dead_sites():
+                break
+            rollups.save_day(site_id, day, day_end, rows)
+
+
+def _query_day(site_id: SiteId, day: int, day_end: int) -> Sequence[Sequence[object]]:
+    query = (
+        "GET statehist\n"
+        f"Columns: host_name service_description {' '.join(ROLLUP_COLUMNS)}\n"
+        f"Filter: time >= {day}\n"
+        f"Filter: time < {day_end}\n"
+        f"Timelimit: {_QUERY_TIMELIMIT}\n"
+        "Stats: sum duration\n"
+    )
+    with sites.only_sites(site_id):
+        return sites.live().query(query)
@@ -4,7 +4,10 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 from __future__ import annotations
 
+import threading
+import time
 from pathlib import Path
+from typing import Final
 
 from livestatus import LivestatusOutputFormat, LivestatusResponse, SiteId
 
@@ -12,25 +15,31 @@ from cmk.ccc import store
 from cmk.ccc.exceptions import MKGeneralException
 
 from cmk.utils.paths import default_config_dir
+from cmk.utils.user import UserId
 
 from cmk.gui import sites
 from cmk.gui.hooks import request_memoize
 from cmk.gui.i18n import _
+from cmk.gui.logged_in import user
 
 from cmk.bi.aggregation import BIAggregation
 from cmk.bi.compiler import BICompiler, path_compiled_aggregations
 from cmk.bi.computer import BIComputer
-from cmk.bi.data_fetcher import BIStatusFetcher
+from cmk.bi.data_fetcher import BIStatusCache, BIStatusFetcher
 from cmk.bi.lib import SitesCallback
 from cmk.bi.trees import BICompiledAggregation, BICompiledRule
 
 
 class BIManager:
-    def __init__(self) -> None:
+    def __init__(self, cache_states: bool = True) -> None:
         sites_callback = SitesCallback(all_sites_with_id_and_online, bi_livestatus_query, _)
         self.compiler = BICompiler(self.bi_configuration_file(), sites_callback)
         self.compiler.load_compiled_aggregations()
-        self.status_fetcher = BIStatusFetcher(sites_callback)
+        status_cache = None
+        if cache_states:
+            status_cache = _get_status_cache()
+            status_cache.use_compilation(self.compiler.compilation_token())
+        self.status_fetcher = BIStatusFetcher(sites_callback, status_cache)
         self.computer = BIComputer(self.compiler.compiled_aggregations, self.status_fetcher)
 
     @classmethod
@@ -38,6 +47,28 @@ class BIManager:
         return str(Path(default_config_dir) / "multisite.d" / "wato" / "bi_config.bi")
 
 
+# The status rows and results are kept between the requests of the GUI process. What a user
+# sees depends on their contacts and their enabled sites, so every user has a cache of their
+# own. Only the caches of the users seen last are kept, along with the time they were used.
+_MAX_STATUS_CACHES: Final = 10
+_status_caches: dict[UserId | None, tuple[float, BIStatusCache]] = {}
+_status_caches_lock = threading.Lock()
+
+
+def _get_status_cache() -> BIStatusCache:
+    now = time.monotonic()
+    with _status_caches_lock:
+        _last_used, status_cache = _status_caches.pop(user.id, (now, BIStatusCache()))
+        # A cache not used for longer than the full refresh interval would be refreshed anyway
+        for user_id, (last_used, cache) in list(_status_caches.items()):
+            if now - last_used > cache.max_age:
+                del _status_caches[user_id]
+        while len(_status_caches) >= _MAX_STATUS_CACHES:
+            del _status_caches[next(iter(_status_caches))]
+        _status_caches[user.id] = now, status_cache
+    return status_cache
+
+
 def all_sites_with_id_and_online() -> list[tuple[SiteId, bool]]:
     return [
         (site_id, site_status["state"] == "online")
@@ -898,7 +898,8 @@ class PainterAggrTreestateFrozenDiff(Painter):
 
 @request_memoize()
 def _get_cached_bi_manager() -> BIManager:
-    return BIManager()
+    # The branches are modified to diff trees, their results must not be cached
+    return BIManager(cache_states=False)
 
 
 def convert_tree_to_frozen_diff_tree(row: Row) -> tuple[Row, bool]:
@@ -17,6 +17,7 @@ import cmk.gui.help
 from cmk.gui import (
     agent_registration,
     autocompleters,
+    availability_rollups,
     crash_handler,
     crash_reporting,
     default_permissions,
@@ -178,6 +179,7 @@ def register(
         icon_and_action_registry,
         cron_job_registry,
     )
+    availability_rollups.register(cron_job_registry)
     dashboard_registration.register(
         permission_section_registry,
         page_registry,
@@ -13,10 +13,11 @@ from cmk.ccc.exceptions import MKGeneralException
 import cmk.utils.paths
 from cmk.utils.hostaddress import HostName
 from cmk.utils.structured_data import (
+    ArchivedDelta,
     deserialize_delta_tree,
     ImmutableDeltaTree,
     ImmutableTree,
-    load_tree,
+    load_archive_entry,
     SDFilterChoice,
     serialize_delta_tree,
 )
@@ -164,6 +165,20 @@ def _get_history(
             filters,
         )
 
+        try:
+            archived_delta = cached_tree_loader.get_archived_delta(previous.path, current.timestamp)
+        except (FileNotFoundError, ValueError):
+            archived_delta = None
+
+        if archived_delta is not None:
+            if (
+                archived_history_entry := cached_delta_tree_loader.get_archived_entry(
+                    archived_delta
+                )
+            ) is not None:
+                history.append(archived_history_entry)
+            continue
+
         if (cached_history_entry := cached_delta_tree_loader.get_cached_entry()) is not None:
             history.append(cached_history_entry)
             continue
@@ -239,19 +254,41 @@ def _get_pairs(
 
 @dataclass(frozen=True)
 class _CachedTreeLoader:
-    _lookup: dict[Path, ImmutableTree] = field(default_factory=dict)
+    # The archive entries as loaded, and the trees restored from them
+    _entries: dict[Path, ImmutableTree | ArchivedDelta] = field(default_factory=dict)
+    _trees: dict[Path, ImmutableTree] = field(default_factory=dict)
+
+    def _get_entry(self, filepath: Path) -> ImmutableTree | ArchivedDelta:
+        if filepath in self._entries:
+            return self._entries[filepath]
+        return self._entries.setdefault(filepath, load_archive_entry(filepath))
+
+    def get_archived_delta(self, filepath: Path, next_timestamp: int) -> ArchivedDelta | None:
+        if filepath == Path():
+            return None
+
+        if (
+            isinstance(entry := self._get_entry(filepath), ArchivedDelta)
+            and entry.next_timestamp == next_timestamp
+        ):
+            return entry
+
+        return None
 
     def get_tree(self, filepath: Path) -> ImmutableTree:
         if filepath == Path():
             return ImmutableTree()
 
-        if filepath in self._lookup:
-            return self._lookup[filepath]
+        if filepath in self._trees:
+            return self._trees[filepath]
+
+        if isinstance(tree := self._get_entry(filepath), ArchivedDelta):
+            tree = tree.restore(self.get_tree(filepath.with_name(str(tree.next_timestamp))))
 
-        if not (tree := load_tree(filepath)):
+        if not tree:
             raise ValueError(tree)
 
-        return self._lookup.setdefault(filepath, tree)
+        return self._trees.setdefault(filepath, tree)
 
 
 @dataclass(frozen=True)
@@ -287,6 +324,16 @@ class _CachedDeltaTreeLoader:
             deserialize_delta_tree(raw_delta_tree),
         )
 
+    def get_archived_entry(self, archived_delta: ArchivedDelta) -> HistoryEntry | None:
+        if not any(archived_delta.stats.values()):
+            return None
+        return self._make_history_entry(
+            archived_delta.stats["new"],
+            archived_delta.stats["changed"],
+            archived_delta.stats["removed"],
+            archived_delta.delta_tree,
+        )
+
     def get_calculated_or_store_entry(
         self,
         previous_tree: ImmutableTree,
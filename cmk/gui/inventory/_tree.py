@@ -6,7 +6,9 @@
 from __future__ import annotations
 
 import ast
-from collections.abc import Sequence
+import re
+import sqlite3
+from collections.abc import Callable, Mapping, Sequence
 from dataclasses import dataclass
 from enum import auto, Enum
 from pathlib import Path
@@ -14,6 +16,7 @@ from typing import Literal
 
 import cmk.utils.paths
 from cmk.utils.hostaddress import HostName
+from cmk.utils.inventory_index import InventoryIndex
 from cmk.utils.structured_data import (
     deserialize_tree,
     ImmutableTree,
@@ -23,6 +26,7 @@ from cmk.utils.structured_data import (
     SDKey,
     SDNodeName,
     SDPath,
+    SDValue,
 )
 
 from cmk.gui import userdb
@@ -193,20 +197,115 @@ def _get_permitted_inventory_paths() -> Sequence[PermittedPath] | None:
 def load_filtered_and_merged_tree(row: Row) -> ImmutableTree:
     """Load inventory tree from file, status data tree from row,
     merge these trees and returns the filtered tree"""
-    host_name = row.get("host_name")
-    inventory_tree = _load_tree_from_file(tree_type="inventory", host_name=host_name)
-    if raw_status_data_tree := row.get("host_structured_status"):
-        status_data_tree = deserialize_tree(ast.literal_eval(raw_status_data_tree.decode("utf-8")))
-    else:
-        status_data_tree = _load_tree_from_file(tree_type="status_data", host_name=host_name)
-
-    merged_tree = inventory_tree.merge(status_data_tree)
+    inventory_tree = _load_tree_from_file(tree_type="inventory", host_name=row.get("host_name"))
+    merged_tree = inventory_tree.merge(_load_status_data_tree(row))
     if isinstance(permitted_paths := _get_permitted_inventory_paths(), list):
         return merged_tree.filter(make_filter_choices_from_permitted_paths(permitted_paths))
 
     return merged_tree
 
 
+def _load_status_data_tree(row: Row) -> ImmutableTree:
+    if raw_status_data_tree := row.get("host_structured_status"):
+        return deserialize_tree(ast.literal_eval(raw_status_data_tree.decode("utf-8")))
+    return _load_tree_from_file(tree_type="status_data", host_name=row.get("host_name"))
+
+
+def _host_inventory(row: Row) -> ImmutableTree:
+    if "host_inventory" not in row:
+        try:
+            row["host_inventory"] = load_filtered_and_merged_tree(row)
+        except Exception:
+            # Corrupted trees are reported by the painters, just as if no filter needed them
+            row["host_inventory"] = ImmutableTree()
+    return row["host_inventory"]
+
+
+@request_memoize()
+def _indexed_hosts() -> Mapping[HostName, int]:
+    try:
+        return InventoryIndex(cmk.utils.paths.inventory_index_file).indexed_hosts()
+    except sqlite3.Error:
+        return {}
+
+
+@request_memoize()
+def _indexed_attribute_values(path: SDPath, key: SDKey) -> Mapping[HostName, SDValue] | None:
+    try:
+        return InventoryIndex(cmk.utils.paths.inventory_index_file).attribute_values(path, key)
+    except sqlite3.Error:
+        return None
+
+
+@request_memoize()
+def _indexed_rows(
+    path: SDPath, key: SDKey, match: str | re.Pattern[str]
+) -> Mapping[HostName, Sequence[Mapping[SDKey, SDValue]]] | None:
+    try:
+        return InventoryIndex(cmk.utils.paths.inventory_index_file).find_rows(path, key, match)
+    except sqlite3.Error:
+        return None
+
+
+def _is_indexed(row: Row, has_status_data: Callable[[ImmutableTree], bool]) -> bool:
+    """Whether the inventory index knows the merged and filtered tree of the host
+
+    This is the case if the tree file did not change since it was indexed,
+    the user may see the whole tree and there is no status data in question.
+    """
+    if (
+        "host_inventory" in row
+        or not (host_name := row.get("host_name"))
+        or "/" in host_name
+        or (mtime_ns := _indexed_hosts().get(host_name)) is None
+        or _get_permitted_inventory_paths() is not None
+    ):
+        return False
+    try:
+        if Path(cmk.utils.paths.inventory_output_dir, host_name).stat().st_mtime_ns != mtime_ns:
+            return False
+    except OSError:
+        return False
+    return not has_status_data(_load_status_data_tree(row))
+
+
+def get_attribute_of_host(row: Row, inventory_path: InventoryPath) -> SDValue:
+    """The value of an attribute of the merged and filtered tree of the host
+
+    Uses the inventory index if possible, see `cmk.utils.inventory_index`.
+    The tree is only loaded otherwise.
+    """
+    path, key = inventory_path.path, inventory_path.key
+    if (
+        _is_indexed(row, lambda tree: tree.get_attribute(path, key) is not None)
+        and (values := _indexed_attribute_values(path, key)) is not None
+    ):
+        return values.get(row["host_name"])
+    return _host_inventory(row).get_attribute(path, key)
+
+
+def find_rows_of_host(
+    row: Row, path: SDPath, key: SDKey, match: str | re.Pattern[str]
+) -> Sequence[Mapping[SDKey, SDValue]]:
+    """The rows of a table of the merged and filtered tree of the host whose
+    value of the column equals or matches 'match'
+
+    Uses the inventory index if possible, see `cmk.utils.inventory_index`.
+    The tree is only loaded otherwise.
+    """
+    if (
+        _is_indexed(row, lambda tree: bool(tree.get_rows(path)))
+        and (rows_by_host := _indexed_rows(path, key, match)) is not None
+    ):
+        return rows_by_host.get(row["host_name"], [])
+    return [
+        r
+        for r in _host_inventory(row).get_rows(path)
+        if (value := r.get(key)) is not None
+        and (value == match if isinstance(match, str) else match.search(str(value)))
+    ]
+
+
 def get_short_inventory_filepath(hostname: HostName) -> Path:
     return (
         Path(cmk.utils.paths.inventory_output_dir)
@@ -7,6 +7,8 @@ import re
 from collections.abc import Callable
 from functools import partial
 
+from cmk.utils.structured_data import SDKey, SDNodeName
+
 from cmk.gui import query_filters
 from cmk.gui.exceptions import MKUserError
 from cmk.gui.htmllib.html import html
@@ -25,7 +27,7 @@ from cmk.gui.visuals.filter import (
     InputTextFilter,
 )
 
-from ._tree import InventoryPath
+from ._tree import find_rows_of_host, get_attribute_of_host, InventoryPath
 
 
 class FilterInvtableText(InputTextFilter):
@@ -61,9 +63,6 @@ class FilterInvText(InputTextFilter):
             is_show_more=is_show_more,
         )
 
-    def need_inventory(self, value: FilterHTTPVariables) -> bool:
-        return bool(value.get(self.htmlvars[0], "").strip().lower())
-
 
 def _filter_by_host_inventory(
     inventory_path: InventoryPath,
@@ -72,13 +71,7 @@ def _filter_by_host_inventory(
         regex = query_filters.re_ignorecase(filtertext, column)
 
         def filt(row: Row) -> bool:
-            return bool(
-                regex.search(
-                    str(
-                        row["host_inventory"].get_attribute(inventory_path.path, inventory_path.key)
-                    )
-                )
-            )
+            return bool(regex.search(str(get_attribute_of_host(row, inventory_path))))
 
         return filt
 
@@ -145,16 +138,13 @@ class FilterInvFloat(FilterNumberRange):
             is_show_more=is_show_more,
         )
 
-    def need_inventory(self, value: FilterHTTPVariables) -> bool:
-        return any(self.query_filter.extractor(value))
-
 
 def _filter_in_host_inventory_range(
     inventory_path: InventoryPath,
 ) -> Callable[[Row, str, query_filters.MaybeBounds], bool]:
     def row_filter(row: Row, column: str, bounds: query_filters.MaybeBounds) -> bool:
         if not isinstance(
-            invdata := row["host_inventory"].get_attribute(inventory_path.path, inventory_path.key),
+            invdata := get_attribute_of_host(row, inventory_path),
             (int, float),
         ):
             return False
@@ -298,14 +288,11 @@ class FilterInvBool(FilterOption):
             is_show_more=is_show_more,
         )
 
-    def need_inventory(self, value: FilterHTTPVariables) -> bool:
-        return self.query_filter.selection_value(value) != self.query_filter.ignore
-
 
 # Filter tables
 def inside_inventory(inventory_path: InventoryPath) -> Callable[[bool, Row], bool]:
     def keep_row(on: bool, row: Row) -> bool:
-        return row["host_inventory"].get_attribute(inventory_path.path, inventory_path.key) is on
+        return get_attribute_of_host(row, inventory_path) is on
 
     return keep_row
 
@@ -347,9 +334,6 @@ class FilterInvHasSoftwarePackage(Filter):
             is_show_more=True,
         )
 
-    def need_inventory(self, value: FilterHTTPVariables) -> bool:
-        return bool(value.get(self._varprefix + "name"))
-
     def display(self, value: FilterHTTPVariables) -> None:
         html.text_input(self._varprefix + "name")
         html.br()
@@ -410,7 +394,9 @@ class FilterInvHasSoftwarePackage(Filter):
 
         new_rows = []
         for row in rows:
-            packages = row["host_inventory"].get_rows(("software", "packages"))
+            packages = find_rows_of_host(
+                row, (SDNodeName("software"), SDNodeName("packages")), SDKey("name"), name
+            )
             is_in = self.find_package(packages, name, from_version, to_version)
             if is_in != negate:
                 new_rows.append(row)
@@ -432,6 +418,7 @@ class FilterInvHasSoftwarePackage(Filter):
                 continue
             if to_version and self.version_is_higher(version, to_version):
                 continue
+            return True
         return False
 
     def version_is_lower(self, a: str | None, b: str | None) -> bool:
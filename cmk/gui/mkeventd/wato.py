@@ -262,6 +262,8 @@ def register(
     config_var_registry.register(ConfigVariableEventConsoleServiceLevels)
     config_var_registry.register(ConfigVariableEventConsoleSqliteHousekeepingInterval)
     config_var_registry.register(ConfigVariableEventConsoleSqliteFreelistSize)
+    config_var_registry.register(ConfigVariableEventConsoleSqliteWriteBatchSize)
+    config_var_registry.register(ConfigVariableEventConsoleSqliteWriteInterval)
 
     rulespec_group_registry.register(RulespecGroupEventConsole)
     rulespec_registry.register(ECEventLimitRulespec)
@@ -4147,6 +4149,52 @@ class ConfigVariableEventConsoleSqliteFreelistSize(ConfigVariable):
         )
 
 
+class ConfigVariableEventConsoleSqliteWriteBatchSize(ConfigVariable):
+    def group(self) -> type[ConfigVariableGroup]:
+        return ConfigVariableGroupEventConsoleGeneric
+
+    def domain(self) -> type[ABCConfigDomain]:
+        return ConfigDomainEventConsole
+
+    def ident(self) -> str:
+        return "sqlite_write_batch_size"
+
+    def valuespec(self) -> ValueSpec:
+        return Integer(
+            title=_("Event Console history write batch size"),
+            help=_(
+                "The Event Console collects new history entries and writes them together. "
+                "As soon as this number of entries has been collected, they are written "
+                "without waiting for the write interval."
+            ),
+            unit=_("entries"),
+            minvalue=1,
+        )
+
+
+class ConfigVariableEventConsoleSqliteWriteInterval(ConfigVariable):
+    def group(self) -> type[ConfigVariableGroup]:
+        return ConfigVariableGroupEventConsoleGeneric
+
+    def domain(self) -> type[ABCConfigDomain]:
+        return ConfigDomainEventConsole
+
+    def ident(self) -> str:
+        return "sqlite_write_interval"
+
+    def valuespec(self) -> ValueSpec:
+        return Integer(
+            title=_("Event Console history write interval"),
+            help=_(
+                "The Event Console collects new history entries and writes them together "
+                "at this interval. The entries collected are lost if the Event Console "
+                "crashes before they are written."
+            ),
+            unit=_("ms"),
+            minvalue=1,
+        )
+
+
 class ConfigVariableEventConsoleStatisticsInterval(ConfigVariable):
     def group(self) -> type[ConfigVariableGroup]:
         return ConfigVariableGroupEventConsoleGeneric
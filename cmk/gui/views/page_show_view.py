@@ -9,7 +9,7 @@ from __future__ import annotations
 
 import functools
 import json
-from collections.abc import Callable, Iterable, Mapping, Sequence
+from collections.abc import Callable, Iterable, Sequence
 from itertools import chain
 from typing import Any
 from urllib.parse import quote_plus
@@ -58,7 +58,7 @@ from cmk.gui.visuals.filter import Filter
 
 from . import availability
 from .row_post_processing import post_process_rows
-from .sorter import SorterEntry, SorterProtocol
+from .sorter import SorterEntry
 from .store import get_all_views, get_permitted_views
 
 
@@ -630,57 +630,38 @@ def _link_to_folder_by_path(path: str) -> str:
 
 
 def _sort_data(data: Rows, sorters: list[SorterEntry]) -> None:
-    """Sort data according to list of sorters."""
-    if not sorters:
-        return
+    """Sort data according to list of sorters.
 
-    # Handle case where join columns are not present for all rows
-    def safe_compare(
-        compfunc: SorterProtocol,
-        row1: Row,
-        row2: Row,
-        parameters: Mapping[str, Any] | None,
-        config: Config,
-        req: Request,
-    ) -> int:
-        if row1 is None and row2 is None:
-            return 0
-        if row1 is None:
-            return -1
-        if row2 is None:
-            return 1
-        return compfunc(
-            row1,
-            row2,
-            parameters=parameters,
-            config=config,
-            request=req,
-        )
+    The rows are sorted once per sorter, the most significant sorter last. The
+    sort is stable, so each pass keeps the order of the previous passes among
+    the rows it considers equal.
+    """
+    for entry in reversed(sorters):
+        data.sort(key=_sort_key(entry, active_config, request), reverse=entry.negate)
+
+
+def _sort_key(entry: SorterEntry, config: Config, req: Request) -> Callable[[Row], Any]:
+    sorter, parameters, join_key = entry.sorter, entry.parameters, entry.join_key
+
+    if (sort_key := sorter.key) is None:
+        # Sorters without a key compare the rows pairwise
+        def compare(row1: Row, row2: Row) -> int:
+            if join_key:  # Sorter for join column, use JOIN info
+                row1, row2 = row1["JOIN"].get(join_key), row2["JOIN"].get(join_key)
+                # Handle case where join columns are not present for all rows
+                if row1 is None or row2 is None:
+                    return (row1 is not None) - (row2 is not None)
+            return sorter.cmp(row1, row2, parameters=parameters, config=config, request=req)
+
+        return functools.cmp_to_key(compare)
+
+    if join_key:  # Sorter for join column, use JOIN info
+        # Rows without the join columns come first
+        def join_row_key(row: Row) -> tuple[Any, ...]:
+            if (joined_row := row["JOIN"].get(join_key)) is None:
+                return (False,)
+            return True, sort_key(joined_row, parameters=parameters, config=config, request=req)
+
+        return join_row_key
 
-    def multisort(e1: Row, e2: Row) -> int:
-        for entry in sorters:
-            neg = -1 if entry.negate else 1
-
-            if entry.join_key:  # Sorter for join column, use JOIN info
-                c = neg * safe_compare(
-                    entry.sorter.cmp,
-                    e1["JOIN"].get(entry.join_key),
-                    e2["JOIN"].get(entry.join_key),
-                    entry.parameters,
-                    active_config,
-                    request,
-                )
-            else:
-                c = neg * entry.sorter.cmp(
-                    e1,
-                    e2,
-                    parameters=entry.parameters,
-                    config=active_config,
-                    request=request,
-                )
-
-            if c != 0:
-                return c
-        return 0  # equal
-
-    data.sort(key=functools.cmp_to_key(multisort))
+    return lambda row: sort_key(row, parameters=parameters, config=config, request=req)
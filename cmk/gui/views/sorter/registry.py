@@ -16,10 +16,11 @@ from cmk.gui.logged_in import user
 from cmk.gui.painter.v0.base import EmptyCell, painter_registry
 from cmk.gui.painter.v0.helpers import RenderLink
 from cmk.gui.painter_options import PainterOptions
-from cmk.gui.type_defs import ColumnName, PainterName, SorterFunction
+from cmk.gui.type_defs import ColumnName, PainterName, SorterFunction, SorterKeyFunction
 from cmk.gui.utils.theme import theme
 
-from .base import Sorter
+from .base import Sorter, SorterKeyProtocol
+from .helpers import sort_key_function
 
 
 class SorterRegistry(Registry[Sorter]):
@@ -43,20 +44,46 @@ def register_sorter(ident: str, spec: dict[str, Any]) -> None:
     )
 
 
-def declare_simple_sorter(name: str, title: str, column: ColumnName, func: SorterFunction) -> None:
+def _column_sort_key(column: ColumnName, key: SorterKeyFunction | None) -> SorterKeyProtocol | None:
+    if key is None:
+        return None
+    return lambda row, **_kwargs: key(column, row)
+
+
+def declare_simple_sorter(
+    name: str,
+    title: str,
+    column: ColumnName,
+    func: SorterFunction,
+    key: SorterKeyFunction | None = None,
+) -> None:
+    """Declare a sorter comparing one column with func
+
+    The sort key defaults to the one of func, if it is one of the helper functions.
+    """
     sorter_registry.register(
         Sorter(
             ident=name,
             title=title,
             columns=[column],
             sort_function=lambda r1, r2, **_kwargs: func(column, r1, r2),
+            sort_key=_column_sort_key(column, key or sort_key_function(func)),
         )
     )
 
 
 def declare_1to1_sorter(
-    painter_name: PainterName, func: SorterFunction, col_num: int = 0, reverse: bool = False
+    painter_name: PainterName,
+    func: SorterFunction,
+    col_num: int = 0,
+    reverse: bool = False,
+    key: SorterKeyFunction | None = None,
 ) -> PainterName:
+    """Declare a sorter for the column of a painter
+
+    If given, key has to order the rows like func, including 'reverse'. It
+    defaults to the one of func, if it is one of the helper functions.
+    """
     painter = painter_registry[painter_name](
         user=user,
         config=active_config,
@@ -76,6 +103,9 @@ def declare_1to1_sorter(
                 if reverse
                 else lambda r1, r2, **_kwargs: func(painter.columns[col_num], r1, r2)
             ),
+            sort_key=_column_sort_key(
+                painter.columns[col_num], key or sort_key_function(func, reverse=reverse)
+            ),
         )
     )
 
@@ -15,19 +15,20 @@ from cmk.gui.i18n import _, _l
 from cmk.gui.painter.v0.helpers import get_tag_groups
 from cmk.gui.painter.v1.helpers import get_perfdata_nth_value
 from cmk.gui.site_config import get_site_config
-from cmk.gui.type_defs import ColumnSpec, Row
+from cmk.gui.type_defs import ColumnName, ColumnSpec, Row
 from cmk.gui.valuespec import Dictionary, DropdownChoice
 from cmk.gui.view_utils import get_labels
 
 from .base import ParameterizedSorter, Sorter
 from .helpers import (
-    cmp_insensitive_string,
     cmp_ip_address,
     cmp_num_split,
     cmp_simple_number,
     cmp_simple_string,
     cmp_string_list,
-    compare_ips,
+    key_insensitive_string,
+    key_ip,
+    key_num_split,
 )
 from .registry import declare_1to1_sorter, declare_simple_sorter, SorterRegistry
 
@@ -56,7 +57,9 @@ def register_sorters(registry: SorterRegistry) -> None:
     registry.register(SorterHostIpv4Address)
     registry.register(SorterNumProblems)
 
-    declare_simple_sorter("svcdescr", _("Service name"), "service_description", cmp_service_name)
+    declare_simple_sorter(
+        "svcdescr", _("Service name"), "service_description", cmp_service_name, key_service_name
+    )
     declare_simple_sorter(
         "svcdispname",
         _("Service alternative display name"),
@@ -203,9 +206,9 @@ def register_sorters(registry: SorterRegistry) -> None:
     declare_1to1_sorter("log_time", cmp_simple_number)
     declare_1to1_sorter("log_lineno", cmp_simple_number)
 
-    declare_1to1_sorter("log_what", cmp_log_what)
+    declare_1to1_sorter("log_what", cmp_log_what, key=key_log_what)
 
-    declare_1to1_sorter("log_date", cmp_date)
+    declare_1to1_sorter("log_date", cmp_date, key=key_date)
 
     # Alert statistics
     declare_simple_sorter(
@@ -250,152 +253,134 @@ def cmp_host_state_equiv(r):
     return 2 - s  # swap down und unreachable
 
 
-def _sort_service_state(
-    r1: Row, r2: Row, *, parameters: Mapping[str, Any] | None, config: Config, request: Request
+def _sort_key_service_state(
+    row: Row, *, parameters: Mapping[str, Any] | None, config: Config, request: Request
 ) -> int:
-    return (cmp_state_equiv(r1) > cmp_state_equiv(r2)) - (cmp_state_equiv(r1) < cmp_state_equiv(r2))
+    return cmp_state_equiv(row)
 
 
 SorterSvcstate = Sorter(
     ident="svcstate",
     title=_l("Service state"),
     columns=["service_state", "service_has_been_checked"],
-    sort_function=_sort_service_state,
+    sort_key=_sort_key_service_state,
 )
 
 
-def _sort_host_state(
-    r1: Row,
-    r2: Row,
+def _sort_key_host_state(
+    row: Row,
     *,
     parameters: Mapping[str, Any] | None,
     config: Config,
     request: Request,
 ) -> int:
-    return (cmp_host_state_equiv(r1) > cmp_host_state_equiv(r2)) - (
-        cmp_host_state_equiv(r1) < cmp_host_state_equiv(r2)
-    )
+    return cmp_host_state_equiv(row)
 
 
 SorterHoststate = Sorter(
     ident="hoststate",
     title=_l("Host state"),
     columns=["host_state", "host_has_been_checked"],
-    sort_function=_sort_host_state,
+    sort_key=_sort_key_host_state,
 )
 
 
-def _sort_site_host(
-    r1: Row,
-    r2: Row,
+def _sort_key_site_host(
+    row: Row,
     *,
     parameters: Mapping[str, Any] | None,
     config: Config,
     request: Request,
-) -> int:
-    return (r1["site"] > r2["site"]) - (r1["site"] < r2["site"]) or cmp_num_split(
-        "host_name", r1, r2
-    )
+) -> tuple[str, tuple[int | str, ...]]:
+    return row["site"], key_num_split("host_name", row)
 
 
 SorterSiteHost = Sorter(
     ident="site_host",
     title=_l("Host site and name"),
     columns=["site", "host_name"],
-    sort_function=_sort_site_host,
+    sort_key=_sort_key_site_host,
 )
 
 
-def _sort_host_name(
-    r1: Row,
-    r2: Row,
+def _sort_key_host_name(
+    row: Row,
     *,
     parameters: Mapping[str, Any] | None,
     config: Config,
     request: Request,
-) -> int:
-    return cmp_num_split("host_name", r1, r2)
+) -> tuple[int | str, ...]:
+    return key_num_split("host_name", row)
 
 
 SorterHostName = Sorter(
     ident="host",
     title=_l("Host name"),
     columns=["host_name"],
-    sort_function=_sort_host_name,
+    sort_key=_sort_key_host_name,
 )
 
 
-def _sort_site_alias(
-    r1: Row,
-    r2: Row,
+def _sort_key_site_alias(
+    row: Row,
     *,
     parameters: Mapping[str, Any] | None,
     config: Config,
     request: Request,
-) -> int:
-    return (
-        get_site_config(config, r1["site"])["alias"] > get_site_config(config, r2["site"])["alias"]
-    ) - (
-        get_site_config(config, r1["site"])["alias"] < get_site_config(config, r2["site"])["alias"]
-    )
+) -> str:
+    return get_site_config(config, row["site"])["alias"]
 
 
 SorterSitealias = Sorter(
     ident="sitealias",
     title=_l("Site Alias"),
     columns=["site"],
-    sort_function=_sort_site_alias,
+    sort_key=_sort_key_site_alias,
 )
 
 
-def _sort_tags(
-    r1: Row,
-    r2: Row,
+def _sort_key_tags(
+    row: Row,
     *,
     parameters: Mapping[str, Any] | None,
     config: Config,
     request: Request,
     object_type: str,
-) -> int:
-    tag_groups_1 = sorted(get_tag_groups(r1, object_type).items())
-    tag_groups_2 = sorted(get_tag_groups(r2, object_type).items())
-    return (tag_groups_1 > tag_groups_2) - (tag_groups_1 < tag_groups_2)
+) -> list[tuple[str, str]]:
+    return sorted(get_tag_groups(row, object_type).items())
 
 
 SorterHostTags = Sorter(
     ident="host",
     title=_l("Host Tags"),
     columns=["host_tags"],
-    sort_function=partial(_sort_tags, object_type="host"),
+    sort_key=partial(_sort_key_tags, object_type="host"),
 )
 
 SorterServiceTags = Sorter(
     ident="service",
     title=_l("Service Tags"),
     columns=["service_tags"],
-    sort_function=partial(_sort_tags, object_type="service"),
+    sort_key=partial(_sort_key_tags, object_type="service"),
 )
 
 
-def _sort_labels(
-    r1: Row,
-    r2: Row,
+def _sort_key_labels(
+    row: Row,
     *,
     parameters: Mapping[str, Any] | None,
     config: Config,
     request: Request,
     object_type: str,
-) -> int:
-    labels_1 = sorted(get_labels(r1, object_type).items())
-    labels_2 = sorted(get_labels(r2, object_type).items())
-    return (labels_1 > labels_2) - (labels_1 < labels_2)
+) -> list[tuple[str, str]]:
+    return sorted(get_labels(row, object_type).items())
 
 
 SorterHostLabels = Sorter(
     ident="host_labels",
     title=_l("Host labels"),
     columns=["host_labels"],
-    sort_function=partial(_sort_labels, object_type="host"),
+    sort_key=partial(_sort_key_labels, object_type="host"),
 )
 
 
@@ -403,7 +388,7 @@ SorterServiceLabels = Sorter(
     ident="service_labels",
     title=_l("Service labels"),
     columns=["service_labels"],
-    sort_function=partial(_sort_labels, object_type="service"),
+    sort_key=partial(_sort_key_labels, object_type="service"),
 )
 
 
@@ -413,39 +398,40 @@ def cmp_service_name(column, r1, r2):
     ) or cmp_num_split(column, r1, r2)
 
 
-def _sort_service_perf_val(
-    r1: Row,
-    r2: Row,
+def key_service_name(column: ColumnName, row: Row) -> tuple[int, tuple[int | str, ...]]:
+    return utils.cmp_service_name_equiv(row[column]), key_num_split(column, row)
+
+
+def _sort_key_service_perf_val(
+    row: Row,
     *,
     parameters: Mapping[str, Any] | None,
     config: Config,
     request: Request,
     num: int,
-) -> int:
-    v1 = utils.savefloat(get_perfdata_nth_value(r1, num - 1, True))
-    v2 = utils.savefloat(get_perfdata_nth_value(r2, num - 1, True))
-    return (v1 > v2) - (v1 < v2)
+) -> float:
+    return utils.savefloat(get_perfdata_nth_value(row, num - 1, True))
 
 
 SorterSvcPerfVal01 = Sorter(
     ident="svc_perf_val01",
     title=_("Service performance data - value number 01"),
     columns=["service_perf_data"],
-    sort_function=partial(_sort_service_perf_val, num=1),
+    sort_key=partial(_sort_key_service_perf_val, num=1),
 )
 
 SorterSvcPerfVal02 = Sorter(
     ident="svc_perf_val02",
     title=_("Service performance data - value number 02"),
     columns=["service_perf_data"],
-    sort_function=partial(_sort_service_perf_val, num=2),
+    sort_key=partial(_sort_key_service_perf_val, num=2),
 )
 
 SorterSvcPerfVal03 = Sorter(
     ident="svc_perf_val03",
     title=_("Service performance data - value number 03"),
     columns=["service_perf_data"],
-    sort_function=partial(_sort_service_perf_val, num=3),
+    sort_key=partial(_sort_key_service_perf_val, num=3),
 )
 
 
@@ -453,14 +439,14 @@ SorterSvcPerfVal04 = Sorter(
     ident="svc_perf_val04",
     title=_("Service performance data - value number 04"),
     columns=["service_perf_data"],
-    sort_function=partial(_sort_service_perf_val, num=4),
+    sort_key=partial(_sort_key_service_perf_val, num=4),
 )
 
 SorterSvcPerfVal05 = Sorter(
     ident="svc_perf_val05",
     title=_("Service performance data - value number 05"),
     columns=["service_perf_data"],
-    sort_function=partial(_sort_service_perf_val, num=5),
+    sort_key=partial(_sort_key_service_perf_val, num=5),
 )
 
 
@@ -468,57 +454,52 @@ SorterSvcPerfVal06 = Sorter(
     ident="svc_perf_val06",
     title=_("Service performance data - value number 06"),
     columns=["service_perf_data"],
-    sort_function=partial(_sort_service_perf_val, num=6),
+    sort_key=partial(_sort_key_service_perf_val, num=6),
 )
 
 SorterSvcPerfVal07 = Sorter(
     ident="svc_perf_val07",
     title=_("Service performance data - value number 07"),
     columns=["service_perf_data"],
-    sort_function=partial(_sort_service_perf_val, num=7),
+    sort_key=partial(_sort_key_service_perf_val, num=7),
 )
 
 SorterSvcPerfVal08 = Sorter(
     ident="svc_perf_val08",
     title=_("Service performance data - value number 08"),
     columns=["service_perf_data"],
-    sort_function=partial(_sort_service_perf_val, num=8),
+    sort_key=partial(_sort_key_service_perf_val, num=8),
 )
 
 SorterSvcPerfVal09 = Sorter(
     ident="svc_perf_val09",
     title=_("Service performance data - value number 09"),
     columns=["service_perf_data"],
-    sort_function=partial(_sort_service_perf_val, num=9),
+    sort_key=partial(_sort_key_service_perf_val, num=9),
 )
 
 SorterSvcPerfVal10 = Sorter(
     ident="svc_perf_val10",
     title=_("Service performance data - value number 10"),
     columns=["service_perf_data"],
-    sort_function=partial(_sort_service_perf_val, num=10),
+    sort_key=partial(_sort_key_service_perf_val, num=10),
 )
 
 
-def _sort_host_custom_variable(
-    r1: Row,
-    r2: Row,
+def _sort_key_host_custom_variable(
+    row: Row,
     *,
     parameters: Mapping[str, Any] | None,
     config: Config,
     request: Request,
-) -> int:
+) -> tuple[str, str]:
     assert parameters is not None
     variable_name = parameters["ident"].upper()
-
-    def _get_value(row: Row) -> str:
-        try:
-            index = row["host_custom_variable_names"].index(variable_name)
-        except ValueError:
-            return ""
-        return row["host_custom_variable_values"][index]
-
-    return cmp_insensitive_string(_get_value(r1), _get_value(r2))
+    try:
+        index = row["host_custom_variable_names"].index(variable_name)
+    except ValueError:
+        return key_insensitive_string("")
+    return key_insensitive_string(row["host_custom_variable_values"][index])
 
 
 def _sort_host_custom_variable_parameter_valuespec(
@@ -547,58 +528,46 @@ SorterCustomHostVariable = ParameterizedSorter(
     ident="host_custom_variable",
     title=_l("Host custom attribute"),
     columns=["host_custom_variable_names", "host_custom_variable_values"],
-    sort_function=_sort_host_custom_variable,
+    sort_function=None,
     parameter_valuespec=_sort_host_custom_variable_parameter_valuespec,
+    sort_key=_sort_key_host_custom_variable,
 )
 
 
-def _sort_host_ipv4_address(
-    r1: Row,
-    r2: Row,
+def _sort_key_host_ipv4_address(
+    row: Row,
     *,
     parameters: Mapping[str, Any] | None,
     config: Config,
     request: Request,
-) -> int:
-    def get_address(row):
-        custom_vars = dict(
-            zip(row["host_custom_variable_names"], row["host_custom_variable_values"])
-        )
-        return custom_vars.get("ADDRESS_4", "")
-
-    return compare_ips(get_address(r1), get_address(r2))
+) -> tuple:
+    custom_vars = dict(zip(row["host_custom_variable_names"], row["host_custom_variable_values"]))
+    return key_ip(custom_vars.get("ADDRESS_4", ""))
 
 
 SorterHostIpv4Address = Sorter(
     ident="host_ipv4_address",
     title=_l("Host IPv4 address"),
     columns=["host_custom_variable_names", "host_custom_variable_values"],
-    sort_function=_sort_host_ipv4_address,
+    sort_key=_sort_key_host_ipv4_address,
 )
 
 
-def _sort_num_problems(
-    r1: Row,
-    r2: Row,
+def _sort_key_num_problems(
+    row: Row,
     *,
     parameters: Mapping[str, Any] | None,
     config: Config,
     request: Request,
 ) -> int:
-    return (
-        r1["host_num_services"] - r1["host_num_services_ok"] - r1["host_num_services_pending"]
-        > r2["host_num_services"] - r2["host_num_services_ok"] - r2["host_num_services_pending"]
-    ) - (
-        r1["host_num_services"] - r1["host_num_services_ok"] - r1["host_num_services_pending"]
-        < r2["host_num_services"] - r2["host_num_services_ok"] - r2["host_num_services_pending"]
-    )
+    return row["host_num_services"] - row["host_num_services_ok"] - row["host_num_services_pending"]
 
 
 SorterNumProblems = Sorter(
     ident="num_problems",
     title=_l("Number of problems"),
     columns=["host_num_services", "host_num_services_ok", "host_num_services_pending"],
-    sort_function=_sort_num_problems,
+    sort_key=_sort_key_num_problems,
 )
 
 
@@ -606,6 +575,10 @@ def cmp_log_what(col, a, b):
     return (log_what(a[col]) > log_what(b[col])) - (log_what(a[col]) < log_what(b[col]))
 
 
+def key_log_what(column: ColumnName, row: Row) -> int:
+    return log_what(row[column])
+
+
 def log_what(t):
     if "HOST" in t:
         return 1
@@ -627,3 +600,8 @@ def cmp_date(column, r1, r2):
     r1_date = get_day_start_timestamp(r1[column])
     r2_date = get_day_start_timestamp(r2[column])
     return (r2_date > r1_date) - (r2_date < r1_date)
+
+
+def key_date(column: ColumnName, row: Row) -> int:
+    # Latest day first, see cmp_date
+    return -get_day_start_timestamp(row[column])[0]
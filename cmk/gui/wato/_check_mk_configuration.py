@@ -210,6 +210,7 @@ def register(
     config_variable_registry.register(ConfigVariablePiggybackMaxCachefileAge)
     config_variable_registry.register(ConfigVariableCheckMKPerfdataWithTimes)
     config_variable_registry.register(ConfigVariableUseDNSCache)
+    config_variable_registry.register(ConfigVariableCompressDataSourceCache)
     config_variable_registry.register(ConfigVariableChooseSNMPBackend)
     config_variable_registry.register(ConfigVariableUseInlineSNMP)
     config_variable_registry.register(ConfigVariableHTTPProxies)
@@ -3211,21 +3212,51 @@ class ConfigVariableUseDNSCache(ConfigVariable):
         )
 
 
+class ConfigVariableCompressDataSourceCache(ConfigVariable):
+    def group(self) -> type[ConfigVariableGroup]:
+        return ConfigVariableGroupCheckExecution
+
+    def domain(self) -> type[ABCConfigDomain]:
+        return ConfigDomainCore
+
+    def ident(self) -> str:
+        return "compress_data_source_cache"
+
+    def valuespec(self) -> ValueSpec:
+        return Checkbox(
+            title=_("Compress data source cache files"),
+            label=_("Store the cached agent and SNMP data compressed"),
+            help=_(
+                "The data fetched from the agents and SNMP devices is cached in files "
+                "in the temporary file system of the site. When this option is enabled, "
+                "these files are compressed. If the data of a host has not changed since "
+                "the last fetch, its cache file is not written again. This reduces the "
+                "memory used by the temporary file system at the cost of some CPU time. "
+                "Cache files written before are still read."
+            ),
+        )
+
+
 def transform_snmp_backend_default_to_valuespec(
-    backend: Literal["classic", "inline"],
+    backend: Literal["classic", "inline", "async"],
 ) -> SNMPBackendEnum:
     return {
         "classic": SNMPBackendEnum.CLASSIC,
         "inline": SNMPBackendEnum.INLINE,
+        "async": SNMPBackendEnum.ASYNC,
     }[backend]
 
 
-def transform_snmp_backend_from_valuespec(backend: SNMPBackendEnum) -> Literal["classic", "inline"]:
+def transform_snmp_backend_from_valuespec(
+    backend: SNMPBackendEnum,
+) -> Literal["classic", "inline", "async"]:
     match backend:
         case SNMPBackendEnum.CLASSIC:
             return "classic"
         case SNMPBackendEnum.INLINE:
             return "inline"
+        case SNMPBackendEnum.ASYNC:
+            return "async"
         case _:
             raise MKConfigError("SNMPBackendEnum %r not implemented" % backend)
 
@@ -3249,6 +3280,7 @@ class ConfigVariableChooseSNMPBackend(ConfigVariable):
                 choices=[
                     (SNMPBackendEnum.CLASSIC, _("Use Classic SNMP Backend")),
                     (SNMPBackendEnum.INLINE, _("Use Inline SNMP Backend")),
+                    (SNMPBackendEnum.ASYNC, _("Use Asynchronous SNMP Backend")),
                 ],
                 help=_(
                     "By default Checkmk uses command line calls of Net-SNMP tools like snmpget or "
@@ -5687,6 +5719,8 @@ def transform_snmp_backend_hosts_to_valuespec(backend):
         # We dropped pysnmp during the 2.1 beta because it is currently slow
         # and unreliable.
         return SNMPBackendEnum.CLASSIC
+    if backend == "async":
+        return SNMPBackendEnum.ASYNC
     raise MKConfigError("SNMPBackendEnum %r not implemented" % backend)
 
 
@@ -5697,6 +5731,7 @@ def _valuespec_snmp_backend():
             choices=[
                 (SNMPBackendEnum.INLINE, _("Use Inline SNMP backend")),
                 (SNMPBackendEnum.CLASSIC, _("Use Classic backend")),
+                (SNMPBackendEnum.ASYNC, _("Use Asynchronous backend")),
             ],
         ),
         to_valuespec=transform_snmp_backend_hosts_to_valuespec,
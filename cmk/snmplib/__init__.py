@@ -9,6 +9,7 @@ from ._detect import SNMPDetectBaseType as SNMPDetectBaseType
 from ._detect import SNMPDetectSpec as SNMPDetectSpec
 from ._getoid import get_single_oid as get_single_oid
 from ._table import get_snmp_table as get_snmp_table
+from ._table import get_snmp_table_walks as get_snmp_table_walks
 from ._table import SNMPDecodedString as SNMPDecodedString
 from ._table import SNMPRawData as SNMPRawData
 from ._table import SNMPRawDataElem as SNMPRawDataElem
@@ -176,6 +176,31 @@ def _key_oid_pairs(pair1: tuple[OID, SNMPRawValue]) -> list[int]:
     return _oid_to_intlist(pair1[0].lstrip("."))
 
 
+def get_snmp_table_walks(
+    *,
+    section_name: SectionName | None,
+    tree: BackendSNMPTree,
+    walk_cache: MutableMapping[tuple[str, str, bool], SNMPRowInfo],
+    backend: SNMPBackend,
+) -> Sequence[tuple[OID, SNMPContext]]:
+    """The walks get_snmp_table() is going to do, as far as they are not cached"""
+    contexts = backend.config.snmpv3_contexts_of(section_name).contexts
+    context_hash = _context_hash(contexts)
+    return [
+        (f"{tree.base}.{oid.column}", context)
+        for oid in tree.oids
+        if not isinstance(oid.column, SpecialColumn)
+        and (f"{tree.base}.{oid.column}", context_hash, oid.save_to_cache) not in walk_cache
+        for context in contexts
+    ]
+
+
+def _context_hash(contexts: Sequence[SNMPContext]) -> str:
+    context_string = "-".join(["no_context" if not c else c for c in contexts])
+    # contexts are hashed in order not to exceed max pathname length
+    return hashlib.shake_256(context_string.encode("utf-8")).hexdigest(15)
+
+
 def get_snmpwalk(
     section_name: SectionName | None,
     base_oid: str,
@@ -186,11 +211,7 @@ def get_snmpwalk(
     backend: SNMPBackend,
     log: Callable[[str], None],
 ) -> SNMPRowInfo:
-    contexts = backend.config.snmpv3_contexts_of(section_name).contexts
-    context_string = "-".join(["no_context" if not c else c for c in contexts])
-
-    # contexts are hashed in order not to exceed max pathname length
-    context_hash = hashlib.shake_256(context_string.encode("utf-8")).hexdigest(15)
+    context_hash = _context_hash(backend.config.snmpv3_contexts_of(section_name).contexts)
 
     with contextlib.suppress(KeyError):
         cache_info = walk_cache[(fetchoid, context_hash, save_walk_cache)]
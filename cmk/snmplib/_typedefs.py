@@ -57,6 +57,7 @@ class SNMPBackendEnum(enum.Enum):
     INLINE = "Inline"
     CLASSIC = "Classic"
     STORED_WALK = "StoredWalk"
+    ASYNC = "Async"
 
     def serialize(self) -> str:
         return self.name
@@ -221,6 +222,12 @@ class SNMPBackend(abc.ABC):
     ) -> SNMPRowInfo:
         return []
 
+    def prefetch(self, walks: Iterable[tuple[OID, SNMPContext]]) -> None:
+        """Announce the walks about to be done
+
+        Backends able to do several walks at once may do them right away.
+        """
+
 
 class SpecialColumn(enum.IntEnum):
     # Until we remove all but the first, its worth having an enum
@@ -41,6 +41,10 @@ class ConvertCounters(UpdateAction):
                 logger.debug(msg_temp, "skipped (empty)", f)
                 continue
 
+            if content.startswith("# Checkmk value store journal"):
+                logger.debug(msg_temp, "skipped (journal)", f)
+                continue
+
             if _is_json(content):
                 logger.debug(msg_temp, "skipped (already JSON)", f)
                 continue
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""A compact binary encoding of the data in our caches
+
+The encoding resembles msgpack: every value is a type tag followed by its
+length (if any) and its data. It supports None, booleans, integers, strings,
+bytes, lists and tuples.
+
+Lists of strings, lists of bytes and lists of lists of strings (our agent
+sections) are stored column wise: all elements in one block, separated by
+NUL characters or, if an element contains one, preceded by the lengths of
+all elements. This way they are decoded with a few split or slicing
+operations, rather than element by element.
+
+Unlike pickle and `ast.literal_eval` this is safe to decode from untrusted
+input: the worst case is a `ValueError`. Encoding an integer that does not
+fit into 64 bits raises a `ValueError` as well.
+"""
+
+import itertools
+import struct
+from collections.abc import Callable, Sequence
+from typing import Any, Final
+
+__all__ = ["decode", "encode"]
+
+_ENCODING: Final = "utf-8"
+_ERRORS: Final = "surrogatepass"
+
+_INT: Final = struct.Struct("<q")
+_INT_RANGE: Final = range(-(2**63), 2**63)
+_SHORT: Final = struct.Struct("<B")
+_LONG: Final = struct.Struct("<I")
+
+_NONE: Final = ord("N")
+_FALSE: Final = ord("F")
+_TRUE: Final = ord("T")
+_INTEGER: Final = ord("i")
+# The upper case variants use a long length.
+_STR: Final = (ord("s"), ord("S"))
+_BYTES: Final = (ord("b"), ord("B"))
+_LIST: Final = (ord("l"), ord("L"))
+_TUPLE: Final = (ord("u"), ord("U"))
+_STR_COLUMN: Final = (ord("z"), ord("Z"))
+_BYTES_COLUMN: Final = (ord("y"), ord("Y"))
+_STR_SPLIT: Final = ord("x")
+_BYTES_SPLIT: Final = ord("w")
+_STR_TABLE: Final = (ord("r"), ord("R"))
+
+
+def encode(obj: object) -> bytes:
+    out = bytearray()
+    _encode(obj, out)
+    return bytes(out)
+
+
+def decode(data: bytes | memoryview) -> Any:
+    try:
+        obj, offset = _decode(memoryview(data), 0)
+    except (
+        IndexError,
+        KeyError,
+        RecursionError,
+        TypeError,
+        UnicodeDecodeError,
+        struct.error,
+    ) as e:
+        raise ValueError(f"Invalid data: {e!r}") from e
+    if offset != len(data):
+        raise ValueError(f"Invalid data: {len(data) - offset} trailing bytes")
+    return obj
+
+
+def _lengths(tags: tuple[int, int], lengths: Sequence[int], out: bytearray) -> None:
+    long = any(length > 0xFF for length in lengths)
+    out.append(tags[long])
+    out += _LONG.pack(len(lengths))
+    out += struct.pack(f"<{len(lengths)}{'I' if long else 'B'}", *lengths)
+
+
+def _encode_str_column(column: Sequence[str], out: bytearray) -> None:
+    if (text := "\0".join(column)).count("\0") == len(column) - 1:
+        out.append(_STR_SPLIT)
+    else:
+        _lengths(_STR_COLUMN, [len(e) for e in column], out)
+        text = "".join(column)
+    _encode_data(_STR, text.encode(_ENCODING, _ERRORS), out)
+
+
+def _encode_bytes_column(column: Sequence[bytes], out: bytearray) -> None:
+    if (blob := b"\0".join(column)).count(b"\0") == len(column) - 1:
+        out.append(_BYTES_SPLIT)
+    else:
+        _lengths(_BYTES_COLUMN, [len(e) for e in column], out)
+        blob = b"".join(column)
+    _encode_data(_BYTES, blob, out)
+
+
+def _encode(obj: object, out: bytearray) -> None:
+    match obj:
+        case None:
+            out.append(_NONE)
+        case bool():
+            out.append(_TRUE if obj else _FALSE)
+        case int():
+            if obj not in _INT_RANGE:
+                raise ValueError(f"Cannot encode integer out of 64 bit range: {obj}")
+            out.append(_INTEGER)
+            out += _INT.pack(obj)
+        case str():
+            _encode_data(_STR, obj.encode(_ENCODING, _ERRORS), out)
+        case bytes():
+            _encode_data(_BYTES, obj, out)
+        case list() if obj and all(type(e) is str for e in obj):
+            _encode_str_column(obj, out)
+        case list() if obj and all(type(e) is bytes for e in obj):
+            _encode_bytes_column(obj, out)
+        case list() if (
+            obj
+            and all(type(row) is list and all(type(e) is str for e in row) for row in obj)
+            and (cells := list(itertools.chain.from_iterable(obj)))
+        ):
+            _lengths(_STR_TABLE, [len(row) for row in obj], out)
+            _encode_str_column(cells, out)
+        case list() | tuple():
+            long = len(obj) > 0xFF
+            out.append((_TUPLE if isinstance(obj, tuple) else _LIST)[long])
+            out += (_LONG if long else _SHORT).pack(len(obj))
+            for element in obj:
+                _encode(element, out)
+        case _:
+            raise TypeError(f"Cannot encode {type(obj).__name__}")
+
+
+def _encode_data(tags: tuple[int, int], data: bytes, out: bytearray) -> None:
+    long = len(data) > 0xFF
+    out.append(tags[long])
+    out += (_LONG if long else _SHORT).pack(len(data))
+    out += data
+
+
+def _decode_lengths(data: memoryview, offset: int, long: bool) -> tuple[tuple[int, ...], int]:
+    (count,) = _LONG.unpack_from(data, offset)
+    offset += _LONG.size
+    fmt = f"<{count}{'I' if long else 'B'}"
+    return struct.unpack_from(fmt, data, offset), offset + struct.calcsize(fmt)
+
+
+def _decode_data(data: memoryview, offset: int, long: bool) -> tuple[bytes, int]:
+    size = _LONG if long else _SHORT
+    (length,) = size.unpack_from(data, offset)
+    offset += size.size
+    if offset + length > len(data):
+        raise IndexError("data out of range")
+    return bytes(data[offset : offset + length]), offset + length
+
+
+def _slices(lengths: Sequence[int]) -> Sequence[tuple[int, int]]:
+    return list(itertools.pairwise(itertools.accumulate(lengths, initial=0)))
+
+
+def _decode(data: memoryview, offset: int) -> tuple[Any, int]:
+    tag = data[offset]
+    offset += 1
+    return _DECODERS[tag](data, offset, tag)
+
+
+def _decode_typed(data: memoryview, offset: int, type_: type) -> tuple[Any, int]:
+    obj, offset = _decode(data, offset)
+    if type(obj) is not type_:
+        raise TypeError(f"Expected {type_.__name__}, got {type(obj).__name__}")
+    return obj, offset
+
+
+def _decode_none(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    return None, offset
+
+
+def _decode_bool(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    return tag == _TRUE, offset
+
+
+def _decode_int(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    return _INT.unpack_from(data, offset)[0], offset + _INT.size
+
+
+def _decode_str(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    raw, offset = _decode_data(data, offset, tag == _STR[1])
+    return raw.decode(_ENCODING, _ERRORS), offset
+
+
+def _decode_bytes(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    return _decode_data(data, offset, tag == _BYTES[1])
+
+
+def _decode_sequence(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    size = _LONG if tag in (_LIST[1], _TUPLE[1]) else _SHORT
+    (count,) = size.unpack_from(data, offset)
+    offset += size.size
+    elements = []
+    for _i in range(count):
+        element, offset = _decode(data, offset)
+        elements.append(element)
+    return (tuple(elements) if tag in _TUPLE else elements), offset
+
+
+def _decode_str_column(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    lengths, offset = _decode_lengths(data, offset, tag == _STR_COLUMN[1])
+    text, offset = _decode_typed(data, offset, str)
+    return [text[start:end] for start, end in _slices(lengths)], offset
+
+
+def _decode_str_split(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    text, offset = _decode_typed(data, offset, str)
+    return text.split("\0"), offset
+
+
+def _decode_bytes_split(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    blob, offset = _decode_typed(data, offset, bytes)
+    return blob.split(b"\0"), offset
+
+
+def _decode_bytes_column(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    lengths, offset = _decode_lengths(data, offset, tag == _BYTES_COLUMN[1])
+    blob, offset = _decode_typed(data, offset, bytes)
+    return [blob[start:end] for start, end in _slices(lengths)], offset
+
+
+def _decode_str_table(data: memoryview, offset: int, tag: int) -> tuple[Any, int]:
+    row_lengths, offset = _decode_lengths(data, offset, tag == _STR_TABLE[1])
+    cells, offset = _decode_typed(data, offset, list)
+    return [cells[start:end] for start, end in _slices(row_lengths)], offset
+
+
+_DECODERS: Final[dict[int, Callable[[memoryview, int, int], tuple[Any, int]]]] = {
+    _NONE: _decode_none,
+    _FALSE: _decode_bool,
+    _TRUE: _decode_bool,
+    _INTEGER: _decode_int,
+    **dict.fromkeys(_STR, _decode_str),
+    **dict.fromkeys(_BYTES, _decode_bytes),
+    **dict.fromkeys(_LIST + _TUPLE, _decode_sequence),
+    **dict.fromkeys(_STR_COLUMN, _decode_str_column),
+    **dict.fromkeys(_BYTES_COLUMN, _decode_bytes_column),
+    _STR_SPLIT: _decode_str_split,
+    _BYTES_SPLIT: _decode_bytes_split,
+    **dict.fromkeys(_STR_TABLE, _decode_str_table),
+}
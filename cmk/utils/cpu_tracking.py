@@ -48,6 +48,11 @@ class Snapshot:
             return NotImplemented
         return Snapshot(posix.times_result(t0 - t1 for t0, t1 in zip(self.process, other.process)))
 
+    def __truediv__(self, divisor: int) -> Snapshot:
+        if not isinstance(divisor, int):
+            return NotImplemented
+        return Snapshot(posix.times_result(t / divisor for t in self.process))
+
     def __bool__(self) -> bool:
         return self != Snapshot.null()
 
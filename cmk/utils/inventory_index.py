@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""A cross-host index of the HW/SW inventory trees
+
+Views over the inventory of many hosts filter them by a few values of their
+trees. Rather than loading the trees of all hosts, these filters query this
+index: an sqlite database with one table per node of the trees and per kind
+of data, attributes or table rows. Such a table holds the data of the node
+of all hosts, one column per key. The columns filtered on get a secondary
+index the first time they are queried.
+
+The index is updated whenever the inventory tree of a host is saved. It
+records the modification time of every indexed tree file: the index entries
+of a host are only valid as long as its tree file did not change. For all
+other hosts, readers have to load the tree. The index can be rebuilt from
+the tree files at any time, see `cmk --rebuild-inventory-index`.
+"""
+
+import contextlib
+import json
+import re
+import sqlite3
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Final, Literal
+
+from cmk.utils.hostaddress import HostName
+from cmk.utils.structured_data import (
+    ImmutableTree,
+    load_tree,
+    MutableTree,
+    SDKey,
+    SDPath,
+    SDValue,
+)
+
+__all__ = ["InventoryIndex"]
+
+_NodeKind = Literal["attributes", "rows"]
+
+_SQLITE_PRAGMAS: Final = (
+    # Readers do not block the writer and vice versa
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+)
+
+
+def _quote(identifier: str) -> str:
+    return '"%s"' % identifier.replace('"', '""')
+
+
+def _column_name(key: SDKey) -> str:
+    # sqlite ignores the case of column names, unlike the inventory keys
+    return f"k_{key.encode().hex()}"
+
+
+def _column(key: SDKey) -> str:
+    return _quote(_column_name(key))
+
+
+def _key(column_name: str) -> SDKey:
+    return SDKey(bytes.fromhex(column_name[2:]).decode())
+
+
+def _encode(value: SDValue) -> object:
+    # sqlite would store booleans as integers, keep them apart as blobs.
+    return bytes([value]) if isinstance(value, bool) else value
+
+
+def _decode(value: object) -> SDValue:
+    if isinstance(value, bytes):
+        return bool(value[0])
+    return value  # type: ignore[return-value]
+
+
+def _nodes(tree: MutableTree | ImmutableTree) -> Iterator[MutableTree | ImmutableTree]:
+    yield tree
+    for node in tree.nodes_by_name.values():
+        yield from _nodes(node)
+
+
+class InventoryIndex:
+    def __init__(self, path: Path) -> None:
+        self.path: Final = path
+
+    @contextlib.contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            for pragma in _SQLITE_PRAGMAS:
+                connection.execute(pragma)
+            with connection:
+                connection.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS hosts (
+                        host_name TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL
+                    );
+                    CREATE TABLE IF NOT EXISTS nodes (
+                        id INTEGER PRIMARY KEY, kind TEXT NOT NULL, path TEXT NOT NULL,
+                        UNIQUE (kind, path)
+                    );
+                    CREATE TABLE IF NOT EXISTS host_nodes (
+                        host_name TEXT NOT NULL, node INTEGER NOT NULL,
+                        PRIMARY KEY (host_name, node)
+                    ) WITHOUT ROWID;
+                    """
+                )
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def update(
+        self, host_name: HostName, tree: MutableTree | ImmutableTree, *, mtime_ns: int
+    ) -> None:
+        """Replace the entries of the host by the ones of its current tree
+
+        'mtime_ns' is the modification time of the tree file.
+        """
+        with self._connection() as connection:
+            self._remove(connection, host_name)
+            self._add(connection, host_name, tree, mtime_ns)
+
+    def remove(self, host_name: HostName) -> None:
+        with self._connection() as connection:
+            self._remove(connection, host_name)
+
+    def rebuild(self, tree_dir: Path) -> int:
+        """Index all trees in the directory, return the number of hosts"""
+        with self._connection() as connection:
+            for (node,) in connection.execute("SELECT id FROM nodes").fetchall():
+                for kind in ("attributes", "rows"):
+                    connection.execute(f"DROP TABLE IF EXISTS {kind}_{node}")
+            connection.execute("DELETE FROM nodes")
+            connection.execute("DELETE FROM host_nodes")
+            connection.execute("DELETE FROM hosts")
+
+            count = 0
+            for tree_file in sorted(tree_dir.iterdir()) if tree_dir.exists() else ():
+                if tree_file.name.startswith(".") or tree_file.suffix == ".gz":
+                    continue
+                mtime_ns = tree_file.stat().st_mtime_ns
+                self._add(connection, HostName(tree_file.name), load_tree(tree_file), mtime_ns)
+                count += 1
+            return count
+
+    def indexed_hosts(self) -> Mapping[HostName, int]:
+        """The indexed hosts and the modification times of their tree files"""
+        if not self.path.exists():
+            return {}
+        with self._connection() as connection:
+            return {
+                HostName(host_name): mtime_ns
+                for host_name, mtime_ns in connection.execute(
+                    "SELECT host_name, mtime_ns FROM hosts"
+                )
+            }
+
+    def attribute_values(self, path: SDPath, key: SDKey) -> Mapping[HostName, SDValue]:
+        """The value of the attribute for all hosts having it"""
+        if not self.path.exists():
+            return {}
+        with self._connection() as connection:
+            if (table := self._find_table(connection, "attributes", path)) is None or _column_name(
+                key
+            ) not in self._columns(connection, table):
+                return {}
+            return {
+                HostName(host_name): _decode(value)
+                for host_name, value in connection.execute(
+                    f"SELECT host_name, {_column(key)} FROM {table}"
+                    f" WHERE {_column(key)} IS NOT NULL"
+                )
+            }
+
+    def find_rows(
+        self, path: SDPath, key: SDKey, match: str | re.Pattern[str]
+    ) -> Mapping[HostName, Sequence[Mapping[SDKey, SDValue]]]:
+        """The table rows of all hosts whose value of the column equals or matches 'match'
+
+        The rows have all columns of the table, the ones without a value are None.
+        """
+        if not self.path.exists():
+            return {}
+        with self._connection() as connection:
+            if (table := self._find_table(connection, "rows", path)) is None or _column_name(
+                key
+            ) not in (columns := self._columns(connection, table)):
+                return {}
+
+            column = _column(key)
+            if isinstance(match, str):
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_quote(f'{table}_{_column_name(key)}')}"
+                    f" ON {table} ({column})"
+                )
+                condition = f"{column} = ?"
+                parameters: tuple[object, ...] = (match,)
+            else:
+                connection.create_function(
+                    "inventory_matches",
+                    1,
+                    lambda value: value is not None and bool(match.search(str(_decode(value)))),
+                    deterministic=True,
+                )
+                condition = f"inventory_matches({column})"
+                parameters = ()
+
+            keys = [_key(c) for c in columns]
+            rows_by_host: dict[HostName, list[Mapping[SDKey, SDValue]]] = {}
+            for host_name, *values in connection.execute(
+                f"SELECT host_name, {', '.join(map(_quote, columns))} FROM {table}"
+                f" WHERE {condition}",
+                parameters,
+            ):
+                rows_by_host.setdefault(HostName(host_name), []).append(
+                    {k: _decode(v) for k, v in zip(keys, values)}
+                )
+            return rows_by_host
+
+    @staticmethod
+    def _remove(connection: sqlite3.Connection, host_name: HostName) -> None:
+        for (node,) in connection.execute(
+            "SELECT node FROM host_nodes WHERE host_name = ?", (host_name,)
+        ).fetchall():
+            for kind in ("attributes", "rows"):
+                with contextlib.suppress(sqlite3.OperationalError):
+                    connection.execute(
+                        f"DELETE FROM {kind}_{node} WHERE host_name = ?", (host_name,)
+                    )
+        connection.execute("DELETE FROM host_nodes WHERE host_name = ?", (host_name,))
+        connection.execute("DELETE FROM hosts WHERE host_name = ?", (host_name,))
+
+    def _add(
+        self,
+        connection: sqlite3.Connection,
+        host_name: HostName,
+        tree: MutableTree | ImmutableTree,
+        mtime_ns: int,
+    ) -> None:
+        for node in _nodes(tree):
+            if node.attributes.pairs:
+                self._insert(
+                    connection, host_name, "attributes", node.path, [node.attributes.pairs]
+                )
+            if node.table.rows_by_ident:
+                self._insert(
+                    connection,
+                    host_name,
+                    "rows",
+                    node.path,
+                    list(node.table.rows_by_ident.values()),
+                )
+        connection.execute(
+            "INSERT INTO hosts (host_name, mtime_ns) VALUES (?, ?)", (host_name, mtime_ns)
+        )
+
+    def _insert(
+        self,
+        connection: sqlite3.Connection,
+        host_name: HostName,
+        kind: _NodeKind,
+        path: SDPath,
+        rows: Sequence[Mapping[SDKey, SDValue]],
+    ) -> None:
+        keys = sorted({k for row in rows for k in row})
+        table, node = self._table(connection, kind, path, keys)
+        columns = ", ".join(["host_name", *(_column(k) for k in keys)])
+        connection.executemany(
+            f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * (len(keys) + 1))})",
+            ([host_name, *(_encode(row.get(k)) for k in keys)] for row in rows),
+        )
+        connection.execute(
+            "INSERT OR IGNORE INTO host_nodes (host_name, node) VALUES (?, ?)", (host_name, node)
+        )
+
+    def _find_table(
+        self, connection: sqlite3.Connection, kind: _NodeKind, path: SDPath
+    ) -> str | None:
+        row = connection.execute(
+            "SELECT id FROM nodes WHERE kind = ? AND path = ?", (kind, json.dumps(path))
+        ).fetchone()
+        return None if row is None else f"{kind}_{row[0]}"
+
+    def _table(
+        self, connection: sqlite3.Connection, kind: _NodeKind, path: SDPath, keys: Iterable[SDKey]
+    ) -> tuple[str, int]:
+        if (table := self._find_table(connection, kind, path)) is None:
+            node = connection.execute(
+                "INSERT INTO nodes (kind, path) VALUES (?, ?)", (kind, json.dumps(path))
+            ).lastrowid
+            assert node is not None
+            table = f"{kind}_{node}"
+            connection.execute(f"CREATE TABLE {table} (host_name TEXT NOT NULL)")
+            connection.execute(f"CREATE INDEX {table}_host_name ON {table} (host_name)")
+        node = int(table.rsplit("_", 1)[1])
+        existing = self._columns(connection, table)
+        for key in keys:
+            if _column_name(key) not in existing:
+                connection.execute(f"ALTER TABLE {table} ADD COLUMN {_column(key)}")
+        return table, node
+
+    @staticmethod
+    def _columns(connection: sqlite3.Connection, table: str) -> Sequence[str]:
+        return [
+            name
+            for _cid, name, *_rest in connection.execute(f"PRAGMA table_info({table})")
+            if name.startswith("k_")
+        ]
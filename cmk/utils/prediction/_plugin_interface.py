@@ -5,8 +5,10 @@
 """Code for predictive monitoring / anomaly detection"""
 
 import logging
-from collections.abc import Callable, Mapping
-from typing import assert_never, Literal
+from collections import OrderedDict
+from collections.abc import Callable, Mapping, Sequence
+from pathlib import Path
+from typing import assert_never, Final, Literal, NamedTuple
 
 from cmk.utils.log import VERBOSE
 
@@ -25,20 +27,97 @@ EstimatedLevels = tuple[tuple[float, float] | None, tuple[float, float] | None]
 logger = logging.getLogger("cmk.prediction")
 
 
+RecordedDataGetter = Callable[[str, Sequence[tuple[int, int]]], Sequence[MetricRecord | None]]
+
+
+class _CacheKey(NamedTuple):
+    store: Path
+    metric: str
+    period: str
+    horizon: int
+    valid_interval: tuple[int, int]
+
+    @classmethod
+    def make(cls, store: PredictionStore, meta: PredictionInfo) -> "_CacheKey":
+        # The prediction data only depends on these. Predictions of the same
+        # metric for upper and lower levels or for different levels share it.
+        return cls(
+            store.path, meta.metric, meta.params.period, meta.params.horizon, meta.valid_interval
+        )
+
+
+class PredictionCache:
+    """The recently used predictions of this process
+
+    An entry is evicted as soon as the valid interval of its prediction ends.
+    """
+
+    def __init__(self, maxsize: int = 512) -> None:
+        self.maxsize: Final = maxsize
+        self._entries: OrderedDict[_CacheKey, PredictionData] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, store: PredictionStore, meta: PredictionInfo) -> PredictionData | None:
+        key = _CacheKey.make(store, meta)
+        if (prediction := self._entries.get(key)) is not None:
+            self._entries.move_to_end(key)
+        return prediction
+
+    def put(self, store: PredictionStore, meta: PredictionInfo, prediction: PredictionData) -> None:
+        key = _CacheKey.make(store, meta)
+        self._entries[key] = prediction
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def evict(self, now: float) -> None:
+        for key in [k for k in self._entries if k.valid_interval[1] <= now]:
+            del self._entries[key]
+
+
+_CACHE: Final = PredictionCache()
+
+
 def make_updated_predictions(
     store: PredictionStore,
-    get_recorded_data: Callable[[str, int, int], MetricRecord | None],
+    get_recorded_data: RecordedDataGetter,
     now: float,
+    cache: PredictionCache = _CACHE,
 ) -> Mapping[int, tuple[float | None, tuple[float, float] | None]]:
     store.remove_outdated_predictions(now)
+    cache.evict(now)
     return {
         hash(meta): _make_reference_and_prediction(
-            meta, valid_prediction or _update_prediction(store, meta, get_recorded_data), now
+            meta, _get_prediction(store, meta, get_recorded_data, cache), now
         )
-        for meta, valid_prediction in store.iter_all_valid_predictions(now)
+        for meta in store.iter_all_valid_metadata(now)
     }
 
 
+def _get_prediction(
+    store: PredictionStore,
+    meta: PredictionInfo,
+    get_recorded_data: RecordedDataGetter,
+    cache: PredictionCache,
+) -> PredictionData | None:
+    if (prediction := cache.get(store, meta)) is not None:
+        if not store.is_up_to_date(meta):
+            store.save_prediction(meta, prediction)
+        return prediction
+
+    if (prediction := store.load_prediction(meta)) is None:
+        # Only one process computes the prediction, the others wait for it.
+        with store.locked(meta):
+            if (prediction := store.load_prediction(meta)) is None:
+                prediction = _update_prediction(store, meta, get_recorded_data)
+
+    if prediction is not None:
+        cache.put(store, meta, prediction)
+    return prediction
+
+
 def _make_reference_and_prediction(
     meta: PredictionInfo,
     prediction: PredictionData | None,
@@ -59,7 +138,7 @@ def _make_reference_and_prediction(
 def _update_prediction(
     store: PredictionStore,
     meta: PredictionInfo,
-    get_recorded_data: Callable[[str, int, int], MetricRecord | None],
+    get_recorded_data: RecordedDataGetter,
 ) -> PredictionData | None:
     logger.log(
         VERBOSE,
@@ -3,13 +3,15 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import contextlib
 import logging
-import math
 from collections.abc import Callable, Iterable, Iterator, Sequence
 from pathlib import Path
-from typing import Final, Literal, NamedTuple, Protocol, Self
+from typing import Final, Literal, NamedTuple, Protocol
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+
+from cmk.ccc import store
 
 from cmk.agent_based.prediction_backend import PredictionInfo
 
@@ -38,17 +40,6 @@ class DataStat(NamedTuple):
     max_: float
     stdev: float | None
 
-    @classmethod
-    def from_values(cls, values: Sequence[float]) -> Self:
-        """Statistically summarize all the measured values"""
-        average = sum(values) / float(len(values))
-        return cls(
-            average=average,
-            min_=min(values),
-            max_=max(values),
-            stdev=_std_dev(values, average),
-        )
-
 
 class PredictionData(BaseModel, frozen=True):
     points: list[DataStat | None]
@@ -103,10 +94,47 @@ class PredictionStore:
             if metric in prediction_file.parts
         )
 
+    def _info_file(self, meta: PredictionInfo) -> Path:
+        return Path(self.meta_file_path_template.format(meta=meta))
+
+    @staticmethod
+    def _lock_file(data_file: Path) -> Path:
+        return data_file.with_name(f".{data_file.name}.lock")
+
     def save_prediction(self, meta: PredictionInfo, prediction: PredictionData) -> None:
         data_file = self._data_file(meta)
         data_file.parent.mkdir(exist_ok=True, parents=True)
-        data_file.write_text(prediction.model_dump_json())
+        # Readers must never see a partially written file.
+        tmp_file = data_file.with_name(f".{data_file.name}.new")
+        tmp_file.write_text(prediction.model_dump_json())
+        tmp_file.rename(data_file)
+
+    @contextlib.contextmanager
+    def locked(self, meta: PredictionInfo) -> Iterator[None]:
+        """Serialize the computation of the prediction between processes"""
+        data_file = self._data_file(meta)
+        data_file.parent.mkdir(exist_ok=True, parents=True)
+        with store.locked(self._lock_file(data_file)):
+            yield
+
+    def is_up_to_date(self, meta: PredictionInfo) -> bool:
+        """Whether the data file was saved for the current info file
+
+        The info file is rewritten when the parameters change, the data
+        file is outdated as soon as it is older than that.
+        """
+        try:
+            return self._data_file(meta).stat().st_mtime >= self._info_file(meta).stat().st_mtime
+        except FileNotFoundError:
+            return False
+
+    def load_prediction(self, meta: PredictionInfo) -> PredictionData | None:
+        if not self.is_up_to_date(meta):
+            return None
+        try:
+            return PredictionData.model_validate_json(self._data_file(meta).read_text())
+        except (FileNotFoundError, ValidationError):
+            return None
 
     def iter_all_metadata_files(self) -> Iterable[Path]:
         if not self.path.exists():
@@ -119,34 +147,35 @@ class PredictionStore:
 
             if (now - float(start_time_str)) > self.RETENTION[period]:
                 info_path.unlink(missing_ok=True)
-                info_path.with_suffix(self.DATA_FILE_SUFFIX).unlink(missing_ok=True)
+                data_path = info_path.with_suffix(self.DATA_FILE_SUFFIX)
+                data_path.unlink(missing_ok=True)
+                self._lock_file(data_path).unlink(missing_ok=True)
 
-    def iter_all_valid_predictions(
-        self, now: float
-    ) -> Iterator[tuple[PredictionInfo, PredictionData | None]]:
+    def iter_all_valid_metadata(self, now: float) -> Iterator[PredictionInfo]:
         for info_path in self.iter_all_metadata_files():
             try:
                 meta = PredictionInfo.model_validate_json(info_path.read_text())
-            except FileNotFoundError:
+            except (FileNotFoundError, ValidationError):
                 continue
 
-            if not meta.valid_interval[0] <= now < meta.valid_interval[1]:
-                continue
-
-            data_path = info_path.with_suffix(self.DATA_FILE_SUFFIX)
-            try:
-                if info_path.stat().st_mtime >= data_path.stat().st_mtime:
-                    yield meta, PredictionData.model_validate_json(data_path.read_text())
-            except FileNotFoundError:
-                pass
+            if meta.valid_interval[0] <= now < meta.valid_interval[1]:
+                yield meta
 
-            yield meta, None
+    def iter_all_valid_predictions(
+        self, now: float
+    ) -> Iterator[tuple[PredictionInfo, PredictionData | None]]:
+        for meta in self.iter_all_valid_metadata(now):
+            yield meta, self.load_prediction(meta)
 
 
 def compute_prediction(
     info: PredictionInfo,
-    get_recorded_data: Callable[[str, int, int], MetricRecord | None],
+    get_recorded_data: Callable[[str, Sequence[tuple[int, int]]], Sequence[MetricRecord | None]],
 ) -> PredictionData | None:
+    """Compute the prediction from the recorded data of all time windows of the horizon
+
+    'get_recorded_data' fetches the data of all windows at once.
+    """
     time_windows = time_slices(
         info.valid_interval[0], info.params.horizon * 86400, info.params.period
     )
@@ -158,8 +187,10 @@ def compute_prediction(
             response.values,
             from_time - start,
         )
-        for start, end in time_windows
-        if (response := get_recorded_data(f"{info.metric}.max", start, end))
+        for (start, _end), response in zip(
+            time_windows, get_recorded_data(f"{info.metric}.max", time_windows)
+        )
+        if response
     ]
 
     return _calculate_data_for_prediction(raw_slices[0][0], raw_slices) if raw_slices else None
@@ -169,10 +200,13 @@ def _calculate_data_for_prediction(
     youngest_range: range,
     raw_slices: Sequence[tuple[range, Sequence[float | None], int]],
 ) -> PredictionData:
+    # Importing numpy is expensive, only the computation of the predictions needs it
+    from ._statistics import data_stats, forward_fill_resample
+
     # Upsample all time slices to same resolution
     # We assume that the youngest slice has the finest resolution.
     slices = [
-        _forward_fill_resample(
+        forward_fill_resample(
             current_range,
             values,
             range(youngest_range.start - shift, youngest_range.stop - shift, youngest_range.step),
@@ -181,40 +215,7 @@ def _calculate_data_for_prediction(
     ]
 
     return PredictionData(
-        points=_data_stats(slices),
+        points=data_stats(slices),
         start=youngest_range.start,
         step=youngest_range.step,
     )
-
-
-def _forward_fill_resample(
-    current_range: range, values: Sequence[float | None], new_range: range
-) -> Sequence[float | None]:
-    if current_range == new_range:
-        return values
-
-    idx_max = len(values) - 1
-    return [
-        values[max(0, min(int((t - current_range.start) / current_range.step), idx_max))]
-        for t in new_range
-    ]
-
-
-def _data_stats(slices: Iterable[Iterable[float | None]]) -> list[DataStat | None]:
-    "Statistically summarize all the upsampled RRD data"
-    return [  # can't inline this b/c it is unit tested :-/
-        (
-            DataStat.from_values(point_line)
-            if (point_line := [x for x in time_column if x is not None])
-            else None
-        )
-        for time_column in zip(*slices)
-    ]
-
-
-def _std_dev(point_line: Sequence[float], average: float) -> float | None:
-    samples = len(point_line)
-    # In the case of a single data-point an unbiased standard deviation is undefined.
-    if samples == 1:
-        return None
-    return math.sqrt(abs(sum(p**2 for p in point_line) - average**2 * samples) / float(samples - 1))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""The numerical part of the computation of the predictions
+
+Importing numpy is expensive, so this module is only imported once a
+prediction is computed.
+"""
+
+import math
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from ._prediction import DataStat
+
+
+def _as_array(values: Iterable[float | None]) -> npt.NDArray[np.float64]:
+    """The values as floats, None as NaN"""
+    if isinstance(values, np.ndarray):
+        return values
+    return np.array(values if isinstance(values, Sequence) else list(values), dtype=np.float64)
+
+
+def forward_fill_resample(
+    current_range: range, values: Sequence[float | None], new_range: range
+) -> npt.NDArray[np.float64]:
+    array = _as_array(values)
+    if current_range == new_range or not len(array):
+        return array
+
+    indices = np.trunc(
+        (
+            np.arange(new_range.start, new_range.stop, new_range.step, dtype=np.float64)
+            - current_range.start
+        )
+        / current_range.step
+    )
+    return array[np.clip(indices, 0, len(array) - 1).astype(np.intp)]
+
+
+def data_stats(slices: Iterable[Iterable[float | None]]) -> list[DataStat | None]:
+    "Statistically summarize all the upsampled RRD data"
+    if not (arrays := [_as_array(s) for s in slices]):
+        return []
+    # like zip(*slices): all time columns covered by all slices
+    data = np.stack([a[: min(len(a) for a in arrays)] for a in arrays])
+
+    missing = np.isnan(data)
+    samples = (~missing).sum(axis=0)
+    present = samples > 0
+    values = np.where(missing, 0.0, data)
+
+    average = np.divide(_sum(values), samples, where=present, out=np.zeros(len(samples)))
+    squares = _sum(_square(values)) - _square(average) * samples
+    stdev = np.sqrt(
+        np.abs(squares) / np.maximum(samples - 1, 1), where=samples > 1, out=np.zeros(len(samples))
+    )
+
+    return [
+        DataStat(average=avg, min_=min_, max_=max_, stdev=dev if n > 1 else None) if n else None
+        for avg, min_, max_, dev, n in zip(
+            average.tolist(),
+            np.where(missing, np.inf, data).min(axis=0, initial=np.inf).tolist(),
+            np.where(missing, -np.inf, data).max(axis=0, initial=-np.inf).tolist(),
+            stdev.tolist(),
+            samples.tolist(),
+        )
+    ]
+
+
+def _square(values: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """The squares of the values, exactly as computed by `x**2`
+
+    `x**2` is computed by pow() of the C library. It is accurate to about half
+    a unit in the last place (ULP), so it may differ from the correctly rounded
+    `x * x` if the exact square is almost halfway between two floats. Use pow()
+    for these values only.
+    """
+    with np.errstate(all="ignore"):
+        squares = values * values
+        # Split the values into halves of 26 bits, the square of which is exact
+        # (Dekker's product): the exact square is `squares + error`.
+        split = values * 134217729.0
+        high = split - (split - values)
+        low = values - high
+        error = ((high * high - squares) + 2.0 * high * low) + low * low
+        halfway = np.abs(np.abs(error) / np.spacing(squares) - 0.5) < 0.1
+    uncertain = np.isfinite(squares) & (
+        halfway
+        | (np.frexp(squares)[0] == 0.5)  # powers of two, the ULP below is smaller
+        | ((np.abs(values) < 1e-150) & (values != 0.0))  # the split underflows
+        | (np.abs(values) > 1e150)  # the split overflows
+    )
+    squares[uncertain] = [math.pow(v, 2.0) for v in values[uncertain].tolist()]
+    return squares
+
+
+def _sum(values: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """The sums of the columns, exactly as computed by `sum`
+
+    Since Python 3.12 `sum` compensates for the rounding errors of floats
+    (Neumaier's variant of Kahan summation). Apply the same algorithm to all
+    columns at once.
+    """
+    total = np.zeros(values.shape[1])
+    compensation = np.zeros(values.shape[1])
+    for row in values:
+        new_total = total + row
+        compensation += np.where(
+            np.abs(total) >= np.abs(row), (total - new_total) + row, (row - new_total) + total
+        )
+        total = new_total
+    return np.where((compensation != 0) & np.isfinite(compensation), total + compensation, total)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Inverted index from host attributes to compact host bitsets
+
+Every configured host is assigned a fixed bit position. A set of hosts is
+represented by a (arbitrary precision) integer with the bits of its members
+set. Rule conditions can then be evaluated with integer AND/OR/NOT operations
+instead of iterating over all hosts in Python.
+"""
+
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from typing import TypeAlias
+
+from cmk.utils.hostaddress import HostName
+from cmk.utils.labels import Labels
+from cmk.utils.tags import TagGroupID, TagID
+
+HostBits: TypeAlias = int
+
+
+def _bits_from_positions(positions: Iterable[int], size: int) -> HostBits:
+    # Setting the bits one by one on an int is quadratic for large sets,
+    # going through a bytearray keeps this linear.
+    buffer = bytearray((size + 7) // 8)
+    for pos in positions:
+        buffer[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def positions_of_bits(bits: HostBits) -> Iterator[int]:
+    # Least significant bit first, so that the string index is the bit position
+    bit_string = format(bits, "b")[::-1]
+    pos = bit_string.find("1")
+    while pos != -1:
+        yield pos
+        pos = bit_string.find("1", pos + 1)
+
+
+class HostBitmapIndex:
+    """Maps tags, folders and host labels to host bitsets
+
+    Host labels are expensive to compute, so they are indexed lazily: only the
+    labels of hosts that have been requested via :meth:`label_bits` are known.
+    Callers must restrict the result of label lookups to these hosts.
+    """
+
+    def __init__(
+        self,
+        hosts: Iterable[HostName],
+        host_tags: Mapping[HostName, Iterable[tuple[TagGroupID, TagID]]],
+        host_paths: Mapping[HostName, str],
+    ) -> None:
+        self._hosts: tuple[HostName, ...] = tuple(sorted(hosts))
+        self._position_of_host: dict[str, int] = {
+            hostname: pos for pos, hostname in enumerate(self._hosts)
+        }
+        self.all_hosts: HostBits = (1 << len(self._hosts)) - 1
+
+        tag_positions: dict[tuple[TagGroupID, TagID | None], list[int]] = {}
+        path_positions: dict[str, list[int]] = {}
+        for pos, hostname in enumerate(self._hosts):
+            for tag in host_tags.get(hostname, ()):
+                tag_positions.setdefault(tag, []).append(pos)
+            path_positions.setdefault(host_paths.get(hostname, "/"), []).append(pos)
+
+        self._tag_bits: dict[tuple[TagGroupID, TagID | None], HostBits] = {
+            tag: _bits_from_positions(positions, len(self._hosts))
+            for tag, positions in tag_positions.items()
+        }
+        self._path_bits = {
+            path: _bits_from_positions(positions, len(self._hosts))
+            for path, positions in path_positions.items()
+        }
+        self._folder_bits: dict[str, HostBits] = {}
+
+        self._labels_indexed: HostBits = 0
+        self._label_bits: dict[tuple[str, str], HostBits] = {}
+
+    def __len__(self) -> int:
+        return len(self._hosts)
+
+    def bits_of_hosts(self, hostnames: Iterable[str]) -> HostBits:
+        return _bits_from_positions(
+            (
+                pos
+                for hostname in hostnames
+                if (pos := self._position_of_host.get(hostname)) is not None
+            ),
+            len(self._hosts),
+        )
+
+    @property
+    def hosts(self) -> Sequence[HostName]:
+        """All hosts, ordered by their bit position"""
+        return self._hosts
+
+    def hosts_of_bits(self, bits: HostBits) -> set[HostName]:
+        return {self._hosts[pos] for pos in positions_of_bits(bits)}
+
+    def tag_bits(self, taggroup_id: TagGroupID, tag_id: TagID | None) -> HostBits:
+        return self._tag_bits.get((taggroup_id, tag_id), 0)
+
+    def folder_bits(self, folder_path: str) -> HostBits:
+        """Hosts located in the given folder or one of its subfolders"""
+        try:
+            return self._folder_bits[folder_path]
+        except KeyError:
+            pass
+
+        bits = 0
+        for path, path_bits in self._path_bits.items():
+            if path.startswith(folder_path):
+                bits |= path_bits
+        return self._folder_bits.setdefault(folder_path, bits)
+
+    def label_bits(
+        self,
+        label: tuple[str, str],
+        candidates: HostBits,
+        labels_of_host: Callable[[HostName], Labels],
+    ) -> HostBits:
+        """Hosts carrying the given label
+
+        The result is only valid within `candidates`. The labels of all
+        candidates not indexed so far are added to the index first."""
+        if missing := candidates & ~self._labels_indexed:
+            label_positions: dict[tuple[str, str], list[int]] = {}
+            for hostname in self.hosts_of_bits(missing):
+                pos = self._position_of_host[hostname]
+                for key, value in labels_of_host(hostname).items():
+                    label_positions.setdefault((key, value), []).append(pos)
+
+            for host_label, positions in label_positions.items():
+                self._label_bits[host_label] = self._label_bits.get(
+                    host_label, 0
+                ) | _bits_from_positions(positions, len(self._hosts))
+            self._labels_indexed |= missing
+
+        return self._label_bits.get(label, 0)
+
+    def clear_label_index(self) -> None:
+        self._labels_indexed = 0
+        self._label_bits.clear()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Persist host condition matching results across cmk invocations
+
+The matching results of the rule conditions are stored as host bitsets
+together with a fingerprint of the matching relevant attributes of each host.
+A process loading these results only has to re-evaluate the conditions for
+the hosts whose attributes changed and for the conditions it has not seen
+before.
+"""
+
+import dataclasses
+import hashlib
+import pickle
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+from typing import Final, Self
+
+from cmk.utils.config_path import ConfigPath
+from cmk.utils.tags import TagGroupID, TagID
+
+from .host_bitmap_index import HostBits
+
+_VERSION: Final = 1
+
+
+def host_fingerprint(tags: Iterable[tuple[TagGroupID, TagID]], folder_path: str) -> bytes:
+    """Fingerprint of the host attributes the host conditions (except labels) depend on"""
+    return hashlib.blake2b(repr((sorted(tags), folder_path)).encode(), digest_size=8).digest()
+
+
+@dataclasses.dataclass(frozen=True)
+class RulesetMatchingCache:
+    # The hosts and their fingerprints, ordered by their bit position
+    hosts: Sequence[str]
+    host_fingerprints: Sequence[bytes]
+    # Condition cache id -> matching hosts (of all configured hosts)
+    condition_bits: Mapping[str, HostBits]
+
+
+class RulesetMatchingCacheStore:
+    """Caring about persistence of the ruleset matching cache
+
+    The cache is stored next to the packed configuration of the same config
+    serial. A missing, outdated or unreadable cache is treated as empty."""
+
+    def __init__(self, path: Path) -> None:
+        self.path: Final = path
+
+    @classmethod
+    def from_serial(cls, config_path: ConfigPath) -> Self:
+        return cls(Path(config_path) / "ruleset_matching_cache")
+
+    def write(self, cache: RulesetMatchingCache) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f"{self.path.suffix}.new")
+        with tmp_path.open("wb") as f:
+            pickle.dump(
+                (
+                    _VERSION,
+                    tuple(str(h) for h in cache.hosts),
+                    tuple(cache.host_fingerprints),
+                    dict(cache.condition_bits),
+                ),
+                f,
+            )
+        tmp_path.rename(self.path)
+
+    def read(self) -> RulesetMatchingCache | None:
+        try:
+            with self.path.open("rb") as f:
+                version, hosts, host_fingerprints, condition_bits = pickle.load(f)  # nosec B301 # BNS:c3c5e9
+        except (FileNotFoundError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return None
+
+        if version != _VERSION:
+            return None
+
+        return RulesetMatchingCache(
+            hosts=hosts,
+            host_fingerprints=host_fingerprints,
+            condition_bits=condition_bits,
+        )
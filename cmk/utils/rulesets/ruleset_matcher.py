@@ -44,6 +44,9 @@ from cmk.utils.servicename import Item, ServiceName
 from cmk.utils.tags import TagConfig, TagGroupID, TagID
 
 from .conditions import HostOrServiceConditions, HostOrServiceConditionsSimple
+from .host_bitmap_index import HostBitmapIndex, HostBits, positions_of_bits
+from .matching_cache import host_fingerprint, RulesetMatchingCache
+from .service_description_matcher import ServiceDescriptionMatcher
 
 RulesetName = str  # Could move to a less cluttered module as it is often used on its own.
 TRuleValue = TypeVar("TRuleValue")
@@ -210,12 +213,7 @@ class RulesetMatcher:
         self.label_sources_of_service = self.ruleset_optimizer.label_sources_of_service
         self.clear_caches = self.ruleset_optimizer.clear_caches
 
-        self._service_match_cache: dict[
-            tuple[
-                tuple[ServiceName | None, int], PreprocessedPattern, tuple[tuple[str, object], ...]
-            ],
-            object,
-        ] = {}
+        self._service_labels_match_cache: dict[tuple[int, LabelGroupsCacheId], bool] = {}
         # Expensive and mostly useless caching.
         self.__service_match_obj: dict[
             tuple[HostName, ServiceName, Item | None], RulesetMatchObject
@@ -399,49 +397,56 @@ class RulesetMatcher:
                 match_object.host_name
             )
 
-        never_matched = True
-        for (
-            _rule_id,
-            value,
-            hosts,
-            service_label_groups,
-            service_label_groups_cache_id,
-            service_description_condition,
-        ) in optimized_ruleset:
-            if match_object.service_description is None:
-                continue
+        # Only look at the rules whose service description condition is fulfilled
+        matching_description_rules = (
+            ()
+            if match_object.service_description is None
+            else self.ruleset_optimizer.get_service_description_matcher(ruleset).matching_rules(
+                match_object.service_description
+            )
+        )
+        labels_cache_id = hash(
+            None
+            if match_object.service_labels is None
+            else frozenset(match_object.service_labels.items())
+        )
 
+        never_matched = True
+        for index in matching_description_rules:
+            (
+                _rule_id,
+                value,
+                hosts,
+                service_label_groups,
+                service_label_groups_cache_id,
+                service_description_condition,
+            ) = optimized_ruleset[index]
             if match_object.host_name not in hosts:
                 continue
 
-            service_cache_id = (
-                (
-                    match_object.service_description,
-                    hash(
-                        None
-                        if match_object.service_labels is None
-                        else frozenset(match_object.service_labels.items())
-                    ),
-                ),
-                service_description_condition,
-                service_label_groups_cache_id,
-            )
+            if service_label_groups:
+                label_cache_id = (labels_cache_id, service_label_groups_cache_id)
+                try:
+                    labels_match = self._service_labels_match_cache[label_cache_id]
+                except KeyError:
+                    labels_match = self._service_labels_match_cache.setdefault(
+                        label_cache_id,
+                        matches_labels(match_object.service_labels, service_label_groups),
+                    )
+                if not labels_match:
+                    continue
 
-            if service_cache_id in self._service_match_cache:
-                match = self._service_match_cache[service_cache_id]
-            else:
-                match = matches_service_conditions(
-                    service_description_condition, service_label_groups, match_object
+            if self._debug_matching_stats:
+                service_cache_id = (
+                    (match_object.service_description, labels_cache_id),
+                    service_description_condition,
+                    service_label_groups_cache_id,
                 )
-                self._service_match_cache[service_cache_id] = match
-
-            if match:
-                if self._debug_matching_stats:
-                    self._track_service_ruleset_match(
-                        match_object, never_matched, _rule_id, ruleset_id, service_cache_id
-                    )
-                    never_matched = False
-                yield value
+                self._track_service_ruleset_match(
+                    match_object, never_matched, _rule_id, ruleset_id, service_cache_id
+                )
+                never_matched = False
+            yield value
 
         if self._debug_matching_stats and never_matched:
             self._track_service_ruleset_miss(match_object, never_matched, ruleset_id)
@@ -516,7 +521,7 @@ class RulesetOptimizer:
         self.__labels_of_host: dict[HostName, Labels] = {}
         self._ruleset_matcher = ruleset_matcher
         self._label_manager = label_manager
-        self._host_tags = {hn: set(tags_of_host.items()) for hn, tags_of_host in host_tags.items()}
+        self._host_tags = host_tags
         self._host_paths = host_paths
         self._clusters_of = clusters_of
         self._nodes_of = nodes_of
@@ -529,27 +534,27 @@ class RulesetOptimizer:
         # is enabled.
         self._all_processed_hosts = self._all_configured_hosts
 
-        # A factor which indicates how much hosts share the same host tag configuration (excluding folders).
-        # len(all_processed_hosts) / len(different tag combinations)
-        # It is used to determine the best rule evualation method
-        self._all_processed_hosts_similarity = 1.0
+        # Tags, folders and labels of all configured hosts, represented as host bitsets
+        self._host_index = HostBitmapIndex(
+            self._all_configured_hosts,
+            {hn: tags_of_host.items() for hn, tags_of_host in host_tags.items()},
+            host_paths,
+        )
+        self._all_processed_hosts_bits = self._host_index.all_hosts
 
         self.__service_ruleset_cache: dict[tuple[int, bool], PreprocessedServiceRuleset] = {}
+        self.__service_description_matcher_cache: dict[int, ServiceDescriptionMatcher] = {}
         self.__host_ruleset_cache: dict[tuple[int, bool], Mapping[HostAddress, Sequence[Any]]] = {}
         self._all_matching_hosts_match_cache: dict[
             tuple[ConditionCacheID, bool], set[HostName]
         ] = {}
 
-        # Reference dirname -> hosts in this dir including subfolders
-        self._folder_host_lookup: dict[tuple[bool, str], set[HostName]] = {}
-
-        # Provides a list of hosts with the same hosttags, excluding the folder
-        self._hosts_grouped_by_tags: dict[tuple[tuple[TagGroupID, TagID], ...], set[HostName]] = {}
-        # Reference hostname -> tag group reference
-        self._host_grouped_ref: dict[HostName, tuple[tuple[TagGroupID, TagID], ...]] = {}
-
-        # TODO: Clean this one up?
-        self._initialize_host_lookup()
+        # Matching results of a previous process, see use_matching_cache()
+        self._matching_cache: RulesetMatchingCache | None = None
+        self._matching_cache_changed_hosts_bits: HostBits = 0
+        self._matching_cache_same_hosts = True
+        # Condition cache id -> matching hosts of all configured hosts
+        self._all_hosts_condition_bits: dict[str, HostBits] = {}
 
         self._debug_matching_stats = debug_matching_stats
         self.matching_stats: dict[int, HostRulesetMatchingStats | ServiceRulesetMatchingStats] = {}
@@ -562,10 +567,54 @@ class RulesetOptimizer:
     def clear_ruleset_caches(self) -> None:
         self.__host_ruleset_cache.clear()
         self.__service_ruleset_cache.clear()
+        self.__service_description_matcher_cache.clear()
 
     def clear_caches(self) -> None:
         self.__host_ruleset_cache.clear()
         self._all_matching_hosts_match_cache.clear()
+        self._host_index.clear_label_index()
+
+    def use_matching_cache(self, previous: RulesetMatchingCache | None) -> None:
+        """Reuse the host condition matching results of a previous process
+
+        Once enabled, the conditions (without host label conditions) are
+        matched against all configured hosts, so that the results can be
+        persisted with dump_matching_cache(). Only the hosts whose tags or
+        folder changed since the previous results have to be re-evaluated.
+        """
+        self._matching_cache = (
+            RulesetMatchingCache(hosts=(), host_fingerprints=(), condition_bits={})
+            if previous is None
+            else previous
+        )
+        self._all_hosts_condition_bits.clear()
+
+        self._matching_cache_same_hosts = tuple(self._matching_cache.hosts) == tuple(
+            self._host_index.hosts
+        )
+        previous_fingerprints = dict(
+            zip(self._matching_cache.hosts, self._matching_cache.host_fingerprints)
+        )
+        self._matching_cache_changed_hosts_bits = self._host_index.bits_of_hosts(
+            hostname
+            for hostname, fingerprint in zip(self._host_index.hosts, self._host_fingerprints())
+            if previous_fingerprints.get(hostname) != fingerprint
+        )
+
+    def dump_matching_cache(self) -> RulesetMatchingCache:
+        return RulesetMatchingCache(
+            hosts=self._host_index.hosts,
+            host_fingerprints=self._host_fingerprints(),
+            condition_bits=dict(self._all_hosts_condition_bits),
+        )
+
+    def _host_fingerprints(self) -> Sequence[bytes]:
+        return [
+            host_fingerprint(
+                self._host_tags.get(hostname, {}).items(), self._host_paths.get(hostname, "/")
+            )
+            for hostname in self._host_index.hosts
+        ]
 
     def all_processed_hosts(self) -> FrozenSet[HostName]:
         """Returns a set of all processed hosts"""
@@ -587,24 +636,7 @@ class RulesetOptimizer:
         # Only add references to configured hosts
         nodes_and_clusters.intersection_update(self._all_configured_hosts)
         self._all_processed_hosts = frozenset(nodes_and_clusters)
-
-        # The folder host lookup includes a list of all -processed- hosts within a given
-        # folder. Any update with set_all_processed hosts invalidates this cache, because
-        # the scope of relevant hosts has changed. This is -good-, since the values in this
-        # lookup are iterated one by one later on in all_matching_hosts
-        self._folder_host_lookup = {}
-
-        used_groups = {
-            self._host_grouped_ref.get(hostname, ()) for hostname in self._all_processed_hosts
-        }
-
-        if not used_groups:
-            self._all_processed_hosts_similarity = 1.0
-            return
-
-        self._all_processed_hosts_similarity = (
-            1.0 * len(self._all_processed_hosts) / len(used_groups)
-        )
+        self._all_processed_hosts_bits = self._host_index.bits_of_hosts(self._all_processed_hosts)
 
     def _compute_all_matching_hosts_stats(
         self, ruleset_id: int, condition_id: tuple[ConditionCacheID, bool]
@@ -723,6 +755,25 @@ class RulesetOptimizer:
 
         return self.__service_ruleset_cache.setdefault(cache_id, _impl(ruleset, with_foreign_hosts))
 
+    def get_service_description_matcher(
+        self, ruleset: Sequence[RuleSpec[TRuleValue]]
+    ) -> ServiceDescriptionMatcher:
+        """Matches the service conditions of all rules of get_service_ruleset() at once
+
+        The rules are identified by their index in the preprocessed ruleset."""
+        ruleset_id = id(ruleset)
+        with contextlib.suppress(KeyError):
+            return self.__service_description_matcher_cache[ruleset_id]
+
+        return self.__service_description_matcher_cache.setdefault(
+            ruleset_id,
+            ServiceDescriptionMatcher(
+                rule["condition"].get("service_description")
+                for rule in ruleset
+                if not is_disabled(rule)
+            ),
+        )
+
     @staticmethod
     def _convert_pattern_list(patterns: HostOrServiceConditions | None) -> PreprocessedPattern:
         """Compiles a list of service match patterns to a to a single regex
@@ -757,80 +808,139 @@ class RulesetOptimizer:
             with_foreign_hosts,
         )
 
-    def _all_matching_hosts(  # pylint: disable=too-many-branches
+    def _all_matching_hosts(
         self, condition: RuleConditionsSpec, with_foreign_hosts: bool
     ) -> set[HostName]:
         """Returns a set containing the names of hosts that match the given
         tags and hostlist conditions."""
-        hostlist = condition.get("host_name")
-        tag_conditions: Mapping[TagGroupID, TagCondition] = condition.get("host_tags", {})
-        label_groups: LabelGroups = condition.get("host_label_groups", [])
-        rule_path = condition.get("host_folder", "/")
-
         cache_id = self._get_cache_id(condition, with_foreign_hosts)
         try:
             return self._all_matching_hosts_match_cache[cache_id]
         except KeyError:
             pass
 
-        # Thin out the valid hosts further. If the rule is located in a folder
-        # we only need the intersection of the folders hosts and the previously determined valid_hosts
-        valid_hosts = self._get_hosts_within_folder(rule_path, with_foreign_hosts)
-
-        if tag_conditions and hostlist is None and not label_groups:
-            # TODO: Labels could also be optimized like the tags
-            matched_by_tags = self._match_hosts_by_tags(cache_id, valid_hosts, tag_conditions)
-            if matched_by_tags is not None:
-                return matched_by_tags
-
-        matching: set[HostName] = set()
-        only_specific_hosts = (
-            hostlist is not None
-            and not isinstance(hostlist, dict)
-            and all(not isinstance(x, dict) for x in hostlist)
+        relevant_hosts = (
+            self._host_index.all_hosts if with_foreign_hosts else self._all_processed_hosts_bits
         )
+        if (matching := self._cached_all_hosts_matching_bits(condition, cache_id[0])) is None:
+            matching = self._matching_host_bits(condition, relevant_hosts)
 
+        return self._all_matching_hosts_match_cache.setdefault(
+            cache_id, self._host_index.hosts_of_bits(matching & relevant_hosts)
+        )
+
+    def _cached_all_hosts_matching_bits(
+        self, condition: RuleConditionsSpec, condition_id: ConditionCacheID
+    ) -> HostBits | None:
+        """Matching hosts of all configured hosts, based on the matching cache
+
+        Returns None if the matching cache is not in use or can not be applied
+        to the condition. Host labels are not covered by the host fingerprints."""
+        if self._matching_cache is None or condition.get("host_label_groups"):
+            return None
+
+        key = repr(condition_id)
+        with contextlib.suppress(KeyError):
+            return self._all_hosts_condition_bits[key]
+
+        if (previous := self._matching_cache.condition_bits.get(key)) is None:
+            return self._all_hosts_condition_bits.setdefault(
+                key, self._matching_host_bits(condition, self._host_index.all_hosts)
+            )
+
+        if not self._matching_cache_same_hosts:
+            previous = self._host_index.bits_of_hosts(
+                self._matching_cache.hosts[pos] for pos in positions_of_bits(previous)
+            )
+
+        changed = self._matching_cache_changed_hosts_bits
+        return self._all_hosts_condition_bits.setdefault(
+            key,
+            (previous & ~changed) | self._matching_host_bits(condition, changed)
+            if changed
+            else previous,
+        )
+
+    def _matching_host_bits(self, condition: RuleConditionsSpec, hosts: HostBits) -> HostBits:
+        """Evaluates the host conditions of a rule on the given hosts
+
+        The cheap conditions are applied first, so that the expensive host label
+        computation only has to be done for the remaining candidates."""
+        hostlist = condition.get("host_name")
         if hostlist == []:
-            pass  # Empty host list -> Nothing matches
+            return 0  # Empty host list -> Nothing matches
 
-        elif not tag_conditions and not label_groups and not hostlist:
-            # If no tags are specified and the hostlist only include @all (all hosts)
-            matching = valid_hosts
+        candidates = hosts & self._host_index.folder_bits(condition.get("host_folder", "/"))
 
-        elif (
-            not tag_conditions and not label_groups and only_specific_hosts and hostlist is not None
-        ):
-            # If no tags are specified and there are only specific hosts we already have the matches
-            matching = valid_hosts.intersection(hostlist)
+        for taggroup_id, tag_condition in condition.get("host_tags", {}).items():
+            if not candidates:
+                return 0
+            candidates &= self._tag_condition_bits(taggroup_id, tag_condition)
 
-        else:
-            # If the rule has only exact host restrictions, we can thin out the list of hosts to check
-            if only_specific_hosts and hostlist is not None:
-                hosts_to_check = valid_hosts.intersection(hostlist)
-            else:
-                hosts_to_check = valid_hosts
-
-            for hostname in hosts_to_check:
-                # When no tag matching is requested, do not filter by tags. Accept all hosts
-                # and filter only by hostlist
-                if tag_conditions and not matches_host_tags(
-                    self._host_tags[hostname],
-                    tag_conditions,
-                ):
-                    continue
+        if candidates and hostlist:
+            candidates &= self._host_name_bits(hostlist, candidates)
+
+        if candidates and (label_groups := condition.get("host_label_groups", [])):
+            candidates &= self._label_groups_bits(label_groups, candidates)
+
+        return candidates
+
+    def _tag_condition_bits(self, taggroup_id: TagGroupID, tag_condition: TagCondition) -> HostBits:
+        if isinstance(tag_condition, dict):
+            if "$ne" in tag_condition:
+                return ~self._host_index.tag_bits(
+                    taggroup_id, cast(TagConditionNE, tag_condition)["$ne"]
+                )
 
-                if label_groups:
-                    host_labels = self.labels_of_host(hostname)
-                    if not matches_labels(host_labels, label_groups):
-                        continue
+            if "$or" in tag_condition:
+                return self._any_tag_bits(taggroup_id, cast(TagConditionOR, tag_condition)["$or"])
 
-                if not matches_host_name(hostlist, hostname):
+            if "$nor" in tag_condition:
+                return ~self._any_tag_bits(taggroup_id, tag_condition["$nor"])
+
+            raise NotImplementedError()
+
+        return self._host_index.tag_bits(taggroup_id, tag_condition)
+
+    def _any_tag_bits(self, taggroup_id: TagGroupID, tag_ids: Iterable[TagID | None]) -> HostBits:
+        bits = 0
+        for tag_id in tag_ids:
+            bits |= self._host_index.tag_bits(taggroup_id, tag_id)
+        return bits
+
+    def _label_groups_bits(self, label_groups: LabelGroups, candidates: HostBits) -> HostBits:
+        """Bitmap counterpart of matches_labels(), only valid within the candidates"""
+        overall_match = candidates
+        for group_operator, label_group in label_groups:
+            group_match = candidates
+            for label_operator, label in label_group:
+                if not label:
                     continue
+                key, value = label.split(":")
+                label_match = self._host_index.label_bits(
+                    (key, value), candidates, self.labels_of_host
+                )
+                group_match = _and_or_not_bits(group_match, label_match, label_operator)
+            overall_match = _and_or_not_bits(overall_match, group_match, group_operator)
+        return overall_match & candidates
+
+    def _host_name_bits(self, hostlist: HostOrServiceConditions, candidates: HostBits) -> HostBits:
+        """Bitmap counterpart of matches_host_name(), only valid within the candidates"""
+        negate, host_entries = parse_negated_condition_list(hostlist)
 
-                matching.add(hostname)
+        matching = self._host_index.bits_of_hosts(
+            entry for entry in host_entries if not isinstance(entry, dict)
+        )
+        if patterns := [
+            regex(entry["$regex"]) for entry in host_entries if isinstance(entry, dict)
+        ]:
+            matching |= self._host_index.bits_of_hosts(
+                hostname
+                for hostname in self._host_index.hosts_of_bits(candidates & ~matching)
+                if any(pattern.match(hostname) is not None for pattern in patterns)
+            )
 
-        self._all_matching_hosts_match_cache[cache_id] = matching
-        return matching
+        return ~matching if negate else matching
 
     @staticmethod
     def _condition_cache_id(
@@ -866,99 +976,6 @@ class RulesetOptimizer:
             rule_path,
         )
 
-    # TODO: Generalize this optimization: Build some kind of key out of the tag conditions
-    # (positive, negative, ...). Make it work with the new tag group based "$or" handling.
-    def _match_hosts_by_tags(
-        self,
-        cache_id: tuple[ConditionCacheID, bool],
-        valid_hosts: set[HostName],
-        tag_conditions: Mapping[TagGroupID, TagCondition],
-    ) -> set[HostName] | None:
-        matching = set()
-        negative_match_tags = set()
-        positive_match_tags = set()
-        for taggroup_id, tag_condition in tag_conditions.items():
-            if isinstance(tag_condition, dict):
-                if "$ne" in tag_condition:
-                    negative_match_tags.add(
-                        (
-                            taggroup_id,
-                            cast(TagConditionNE, tag_condition)["$ne"],
-                        )
-                    )
-                    continue
-
-                if "$or" in tag_condition:
-                    return None  # Can not be optimized, makes _all_matching_hosts proceed
-
-                if "$nor" in tag_condition:
-                    return None  # Can not be optimized, makes _all_matching_hosts proceed
-
-                raise NotImplementedError()
-
-            positive_match_tags.add((taggroup_id, tag_condition))
-
-        # TODO:
-        # if has_specific_folder_tag or self._all_processed_hosts_similarity < 3.0:
-        if self._all_processed_hosts_similarity < 3.0:
-            # Without shared folders
-            for hostname in valid_hosts:
-                if positive_match_tags <= self._host_tags[
-                    hostname
-                ] and not negative_match_tags.intersection(self._host_tags[hostname]):
-                    matching.add(hostname)
-
-            self._all_matching_hosts_match_cache[cache_id] = matching
-            return matching
-
-        # With shared folders
-        checked_hosts: set[str] = set()
-        for hostname in valid_hosts:
-            if hostname in checked_hosts:
-                continue
-
-            hosts_with_same_tag = self._filter_hosts_with_same_tags_as_host(hostname, valid_hosts)
-            checked_hosts.update(hosts_with_same_tag)
-
-            if positive_match_tags <= self._host_tags[
-                hostname
-            ] and not negative_match_tags.intersection(self._host_tags[hostname]):
-                matching.update(hosts_with_same_tag)
-
-        self._all_matching_hosts_match_cache[cache_id] = matching
-        return matching
-
-    def _filter_hosts_with_same_tags_as_host(
-        self,
-        hostname: HostName,
-        hosts: set[HostName],
-    ) -> set[HostName]:
-        return self._hosts_grouped_by_tags[self._host_grouped_ref[hostname]].intersection(hosts)
-
-    def _get_hosts_within_folder(self, folder_path: str, with_foreign_hosts: bool) -> set[HostName]:
-        cache_id = with_foreign_hosts, folder_path
-        if cache_id not in self._folder_host_lookup:
-            hosts_in_folder = set()
-            relevant_hosts = (
-                self._all_configured_hosts if with_foreign_hosts else self._all_processed_hosts
-            )
-
-            for hostname in relevant_hosts:
-                host_path = self._host_paths.get(hostname, "/")
-                if host_path.startswith(folder_path):
-                    hosts_in_folder.add(hostname)
-
-            self._folder_host_lookup[cache_id] = hosts_in_folder
-            return hosts_in_folder
-
-        return self._folder_host_lookup[cache_id]
-
-    def _initialize_host_lookup(self) -> None:
-        for hostname in self._all_configured_hosts:
-            group_ref = tuple(sorted(self._host_tags[hostname]))
-            self._hosts_grouped_by_tags.setdefault(group_ref, set()).add(hostname)
-            self._host_grouped_ref[hostname] = group_ref
-
     def labels_of_host(self, hostname: HostName) -> Labels:
         """Returns the effective set of host labels from all available sources
 
@@ -1172,6 +1189,18 @@ def matches_labels(object_labels: Labels | None, required_label_groups: LabelGro
     return overall_match
 
 
+def _and_or_not_bits(
+    given_bits: HostBits, new_bits: HostBits, operator: AndOrNotLiteral
+) -> HostBits:
+    match operator:
+        case "and":
+            return given_bits & new_bits
+        case "or":
+            return given_bits | new_bits
+        case "not":
+            return given_bits & ~new_bits
+
+
 def _and_or_not_group_match(
     given_group_match: bool, new_single_match: bool, operator: AndOrNotLiteral
 ) -> bool:
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Match a service description against the service conditions of all rules of a ruleset
+
+Most service conditions are plain prefixes ("Interface ") or exact names
+("CPU load$"). These are looked up in dictionaries, so that the number of
+regex matches does not grow with the number of rules in a ruleset.
+"""
+
+import contextlib
+import re
+from collections.abc import Iterable, Sequence
+from typing import Final
+
+from cmk.utils.regex import combine_patterns, is_regex, regex
+from cmk.utils.servicename import ServiceName
+
+from .conditions import HostOrServiceConditions
+
+_GROUP_REFERENCE: Final = re.compile(r"\\\d|\(\?P")
+
+
+def _pattern_parts(patterns: HostOrServiceConditions | None) -> tuple[bool, Sequence[str]]:
+    if not patterns:
+        return False, []
+    negate, entries = (True, patterns["$nor"]) if isinstance(patterns, dict) else (False, patterns)
+    return negate, [p["$regex"] if isinstance(p, dict) else p for p in entries]
+
+
+class ServiceDescriptionMatcher:
+    """Finds all rules whose service description condition is fulfilled in one go
+
+    This is equivalent to matching the patterns of every rule one by one, like
+    matches_service_description_condition() does, for all rules of a ruleset.
+    """
+
+    def __init__(self, rule_patterns: Iterable[HostOrServiceConditions | None]) -> None:
+        self._negated: set[int] = set()
+        self._match_all: set[int] = set()
+        self._exact: dict[str, set[int]] = {}
+        self._prefixes: dict[str, set[int]] = {}
+        regex_rules: list[tuple[int, re.Pattern[str]]] = []
+        regex_parts: list[str] = []
+
+        for index, patterns in enumerate(rule_patterns):
+            negate, parts = _pattern_parts(patterns)
+            if negate:
+                self._negated.add(index)
+            if not parts:
+                self._match_all.add(index)  # An empty pattern list matches everything
+                continue
+
+            rule_regex_parts = []
+            for part in parts:
+                if not is_regex(part):
+                    self._prefixes.setdefault(part, set()).add(index)
+                elif part.endswith("$") and not is_regex(part[:-1]):
+                    self._exact.setdefault(part[:-1], set()).add(index)
+                else:
+                    rule_regex_parts.append(part)
+
+            if rule_regex_parts:
+                regex_rules.append((index, regex(combine_patterns(rule_regex_parts))))
+                regex_parts.extend(rule_regex_parts)
+
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefixes})
+        self._regex_rules = regex_rules
+        # Allows to skip the rule specific regexes if none of them matches. Group references
+        # can not be combined across rules, they would refer to groups of other rules.
+        self._any_regex = (
+            regex(combine_patterns(regex_parts))
+            if regex_parts and not any(_GROUP_REFERENCE.search(part) for part in regex_parts)
+            else None
+        )
+
+        self._matching_rules_cache: dict[ServiceName, Sequence[int]] = {}
+
+    def matching_rules(self, service_description: ServiceName) -> Sequence[int]:
+        """The ordered indices of the rules whose condition is fulfilled by the service description"""
+        with contextlib.suppress(KeyError):
+            return self._matching_rules_cache[service_description]
+
+        return self._matching_rules_cache.setdefault(
+            service_description, self._compute_matching_rules(service_description)
+        )
+
+    def _compute_matching_rules(self, service_description: ServiceName) -> Sequence[int]:
+        matching = set(self._match_all)
+
+        if (rules := self._exact.get(service_description)) is not None:
+            matching |= rules
+
+        for length in self._prefix_lengths:
+            if length > len(service_description):
+                break
+            if (rules := self._prefixes.get(service_description[:length])) is not None:
+                matching |= rules
+
+        if self._any_regex is None or self._any_regex.match(service_description):
+            matching.update(
+                index
+                for index, pattern in self._regex_rules
+                if index not in matching and pattern.match(service_description)
+            )
+
+        return sorted(matching.symmetric_difference(self._negated))
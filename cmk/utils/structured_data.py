@@ -15,8 +15,9 @@ import pprint
 from collections import Counter
 from collections.abc import Callable, Iterable, Mapping, Sequence
 from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
-from typing import Generic, Literal, NewType, Self, TypedDict, TypeVar
+from typing import Final, Generic, Literal, NewType, Self, TypedDict, TypeVar
 
 from cmk.ccc import store
 
@@ -38,7 +39,7 @@ from cmk.utils.hostaddress import HostName
 #   - 'all' -> _use_all
 # TODO Centralize different stores and loaders of tree files:
 #   - inventory/HOSTNAME, inventory/HOSTNAME.gz, inventory/.last
-#   - inventory_archive/HOSTNAME/TIMESTAMP,
+#   - inventory_archive/HOSTNAME/TIMESTAMP (tree or delta to the next one),
 #   - inventory_delta_cache/HOSTNAME/TIMESTAMP_{TIMESTAMP,None}
 #   - status_data/HOSTNAME, status_data/HOSTNAME.gz
 
@@ -1299,6 +1300,85 @@ def _compare_trees(left: ImmutableTree, right: ImmutableTree) -> ImmutableDeltaT
     )
 
 
+def _restore_attributes(
+    left: ImmutableAttributes, delta: ImmutableDeltaAttributes
+) -> ImmutableAttributes:
+    pairs = dict(left.pairs)
+    for key, delta_value in delta.pairs.items():
+        if key not in left.pairs:
+            pairs[key] = delta_value.old
+        elif delta_value == _encode_as_new(left.pairs[key]):
+            del pairs[key]
+        else:
+            pairs[key] = delta_value.new
+    return ImmutableAttributes(pairs=pairs)
+
+
+def _restore_row(
+    left_row: Mapping[SDKey, SDValue], delta_row: Mapping[SDKey, SDDeltaValue]
+) -> Mapping[SDKey, SDValue]:
+    row = dict(left_row)
+    for key, delta_value in delta_row.items():
+        if key not in left_row:
+            row[key] = delta_value.old
+        elif delta_value == _encode_as_new(left_row[key]):
+            del row[key]
+        else:
+            row[key] = delta_value.new
+    return row
+
+
+def _restore_table(left: ImmutableTable, delta: ImmutableDeltaTable) -> ImmutableTable:
+    key_columns = (
+        left.key_columns if set(left.key_columns) == set(delta.key_columns) else delta.key_columns
+    )
+    rows_by_ident = dict(left.rows_by_ident)
+    added_rows = []
+    for delta_row in delta.rows:
+        new_row = {k: v.new for k, v in delta_row.items()}
+        if (
+            all(v.old is None for v in delta_row.values())
+            and left.rows_by_ident.get(ident := _make_row_ident(left.key_columns, new_row))
+            == new_row
+        ):
+            del rows_by_ident[ident]
+            continue
+        old_row = {k: v.old if v.old is not None else v.new for k, v in delta_row.items()}
+        ident = _make_row_ident(left.key_columns, old_row)
+        if all(v.new is None for v in delta_row.values()) and ident not in left.rows_by_ident:
+            added_rows.append({k: v.old for k, v in delta_row.items()})
+        else:
+            rows_by_ident[ident] = _restore_row(left.rows_by_ident.get(ident, {}), delta_row)
+    return ImmutableTable(
+        key_columns=key_columns,
+        rows_by_ident={
+            _make_row_ident(key_columns, row): row for row in [*rows_by_ident.values(), *added_rows]
+        },
+    )
+
+
+def _restore_tree(left: ImmutableTree, delta: ImmutableDeltaTree) -> ImmutableTree:
+    """Restore the right tree of the difference 'left.difference(right)'
+
+    Retentions are not part of the delta tree, the restored tree has none.
+    """
+    nodes_by_name = dict(left.nodes_by_name)
+    for name, delta_node in delta.nodes_by_name.items():
+        if node := _restore_tree(
+            left.nodes_by_name.get(name, ImmutableTree(path=left.path + (name,))),
+            delta_node,
+        ):
+            nodes_by_name[name] = node
+        else:
+            nodes_by_name.pop(name, None)
+    return ImmutableTree(
+        path=left.path,
+        attributes=_restore_attributes(left.attributes, delta.attributes),
+        table=_restore_table(left.table, delta.table),
+        nodes_by_name=nodes_by_name,
+    )
+
+
 @dataclass(frozen=True, kw_only=True)
 class ImmutableAttributes:
     pairs: Mapping[SDKey, SDValue] = field(default_factory=dict)
@@ -1656,6 +1736,56 @@ def load_tree(filepath: Path) -> ImmutableTree:
     return ImmutableTree()
 
 
+class SDRawArchivedDelta(TypedDict):
+    Next: int
+    Stats: Mapping[Literal["new", "changed", "removed"], int]
+    DeltaTree: SDRawDeltaTree
+
+
+@dataclass(frozen=True, kw_only=True)
+class ArchivedDelta:
+    """An archived tree stored as the difference of the next archived tree to it
+
+    This is exactly the delta the inventory history shows for the next
+    timestamp. The delta tree is only deserialized if needed.
+    """
+
+    next_timestamp: int
+    stats: SDDeltaCounter
+    raw_delta_tree: SDRawDeltaTree
+
+    @cached_property
+    def delta_tree(self) -> ImmutableDeltaTree:
+        return deserialize_delta_tree(self.raw_delta_tree)
+
+    def restore(self, next_tree: ImmutableTree) -> ImmutableTree:
+        return _restore_tree(next_tree, self.delta_tree)
+
+
+def load_archive_entry(filepath: Path) -> ImmutableTree | ArchivedDelta:
+    raw = store.load_object_from_file(filepath, default=None)
+    if isinstance(raw, dict) and set(raw) == set(SDRawArchivedDelta.__annotations__):
+        return ArchivedDelta(
+            next_timestamp=raw["Next"],
+            stats=Counter(raw["Stats"]),
+            raw_delta_tree=raw["DeltaTree"],
+        )
+    return deserialize_tree(raw) if raw else ImmutableTree()
+
+
+def load_archived_tree(filepath: Path) -> ImmutableTree:
+    deltas: list[ArchivedDelta] = []
+    while isinstance(entry := load_archive_entry(filepath), ArchivedDelta):
+        deltas.append(entry)
+        if not (filepath := filepath.with_name(str(entry.next_timestamp))).exists():
+            raise FileNotFoundError(filepath)
+
+    tree = entry
+    for delta in reversed(deltas):
+        tree = delta.restore(tree)
+    return tree
+
+
 class SDMeta(TypedDict):
     version: Literal["1"]
     do_archive: bool
@@ -1761,6 +1891,16 @@ class TreeStore:
 
 
 class TreeOrArchiveStore(TreeStore):
+    """The current trees and the archive of the previous ones
+
+    The latest archived tree of a host is stored as is. When a tree is
+    archived, the formerly latest one is replaced by the difference of the new
+    one to it, see `ArchivedDelta`. Every KEYFRAME_INTERVAL-th archived tree is
+    kept as is, so restoring a tree never requires more deltas than that.
+    """
+
+    KEYFRAME_INTERVAL: Final = 10
+
     def __init__(self, tree_dir: Path | str, archive: Path | str) -> None:
         super().__init__(tree_dir)
         self._archive_dir = Path(archive)
@@ -1776,7 +1916,7 @@ class TreeOrArchiveStore(TreeStore):
         except (FileNotFoundError, ValueError):
             return ImmutableTree()
 
-        return load_tree(latest_archive_tree_file)
+        return load_archived_tree(latest_archive_tree_file)
 
     def _archive_host_dir(self, host_name: HostName) -> Path:
         return self._archive_dir / str(host_name)
@@ -1786,5 +1926,32 @@ class TreeOrArchiveStore(TreeStore):
             return
         target_dir = self._archive_host_dir(host_name)
         target_dir.mkdir(parents=True, exist_ok=True)
-        tree_file.rename(target_dir / str(int(tree_file.stat().st_mtime)))
+        timestamp = int(tree_file.stat().st_mtime)
+        previous_timestamps = sorted(
+            int(tp.name) for tp in target_dir.iterdir() if tp.name.isdigit()
+        )
+        tree_file.rename(target_dir / str(timestamp))
         self._gz_file(host_name).unlink(missing_ok=True)
+
+        if (previous_timestamps := [t for t in previous_timestamps if t < timestamp]) and (
+            len(previous_timestamps) - 1
+        ) % self.KEYFRAME_INTERVAL:
+            self._replace_by_delta(target_dir / str(previous_timestamps[-1]), timestamp)
+
+    @staticmethod
+    def _replace_by_delta(previous_file: Path, next_timestamp: int) -> None:
+        if not isinstance(previous_tree := load_archive_entry(previous_file), ImmutableTree):
+            return
+        next_tree = load_tree(previous_file.with_name(str(next_timestamp)))
+        delta_tree = next_tree.difference(previous_tree)
+        if not previous_tree or _restore_tree(next_tree, delta_tree) != previous_tree:
+            # Some differences, eg. of the key columns, are not part of a delta tree.
+            return
+        store.save_object_to_file(
+            previous_file,
+            SDRawArchivedDelta(
+                Next=next_timestamp,
+                Stats=dict(delta_tree.get_stats()),
+                DeltaTree=serialize_delta_tree(delta_tree),
+            ),
+        )
@@ -17,11 +17,12 @@ import json
 import os
 import re
 import select
+import selectors
 import socket
 import ssl
 import threading
 import time
-from collections.abc import Callable, Iterator, Sequence
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 from dataclasses import dataclass, field
 from enum import Enum
 from functools import cache
@@ -181,6 +182,15 @@ remove_cache_regex = re.compile("\nCache:[^\n]*")
 # Pattern for allowed UserId values
 validate_user_id_regex = re.compile(r"^[\w$][-@.+\w$]*$", re.UNICODE)
 
+# Size of the header of the responses ("ResponseHeader: fixed16")
+RESPONSE_HEADER_SIZE = 16
+
+# Time to receive the data of a response once its header arrived
+RESPONSE_DATA_TIMEOUT = 30
+
+# Maximum size of the packets received from the socket
+RESPONSE_PACKET_SIZE = 256 * 1024
+
 
 class MKLivestatusException(Exception):
     pass
@@ -303,6 +313,10 @@ class Helpers:
     def query(self, query: QueryTypes, add_headers: str = "") -> LivestatusResponse:
         raise NotImplementedError()
 
+    def iter_query(self, query: QueryTypes, add_headers: str = "") -> Iterator[LivestatusRow]:
+        """Like query, but yields the rows. Connections may yield them while they arrive"""
+        yield from self.query(query, add_headers)
+
     def query_value(self, query: QueryTypes, deflt: Any = no_default) -> LivestatusColumn:
         """Issues a query that returns exactly one line and one columns and returns
         the response as a single value"""
@@ -346,6 +360,12 @@ class Helpers:
 
         return [row[0] for row in self.query(normalized_query, "ColumnHeaders: off\n")]
 
+    def iter_column(self, query: QueryTypes) -> Iterator[LivestatusColumn]:
+        """Like query_column, but yields the values while the lines arrive"""
+        normalized_query = Query(query) if not isinstance(query, Query) else query
+
+        return (row[0] for row in self.iter_query(normalized_query, "ColumnHeaders: off\n"))
+
     def query_column_unique(self, query: QueryTypes) -> set[LivestatusColumn]:
         """Issues a query that returns exactly one column and returns the values
         of all lines with duplicates removed. The "natural order" of the rows is
@@ -360,6 +380,12 @@ class Helpers:
 
         return self.query(normalized_query, "ColumnHeaders: off\n")
 
+    def iter_table(self, query: QueryTypes) -> Iterator[LivestatusRow]:
+        """Like query_table, but yields the lines while they arrive"""
+        normalized_query = Query(query) if not isinstance(query, Query) else query
+
+        return self.iter_query(normalized_query, "ColumnHeaders: off\n")
+
     def query_table_assoc(self, query: QueryTypes) -> list[dict[str, Any]]:
         """Issues a query that may return multiple lines and columns and returns
         a dictionary from column names to values for each line. This can be
@@ -373,6 +399,16 @@ class Helpers:
             result.append(dict(zip(headers, line)))
         return result
 
+    def iter_table_assoc(self, query: QueryTypes) -> Iterator[dict[str, Any]]:
+        """Like query_table_assoc, but yields the dictionaries while the lines arrive"""
+        normalized_query = Query(query) if not isinstance(query, Query) else query
+
+        response = self.iter_query(normalized_query, "ColumnHeaders: on\n")
+        if (headers := next(response, None)) is None:
+            return
+        for line in response:
+            yield dict(zip(headers, line))
+
     def query_summed_stats(self, query: QueryTypes, add_headers: str = "") -> list[int]:
         """Convenience function for adding up numbers from Stats queries
         Adds up results column-wise. This is useful for multisite queries."""
@@ -531,6 +567,62 @@ Must begin with 'tcp:', 'tcp6:' or 'unix:'
     )
 
 
+class _ResponseRowParser:
+    """Parses the rows of a response in python or JSON format while it arrives
+
+    Livestatus renders one row per line: "[row,\nrow,\nrow]\n". The complete lines of
+    each packet are parsed at once, so only the current packet and its rows are kept in
+    memory. Lines that can not be parsed on their own are joined with the following ones,
+    which also handles responses rendered in a single line.
+    """
+
+    def __init__(self, parse: Callable[[str], Any]) -> None:
+        self._parse = parse
+        self._data = b""
+        self._pending = ""
+        self._first = True
+
+    def feed(self, packet: bytes) -> list[LivestatusRow]:
+        data = self._data + packet
+        # Hold back the last complete line, it may be the last line of the response
+        end = data.rfind(b"\n", 0, data.rfind(b"\n"))
+        if end == -1:
+            self._data = data
+            return []
+        self._data = data[end + 1 :]
+        return self._parse_lines(data[:end], last=False)
+
+    def close(self) -> list[LivestatusRow]:
+        if not (data := self._data.removesuffix(b"\n")):
+            raise MKLivestatusQueryError("Malformed raw response output")
+        rows = self._parse_lines(data, last=True)
+        if self._pending:
+            raise MKLivestatusQueryError("Malformed raw response output")
+        return rows
+
+    def _parse_lines(self, data: bytes, last: bool) -> list[LivestatusRow]:
+        text = self._pending + data.decode("utf-8")
+        if self._first:
+            if not text.startswith("["):
+                raise MKLivestatusQueryError("Malformed raw response output")
+            text = text[1:]
+            self._first = False
+        if last:
+            if not text.endswith("]"):
+                raise MKLivestatusQueryError("Malformed raw response output")
+            text = text[:-1]
+
+        if not text:
+            return []
+        try:
+            rows: list[LivestatusRow] = self._parse("[%s]" % text.removesuffix(","))
+        except (ValueError, SyntaxError):
+            self._pending = text + "\n"
+            return []
+        self._pending = ""
+        return rows
+
+
 class SingleSiteConnection(Helpers):
     # So we only collect in a specific thread, and not in all of them. We also use
     # a class-variable for this case, so we activate this across all sites at once.
@@ -684,28 +776,38 @@ class SingleSiteConnection(Helpers):
                 pass
 
     def receive_data(self, size: int, timeout: float | None = None) -> bytes:
+        return b"".join(self.iter_data(size, timeout))
+
+    def iter_data(self, size: int, timeout: float | None = None) -> Iterator[bytes]:
+        """Yield the data of the given size packet by packet as it arrives on the socket
+
+        The timeout limits the time spent waiting for the data. The time the caller needs
+        to process the packets is not accounted.
+        """
         if self.socket is None:
             raise MKLivestatusSocketError("Socket to '%s' is not connected" % self.socketurl)
 
-        data = BytesIO()
         self.socket.settimeout(timeout)
-        receive_start = time.time()
-        while size > 0:
+        received = 0
+        waited = 0.0
+        while received < size:
+            receive_start = time.time()
+            packet = b""
             if is_socket_readable(self.socket, 0.1):
-                packet = self.socket.recv(size)
+                packet = self.socket.recv(min(size - received, RESPONSE_PACKET_SIZE))
                 if not packet:
                     raise MKLivestatusSocketClosed(
                         "Read zero data from socket, remote peer closed connection."
                     )
-                size -= len(packet)
-                data.write(packet)
-            if timeout is not None and (time.time() - receive_start) > timeout:
+                received += len(packet)
+            waited += time.time() - receive_start
+            if timeout is not None and waited > timeout:
                 raise MKLivestatusSocketError(
                     f"{timeout}s while reading data from socket. "
-                    "Received data: {data.getbuffer().nbytes}/{size} bytes"
+                    f"Received data: {received}/{size} bytes"
                 )
-
-        return data.getvalue()
+            if packet:
+                yield packet
 
     def do_query(self, query: Query, add_headers: str = "") -> LivestatusResponse:
         with (
@@ -782,38 +884,13 @@ class SingleSiteConnection(Helpers):
         timeout_at: float | None = None,
     ) -> bytes:
         try:
-            # Headers are always ASCII encoded
-            resp = self.receive_data(16)
-            code = resp[0:3].decode("ascii")
-            try:
-                length = int(resp[4:15].lstrip())
-            except Exception:
-                self.disconnect()
-                raise MKLivestatusSocketError(
-                    f"Malformed response header {resp!r}. Livestatus TCP socket might be "
-                    "unreachable or wrong encryption settings are used."
-                )
+            code, length = self.parse_response_header(self.receive_data(RESPONSE_HEADER_SIZE))
 
             # Apply a lower timeout for the content because the data is already available
             # in the socket. The liveproxyd (same system) has the complete data available
             # while the data from a standard connection can still take some time.
             # 30 seconds should be more than enough for the maximum telegram size of 100MB
-            data = self.receive_data(length, 30)
-
-            if code == "200":
-                return data
-
-            error_info = data.decode("utf-8")
-            if code == "404":
-                raise MKLivestatusTableNotFoundError(f"Not Found ({code}): {error_info!r}")
-
-            if code == "413":
-                raise MKLivestatusPayloadTooLargeError(error_info)
-
-            if code == "502":
-                raise MKLivestatusBadGatewayError(error_info)
-
-            raise MKLivestatusQueryError(f"{code}: {error_info}")
+            return self.check_response(code, self.receive_data(length, RESPONSE_DATA_TIMEOUT))
 
         except (MKLivestatusSocketClosed, OSError) as e:
             # In case of an IO error or the other side having
@@ -853,6 +930,69 @@ class SingleSiteConnection(Helpers):
             # FIXME: ? self.disconnect()
             raise MKLivestatusSocketError("Unhandled exception: %s" % e)
 
+    def iter_raw_response(
+        self, query: str, suppress_exceptions: tuple[type[Exception], ...]
+    ) -> Iterator[bytes]:
+        """Yield the data of the response packet by packet as it arrives
+
+        Like receive_raw_response, but the connection is only retried while waiting for
+        the response header. Once data has been handed out, the query can not be repeated.
+        """
+        try:
+            try:
+                header = self.receive_data(RESPONSE_HEADER_SIZE)
+            except (MKLivestatusSocketClosed, OSError):
+                self.disconnect()
+                time.sleep(0.1)
+                self.connect()
+                self.send_query(query)
+                header = self.receive_data(RESPONSE_HEADER_SIZE)
+
+            code, length = self.parse_response_header(header)
+            if code != "200":
+                self.check_response(code, self.receive_data(length, RESPONSE_DATA_TIMEOUT))
+            yield from self.iter_data(length, RESPONSE_DATA_TIMEOUT)
+
+        except (MKLivestatusSocketClosed, OSError) as e:
+            self.disconnect()
+            raise MKLivestatusSocketError(str(e))
+
+        except suppress_exceptions:
+            raise
+
+        except Exception as e:
+            raise MKLivestatusSocketError("Unhandled exception: %s" % e)
+
+    def parse_response_header(self, header: bytes) -> tuple[str, int]:
+        """The status code and the length of the data of a response"""
+        # Headers are always ASCII encoded
+        code = header[0:3].decode("ascii")
+        try:
+            return code, int(header[4:15].lstrip())
+        except Exception:
+            self.disconnect()
+            raise MKLivestatusSocketError(
+                f"Malformed response header {header!r}. Livestatus TCP socket might be "
+                "unreachable or wrong encryption settings are used."
+            )
+
+    @staticmethod
+    def check_response(code: str, data: bytes) -> bytes:
+        if code == "200":
+            return data
+
+        error_info = data.decode("utf-8")
+        if code == "404":
+            raise MKLivestatusTableNotFoundError(f"Not Found ({code}): {error_info!r}")
+
+        if code == "413":
+            raise MKLivestatusPayloadTooLargeError(error_info)
+
+        if code == "502":
+            raise MKLivestatusBadGatewayError(error_info)
+
+        raise MKLivestatusQueryError(f"{code}: {error_info}")
+
     def parse_raw_response(self, raw_response: bytes, query: Query) -> LivestatusResponse:
         data = raw_response.decode("utf-8")
         try:
@@ -863,6 +1003,17 @@ class SingleSiteConnection(Helpers):
         except (ValueError, SyntaxError):
             raise MKLivestatusQueryError("Malformed raw response output")
 
+    def parse_raw_response_rows(
+        self, raw_response: Iterable[bytes], query: Query
+    ) -> Iterator[LivestatusRow]:
+        """Like parse_raw_response, but parse the rows while the response arrives"""
+        parser = _ResponseRowParser(
+            json.loads if query.supports_json_format() else ast.literal_eval
+        )
+        for packet in raw_response:
+            yield from parser.feed(packet)
+        yield from parser.close()
+
     def set_prepend_site(self, p: bool) -> None:
         self.prepend_site = p
 
@@ -896,6 +1047,47 @@ class SingleSiteConnection(Helpers):
                 row.insert(0, b"")
         return response
 
+    @override
+    def iter_query(self, query: QueryTypes, add_headers: str = "") -> Iterator[LivestatusRow]:
+        """Yield the rows of the response while it arrives
+
+        Only the rows that have not been consumed yet are kept in memory. Stopping the
+        iteration early drops the connection, the rest of the response is not read.
+        """
+        normalized_query = Query(query) if not isinstance(query, Query) else query
+
+        if self.limit is not None:
+            normalized_query = Query(
+                "%sLimit: %d\n" % (normalized_query, self.limit),
+                normalized_query.suppress_exceptions,
+            )
+
+        with tracer.start_as_current_span(
+            "iter_query",
+            kind=trace.SpanKind.CLIENT,
+            attributes={
+                "cmk.livestatus.target_site_id": str(self.site_name),
+            },
+        ) as span:
+            with _livestatus_output_format_switcher(normalized_query, self):
+                str_query = self.build_query(normalized_query, add_headers)
+            span.set_attribute("cmk.livestatus.query", str_query)
+            self.send_query(str_query)
+
+        complete = False
+        try:
+            for row in self.parse_raw_response_rows(
+                self.iter_raw_response(str_query, normalized_query.suppress_exceptions),
+                normalized_query,
+            ):
+                if self.prepend_site:
+                    row.insert(0, b"")
+                yield row
+            complete = True
+        finally:
+            if not complete:
+                self.disconnect()
+
     def command(
         self,
         command: str,
@@ -978,6 +1170,93 @@ class ConnectedSite(NamedTuple):
 ConnectedSites = list[ConnectedSite]
 
 
+class _SiteResponse:
+    """The response of a site to a query, received piece by piece
+
+    The response is received whenever data is available on the socket, so
+    the responses of many sites can be received at the same time.
+    """
+
+    def __init__(
+        self,
+        connected_site: ConnectedSite,
+        str_query: str,
+        span: trace.Span,
+        deadline: float | None,
+    ) -> None:
+        self.connected_site = connected_site
+        self.str_query = str_query
+        self.span = span
+        self.deadline = deadline
+        self.retried = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self._buffer = BytesIO()
+        self._header: tuple[str, int] | None = None
+        self._data_deadline: float | None = None
+
+    @property
+    def socket(self) -> socket.socket:
+        if (site_socket := self.connected_site.connection.socket) is None:
+            raise MKLivestatusSocketError(
+                "Socket to '%s' is not connected" % self.connected_site.connection.socketurl
+            )
+        return site_socket
+
+    def has_pending_data(self) -> bool:
+        # Data of SSL sockets may be buffered without the socket being readable
+        site_socket = self.connected_site.connection.socket
+        return isinstance(site_socket, ssl.SSLSocket) and site_socket.pending() > 0
+
+    def timeout_at(self) -> float | None:
+        deadlines = [d for d in (self.deadline, self._data_deadline) if d is not None]
+        return min(deadlines) if deadlines else None
+
+    def resend(self) -> None:
+        """Reconnect and send the query again, see `SingleSiteConnection.receive_raw_response`"""
+        connection = self.connected_site.connection
+        connection.disconnect()
+        time.sleep(0.1)
+        connection.connect()
+        connection.send_query(self.str_query)
+        self.retried = True
+        self._reset()
+
+    def receive(self) -> bytes | None:
+        """Receive the available data, return the data of the response once it is complete
+
+        Only to be called once the socket is readable or has pending data. The
+        socket is read from once, and then only as long as it has pending data,
+        so a site sending its response slowly does not block the others.
+        """
+        connection = self.connected_site.connection
+        readable = True
+        while True:
+            size = (
+                RESPONSE_HEADER_SIZE if self._header is None else self._header[1]
+            ) - self._buffer.tell()
+            if size > 0:
+                if not (readable or self.has_pending_data()):
+                    return None
+                readable = False
+                if not (packet := self.socket.recv(min(size, RESPONSE_PACKET_SIZE))):
+                    raise MKLivestatusSocketClosed(
+                        "Read zero data from socket, remote peer closed connection."
+                    )
+                self._buffer.write(packet)
+                size -= len(packet)
+
+            if size == 0 and self._header is None:
+                self._header = connection.parse_response_header(self._buffer.getvalue())
+                self._buffer = BytesIO()
+                self._data_deadline = time.time() + RESPONSE_DATA_TIMEOUT
+                continue
+
+            if size == 0 and self._header is not None:
+                return connection.check_response(self._header[0], self._buffer.getvalue())
+
+
 class MultiSiteConnection(Helpers):
     def __init__(  # pylint: disable=too-many-branches
         self,
@@ -996,6 +1275,8 @@ class MultiSiteConnection(Helpers):
         self.prepend_site = False
         self.only_sites: OnlySites = None
         self.limit: int | None = None
+        self.response_timeout: float | None = None
+        self.site_response_timeouts: dict[SiteId, float] = {}
         self.parallelize = True
         self._only_sites_postprocess = only_sites_postprocess
 
@@ -1172,6 +1453,17 @@ class MultiSiteConnection(Helpers):
         """Impose Limit on number of returned datasets (distributed among sites)"""
         self.limit = limit
 
+    def set_response_timeout(
+        self, timeout: float | None = None, sites: Mapping[SiteId, float] | None = None
+    ) -> None:
+        """Limit the time the parallel queries wait for the response of each site
+
+        'sites' overrides the timeout for individual sites. Sites that do not answer in
+        time are considered dead, the queries return the rows of the other sites.
+        """
+        self.response_timeout = timeout
+        self.site_response_timeouts = dict(sites or {})
+
     def dead_sites(self) -> dict[SiteId, DeadSite]:
         return self.deadsites
 
@@ -1251,7 +1543,38 @@ class MultiSiteConnection(Helpers):
         The semantics differs in the handling of Limit: since all sites are queried in parallel, the
         Limit: is simply applied to all sites - resulting in possibly more results then Limit
         requests.
+
+        The responses are received from all sites at the same time and parsed as soon as
+        they are complete. The rows are returned in the order of the sites, though.
         """
+        rows_by_site = dict(self._iter_parallel(query, add_headers, "query_parallel"))
+        return LivestatusResponse(
+            [
+                row
+                for connected_site in self.connections
+                for row in rows_by_site.get(connected_site.id, ())
+            ]
+        )
+
+    @override
+    def iter_query(self, query: QueryTypes, add_headers: str = "") -> Iterator[LivestatusRow]:
+        """Yield the rows of the sites as soon as their responses arrive
+
+        Unlike `query` the rows are grouped by site in the order the sites answer. Stopping
+        the iteration early drops the connections to the sites that did not answer yet.
+        """
+        normalized_query = Query(query) if not isinstance(query, Query) else query
+
+        with _livestatus_output_format_switcher(normalized_query, self):
+            if not self.parallelize:
+                yield from self.query_non_parallel(normalized_query, add_headers)
+                return
+            for _site_id, rows in self._iter_parallel(normalized_query, add_headers, "iter_query"):
+                yield from rows
+
+    def _iter_parallel(
+        self, query: Query, add_headers: str, span_name: str
+    ) -> Iterator[tuple[SiteId, LivestatusResponse]]:
         stillalive = []
         if self.only_sites is not None:
             connect_to_sites = [c for c in self.connections if c[0] in self.only_sites]
@@ -1261,7 +1584,7 @@ class MultiSiteConnection(Helpers):
             connect_to_sites = self.connections
 
         with tracer.start_as_current_span(
-            "query_parallel", attributes={"cmk.livestatus.query": str(query)}
+            span_name, attributes={"cmk.livestatus.query": str(query)}
         ):
             # First send all queries
             retrieve_responses = self._send_queries(
@@ -1271,19 +1594,26 @@ class MultiSiteConnection(Helpers):
                 limit_header="Limit: %d\n" % self.limit if self.limit is not None else "",
             )
 
-            # Then retrieve all raw responses. We will be as slow as the slowest of all connections.
-            site_responses = self._retrieve_responses(query, retrieve_responses, stillalive)
-
-            # Convert responses to python format
-            result = self._parse_responses(query, site_responses, stillalive)
-
-        self.connections = stillalive
-        return LivestatusResponse(result)
+            try:
+                # Then receive the responses of all sites at the same time and convert them to
+                # python format one by one, as soon as they are complete.
+                with contextlib.closing(
+                    self._receive_responses(query, retrieve_responses, stillalive)
+                ) as raw_responses:
+                    for connected_site, raw_response in raw_responses:
+                        rows = self._parse_response(query, connected_site, raw_response)
+                        if rows is None:
+                            continue
+                        stillalive.append(connected_site)
+                        yield connected_site.id, rows
+            finally:
+                self.connections = [c for c in self.connections if c in stillalive]
 
     def _send_queries(
         self, query: Query, add_headers: str, connect_to_sites: ConnectedSites, limit_header: str
-    ) -> list[tuple[str, trace.Span, ConnectedSite]]:
-        retrieve_responses: list[tuple[str, trace.Span, ConnectedSite]] = []
+    ) -> list[_SiteResponse]:
+        now = time.time()
+        retrieve_responses: list[_SiteResponse] = []
         for connected_site in connect_to_sites:
             with tracer.start_as_current_span(
                 f"send_query_to_site[{connected_site.id}]",
@@ -1298,83 +1628,172 @@ class MultiSiteConnection(Helpers):
                     )
                     span.set_attribute("cmk.livestatus.query", str_query)
                     connected_site.connection.send_query(str_query)
-                    retrieve_responses.append((str_query, span, connected_site))
-                except LivestatusTestingError:
-                    raise
-                except Exception as e:
-                    self.deadsites[connected_site.id] = {
-                        "exception": e,
-                        "site": connected_site.config,
-                    }
-        return retrieve_responses
-
-    def _retrieve_responses(
-        self,
-        query: Query,
-        retrieve_responses: list[tuple[str, trace.Span, ConnectedSite]],
-        stillalive: ConnectedSites,
-    ) -> list[tuple[ConnectedSite, bytes]]:
-        site_responses: list[tuple[ConnectedSite, bytes]] = []
-        for str_query, request_span, connected_site in retrieve_responses:
-            with tracer.start_as_current_span(
-                f"receive_from_site[{connected_site.id}]",
-                kind=trace.SpanKind.CONSUMER,
-                links=[trace.Link(request_span.get_span_context())],
-                attributes={
-                    "cmk.livestatus.query": str_query,
-                    "cmk.livestatus.target_site_id": str(connected_site.id),
-                },
-            ):
-                try:
-                    site_responses.append(
-                        (
+                    timeout = self.site_response_timeouts.get(
+                        connected_site.id, self.response_timeout
+                    )
+                    retrieve_responses.append(
+                        _SiteResponse(
                             connected_site,
-                            connected_site.connection.receive_raw_response(
-                                str_query, query.suppress_exceptions
-                            ),
+                            str_query,
+                            span,
+                            None if timeout is None else now + timeout,
                         )
                     )
-                except query.suppress_exceptions:
-                    # Mostly handles exception types MKLivestatusTableNotFoundError
-                    stillalive.append(connected_site)
-                    continue
                 except LivestatusTestingError:
                     raise
                 except Exception as e:
-                    connected_site.connection.disconnect()
                     self.deadsites[connected_site.id] = {
                         "exception": e,
                         "site": connected_site.config,
                     }
-        return site_responses
+        return retrieve_responses
 
-    def _parse_responses(
+    def _receive_responses(
         self,
         query: Query,
-        site_responses: list[tuple[ConnectedSite, bytes]],
+        retrieve_responses: list[_SiteResponse],
         stillalive: ConnectedSites,
-    ) -> list[LivestatusRow]:
-        result: list[LivestatusRow] = []
-        for connected_site, raw_response in site_responses:
-            try:
-                rows = connected_site.connection.parse_raw_response(raw_response, query)
-                stillalive.append(connected_site)
-                if self.prepend_site:
-                    for row in rows:
-                        row.insert(0, connected_site.id)
-                result.extend(rows)
-            except query.suppress_exceptions:
-                stillalive.append(connected_site)
-                continue
-            except LivestatusTestingError:
-                raise
-            except Exception as e:
-                connected_site.connection.disconnect()
-                self.deadsites[connected_site.id] = {
-                    "exception": e,
-                    "site": connected_site.config,
+    ) -> Iterator[tuple[ConnectedSite, bytes]]:
+        """Yield the raw responses of the sites in the order they are complete"""
+        with selectors.DefaultSelector() as selector:
+            # The sockets are kept as registered: after a disconnect the response has none
+            receiving: dict[SiteId, tuple[_SiteResponse, socket.socket, trace.Span]] = {}
+
+            def start(response: _SiteResponse) -> None:
+                site_socket = response.socket
+                selector.register(site_socket, selectors.EVENT_READ, response)
+                receiving[response.connected_site.id] = (
+                    response,
+                    site_socket,
+                    tracer.start_span(
+                        f"receive_from_site[{response.connected_site.id}]",
+                        kind=trace.SpanKind.CONSUMER,
+                        links=[trace.Link(response.span.get_span_context())],
+                        attributes={
+                            "cmk.livestatus.query": response.str_query,
+                            "cmk.livestatus.target_site_id": str(response.connected_site.id),
+                        },
+                    ),
+                )
+
+            def stop(response: _SiteResponse, exception: Exception | None = None) -> None:
+                _response, site_socket, span = receiving.pop(response.connected_site.id)
+                with contextlib.suppress(KeyError, ValueError):
+                    selector.unregister(site_socket)
+                span.end()
+                if exception is None:
+                    return
+                if isinstance(exception, query.suppress_exceptions):
+                    # Mostly handles exception types MKLivestatusTableNotFoundError
+                    stillalive.append(response.connected_site)
+                    return
+                kill(response, exception)
+
+            def kill(response: _SiteResponse, exception: Exception) -> None:
+                response.connected_site.connection.disconnect()
+                self.deadsites[response.connected_site.id] = {
+                    "exception": exception,
+                    "site": response.connected_site.config,
                 }
-        return result
+
+            for response in retrieve_responses:
+                try:
+                    start(response)
+                except (MKLivestatusSocketError, OSError, ValueError) as e:
+                    kill(response, e)
+
+            try:
+                while receiving:
+                    now = time.time()
+                    for response, _socket, _span in list(receiving.values()):
+                        if (timeout_at := response.timeout_at()) is not None and timeout_at <= now:
+                            stop(
+                                response,
+                                MKLivestatusSocketError(
+                                    "Timeout while waiting for the response of site %s"
+                                    % response.connected_site.id
+                                ),
+                            )
+                    if not receiving:
+                        break
+
+                    if any(
+                        response.has_pending_data()
+                        for response, _socket, _span in receiving.values()
+                    ):
+                        select_timeout: float | None = 0
+                    else:
+                        timeouts = [
+                            t
+                            for response, _socket, _span in receiving.values()
+                            if (t := response.timeout_at()) is not None
+                        ]
+                        select_timeout = max(0.0, min(timeouts) - now) if timeouts else None
+
+                    ready = {key.data for key, _events in selector.select(select_timeout)}
+                    ready.update(
+                        response
+                        for response, _socket, _span in receiving.values()
+                        if response.has_pending_data()
+                    )
+                    for response in ready:
+                        try:
+                            raw_response = response.receive()
+                        except LivestatusTestingError:
+                            raise
+                        except (MKLivestatusSocketClosed, OSError) as e:
+                            # In case of an IO error or the other side having closed the
+                            # socket do a reconnect and try again, but only once.
+                            if response.retried:
+                                stop(response, MKLivestatusSocketError(str(e)))
+                                continue
+                            stop(response)
+                            try:
+                                response.resend()
+                                start(response)
+                            except LivestatusTestingError:
+                                raise
+                            except Exception as resend_exception:
+                                kill(response, resend_exception)
+                            continue
+                        except query.suppress_exceptions as e:
+                            stop(response, e)
+                            continue
+                        except Exception as e:
+                            stop(response, MKLivestatusSocketError("Unhandled exception: %s" % e))
+                            continue
+
+                        if raw_response is not None:
+                            stop(response)
+                            yield response.connected_site, raw_response
+            finally:
+                # The iteration was stopped early, drop the unread responses.
+                for response, _socket, span in receiving.values():
+                    response.connected_site.connection.disconnect()
+                    stillalive.append(response.connected_site)
+                    span.end()
+
+    def _parse_response(
+        self, query: Query, connected_site: ConnectedSite, raw_response: bytes
+    ) -> LivestatusResponse | None:
+        try:
+            rows = connected_site.connection.parse_raw_response(raw_response, query)
+        except query.suppress_exceptions:
+            return LivestatusResponse([])
+        except LivestatusTestingError:
+            raise
+        except Exception as e:
+            connected_site.connection.disconnect()
+            self.deadsites[connected_site.id] = {
+                "exception": e,
+                "site": connected_site.config,
+            }
+            return None
+
+        if self.prepend_site:
+            for row in rows:
+                row.insert(0, connected_site.id)
+        return rows
 
     def command(self, command: str, sitename: SiteId | None = SiteId("local")) -> None:
         if sitename in self.deadsites:
@@ -1576,17 +1995,50 @@ def get_rrd_data(  # pylint: disable=too-many-positional-arguments
 
     """
 
+    return get_rrd_data_batch(
+        connection,
+        host_name,
+        service_description,
+        rpn,
+        [(fromtime, untiltime)],
+        max_entries,
+    )[0]
+
+
+def get_rrd_data_batch(  # pylint: disable=too-many-positional-arguments
+    connection: SingleSiteConnection,
+    host_name: str,
+    service_description: str,
+    rpn: str,
+    windows: Sequence[tuple[int, int]],
+    max_entries: int = 400,
+) -> Sequence[RRDResponse | None]:
+    """Fetch RRD historic metrics data of a specific service for several time ranges
+
+    All time ranges are fetched with a single livestatus query, one column per
+    range. The responses are in the order of the time ranges, see `get_rrd_data`.
+    """
+    if not windows:
+        return []
+
     step = 1
-    point_range = ":".join(lqencode(str(x)) for x in (fromtime, untiltime, step, max_entries))
-    column = f"rrddata:m1:{rpn}:{point_range}"
+    columns = [
+        f"rrddata:m{index}:{rpn}:"
+        + ":".join(lqencode(str(x)) for x in (fromtime, untiltime, step, max_entries))
+        for index, (fromtime, untiltime) in enumerate(windows, start=1)
+    ]
 
-    lql = livestatus_lql([host_name], [column], service_description) + "OutputFormat: python\n"
+    lql = livestatus_lql([host_name], columns, service_description) + "OutputFormat: python\n"
 
     try:
-        response = connection.query_value(lql)
+        row = connection.query_row(lql)
     except MKLivestatusNotFoundError:
-        return None
+        return [None] * len(windows)
+
+    return [_parse_rrd_response(response) for response in row]
+
 
+def _parse_rrd_response(response: Any) -> RRDResponse | None:
     if response is None:  # It is not obvious to me if this can be the case or not.
         return None
 
@@ -3,6 +3,7 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import json
 from ast import literal_eval
 from pathlib import Path
 from unittest.mock import Mock
@@ -10,6 +11,7 @@ from unittest.mock import Mock
 import pytest
 
 from cmk.ccc import store
+from cmk.ccc.exceptions import MKGeneralException
 
 from cmk.utils.hostaddress import HostName
 
@@ -21,6 +23,7 @@ from cmk.base.api.agent_based.value_store._api import (
 )
 from cmk.base.api.agent_based.value_store._utils import (
     _DynamicDiskSyncedMapping,
+    _JournaledDiskSyncedMapping,
     _StaticDiskSyncedMapping,
     DiskSyncedMapping,
 )
@@ -147,6 +150,141 @@ class Test_StaticDiskSyncedMapping:
         assert list(sdsm.items()) == list(expected_values.items())
 
 
+class Test_JournaledDiskSyncedMapping:
+    @staticmethod
+    def _get_jdsm(path: Path) -> _JournaledDiskSyncedMapping[tuple[str, ...], object]:
+        return _JournaledDiskSyncedMapping(path=path, log_debug=lambda msg: None)
+
+    @staticmethod
+    def _records(path: Path) -> list[object]:
+        return [
+            record for line in path.read_bytes().splitlines()[1:] for record in json.loads(line)
+        ]
+
+    def test_missing_file(self, tmp_path: Path) -> None:
+        assert not self._get_jdsm(tmp_path / "test-host")
+
+    def test_store_and_load(self, tmp_path: Path) -> None:
+        path = tmp_path / "test-host"
+        jdsm = self._get_jdsm(path)
+        jdsm.disksync(updated=[(("check1", "item", "key"), 23), (("check2", "item", "key"), "42")])
+        jdsm.disksync(removed={("check1", "item", "key")}, updated=[(("check3", "", "key"), None)])
+
+        expected = {("check2", "item", "key"): "42", ("check3", "", "key"): None}
+        assert dict(jdsm) == expected
+        assert dict(self._get_jdsm(path)) == expected
+
+    def test_only_changes_are_appended(self, tmp_path: Path) -> None:
+        path = tmp_path / "test-host"
+        jdsm = self._get_jdsm(path)
+        jdsm.disksync(updated=[(("c", str(n), "k"), n) for n in range(10)])
+        size = path.stat().st_size
+
+        jdsm.disksync(
+            removed={("c", "gone", "k")},
+            updated=[(("c", str(n), "k"), n) for n in range(9)] + [(("c", "9", "k"), "new")],
+        )
+
+        assert path.read_bytes()[size:] == b'[[["c", "9", "k"], "new"]]\n'
+
+    def test_journal_is_compacted(self, tmp_path: Path) -> None:
+        path = tmp_path / "test-host"
+        jdsm = self._get_jdsm(path)
+        jdsm.disksync(updated=[(("c", "i", "k"), 0), (("c", "j", "k"), 0)])
+        for n in range(1, 10):
+            jdsm.disksync(updated=[(("c", "i", "k"), n)])
+
+        assert len(self._records(path)) <= 2 * len(jdsm)
+        assert dict(self._get_jdsm(path)) == {("c", "i", "k"): 9, ("c", "j", "k"): 0}
+
+    def test_incremental_sync(self, tmp_path: Path) -> None:
+        path = tmp_path / "test-host"
+        writer, reader = self._get_jdsm(path), self._get_jdsm(path)
+
+        for n in range(10):
+            writer.disksync(updated=[(("c", "i", "k"), n), (("c", str(n), "k"), n)])
+            reader.disksync()
+            assert dict(reader) == dict(writer)
+
+        # the reader's changes are not lost
+        reader.disksync(removed={("c", "0", "k")})
+        writer.disksync()
+        assert ("c", "0", "k") not in writer
+        assert dict(reader) == dict(writer)
+
+    def test_torn_record_is_ignored_and_overwritten(self, tmp_path: Path) -> None:
+        path = tmp_path / "test-host"
+        self._get_jdsm(path).disksync(updated=[(("c", "i", "k"), 1), (("c", "j", "k"), 2)])
+        with path.open("ab") as journal:
+            journal.write(b'[[["c", "i", "k"], 3]')
+
+        jdsm = self._get_jdsm(path)
+        assert dict(jdsm) == {("c", "i", "k"): 1, ("c", "j", "k"): 2}
+
+        jdsm.disksync(updated=[(("c", "j", "k"), 4)])
+        assert dict(self._get_jdsm(path)) == {("c", "i", "k"): 1, ("c", "j", "k"): 4}
+        assert self._records(path)[-1] == [["c", "j", "k"], 4]
+
+    def test_invalid_record_is_skipped(self, tmp_path: Path) -> None:
+        path = tmp_path / "test-host"
+        self._get_jdsm(path).disksync(updated=[(("c", "i", "k"), 1)])
+        with path.open("ab") as journal:
+            journal.write(b'\x00garbage\n[[["c", "j", "k"], 2]]\n')
+
+        assert dict(self._get_jdsm(path)) == {("c", "i", "k"): 1, ("c", "j", "k"): 2}
+
+    def test_failed_compaction_keeps_journal(self, mocker: Mock, tmp_path: Path) -> None:
+        path = tmp_path / "test-host"
+        jdsm = self._get_jdsm(path)
+        jdsm.disksync(updated=[(("c", "i", "k"), 0)])
+        jdsm.disksync(updated=[(("c", "i", "k"), 1)])
+        content = path.read_bytes()
+
+        mocker.patch.object(store, "save_bytes_to_file", side_effect=OSError("disk full"))
+        with pytest.raises(MKGeneralException):
+            jdsm.disksync(updated=[(("c", "i", "k"), 2)])
+
+        assert path.read_bytes() == content
+        assert dict(self._get_jdsm(path)) == {("c", "i", "k"): 1}
+
+    def test_legacy_file_is_migrated(self, tmp_path: Path) -> None:
+        path = tmp_path / "test-host"
+        path.write_text(json.dumps([[["c", "i", "k"], "1"], [["c", "j", "k"], "2"]]))
+
+        jdsm = self._get_jdsm(path)
+        assert dict(jdsm) == {("c", "i", "k"): "1", ("c", "j", "k"): "2"}
+
+        jdsm.disksync(updated=[(("c", "i", "k"), "3")])
+        assert path.read_bytes().startswith(_JournaledDiskSyncedMapping.MAGIC)
+        assert dict(self._get_jdsm(path)) == {("c", "i", "k"): "3", ("c", "j", "k"): "2"}
+
+    def test_only_the_appended_lines_are_replayed(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        keys = [("check", f"item {n}", "user-key") for n in range(100)]
+        writer = self._get_jdsm(tmp_path / "test-host")
+        writer.disksync(updated=[(key, repr(0.0)) for key in keys])
+        reader = self._get_jdsm(tmp_path / "test-host")
+
+        replayed: list[bytes] = []
+        replay = _JournaledDiskSyncedMapping._replay
+
+        def replay_and_record(self: _JournaledDiskSyncedMapping, lines: bytes) -> None:
+            replayed.append(lines)
+            replay(self, lines)
+
+        monkeypatch.setattr(_JournaledDiskSyncedMapping, "_replay", replay_and_record)
+
+        for cycle in range(1, 10):
+            # a tenth of the values change per cycle
+            writer.disksync(updated=[(key, repr(float(cycle))) for key in keys[cycle::10]])
+            reader.disksync()
+            assert [len(json.loads(lines)) for lines in replayed] == [10]
+            replayed.clear()
+
+        assert dict(reader) == dict(writer)
+
+
 class Test_DiskSyncedMapping:
     @staticmethod
     def _get_dsm() -> DiskSyncedMapping:
@@ -2964,12 +2964,15 @@ def test_save_packed_config(monkeypatch: MonkeyPatch, config_path: VersionedConf
     ts.add_host(HostName("bla1"))
     config_cache = ts.apply(monkeypatch)
     precompiled_check_config = Path(config_path) / "precompiled_check_config.mk"
+    ruleset_matching_cache = Path(config_path) / "ruleset_matching_cache"
 
     assert not precompiled_check_config.exists()
+    assert not ruleset_matching_cache.exists()
 
     config.save_packed_config(config_path, config_cache)
 
     assert precompiled_check_config.exists()
+    assert ruleset_matching_cache.exists()
 
 
 def test_load_packed_config(config_path: VersionedConfigPath) -> None:
@@ -6,6 +6,7 @@
 # pylint: disable=protected-access
 
 import datetime
+import os
 import math
 import time
 from collections.abc import Callable, Sequence
@@ -17,6 +18,8 @@ import time_machine
 
 from cmk.utils.prediction import _grouping, _prediction, DataStat, PredictionStore
 
+from cmk.agent_based.prediction_backend import PredictionInfo, PredictionParameters
+
 Timestamp = int
 
 
@@ -235,3 +238,42 @@ class TestPredictionStore:
         assert stillok_hour.exists()
         assert not too_old_minute.exists()
         assert stillok_minute.exists()
+
+    def test_remove_outdated_predictions_removes_lock(self, tmp_path: Path) -> None:
+        now = int(time.time())
+        (info := tmp_path / f"day-{now - 32 * 86400}-upper.info").touch()
+        (data := tmp_path / f"day-{now - 32 * 86400}-upper").touch()
+        (lock := tmp_path / f".day-{now - 32 * 86400}-upper.lock").touch()
+
+        PredictionStore(tmp_path).remove_outdated_predictions(now)
+
+        assert not info.exists()
+        assert not data.exists()
+        assert not lock.exists()
+
+    def test_iter_all_valid_predictions(self, tmp_path: Path) -> None:
+        store = PredictionStore(tmp_path)
+        meta = PredictionInfo(
+            valid_interval=(100, 200),
+            metric="load1",
+            direction="upper",
+            params=PredictionParameters(period="hour", horizon=3, levels=("absolute", (1, 2))),
+        )
+        prediction = _prediction.PredictionData(
+            points=[DataStat(1.0, 0.5, 1.5, 0.1)], start=100, step=60
+        )
+        info_file = Path(store.meta_file_path_template.format(meta=meta))
+        info_file.parent.mkdir(parents=True)
+        info_file.write_text(meta.model_dump_json())
+
+        assert not list(store.iter_all_valid_predictions(200))
+
+        assert list(store.iter_all_valid_predictions(100)) == [(meta, None)]
+
+        store.save_prediction(meta, prediction)
+        assert list(store.iter_all_valid_predictions(100)) == [(meta, prediction)]
+
+        # The parameters changed, the data is outdated.
+        later = info_file.stat().st_mtime_ns + 10**9
+        os.utime(info_file, ns=(later, later))
+        assert list(store.iter_all_valid_predictions(100)) == [(meta, None)]
@@ -9,7 +9,9 @@ from livestatus import LivestatusResponse, SiteId
 
 from cmk.bi.actions import BICallARuleAction
 from cmk.bi.aggregation import BIAggregation
-from cmk.bi.data_fetcher import BIStatusFetcher, BIStructureFetcher
+from cmk.bi.computer import BIComputer
+from cmk.bi.data_fetcher import BIStatusCache, BIStatusFetcher, BIStructureFetcher
+from cmk.bi.lib import BIHostSpec, SitesCallback
 from cmk.bi.packs import BIAggregationPacks
 from cmk.bi.searcher import BISearcher
 
@@ -83,3 +85,83 @@ def test_compute_aggregation(
     assert actual_result.acknowledged == expected_acknowledgment
     assert actual_result.in_downtime == expected_in_downtime
     assert actual_result.in_service_period == expected_service_period
+
+
+def test_compile_aggregation_dependencies(
+    bi_packs_sample_config: BIAggregationPacks,
+    bi_structure_fetcher: BIStructureFetcher,
+    bi_searcher: BISearcher,
+) -> None:
+    bi_structure_fetcher.add_site_data(SiteId("heute"), sample_config.bi_structure_states)
+    bi_searcher.set_hosts(bi_structure_fetcher.hosts)
+    bi_aggregation = bi_packs_sample_config.get_aggregation("default_aggregation")
+    assert bi_aggregation is not None
+
+    with bi_searcher.record_dependencies() as dependencies:
+        compiled_aggregation = bi_aggregation.compile(bi_searcher)
+    assert {"heute", "heute_clone"} <= dependencies.host_names
+
+    # The hosts of the aggregation need the tag tcp
+    heute = bi_structure_fetcher.hosts["heute"]
+    changed_hosts = BISearcher()
+    changed_hosts.set_hosts(
+        {"switch": heute._replace(name="switch", tags={("tcp", "no-tcp")}, services={})}
+    )
+    assert not dependencies.affected_by({"switch"}, changed_hosts)
+
+    bi_searcher.set_hosts({**bi_structure_fetcher.hosts, **changed_hosts.hosts})
+    assert bi_aggregation.compile(bi_searcher).serialize() == compiled_aggregation.serialize()
+
+    changed_hosts.set_hosts({"server": heute._replace(name="server")})
+    assert dependencies.affected_by({"server"}, changed_hosts)
+
+    # Removed host
+    assert dependencies.affected_by({"heute_clone"}, BISearcher())
+
+
+def test_compute_results_cached(
+    bi_packs_sample_config: BIAggregationPacks,
+    bi_structure_fetcher: BIStructureFetcher,
+    bi_searcher: BISearcher,
+) -> None:
+    bi_structure_fetcher.add_site_data(SiteId("heute"), sample_config.bi_structure_states)
+    bi_searcher.set_hosts(bi_structure_fetcher.hosts)
+    bi_aggregation = bi_packs_sample_config.get_aggregation("default_aggregation")
+    assert bi_aggregation is not None
+    compiled_aggregation = bi_aggregation.compile(bi_searcher)
+    required_aggregations = [(compiled_aggregation, compiled_aggregation.branches)]
+
+    status_cache = BIStatusCache()
+    status_cache.update(
+        BIStatusFetcher.create_bi_status_data(sample_config.bi_status_rows),
+        {BIHostSpec(SiteId("heute"), "heute"), BIHostSpec(SiteId("heute"), "heute_clone")},
+    )
+    bi_status_fetcher = BIStatusFetcher(
+        SitesCallback(lambda: [], lambda *args, **kwargs: LivestatusResponse([]), lambda s: s),
+        status_cache,
+    )
+    bi_status_fetcher.states = dict(status_cache.rows)
+    bi_status_fetcher.states_generation = status_cache.generation
+    bi_computer = BIComputer({compiled_aggregation.id: compiled_aggregation}, bi_status_fetcher)
+
+    results = bi_computer.compute_results(required_aggregations)[0][1]
+    assert [r.instance.properties.title for r in results] == ["Host heute", "Host heute_clone"]
+    assert not results[0].actual_result.acknowledged
+    assert bi_computer.compute_results(required_aggregations)[0][1] == results
+
+    # Only the branch of the changed host is computed again
+    status_cache.update(
+        BIStatusFetcher.create_bi_status_data(sample_config.bi_acknowledgment_status_rows),
+        {BIHostSpec(SiteId("heute"), "heute")},
+    )
+    bi_status_fetcher.states = dict(status_cache.rows)
+    bi_status_fetcher.states_generation = status_cache.generation
+    new_results = bi_computer.compute_results(required_aggregations)[0][1]
+    assert new_results[0].actual_result.acknowledged
+    assert new_results[1] is results[1]
+
+    # Results with assumed states are not cached
+    bi_status_fetcher.set_assumed_states({(SiteId("heute"), "heute_clone"): 2})
+    assert bi_computer.compute_results(required_aggregations)[0][1][1].assumed_result
+    bi_status_fetcher.set_assumed_states({})
+    assert bi_computer.compute_results(required_aggregations)[0][1][1] is results[1]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import time
+from pathlib import Path
+
+import pytest
+
+from cmk.bi.aggregation_lookup import BIAggregationLookup, LookupElement
+
+_ELEMENTS: list[LookupElement] = [
+    ("heute", "CPU load", "default_aggregation", "Host heute"),
+    ("heute", "CPU load", "other_aggregation", "Other heute"),
+    ("heute", "None", "default_aggregation", "Host heute"),
+    ("heute", "Filesystem /", "default_aggregation", "Host heute"),
+    ("gestern", "CPU load", "default_aggregation", "Host gestern"),
+    ("mörgen", "Ünicode", "default_aggregation", "Host mörgen"),
+]
+
+
+def _lookup(path: Path, elements: list[LookupElement]) -> BIAggregationLookup:
+    BIAggregationLookup.save(path, elements)
+    lookup = BIAggregationLookup.load(path)
+    assert lookup is not None
+    return lookup
+
+
+def test_lookup(tmp_path: Path) -> None:
+    lookup = _lookup(tmp_path / "lookup", _ELEMENTS)
+    assert len(lookup) == 5
+    for host_name, service_description, _aggr_id, _title in _ELEMENTS:
+        assert (host_name, service_description) in lookup
+    assert ("heute", "Memory") not in lookup
+    assert ("morgen", "CPU load") not in lookup
+    assert ("CPU load", "heute") not in lookup
+    assert ("gestern", "Filesystem /") not in lookup
+    assert lookup.aggregations("heute", "CPU load") == [
+        ("default_aggregation", "Host heute"),
+        ("other_aggregation", "Other heute"),
+    ]
+    assert lookup.aggregations("mörgen", "Ünicode") == [("default_aggregation", "Host mörgen")]
+    assert not lookup.aggregations("heute", "Memory")
+
+
+def test_empty_lookup(tmp_path: Path) -> None:
+    lookup = _lookup(tmp_path / "lookup", [])
+    assert not len(lookup)
+    assert ("heute", "CPU load") not in lookup
+
+
+def test_replace_lookup(tmp_path: Path) -> None:
+    path = tmp_path / "lookup"
+    old_lookup = _lookup(path, _ELEMENTS)
+    new_lookup = _lookup(path, _ELEMENTS[4:])
+    # The old lookup stays readable while it is replaced
+    assert ("heute", "CPU load") in old_lookup
+    assert ("heute", "CPU load") not in new_lookup
+    assert ("gestern", "CPU load") in new_lookup
+    assert [p.name for p in tmp_path.iterdir()] == ["lookup"]
+
+
+def test_unusable_lookup(tmp_path: Path) -> None:
+    path = tmp_path / "lookup"
+    assert BIAggregationLookup.load(path) is None
+    BIAggregationLookup.save(path, _ELEMENTS)
+    path.write_bytes(path.read_bytes()[:-1])
+    assert BIAggregationLookup.load(path) is None
+    path.write_bytes(b"")
+    assert BIAggregationLookup.load(path) is None
+    path.write_bytes(b"CMKBIL00" + bytes(32))
+    assert BIAggregationLookup.load(path) is None
+
+
+@pytest.mark.slow
+def test_benchmark_lookup(tmp_path: Path) -> None:
+    num_hosts, num_services = 10000, 100
+    path = tmp_path / "lookup"
+
+    start = time.perf_counter()
+    BIAggregationLookup.save(
+        path,
+        (
+            (f"host{host}", f"Service {service}", "default_aggregation", f"Host host{host}")
+            for host in range(num_hosts)
+            for service in range(num_services)
+        ),
+    )
+    saving = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lookup = BIAggregationLookup.load(path)
+    assert lookup is not None
+    for host in range(0, num_hosts, 10):
+        assert (f"host{host}", "Service 42") in lookup
+        assert (f"host{host}", "Service 100") not in lookup
+    looking_up = time.perf_counter() - start
+
+    size = path.stat().st_size
+    print(
+        f"\n{num_hosts * num_services} services: {size / 2**20:.1f} MiB, saved in {saving:.1f}s,"
+        f" {looking_up / (num_hosts // 5) * 1e6:.1f}us per lookup"
+    )
+    # Host names and service descriptions are only stored once
+    assert size < 32 * num_hosts * num_services
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+import copy
+import time
+
+from livestatus import LivestatusOutputFormat, LivestatusResponse, SiteId
+
+from cmk.bi.data_fetcher import BIStatusCache, BIStatusFetcher, BIStructureFetcher
+from cmk.bi.lib import BIHostSpec, RequiredBIElement, SitesCallback
+
+from .bi_test_data import sample_config
+
+
+def _save_site_data(
+    bi_structure_fetcher: BIStructureFetcher, site_id: SiteId, timestamp: int, hosts: dict
+) -> None:
+    bi_structure_fetcher._marshal_save_data(
+        bi_structure_fetcher._path_site_structure_data.joinpath(
+            bi_structure_fetcher._site_data_filename(site_id, timestamp)
+        ),
+        hosts,
+    )
+
+
+def test_get_changed_hosts(bi_structure_fetcher: BIStructureFetcher) -> None:
+    hosts = {str(host_name): host for host_name, host in sample_config.bi_structure_states.items()}
+    _save_site_data(bi_structure_fetcher, SiteId("heute"), 1, hosts)
+    _save_site_data(bi_structure_fetcher, SiteId("remote"), 1, {})
+
+    changed_heute_clone = list(hosts.pop("heute_clone"))
+    changed_heute_clone[7] = "New alias"
+    hosts["heute_clone"] = tuple(changed_heute_clone)
+    hosts["new_host"] = hosts["heute"]
+    _save_site_data(bi_structure_fetcher, SiteId("heute"), 2, hosts)
+
+    assert (
+        bi_structure_fetcher.get_changed_hosts(
+            {(SiteId("heute"), 1), (SiteId("remote"), 1)},
+            {(SiteId("heute"), 1), (SiteId("remote"), 1)},
+        )
+        == set()
+    )
+    assert bi_structure_fetcher.get_changed_hosts(
+        {(SiteId("heute"), 1), (SiteId("remote"), 1)},
+        {(SiteId("heute"), 2), (SiteId("remote"), 1)},
+    ) == {"heute_clone", "new_host"}
+
+    # The hosts of a site that is no longer required are removed
+    assert bi_structure_fetcher.get_changed_hosts(
+        {(SiteId("heute"), 1)}, {(SiteId("remote"), 1)}
+    ) == {"heute", "heute_clone"}
+
+    # The data of the previous program start is gone
+    assert (
+        bi_structure_fetcher.get_changed_hosts({(SiteId("heute"), 0)}, {(SiteId("heute"), 2)})
+        is None
+    )
+
+
+def test_add_site_data_removes_vanished_hosts(bi_structure_fetcher: BIStructureFetcher) -> None:
+    bi_structure_fetcher.add_site_data(SiteId("heute"), sample_config.bi_structure_states)
+    bi_structure_fetcher.add_site_data(
+        SiteId("heute"), {"heute": sample_config.bi_structure_states["heute"]}
+    )
+    assert list(bi_structure_fetcher.hosts) == ["heute"]
+
+
+class _StatusSite:
+    def __init__(self) -> None:
+        self.rows = copy.deepcopy(sample_config.bi_status_rows)
+        self.changed_host_names: list[str] = []
+        self.queries: list[str] = []
+
+    def query(
+        self,
+        query: str,
+        only_sites: list[SiteId] | None = None,
+        output_format: LivestatusOutputFormat = LivestatusOutputFormat.PYTHON,
+        fetch_full_data: bool = False,
+    ) -> LivestatusResponse:
+        self.queries.append(query)
+        if query.startswith("GET hosts\nColumns: name\n"):
+            return LivestatusResponse([["heute", name] for name in self.changed_host_names])
+        if query.startswith("GET services"):
+            return LivestatusResponse([])
+        return LivestatusResponse(
+            [row for row in self.rows if f"Filter: name = {row[1]}\n" in query]
+        )
+
+
+def test_status_cache() -> None:
+    site = _StatusSite()
+    status_cache = BIStatusCache()
+    bi_status_fetcher = BIStatusFetcher(
+        SitesCallback(lambda: [(SiteId("heute"), True)], site.query, lambda s: s), status_cache
+    )
+    heute = BIHostSpec(SiteId("heute"), "heute")
+    heute_clone = BIHostSpec(SiteId("heute"), "heute_clone")
+    required_elements = {
+        RequiredBIElement(SiteId("heute"), "heute", None),
+        RequiredBIElement(SiteId("heute"), "heute_clone", None),
+    }
+
+    bi_status_fetcher.update_states(required_elements)
+    assert set(bi_status_fetcher.states) == {heute, heute_clone}
+    generation = bi_status_fetcher.states_generation
+    assert generation is not None
+
+    # Unchanged hosts are not fetched again
+    site.queries.clear()
+    site.rows[0][5] = "New output"
+    bi_status_fetcher.update_states(required_elements)
+    assert len(site.queries) == 2
+    assert bi_status_fetcher.states[heute].plugin_output == "Packet received via smart PING"
+    assert not status_cache.changed_since([heute, heute_clone], generation)
+
+    site.changed_host_names = ["heute"]
+    bi_status_fetcher.update_states(required_elements)
+    assert bi_status_fetcher.states[heute].plugin_output == "New output"
+    assert status_cache.changed_since([heute], generation)
+    assert not status_cache.changed_since([heute_clone], generation)
+
+    # Hosts which are no longer required are dropped by the full refresh
+    status_cache.last_full_refresh = time.time() - status_cache.max_age - 1
+    bi_status_fetcher.update_states({RequiredBIElement(SiteId("heute"), "heute", None)})
+    assert set(bi_status_fetcher.states) == {heute}
+    assert status_cache.changed_since([heute_clone], generation)
+
+
+def test_status_cache_offline_site() -> None:
+    site = _StatusSite()
+    online = [True]
+    status_cache = BIStatusCache()
+    bi_status_fetcher = BIStatusFetcher(
+        SitesCallback(lambda: [(SiteId("heute"), online[0])], site.query, lambda s: s),
+        status_cache,
+    )
+    required_elements = {RequiredBIElement(SiteId("heute"), "heute", None)}
+    bi_status_fetcher.update_states(required_elements)
+    assert bi_status_fetcher.states
+
+    online[0] = False
+    site.rows.clear()
+    bi_status_fetcher.update_states(required_elements)
+    assert not bi_status_fetcher.states
@@ -189,3 +189,19 @@ def test_service_search(
     search = BIServiceSearch(schema_config)
     results = search.execute({}, bi_searcher_with_sample_config)
     assert len(results) == expected_matches
+
+
+def test_host_search_dependencies(bi_searcher_with_sample_config: BISearcher) -> None:
+    schema_config = BIHostSearch.schema()().dump({"conditions": {"host_folder": "subfolder"}})
+    search = BIHostSearch(schema_config)
+    with bi_searcher_with_sample_config.record_dependencies() as dependencies:
+        search.execute({}, bi_searcher_with_sample_config)
+    assert dependencies.host_names == {"heute_clone"}
+
+    heute = bi_searcher_with_sample_config.hosts["heute"]
+    changed_hosts = BISearcher()
+    changed_hosts.set_hosts({"heute": heute})
+    assert not dependencies.affected_by({"heute"}, changed_hosts)
+
+    changed_hosts.set_hosts({"heute": heute._replace(folder="subfolder/")})
+    assert dependencies.affected_by({"heute"}, changed_hosts)
@@ -731,6 +731,150 @@ class TestAgentParser:
         }
         assert store.load() == {}
 
+    def test_header_like_lines_in_skipped_sections(self, parser: AgentParser) -> None:
+        raw_data = AgentRawData(
+            b"\r\n".join(
+                (
+                    b"<<<deselected>>>",
+                    b"<<<not a header",
+                    b" <<<not a header either>>>",
+                    b"<<<selected:sep(59)>>>",
+                    b"<<<no header;>>>x",
+                    b"<<<deselected>>>",
+                    b"<<<selected:sep(59)>>>",
+                    b"last;line",
+                )
+            )
+        )
+
+        ahs = parser.parse(raw_data, selection=frozenset({SectionName("selected")}))
+
+        assert ahs.sections == {
+            SectionName("selected"): [["<<<no header", ">>>x"], ["last", "line"]],
+        }
+
+    @pytest.mark.parametrize(
+        "selection",
+        [
+            frozenset(),
+            frozenset({SectionName("mem")}),
+            frozenset({SectionName("logwatch"), SectionName("uptime")}),
+            frozenset({SectionName("mem"), SectionName("logwatch"), SectionName("uptime")}),
+        ],
+    )
+    def test_selection_is_a_filter(
+        self,
+        parser: AgentParser,
+        selection: frozenset[SectionName],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(time, "time", lambda: 1000)
+        raw_data = AgentRawData(
+            b"\n".join(
+                (
+                    b"<<<check_mk>>>",
+                    b"Version: 2.3.0",
+                    b"<<<mem>>>",
+                    b"MemTotal: 1024 kB",
+                    b"<<<logwatch>>>",
+                    b"[[[Application]]]",
+                    b"W some warning",
+                    b"<<<<piggy>>>>",
+                    b"<<<mem>>>",
+                    b"MemTotal: 2048 kB",
+                    b"<<<logwatch:nostrip>>>",
+                    b"  indented ",
+                    b"<<<<>>>>",
+                    b"<<<uptime>>>",
+                    b"4711",
+                    b"<<<mem:cached(900,100)>>>",
+                    b"MemFree: 512 kB",
+                )
+            )
+        )
+
+        everything = parser.parse(raw_data, selection=NO_SELECTION)
+        selected = parser.parse(raw_data, selection=selection)
+
+        assert selected.sections == {
+            name: content for name, content in everything.sections.items() if name in selection
+        }
+        assert selected.cache_info == {
+            name: info for name, info in everything.cache_info.items() if name in selection
+        }
+        assert selected.piggybacked_raw_data == {
+            hostname: [
+                line
+                for header, *lines in _split_at_headers(content)
+                if SectionMarker.from_header(header[3:-3]).name in selection
+                for line in (header, *lines)
+            ]
+            for hostname, content in everything.piggybacked_raw_data.items()
+        }
+
+    def test_unselected_sections_are_not_parsed(
+        self, parser: AgentParser, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Roughly the output of a Windows agent with an event log
+        raw_data = AgentRawData(
+            b"\r\n".join(
+                (
+                    b"<<<check_mk>>>",
+                    b"Version: 2.3.0",
+                    b"AgentOS: windows",
+                    b"<<<mem>>>",
+                    b"MemTotal: 16777216 kB",
+                    b"<<<winperf_processor>>>",
+                    *(f"{n} 0 0 0 0 0 0 0 counter".encode() for n in range(100)),
+                    b"<<<logwatch>>>",
+                    b"[[[Application]]]",
+                    *(
+                        f"W Oct 17 12:00:{n % 60:02} 0.{n} Source Event {n} with a message".encode()
+                        for n in range(1000)
+                    ),
+                    b"<<<services>>>",
+                    *(f"Service{n} running/auto Service {n}".encode() for n in range(50)),
+                    b"<<<uptime>>>",
+                    b"4711",
+                )
+            )
+        )
+        everything = parser.parse(raw_data, selection=NO_SELECTION)
+
+        parsed: list[bytes] = []
+        call = ParserState.__call__
+
+        def parse_and_record(self: ParserState, line: bytes) -> ParserState:
+            parsed.append(line)
+            return call(self, line)
+
+        monkeypatch.setattr(ParserState, "__call__", parse_and_record)
+        selection = frozenset({SectionName("mem"), SectionName("uptime")})
+        selected = parser.parse(raw_data, selection=selection)
+
+        assert selected.sections == {name: everything.sections[name] for name in selection}
+        # Only the section headers and the lines of the selected sections
+        assert parsed == [
+            b"<<<check_mk>>>",
+            b"<<<mem>>>",
+            b"MemTotal: 16777216 kB",
+            b"",
+            b"<<<winperf_processor>>>",
+            b"<<<logwatch>>>",
+            b"<<<services>>>",
+            b"<<<uptime>>>",
+            b"4711",
+        ]
+
+
+def _split_at_headers(lines: Sequence[bytes]) -> list[list[bytes]]:
+    chunks: list[list[bytes]] = []
+    for line in lines:
+        if line.startswith(b"<<<"):
+            chunks.append([])
+        chunks[-1].append(line)
+    return chunks
+
 
 class ParserStateAdapter(ParserState):
     def __init__(self, *, translation: TranslationOptions | None = None):
@@ -4,17 +4,31 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """EC History sqlite backend"""
 
+# pylint: disable=protected-access
+
 import logging
+import random
 import sqlite3
+import time
 from collections.abc import Iterator
+from pathlib import Path
+from typing import cast
 
 import pytest
 
 from cmk.utils.hostaddress import HostName
 
 import cmk.ec.export as ec
-from cmk.ec.history_sqlite import filters_to_sqlite_query, SQLiteHistory
-from cmk.ec.main import StatusTableHistory
+from cmk.ec.config import Config
+from cmk.ec.history import HistoryWriteStatus
+from cmk.ec.history_sqlite import (
+    filters_to_sqlite_query,
+    segment_start,
+    segment_table,
+    SQLiteHistory,
+    SQLiteSettings,
+)
+from cmk.ec.main import StatusTableEvents, StatusTableHistory
 from cmk.ec.query import QueryFilter, QueryGET, StatusTable
 
 
@@ -52,7 +66,7 @@ def fixture_history_sqlite_raw() -> Iterator[sqlite3.Connection]:
                     argument="test_event",
                 ),
             ],
-            ("SELECT * FROM history WHERE text = ?;", ["test_event"]),
+            ("WHERE text = ? COLLATE NOCASE", ["test_event"]),
         ),
         (
             [
@@ -69,7 +83,7 @@ def fixture_history_sqlite_raw() -> Iterator[sqlite3.Connection]:
                     argument=1234,
                 ),
             ],
-            ("SELECT * FROM history WHERE time < ? AND time > ?;", [123456789, 1234]),
+            ("WHERE time < ? AND time > ?", [123456789, 1234]),
         ),
         (
             [
@@ -86,11 +100,28 @@ def fixture_history_sqlite_raw() -> Iterator[sqlite3.Connection]:
                     argument="user",
                 ),
             ],
-            ("SELECT * FROM history WHERE who LIKE '%?%' AND owner LIKE '%?%';", ["admin", "user"]),
+            ("WHERE owner = ? COLLATE NOCASE", ["user"]),
+        ),
+        (
+            [
+                QueryFilter(
+                    column_name="event_state",
+                    operator_name="in",
+                    predicate=lambda x: True,
+                    argument=[1, 2],
+                ),
+                QueryFilter(
+                    column_name="event_host",
+                    operator_name="in",
+                    predicate=lambda x: True,
+                    argument=["a", "b"],
+                ),
+            ],
+            ("WHERE state IN (?, ?) AND host COLLATE NOCASE IN (?, ?)", [1, 2, "a", "b"]),
         ),
         pytest.param(
             [],
-            ("SELECT * FROM history  ;", []),
+            ("", []),
             id="empty argument",
         ),
     ],
@@ -98,7 +129,7 @@ def fixture_history_sqlite_raw() -> Iterator[sqlite3.Connection]:
 def test_filters_to_sqlite_query(
     filters: list[QueryFilter], expected_sqlite_query: tuple[str, object]
 ) -> None:
-    """filters_to_sqlite_query converts to correct sql select statement."""
+    """filters_to_sqlite_query converts to the where clause of the sql select statement."""
 
     assert filters_to_sqlite_query(filters) == expected_sqlite_query
 
@@ -134,12 +165,17 @@ def test_filters_to_sqlite_query_raises_KeyError() -> None:
 
 
 def test_basic_init_history_table(history_sqlite: SQLiteHistory) -> None:
-    """Basic init in memory and history table exists."""
+    """Basic init in memory and the history segment exists after adding an entry."""
 
+    history_sqlite.add(event=ec.Event(host=HostName("ABC1"), text="Event1 text"), what="NEW")
+    history_sqlite._write_pending()
+
+    start = segment_start(time.time())
     cur = history_sqlite.conn.cursor()
     cur.row_factory = None
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='history';")
-    assert cur.fetchall()[0] == ("history",)
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name GLOB 'history*';")
+    assert cur.fetchall() == [(f"history_{start}",)]
+    assert history_sqlite._segments == [start]
 
 
 def test_file_add_get(history_sqlite: SQLiteHistory) -> None:
@@ -201,20 +237,303 @@ def test_file_add_get(history_sqlite: SQLiteHistory) -> None:
     assert row["contact_groups"] == ["some string1", "another string1"]  # type: ignore[call-overload]
 
 
+def _entry(entry_time: float, **values: object) -> list[object]:
+    values["time"] = entry_time
+    return [
+        values.get(name.split("_", 1)[1], default) for name, default in StatusTableHistory.columns
+    ]
+
+
+def _query(history_sqlite: SQLiteHistory, *headers: str) -> QueryGET:
+    logger = logging.getLogger("cmk.mkeventd")
+    return QueryGET(
+        lambda name: StatusTableHistory(logger, history_sqlite), ["GET history", *headers], logger
+    )
+
+
+def _get(history_sqlite: SQLiteHistory, query: QueryGET) -> list[sqlite3.Row]:
+    return [cast(sqlite3.Row, row) for row in history_sqlite.get(query)]
+
+
+def _count(history_sqlite: SQLiteHistory) -> int:
+    return sum(
+        history_sqlite.conn.execute(f'SELECT count(*) FROM "history_{start}";').fetchone()[0]
+        for start in history_sqlite._segments
+    )
+
+
 def test_housekeeping(history_sqlite: SQLiteHistory) -> None:
-    """Add 2 events to history, drop the older one."""
+    """Add events to history, drop the older ones."""
+
+    now = time.time()
+    history_sqlite.add_entries(
+        [
+            _entry(123456, host="ABC1"),
+            _entry(now - history_sqlite._config["history_lifetime"] * 86400 - 10, host="ABC2"),
+            _entry(now, host="ABC3"),
+        ]
+    )
+    assert len(history_sqlite._segments) == 3
+    assert _count(history_sqlite) == 3
+
+    history_sqlite.housekeeping()
+
+    assert _count(history_sqlite) == 1
+    assert history_sqlite._segments[0] > 123456
+    assert segment_start(now) in history_sqlite._segments
+
+
+def test_add_entries_assigns_line_numbers(history_sqlite: SQLiteHistory) -> None:
+    history_sqlite.add_entries([_entry(t, host="a") for t in (3 * 86400, 86400, 3 * 86400 + 1)])
+    history_sqlite.add(event=ec.Event(host=HostName("b")), what="NEW")
+
+    assert [(row["line"], row["time"]) for row in _get(history_sqlite, _query(history_sqlite))][
+        1:
+    ] == [(3, 3 * 86400 + 1), (1, 3 * 86400), (2, 86400)]
+
+
+def _random_history(history_sqlite: SQLiteHistory, num_entries: int, days: int) -> None:
+    rand = random.Random(4711)
+    now = time.time()
+    history_sqlite.add_entries(
+        [
+            _entry(
+                now - rand.random() * days * 86400,
+                what=rand.choice(["NEW", "DELETE", "CANCELLED"]),
+                host=rand.choice(["heute", "HEUTE", "gestern", "morgen", "übermorgen"]),
+                rule_id=rand.choice(["rule1", "Rule1", "rule2"]),
+                application=rand.choice(["sshd", "cron", ""]),
+                state=rand.randrange(4),
+                text=f"message {rand.randrange(100)}",
+            )
+            for _ in range(num_entries)
+        ]
+    )
 
-    event1 = ec.Event(host=HostName("ABC1"), text="Event1 text", core_host=HostName("ABC"))
-    event2 = ec.Event(host=HostName("ABC2"), text="Event2 text", core_host=HostName("ABC"))
-    history_sqlite.add(event=event1, what="NEW")
-    history_sqlite.add(event=event2, what="NEW")
 
-    with history_sqlite.conn as connection:
-        cur = connection.cursor()
-        cur.execute("SELECT count(*) FROM history;")
-        assert cur.fetchone()["count(*)"] == 2
+@pytest.mark.parametrize(
+    "filters",
+    [
+        [],
+        ["Filter: event_host = heute"],
+        ["Filter: event_host =~ heute"],
+        ["Filter: event_host in HEUTE Gestern"],
+        ["Filter: event_host ~~ ^.*BERMORGEN"],
+        ["Filter: event_rule_id = Rule1", "Filter: event_state >= 2"],
+        ["Filter: event_application ~ ^s", "Filter: history_what = NEW"],
+        ["Filter: event_text ~ message 1.*", "Filter: event_application in SSHD cron"],
+        ["Filter: history_time >= {three_days_ago}", "Filter: event_host = morgen"],
+        ["Filter: history_time < {three_days_ago}", "Filter: history_time > {week_ago}"],
+        ["Filter: history_time = {three_days_ago}"],
+    ],
+)
+def test_get_equals_filtering_all_entries(
+    history_sqlite: SQLiteHistory, filters: list[str]
+) -> None:
+    _random_history(history_sqlite, 3000, days=10)
+    now = time.time()
+    filters = [f.format(three_days_ago=now - 3 * 86400, week_ago=now - 7 * 86400) for f in filters]
+
+    all_entries = list(_get(history_sqlite, _query(history_sqlite)))
+    query = _query(history_sqlite, *filters)
+    result = list(_get(history_sqlite, query))
+
+    assert len(all_entries) == 3000
+    assert [tuple(row) for row in result] == [
+        tuple(row) for row in all_entries if query.filter_row(row)
+    ]
+    assert sorted(row["line"] for row in all_entries) == list(range(1, 3001))
+
+
+def test_get_limit(history_sqlite: SQLiteHistory) -> None:
+    _random_history(history_sqlite, 1000, days=10)
+
+    result = list(
+        _get(history_sqlite, _query(history_sqlite, "Filter: event_host = heute", "Limit: 5"))
+    )
+
+    assert [row["host"] for row in result] == ["heute"] * 5
+    assert [row["line"] for row in result] == sorted((row["line"] for row in result), reverse=True)
+
+
+def test_get_uses_indexes(history_sqlite: SQLiteHistory) -> None:
+    history_sqlite.add(event=ec.Event(host=HostName("ABC1")), what="NEW")
+    history_sqlite._write_pending()
+    (start,) = history_sqlite._segments
+
+    for filters, index in [
+        ([QueryFilter("event_host", "=", lambda x: True, "abc1")], "host"),
+        ([QueryFilter("event_rule_id", "in", lambda x: True, ["a", "b"])], "rule_id"),
+        ([QueryFilter("event_application", "=~", lambda x: True, "sshd")], "application"),
+        ([QueryFilter("event_state", "=", lambda x: True, 2)], "state"),
+    ]:
+        where, arguments = filters_to_sqlite_query(filters)
+        plan = history_sqlite.conn.execute(
+            f'EXPLAIN QUERY PLAN SELECT * FROM "history_{start}" {where} ORDER BY line DESC;',
+            arguments,
+        ).fetchall()
+        assert any(f"idx_history_{start}_{index}" in row["detail"] for row in plan), plan
+
+
+def test_migrate_unpartitioned_history(
+    settings: ec.Settings, config: Config, tmp_path: Path
+) -> None:
+    database = tmp_path / "history.sqlite"
+    history_columns = ", ".join(
+        name.split("_", 1)[1] for name, _default in StatusTableHistory.columns
+    )
+    con = sqlite3.connect(database)
+    con.execute(
+        f"CREATE TABLE history ({history_columns.replace('line', 'line INTEGER PRIMARY KEY', 1)});"
+    )
+    con.executemany(
+        f"INSERT INTO history VALUES ({', '.join('?' * len(StatusTableHistory.columns))});",
+        [
+            [line, *_entry(t, host=f"host{line}")[1:]]
+            for line, t in [(1, 86400 + 5), (2, 5), (3, 86400 + 6)]
+        ],
+    )
+    con.commit()
+    con.close()
+
+    history_sqlite = SQLiteHistory(
+        SQLiteSettings.from_settings(settings, database=database),
+        config | {"archive_mode": "sqlite"},
+        logging.getLogger("cmk.mkeventd"),
+        StatusTableEvents.columns,
+        StatusTableHistory.columns,
+    )
+    try:
+        assert history_sqlite._segments == [0, 86400]
+        assert [row["host"] for row in _get(history_sqlite, _query(history_sqlite))] == [
+            "host3",
+            "host1",
+            "host2",
+        ]
+        history_sqlite.add(event=ec.Event(host=HostName("host4")), what="NEW")
+        assert next(iter(_get(history_sqlite, _query(history_sqlite))))["line"] == 4
+        assert not history_sqlite.conn.execute(
+            "SELECT name FROM sqlite_master WHERE name='history';"
+        ).fetchall()
+    finally:
+        history_sqlite.close()
+
+
+def test_get_host_of_last_month_uses_index(history_sqlite: SQLiteHistory) -> None:
+    _random_history(history_sqlite, 2000, days=60)
+    now = time.time()
+    query = _query(
+        history_sqlite,
+        "Filter: event_host = gestern",
+        f"Filter: history_time >= {now - 30 * 86400}",
+    )
+    expected = [
+        row for row in _get(history_sqlite, _query(history_sqlite)) if query.filter_row(row)
+    ]
+
+    assert [tuple(row) for row in _get(history_sqlite, query)] == [tuple(row) for row in expected]
+    where, arguments = filters_to_sqlite_query(query.filters)
+    for start in history_sqlite._segments:
+        plan = history_sqlite.conn.execute(
+            f'EXPLAIN QUERY PLAN SELECT * FROM "{segment_table(start)}" {where} ORDER BY line DESC;',
+            arguments,
+        ).fetchall()
+        assert any(f"idx_{segment_table(start)}_host" in row[-1] for row in plan)
+
+
+def _sqlite_history(
+    settings: ec.Settings,
+    config: Config,
+    database: Path,
+    *,
+    batch_size: int = 1000,
+    interval: int = 500,
+) -> SQLiteHistory:
+    return SQLiteHistory(
+        SQLiteSettings.from_settings(settings, database=database),
+        config
+        | {
+            "archive_mode": "sqlite",
+            "sqlite_write_batch_size": batch_size,
+            "sqlite_write_interval": interval,
+        },
+        logging.getLogger("cmk.mkeventd"),
+        StatusTableEvents.columns,
+        StatusTableHistory.columns,
+    )
+
 
-        cur.execute("UPDATE history set time = 123456 where host = 'ABC1'")
-        history_sqlite.housekeeping()
-        cur.execute("SELECT count(*) FROM history;")
-        assert cur.fetchone()["count(*)"] == 1
+def test_add_writes_behind_in_batches(
+    settings: ec.Settings, config: Config, tmp_path: Path
+) -> None:
+    history_sqlite = _sqlite_history(
+        settings,
+        config,
+        tmp_path / "history.sqlite",
+        batch_size=3,
+        interval=3600_000,
+    )
+    try:
+        for num in range(2):
+            history_sqlite.add(event=ec.Event(host=HostName(f"host{num}")), what="NEW")
+        assert history_sqlite.write_status() == HistoryWriteStatus(pending=2)
+        assert _count(history_sqlite) == 0
+
+        history_sqlite.add(event=ec.Event(host=HostName("host2")), what="NEW")
+        for _ in range(100):
+            if history_sqlite.write_status().written:
+                break
+            time.sleep(0.01)
+        status = history_sqlite.write_status()
+        assert (status.pending, status.written, status.batches) == (0, 3, 1)
+        assert _count(history_sqlite) == 3
+    finally:
+        history_sqlite.close()
+
+
+def test_add_writes_behind_after_interval(history_sqlite: SQLiteHistory) -> None:
+    history_sqlite.add(event=ec.Event(host=HostName("host1")), what="NEW")
+    for _ in range(200):
+        if history_sqlite.write_status().written:
+            break
+        time.sleep(0.01)
+
+    assert history_sqlite.write_status().written == 1
+    assert _count(history_sqlite) == 1
+
+
+def test_get_and_close_write_pending_entries(
+    settings: ec.Settings, config: Config, tmp_path: Path
+) -> None:
+    database = tmp_path / "history.sqlite"
+    history_sqlite = _sqlite_history(settings, config, database, interval=3600_000)
+    history_sqlite.add(event=ec.Event(host=HostName("host1")), what="NEW")
+    assert [row["host"] for row in _get(history_sqlite, _query(history_sqlite))] == ["host1"]
+
+    history_sqlite.add(event=ec.Event(host=HostName("host2")), what="NEW")
+    history_sqlite.close()
+    history_sqlite.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        history_sqlite.add(event=ec.Event(host=HostName("host3")), what="NEW")
+
+    history_sqlite = _sqlite_history(settings, config, database)
+    try:
+        assert [row["host"] for row in _get(history_sqlite, _query(history_sqlite))] == [
+            "host2",
+            "host1",
+        ]
+    finally:
+        history_sqlite.close()
+
+
+def test_flush_drops_pending_entries(settings: ec.Settings, config: Config, tmp_path: Path) -> None:
+    history_sqlite = _sqlite_history(
+        settings, config, tmp_path / "history.sqlite", interval=3600_000
+    )
+    try:
+        history_sqlite.add(event=ec.Event(host=HostName("host1")), what="NEW")
+        history_sqlite.flush()
+        assert history_sqlite.write_status().pending == 0
+        assert not list(history_sqlite.get(_query(history_sqlite)))
+    finally:
+        history_sqlite.close()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+import logging
+import random
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+
+import cmk.ec.export as ec
+from cmk.ec.config import Config, ServiceLevel
+from cmk.ec.event import create_events_from_syslog_messages
+from cmk.ec.event_pipeline import EventPipeline
+from cmk.ec.main import EventServer, EventStatus
+from cmk.ec.perfcounters import Perfcounters
+
+logger = logging.getLogger("cmk.mkeventd")
+
+
+def _slow_square(item: int) -> int:
+    time.sleep(random.random() / 1000)
+    return item * item
+
+
+@pytest.fixture(name="applied")
+def fixture_applied() -> list[int]:
+    return []
+
+
+@pytest.fixture(name="pipeline")
+def fixture_pipeline(
+    perfcounters: Perfcounters, applied: list[int]
+) -> Iterator[EventPipeline[int, int]]:
+    pipeline = EventPipeline(
+        logger, perfcounters, _slow_square, applied.append, num_workers=4, queue_size=1000
+    )
+    pipeline.start()
+    yield pipeline
+    pipeline.shutdown()
+
+
+def test_results_are_applied_in_order(
+    pipeline: EventPipeline[int, int], applied: list[int]
+) -> None:
+    for item in range(500):
+        assert pipeline.submit(item)
+    pipeline.shutdown()
+
+    assert applied == [item * item for item in range(500)]
+    assert pipeline.queue_length == 0
+
+
+def test_shutdown_applies_pending_results(
+    pipeline: EventPipeline[int, int], applied: list[int]
+) -> None:
+    for item in range(100):
+        pipeline.submit(item)
+    pipeline.shutdown()
+
+    assert len(applied) == 100
+
+
+def test_items_are_dropped_on_full_queue(perfcounters: Perfcounters) -> None:
+    blocker = threading.Event()
+    applied: list[int] = []
+
+    def blocked_apply(item: int) -> None:
+        blocker.wait()
+        applied.append(item)
+
+    pipeline = EventPipeline(
+        logger, perfcounters, lambda item: item, blocked_apply, num_workers=2, queue_size=3
+    )
+    pipeline.start()
+    try:
+        # The first one may already be taken by the event status stage
+        submitted = [pipeline.submit(item) for item in range(10)]
+        assert not all(submitted)
+        assert perfcounters._counters["queue_drops"] == submitted.count(False)
+    finally:
+        blocker.set()
+        pipeline.shutdown()
+
+    assert applied == [item for item, accepted in enumerate(submitted) if accepted]
+
+
+def test_exceptions_do_not_stop_the_pipeline(
+    perfcounters: Perfcounters, applied: list[int]
+) -> None:
+    pipeline: EventPipeline[int, int] = EventPipeline(
+        logger, perfcounters, lambda item: 1 // item, applied.append, num_workers=2, queue_size=10
+    )
+    pipeline.start()
+    for item in (1, 0, 1):
+        pipeline.submit(item)
+    pipeline.shutdown()
+
+    assert applied == [1, 1]
+
+
+def test_submit_needs_started_pipeline(perfcounters: Perfcounters) -> None:
+    pipeline = EventPipeline(logger, perfcounters, int, print, num_workers=1, queue_size=1)
+    with pytest.raises(RuntimeError):
+        pipeline.submit("1")
+
+
+def test_event_server_stages(
+    event_server: EventServer,
+    event_status: EventStatus,
+    perfcounters: Perfcounters,
+    config: Config,
+) -> None:
+    event_server._config = config | {
+        "rule_packs": [
+            ec.default_rule_pack(
+                [
+                    ec.Rule(
+                        id="drop",
+                        description="",
+                        disabled=False,
+                        drop=True,
+                        match="drop me",
+                        sl=ServiceLevel(precedence="message", value=0),
+                        state=0,
+                    )
+                ]
+            )
+        ]
+    }
+    event_server.compile_rules(event_server._config["rule_packs"])
+    pipeline = EventPipeline(
+        logger,
+        perfcounters,
+        event_server.classify_events,
+        event_server.apply_classified_events,
+        num_workers=4,
+        queue_size=100,
+    )
+    pipeline.start()
+    for num in range(50):
+        pipeline.submit(
+            create_events_from_syslog_messages(
+                [f"<13>Jan  1 12:00:00 host{num} app: please drop me {num}".encode()], None, None
+            )
+        )
+    pipeline.shutdown()
+
+    assert event_status._rule_stats == {"drop": 50}
+    assert perfcounters._counters["drops"] == 50
+    assert perfcounters._counters["messages"] == 50
+    assert {"classify", "apply", "pipeline", "processing"} <= set(perfcounters._times)
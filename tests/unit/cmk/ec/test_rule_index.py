@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+import random
+import re
+from collections.abc import Sequence
+
+import pytest
+
+from tests.unit.cmk.ec.helpers import new_event
+
+from livestatus import SiteId
+
+from cmk.utils.hostaddress import HostName
+
+import cmk.ec.export as ec
+from cmk.ec.main import EventServer
+from cmk.ec.rule_index import required_literal, RuleIndex
+from cmk.ec.rule_matcher import compile_rule, MatchSuccess, RuleMatcher
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        ("sshd", "sshd"),
+        ("^Connection from", "connection from"),
+        ("Failed password for (.*) from", "failed password for "),
+        ("disk[0-9]+ failed", "disk"),
+        ("errors?", "error"),
+        ("a{2}", ""),
+        ("foo|bar", ""),
+        ("(?i)foo", ""),
+        (".*foo", ""),
+        ("Kühlung", ""),
+    ],
+)
+def test_required_literal(pattern: str, expected: str) -> None:
+    assert required_literal(re.compile(pattern, re.IGNORECASE)) == expected
+
+
+def test_required_literal_case_sensitive() -> None:
+    assert required_literal(re.compile("foo")) == ""
+
+
+def _rule(rule_id: str, **kwargs: object) -> ec.Rule:
+    rule = ec.Rule(id=rule_id, pack="pack")
+    rule.update(kwargs)  # type: ignore[typeddict-item]
+    compile_rule(rule)
+    return rule
+
+
+def test_rule_candidates_by_host() -> None:
+    rules = [
+        _rule("1", match_host="heute"),
+        _rule("2"),
+        _rule("3", match_host="gestern"),
+        _rule("4", match_host="HEUTE"),
+    ]
+    index = RuleIndex(rules)
+
+    assert [r["id"] for r in index.rule_candidates(new_event({"host": HostName("Heute")}))] == [
+        "1",
+        "2",
+        "4",
+    ]
+    assert [r["id"] for r in index.rule_candidates(new_event({"host": HostName("morgen")}))] == [
+        "2"
+    ]
+    assert index.num_prefiltered == 3
+    assert (index.lookups, index.candidates, index.tried) == (2, 4, 4)
+
+
+def test_rule_candidates_by_text_and_application() -> None:
+    rules = [
+        _rule("text", match="Failed password for (.*)"),
+        _rule("text_ok", match="Failed password", match_ok="^Accepted password"),
+        _rule("application", match_application="sshd"),
+        _rule("alternatives", match="foo|bar"),
+        _rule("inverted", match="Failed", invert_matching=True),
+    ]
+    index = RuleIndex(rules)
+
+    event = new_event({"text": "Accepted password for root", "application": "cron"})
+    assert [r["id"] for r in index.rule_candidates(event)] == [
+        "text_ok",
+        "alternatives",
+        "inverted",
+    ]
+    assert (index.candidates, index.tried) == (5, 3)
+
+
+def test_rule_candidates_non_ascii_text() -> None:
+    # The Kelvin sign matches "k" case insensitively
+    index = RuleIndex([_rule("1", match="kernel: (.*)")])
+    assert index.rule_candidates(new_event({"text": "\u212aernel: oops"}))
+
+
+def test_rule_candidates_facility_and_priority() -> None:
+    rules = [
+        _rule("1", match_facility=4, match_priority=(2, 0)),
+        _rule("2", match_priority=(7, 5), cancel_priority=(1, 1)),
+        _rule("3", match_facility=4, invert_matching=True, match_priority=(0, 0)),
+    ]
+    index = RuleIndex(rules)
+
+    def ids(facility: int, priority: int) -> Sequence[str]:
+        event = new_event({"facility": facility, "priority": priority})
+        return [r["id"] for r in index.rule_candidates(event)]
+
+    assert ids(4, 1) == ["1", "2", "3"]
+    assert ids(4, 3) == ["3"]
+    assert ids(5, 6) == ["2", "3"]
+    assert index.num_unspecific == 0
+    assert index.bucket_sizes(4) == {0: 2, 1: 3, 2: 2, 3: 1, 4: 1, 5: 2, 6: 2, 7: 2}
+
+
+_WORDS = ["sshd", "cron", "kernel", "Failed", "password", "disk", "error", "Accepted", "root"]
+
+
+def _random_pattern(rand: random.Random) -> str:
+    word = rand.choice(_WORDS)
+    match rand.randrange(6):
+        case 0:
+            return word
+        case 1:
+            return f"^{word}"
+        case 2:
+            return f"{word} (.*) {rand.choice(_WORDS)}"
+        case 3:
+            return f"{word}|{rand.choice(_WORDS)}"
+        case 4:
+            return f"{word}s?"
+        case _:
+            return f".*{word}[0-9]*"
+
+
+def _random_rules(num_rules: int, seed: int) -> Sequence[ec.Rule]:
+    rand = random.Random(seed)
+    rules = []
+    for i in range(num_rules):
+        rule = ec.Rule(id=f"rule{i}", pack=f"pack{i // 10}")
+        if rand.randrange(3) == 0:
+            rule["match_host"] = rand.choice(["host1", "HOST2", "host.*", "^host[13]"])
+        if rand.randrange(3) == 0:
+            rule["match_application"] = _random_pattern(rand)
+        if rand.randrange(5) == 0:
+            rule["cancel_application"] = _random_pattern(rand)
+        if rand.randrange(5):
+            rule["match"] = _random_pattern(rand)
+        if rand.randrange(4) == 0:
+            rule["match_ok"] = _random_pattern(rand)
+        if rand.randrange(3) == 0:
+            rule["match_facility"] = rand.randrange(3)
+        if rand.randrange(3) == 0:
+            rule["match_priority"] = (rand.randrange(4, 8), rand.randrange(4))
+        if rand.randrange(6) == 0:
+            rule["cancel_priority"] = (rand.randrange(8), 0)
+        if rand.randrange(10) == 0:
+            rule["invert_matching"] = True
+        compile_rule(rule)
+        rules.append(rule)
+    return rules
+
+
+def _random_events(num_events: int, seed: int) -> Sequence[ec.Event]:
+    rand = random.Random(seed)
+    return [
+        new_event(
+            {
+                "host": HostName(rand.choice(["host1", "Host2", "host3", "other"])),
+                "application": rand.choice(_WORDS),
+                "text": " ".join(rand.choice(_WORDS) for _ in range(6))
+                + rand.choice(["", " disk17", " \u212aernel"]),
+                "facility": rand.randrange(3),
+                "priority": rand.randrange(8),
+            }
+        )
+        for _ in range(num_events)
+    ]
+
+
+def _matching_rules(
+    matcher: RuleMatcher, rules: Sequence[ec.Rule], event: ec.Event
+) -> Sequence[tuple[str, ec.MatchResult]]:
+    return [
+        (rule["id"], result)
+        for rule in rules
+        if isinstance(result := matcher.event_rule_matches(rule, event), MatchSuccess)
+    ]
+
+
+def test_rule_candidates_equal_matching_all_rules() -> None:
+    rules = _random_rules(300, seed=4711)
+    index = RuleIndex(rules)
+    matcher = RuleMatcher(None, SiteId("test_site"), lambda time_period_name: True)
+
+    for event in _random_events(500, seed=42):
+        assert _matching_rules(matcher, index.rule_candidates(event), event) == _matching_rules(
+            matcher, rules, event
+        ), event
+    assert index.tried < index.candidates
+
+
+def test_event_server_status_columns(event_server: EventServer) -> None:
+    status = dict(
+        zip(
+            [name for name, _default in EventServer.status_columns()],
+            list(event_server.get_status())[0],
+        )
+    )
+    assert status["status_rule_index_lookups"] == 0
+    assert "status_rule_index_tried" in status
+
+
+def test_rule_candidates_are_prefiltered() -> None:
+    rules = _random_rules(800, seed=4711)
+    events = _random_events(1000, seed=42)
+    index = RuleIndex(rules)
+
+    # The facility/priority hash is the index without the prefiltering
+    hashed_rules = RuleIndex(rules)
+    for bucket in (b for buckets in hashed_rules._buckets.values() for b in buckets.values()):
+        bucket.any_host = sorted(
+            [r._replace(needles=()) for r in bucket.any_host]
+            + [r._replace(needles=()) for rs in bucket.by_host.values() for r in rs]
+        )
+        bucket.by_host = {}
+
+    num_candidates = num_hashed_candidates = 0
+    for event in events:
+        candidates = index.rule_candidates(event)
+        hashed_candidates = hashed_rules.rule_candidates(event)
+        assert {id(rule) for rule in candidates} <= {id(rule) for rule in hashed_candidates}
+        num_candidates += len(candidates)
+        num_hashed_candidates += len(hashed_candidates)
+
+    assert num_candidates * 3 < num_hashed_candidates * 2
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""A local SNMP agent answering from a stored walk, much like snmpsim does from its records"""
+
+import bisect
+import logging
+import socket
+import threading
+from pathlib import Path
+from types import TracebackType
+from typing import Final, Self
+
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto import api  # type: ignore[import-untyped]
+
+from cmk.fetchers.snmp_backend import StoredWalkSNMPBackend
+from cmk.fetchers.snmp_backend._utils import strip_snmp_value
+
+__all__ = ["StoredWalkResponder"]
+
+
+def _parse_oid(oid: str) -> tuple[int, ...]:
+    return tuple(int(part) for part in oid.strip(".").split("."))
+
+
+class StoredWalkResponder:
+    """Answers SNMP v1 and v2c GET, GETNEXT and GETBULK requests
+
+    All values are sent as octet strings, so the raw values received by
+    the SNMP backends are the ones of the StoredWalkSNMPBackend.
+    """
+
+    def __init__(self, path: Path, *, community: str = "public", drop_requests: int = 0) -> None:
+        records = sorted(
+            (_parse_oid(oid), strip_snmp_value(value[0] if value else ""))
+            for oid, *value in (
+                line.split(None, 1)
+                for line in StoredWalkSNMPBackend.read_walk_from_path(
+                    path, logging.getLogger("test")
+                )
+            )
+        )
+        self._oids: Final = [oid for oid, _value in records]
+        self._values: Final = [value for _oid, value in records]
+        self.community: Final = community
+        # The first requests are not answered, to provoke retries
+        self._drop_requests = drop_requests
+        self.requests = 0
+        self.max_repetitions: set[int] = set()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.settimeout(0.05)
+        self._terminate = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name="StoredWalkResponder")
+
+    @property
+    def port(self) -> int:
+        return int(self._socket.getsockname()[1])
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        self._terminate.set()
+        self._thread.join()
+        self._socket.close()
+
+    def _serve(self) -> None:
+        while not self._terminate.is_set():
+            try:
+                request, address = self._socket.recvfrom(65535)
+            except TimeoutError:
+                continue
+            self.requests += 1
+            if self.requests <= self._drop_requests:
+                continue
+            if (response := self._respond(request)) is not None:
+                self._socket.sendto(response, address)
+
+    def _respond(self, request: bytes) -> bytes | None:
+        proto = api.protoModules[int(api.decodeMessageVersion(request))]
+        message, _rest = decoder.decode(request, asn1Spec=proto.Message())
+        if str(proto.apiMessage.getCommunity(message)) != self.community:
+            return None
+        request_pdu = proto.apiMessage.getPDU(message)
+        response = proto.apiMessage.getResponse(message)
+        response_pdu = proto.apiMessage.getPDU(response)
+        oids = [_parse_oid(str(oid)) for oid, _value in proto.apiPDU.getVarBinds(request_pdu)]
+
+        var_binds = []
+        if request_pdu.isSameTypeWith(proto.GetRequestPDU()):
+            for oid in oids:
+                index = bisect.bisect_left(self._oids, oid)
+                if index < len(self._oids) and self._oids[index] == oid:
+                    var_binds.append((oid, proto.OctetString(self._values[index])))
+                elif proto is api.protoModules[api.protoVersion1]:
+                    proto.apiPDU.setErrorStatus(response_pdu, 2)
+                    proto.apiPDU.setErrorIndex(response_pdu, len(var_binds) + 1)
+                    var_binds.append((oid, proto.Null("")))
+                else:
+                    var_binds.append((oid, api.v2c.NoSuchInstance("")))
+        else:
+            repetitions = 1
+            if proto is api.protoModules[api.protoVersion2c] and request_pdu.isSameTypeWith(
+                proto.GetBulkRequestPDU()
+            ):
+                repetitions = int(proto.apiBulkPDU.getMaxRepetitions(request_pdu))
+                self.max_repetitions.add(repetitions)
+            for _repetition in range(repetitions):
+                next_oids = []
+                for position, oid in enumerate(oids):
+                    index = bisect.bisect_right(self._oids, oid)
+                    if index < len(self._oids):
+                        next_oids.append(self._oids[index])
+                        var_binds.append(
+                            (self._oids[index], proto.OctetString(self._values[index]))
+                        )
+                    elif proto is api.protoModules[api.protoVersion1]:
+                        proto.apiPDU.setErrorStatus(response_pdu, 2)
+                        proto.apiPDU.setErrorIndex(response_pdu, position + 1)
+                        next_oids.append(oid)
+                        var_binds.append((oid, proto.Null("")))
+                    else:
+                        next_oids.append(oid)
+                        var_binds.append((oid, api.v2c.EndOfMibView("")))
+                oids = next_oids
+
+        proto.apiPDU.setVarBinds(response_pdu, var_binds)
+        return encoder.encode(response)
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+import contextlib
+import logging
+import os
+import socket
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from pysnmp.hlapi import asyncio as hlapi  # type: ignore[import-untyped]
+from pysnmp.proto import rfc1902  # type: ignore[import-untyped]
+from pytest import MonkeyPatch
+
+from tests.unit.cmk.fetchers.stored_walk_responder import StoredWalkResponder
+
+from cmk.ccc.exceptions import MKTimeout, OnError
+
+import cmk.utils.resulttype as result
+from cmk.utils.hostaddress import HostAddress, HostName
+from cmk.utils.sectionname import SectionName
+
+from cmk.snmplib import (
+    BackendOIDSpec,
+    BackendSNMPTree,
+    SNMPBackendEnum,
+    SNMPContextTimeout,
+    SNMPCredentials,
+    SNMPDetectSpec,
+    SNMPHostConfig,
+    SNMPVersion,
+)
+
+from cmk.fetchers import fetch_snmp_concurrently, Mode, SNMPFetcher, SNMPScanConfig, SNMPSectionMeta
+from cmk.fetchers.filecache import FileCacheMode, MaxAge, SNMPFileCache
+from cmk.fetchers.snmp import SNMPPluginStore, SNMPPluginStoreItem
+from cmk.fetchers.snmp_backend import AsyncSNMPBackend, SNMPEventLoop, StoredWalkSNMPBackend
+from cmk.fetchers.snmp_backend.async_bulk import auth_data, raw_value
+
+logger = logging.getLogger("test")
+
+_COLUMNS = [f".1.3.6.1.2.1.2.2.1.{column}" for column in range(1, 6)]
+
+
+@pytest.fixture(name="walk_path")
+def fixture_walk_path(tmp_path: Path) -> Path:
+    path = tmp_path / "walk"
+    path.write_text(
+        ".1.3.6.1.2.1.1.1.0 Linux\n"
+        '.1.3.6.1.2.1.1.3.0 "B2 E0 7D "\n'
+        + "".join(
+            f'{column}.{index} "value {index}"\n' for column in _COLUMNS for index in range(1, 42)
+        )
+        + ".1.3.6.1.2.1.31.1.1.1.1.1 lo\n"
+    )
+    return path
+
+
+@pytest.fixture(name="responder")
+def fixture_responder(walk_path: Path) -> Iterator[StoredWalkResponder]:
+    with StoredWalkResponder(walk_path) as responder:
+        yield responder
+
+
+def _snmp_config(
+    port: int,
+    *,
+    hostname: HostName = HostName("localhost"),
+    snmp_version: SNMPVersion = SNMPVersion.V2C,
+    bulkwalk_enabled: bool = True,
+    credentials: SNMPCredentials = "public",
+    timeout: float = 1,
+    retries: int = 1,
+) -> SNMPHostConfig:
+    return SNMPHostConfig(
+        is_ipv6_primary=False,
+        hostname=hostname,
+        ipaddress=HostAddress("127.0.0.1"),
+        credentials=credentials,
+        port=port,
+        bulkwalk_enabled=bulkwalk_enabled,
+        snmp_version=snmp_version,
+        bulk_walk_size_of=10,
+        timing={"timeout": timeout, "retries": retries},
+        oid_range_limits={},
+        snmpv3_contexts=[],
+        character_encoding=None,
+        snmp_backend=SNMPBackendEnum.ASYNC,
+    )
+
+
+def _unused_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+@pytest.mark.parametrize(
+    "snmp_version, bulkwalk_enabled",
+    [
+        (SNMPVersion.V1, False),
+        (SNMPVersion.V2C, False),
+        (SNMPVersion.V2C, True),
+    ],
+)
+def test_walk_equals_stored_walk(
+    responder: StoredWalkResponder,
+    walk_path: Path,
+    snmp_version: SNMPVersion,
+    bulkwalk_enabled: bool,
+) -> None:
+    config = _snmp_config(
+        responder.port, snmp_version=snmp_version, bulkwalk_enabled=bulkwalk_enabled
+    )
+    stored_walk = StoredWalkSNMPBackend(config, logger, walk_path)
+    backend = AsyncSNMPBackend(config, logger)
+
+    for oid in (*_COLUMNS, ".1.3.6.1.2.1.1", ".1.3.6.1.2.1.31.1.1.1.1", ".1.3.6.1.4"):
+        assert backend.walk(oid, context="") == stored_walk.walk(oid, context="")
+
+
+def test_bulkwalk_uses_bulk_size(responder: StoredWalkResponder) -> None:
+    backend = AsyncSNMPBackend(_snmp_config(responder.port), logger)
+
+    assert len(backend.walk(_COLUMNS[0], context="")) == 41
+    # 41 rows and the first OID of the next column in chunks of 10
+    assert backend.requests == 5
+    assert responder.max_repetitions == {10}
+
+
+@pytest.mark.parametrize("snmp_version", [SNMPVersion.V1, SNMPVersion.V2C])
+def test_get(responder: StoredWalkResponder, snmp_version: SNMPVersion) -> None:
+    backend = AsyncSNMPBackend(_snmp_config(responder.port, snmp_version=snmp_version), logger)
+
+    assert backend.get(".1.3.6.1.2.1.1.1.0", context="") == b"Linux"
+    assert backend.get(".1.3.6.1.2.1.1.3.0", context="") == b"\xb2\xe0}"
+    assert backend.get(".1.3.6.1.2.1.1.2.0", context="") is None
+    assert backend.get(".1.3.6.1.2.1.1.*", context="") == b"Linux"
+    assert backend.get(".1.3.6.1.2.1.3.*", context="") is None
+
+
+def test_prefetch(responder: StoredWalkResponder, walk_path: Path) -> None:
+    config = _snmp_config(responder.port)
+    stored_walk = StoredWalkSNMPBackend(config, logger, walk_path)
+    backend = AsyncSNMPBackend(config, logger)
+
+    backend.prefetch((oid, "") for oid in _COLUMNS)
+    assert backend.requests == 5 * len(_COLUMNS)
+    assert responder.requests == backend.requests
+
+    for oid in _COLUMNS:
+        assert backend.walk(oid, context="") == stored_walk.walk(oid, context="")
+    # Nothing is walked twice
+    assert responder.requests == backend.requests == 5 * len(_COLUMNS)
+    assert not backend._prefetched
+
+
+def test_retry(walk_path: Path) -> None:
+    with StoredWalkResponder(walk_path, drop_requests=1) as responder:
+        backend = AsyncSNMPBackend(_snmp_config(responder.port, timeout=0.2), logger)
+        assert backend.get(".1.3.6.1.2.1.1.1.0", context="") == b"Linux"
+        assert responder.requests == 2
+
+
+def test_timeout() -> None:
+    backend = AsyncSNMPBackend(_snmp_config(_unused_port(), timeout=0.1, retries=0), logger)
+    with pytest.raises(SNMPContextTimeout):
+        backend.walk(_COLUMNS[0], context="")
+
+
+def test_prefetch_keeps_timeout_for_walk(walk_path: Path) -> None:
+    with StoredWalkResponder(walk_path, community="private") as responder:
+        backend = AsyncSNMPBackend(_snmp_config(responder.port, timeout=0.1, retries=0), logger)
+        backend.prefetch([(_COLUMNS[0], "")])
+        assert responder.requests == 1
+
+        with pytest.raises(SNMPContextTimeout):
+            backend.walk(_COLUMNS[0], context="")
+        assert responder.requests == 1
+
+
+def test_event_loop_shares_engines(responder: StoredWalkResponder, walk_path: Path) -> None:
+    config = _snmp_config(responder.port)
+    stored_walk = StoredWalkSNMPBackend(config, logger, walk_path)
+    with SNMPEventLoop() as event_loop:
+        backends = [
+            AsyncSNMPBackend(config, logger, event_loop=event_loop),
+            AsyncSNMPBackend(
+                _snmp_config(responder.port, hostname=HostName("other")),
+                logger,
+                event_loop=event_loop,
+            ),
+        ]
+        for backend in backends:
+            assert backend.get(".1.3.6.1.2.1.1.1.0", context="") == b"Linux"
+            backend.prefetch((oid, "") for oid in _COLUMNS)
+            for oid in _COLUMNS:
+                assert backend.walk(oid, context="") == stored_walk.walk(oid, context="")
+
+        assert len(event_loop._engines) == 1
+        AsyncSNMPBackend(
+            _snmp_config(responder.port, snmp_version=SNMPVersion.V1), logger, event_loop=event_loop
+        ).get(".1.3.6.1.2.1.1.1.0", context="")
+        assert len(event_loop._engines) == 2
+
+
+@pytest.fixture(name="plugin_store")
+def fixture_plugin_store(monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(
+        SNMPFetcher,
+        "plugin_store",
+        SNMPPluginStore(
+            {
+                SectionName("interfaces"): SNMPPluginStoreItem(
+                    trees=[
+                        BackendSNMPTree(
+                            base=".1.3.6.1.2.1.2.2.1",
+                            oids=[BackendOIDSpec("1", "string", False)],
+                        )
+                    ],
+                    detect_spec=SNMPDetectSpec([[]]),
+                    inventory=False,
+                ),
+            }
+        ),
+    )
+
+
+def _fetch_job(
+    tmp_path: Path, host: int, snmp_config: SNMPHostConfig
+) -> tuple[SNMPFileCache, SNMPFetcher]:
+    return (
+        SNMPFileCache(
+            path_template=os.devnull,
+            max_age=MaxAge.unlimited(),
+            simulation=False,
+            use_only_cache=False,
+            file_cache_mode=FileCacheMode.DISABLED,
+        ),
+        SNMPFetcher(
+            sections={
+                SectionName("interfaces"): SNMPSectionMeta(
+                    checking=True, disabled=False, redetect=False, fetch_interval=None
+                )
+            },
+            scan_config=SNMPScanConfig(
+                on_error=OnError.RAISE,
+                missing_sys_description=False,
+                oid_cache_dir=tmp_path,
+            ),
+            do_status_data_inventory=False,
+            section_store_path=tmp_path / "sections" / str(host),
+            stored_walk_path=tmp_path,
+            walk_cache_path=tmp_path,
+            snmp_config=snmp_config,
+        ),
+    )
+
+
+@pytest.mark.usefixtures("plugin_store")
+def test_fetch_snmp_concurrently(walk_path: Path, tmp_path: Path) -> None:
+    num_hosts, timeout = 20, 0.3
+    with contextlib.ExitStack() as stack:
+        # Every device swallows the first request, so every fetch waits for a timeout
+        responders = [
+            stack.enter_context(StoredWalkResponder(walk_path, drop_requests=1))
+            for _host in range(num_hosts)
+        ]
+        jobs = [
+            _fetch_job(
+                tmp_path,
+                host,
+                _snmp_config(responder.port, hostname=HostName(f"host{host}"), timeout=timeout),
+            )
+            for host, responder in enumerate(responders)
+        ]
+
+        start = time.monotonic()
+        fetched = fetch_snmp_concurrently(jobs, Mode.FORCE_SECTIONS)
+        duration = time.monotonic() - start
+
+    assert (
+        fetched
+        == [
+            result.OK({SectionName("interfaces"): [[[f"value {index}"] for index in range(1, 42)]]})
+        ]
+        * num_hosts
+    )
+    assert duration < num_hosts * timeout / 2
+
+
+@pytest.mark.usefixtures("plugin_store")
+def test_fetch_snmp_concurrently_timeout(responder: StoredWalkResponder, tmp_path: Path) -> None:
+    jobs = [
+        _fetch_job(tmp_path, 0, _snmp_config(responder.port)),
+        # Nobody answers, the SNMP timeout is way beyond the timeout of the fetch
+        _fetch_job(
+            tmp_path,
+            1,
+            _snmp_config(_unused_port(), hostname=HostName("unreachable"), timeout=3600),
+        ),
+    ]
+
+    fetched = fetch_snmp_concurrently(jobs, Mode.FORCE_SECTIONS, timeout=1)
+
+    assert fetched[0] == result.OK(
+        {SectionName("interfaces"): [[[f"value {index}"] for index in range(1, 42)]]}
+    )
+    assert isinstance(fetched[1].error, MKTimeout)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (rfc1902.OctetString(b"\xb2\xe0"), b"\xb2\xe0"),
+        (rfc1902.Integer(-42), b"-42"),
+        (rfc1902.Counter64(2**40), b"1099511627776"),
+        (rfc1902.TimeTicks(100), b"100"),
+        (rfc1902.IpAddress("10.0.0.1"), b"10.0.0.1"),
+        (rfc1902.ObjectIdentifier("1.3.6.1"), b".1.3.6.1"),
+    ],
+)
+def test_raw_value(value: object, expected: bytes) -> None:
+    assert raw_value(value) == expected
+
+
+def test_auth_data_community() -> None:
+    assert auth_data(_snmp_config(161, snmp_version=SNMPVersion.V1)).mpModel == 0
+    assert auth_data(_snmp_config(161, snmp_version=SNMPVersion.V2C)).mpModel == 1
+
+
+@pytest.mark.parametrize(
+    "credentials, auth_protocol, priv_protocol",
+    [
+        (("noAuthNoPriv", "user"), hlapi.usmNoAuthProtocol, hlapi.usmNoPrivProtocol),
+        (
+            ("authNoPriv", "SHA-256", "user", "password"),
+            hlapi.usmHMAC192SHA256AuthProtocol,
+            hlapi.usmNoPrivProtocol,
+        ),
+        (
+            ("authPriv", "md5", "user", "password", "AES-256", "secret"),
+            hlapi.usmHMACMD5AuthProtocol,
+            hlapi.usmAesBlumenthalCfb256Protocol,
+        ),
+    ],
+)
+def test_auth_data_usm(
+    credentials: SNMPCredentials, auth_protocol: object, priv_protocol: object
+) -> None:
+    usm = auth_data(_snmp_config(161, snmp_version=SNMPVersion.V3, credentials=credentials))
+    assert usm.userName == "user"
+    assert usm.authProtocol == auth_protocol
+    assert usm.privProtocol == priv_protocol
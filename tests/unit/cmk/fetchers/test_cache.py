@@ -5,14 +5,112 @@
 
 import json
 import logging
+from pathlib import Path
+
+import pytest
+
+from cmk.ccc import store
+
+from cmk.utils import binarycodec
+from cmk.utils.sectionname import SectionName
 
 from cmk.fetchers import Mode
-from cmk.fetchers.filecache import MaxAge
+from cmk.fetchers.filecache import FileCacheMode, FileCacheOptions, MaxAge
 
 from cmk.checkengine.parser import SectionStore
 
 
 class TestSectionStore:
+    @pytest.fixture
+    def section_store(self, tmp_path: Path) -> SectionStore[object]:
+        return SectionStore(tmp_path / "store", logger=logging.getLogger("test"))
+
+    def test_store_and_load(self, section_store: SectionStore[object]) -> None:
+        sections: dict[SectionName, tuple[int, int, object]] = {
+            SectionName("agent"): (1000, 1060, [["a", "b"], ["ä", ""]]),
+            SectionName("snmp"): (1000, 1600, [[["1", [0, 255]]], [["2", "x"]]]),
+            SectionName("empty"): (1000, 1000, []),
+        }
+        section_store.store(sections)
+
+        assert section_store.load() == sections
+        assert section_store.load_lifetimes() == {
+            SectionName("agent"): (1000, 1060),
+            SectionName("snmp"): (1000, 1600),
+            SectionName("empty"): (1000, 1000),
+        }
+
+    def test_store_nothing(self, section_store: SectionStore[object]) -> None:
+        section_store.store({SectionName("section"): (0, 0, [])})
+        section_store.store({})
+        assert not section_store.path.exists()
+        assert section_store.load() == {}
+
+    def test_migrate_pickled_sections(self, section_store: SectionStore[object]) -> None:
+        store.save_object_to_pickle_file(section_store.path, {"section": (1, 2, [["old"]])})
+        assert section_store.load() == {SectionName("section"): (1, 2, [["old"]])}
+
+        section_store.store(section_store.load())
+        assert section_store.load() == {SectionName("section"): (1, 2, [["old"]])}
+        assert not section_store.path.read_bytes().startswith(b"\x80")
+
+    def test_invalid_file(self, section_store: SectionStore[object]) -> None:
+        section_store.store({SectionName("section"): (0, 0, [["some", "data"]])})
+        section_store.path.write_bytes(section_store.path.read_bytes()[:-3])
+        assert section_store.load() == {}
+
+    def test_invalid_section(self, section_store: SectionStore[object]) -> None:
+        section_store.store(
+            {SectionName("good"): (0, 60, [["some", "data"]]), SectionName("bad"): (0, 60, "xxxx")}
+        )
+        section_store.path.write_bytes(
+            section_store.path.read_bytes().replace(b"s\x04xxxx", b"?\x04xxxx")
+        )
+        cache_info: dict[SectionName, tuple[int, int]] = {}
+
+        assert section_store.update(
+            {},
+            cache_info,
+            lambda _section_name: None,
+            lambda _valid_until, _now: False,
+            now=0,
+            keep_outdated=True,
+        ) == {SectionName("good"): [["some", "data"]]}
+        assert cache_info == {SectionName("good"): (0, 60)}
+
+    def test_sections_are_decoded_and_encoded_on_demand(
+        self, section_store: SectionStore[object], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        section_store.store(
+            {SectionName(f"section_{n}"): (n, n + 60, [[str(n)]]) for n in range(10)}
+        )
+        decode, encode = binarycodec.decode, binarycodec.encode
+        decoded: list[object] = []
+        encoded: list[object] = []
+
+        def decode_and_count(data: bytes) -> object:
+            decoded.append(obj := decode(data))
+            return obj
+
+        def encode_and_count(obj: object) -> bytes:
+            encoded.append(obj)
+            return encode(obj)
+
+        monkeypatch.setattr(binarycodec, "decode", decode_and_count)
+        monkeypatch.setattr(binarycodec, "encode", encode_and_count)
+
+        section_store.load_lifetimes()
+        persisted_sections = section_store.load()
+        persisted_sections[SectionName("section_3")] = (100, 160, [["new"]])
+        del persisted_sections[SectionName("section_4")]
+        _ = persisted_sections[SectionName("section_5")]
+        section_store.store(persisted_sections)
+
+        assert decoded == [[["5"]]]
+        assert encoded == [[["new"]]]
+        assert len(section_store.load()) == 9
+        assert section_store.load()[SectionName("section_5")] == (5, 65, [["5"]])
+
     def test_repr(self) -> None:
         assert isinstance(
             repr(
@@ -25,6 +123,17 @@ class TestSectionStore:
         )
 
 
+class TestFileCacheOptions:
+    def test_file_cache_mode(self) -> None:
+        assert FileCacheOptions().file_cache_mode() is FileCacheMode.READ_WRITE
+        assert FileCacheOptions(disabled=True, compressed=True).file_cache_mode() is (
+            FileCacheMode.DISABLED
+        )
+        assert FileCacheOptions(compressed=True).file_cache_mode() == (
+            FileCacheMode.READ_WRITE | FileCacheMode.COMPRESSED
+        )
+
+
 class TestMaxAge:
     def test_repr(self) -> None:
         max_age = MaxAge(checking=42, discovery=69, inventory=1337)
@@ -174,6 +174,65 @@ class TestAgentFileCache_and_SNMPFileCache:
         assert path.exists()
         assert file_cache.read(mode) is None
 
+    def test_compressed(
+        self,
+        file_cache: FileCache,
+        path: Path,
+        raw_data: AgentRawData | SNMPRawData,
+    ) -> None:
+        mode = Mode.DISCOVERY
+        file_cache.file_cache_mode = FileCacheMode.READ_WRITE
+
+        file_cache.write(raw_data, mode)
+        plain = path.read_bytes()
+
+        file_cache.file_cache_mode = FileCacheMode.READ_WRITE | FileCacheMode.COMPRESSED
+        # Files written before are still read
+        assert file_cache.read(mode) == raw_data
+
+        file_cache.write(raw_data, mode)
+        assert path.read_bytes() != plain
+        assert file_cache.read(mode) == raw_data
+        assert clone_file_cache(file_cache).read(mode) == raw_data
+
+        file_cache.file_cache_mode = FileCacheMode.READ_WRITE
+        assert file_cache.read(mode) == raw_data
+
+    def test_compressed_unchanged_data_is_not_written(
+        self,
+        file_cache: FileCache,
+        path: Path,
+        raw_data: AgentRawData | SNMPRawData,
+    ) -> None:
+        mode = Mode.DISCOVERY
+        file_cache.file_cache_mode = FileCacheMode.READ_WRITE | FileCacheMode.COMPRESSED
+
+        file_cache.write(raw_data, mode)
+        os.utime(path, (0, 0))
+        inode = path.stat().st_ino
+
+        file_cache.write(raw_data, mode)
+        # Only touched, so the age of the data is right.
+        assert path.stat().st_ino == inode
+        assert path.stat().st_mtime > 0
+        assert file_cache.read(mode) == raw_data
+
+    def test_compressed_broken_file(
+        self,
+        file_cache: FileCache,
+        path: Path,
+        raw_data: AgentRawData | SNMPRawData,
+    ) -> None:
+        mode = Mode.DISCOVERY
+        file_cache.file_cache_mode = FileCacheMode.READ_WRITE | FileCacheMode.COMPRESSED
+
+        file_cache.write(raw_data, mode)
+        path.write_bytes(path.read_bytes()[:-4])
+        assert file_cache.read(mode) is None
+
+        file_cache.write(raw_data, mode)
+        assert file_cache.read(mode) == raw_data
+
 
 _TRawData = TypeVar("_TRawData", bound=Sized)
 
@@ -6,12 +6,35 @@
 # pylint: disable=protected-access
 
 import logging
+import random
 from pathlib import Path
+from unittest import mock
 
 import pytest
 
+from cmk.utils.hostaddress import HostAddress, HostName
+
+from cmk.snmplib import SNMPBackendEnum, SNMPHostConfig, SNMPVersion
+
 import cmk.fetchers.snmp_backend._utils as utils
 from cmk.fetchers.snmp_backend import StoredWalkSNMPBackend
+from cmk.fetchers.snmp_backend.stored_walk import WalkIndex
+
+SNMP_CONFIG = SNMPHostConfig(
+    is_ipv6_primary=False,
+    hostname=HostName("walk"),
+    ipaddress=HostAddress("127.0.0.1"),
+    credentials="public",
+    port=161,
+    bulkwalk_enabled=True,
+    snmp_version=SNMPVersion.V2C,
+    bulk_walk_size_of=10,
+    timing={},
+    oid_range_limits={},
+    snmpv3_contexts=[],
+    character_encoding=None,
+    snmp_backend=SNMPBackendEnum.STORED_WALK,
+)
 
 
 @pytest.mark.parametrize(
@@ -66,3 +89,129 @@ def create_files(tmpdir):
     p1.write(".1.2.3 foo\n.1.2.4 bar\nfoobar\n")
     p2 = (tmpdir / "walkdata").join("2.txt")
     p2.write(".1.2.3 foo\n\n\n.1.2.5 test\n")
+
+
+def _backend(path: Path) -> StoredWalkSNMPBackend:
+    return StoredWalkSNMPBackend(SNMP_CONFIG, logging.getLogger("test"), path)
+
+
+def _reference_walk(path: Path, oid: str) -> list[tuple[str, bytes]]:
+    # What the walk used to be: all records below the OID, in the order of the file
+    prefix = tuple(int(part) for part in oid.strip(".").split("."))
+    return [
+        (f".{line_oid.lstrip('.')}", utils.strip_snmp_value(value[0] if value else ""))
+        for line_oid, *value in (
+            line.split(None, 1)
+            for line in StoredWalkSNMPBackend.read_walk_from_path(path, logging.getLogger("test"))
+        )
+        if tuple(int(part) for part in line_oid.strip(".").split("."))[: len(prefix)] == prefix
+    ]
+
+
+class TestStoredWalkIndex:
+    def test_walk(self, tmp_path: Path) -> None:
+        path = tmp_path / "walk"
+        rng = random.Random(42)
+        path.write_text(
+            "".join(
+                f'.1.3.6.1.{table}.{column}.{index} "{rng.choice(["a", "b c", "00 FF "])}"\n'
+                for table in range(1, 12)
+                for column in range(1, 4)
+                for index in range(1, 15)
+            )
+        )
+        backend = _backend(path)
+
+        for oid in (".1.3.6.1.1", ".1.3.6.1.10.2", "1.3.6.1.11.3.14", ".1.3.6.1.2.4", ".1.3.6.2"):
+            assert backend.walk(oid, context="") == _reference_walk(path, oid)
+
+    def test_walk_unsorted_file(self, tmp_path: Path) -> None:
+        path = tmp_path / "walk"
+        path.write_text(".1.2.10 ten\n.1.2.9 nine\n.1.3 three\n.1.2.1.5 one five\n")
+
+        assert _backend(path).walk(".1.2", context="") == [
+            (".1.2.1.5", b"one five"),
+            (".1.2.9", b"nine"),
+            (".1.2.10", b"ten"),
+        ]
+
+    def test_multiline_values(self, tmp_path: Path) -> None:
+        path = tmp_path / "walk"
+        path.write_text("garbage\n.1.2.3 foo\n.1.2.4 bar\nfoobar\n.1.2.5\n")
+        backend = _backend(path)
+
+        assert backend.walk(".1.2", context="") == [
+            (".1.2.3", b"foo"),
+            (".1.2.4", b"bar\nfoobar"),
+            (".1.2.5", b""),
+        ]
+        assert backend.get(".1.2.4", context="") == b"bar\nfoobar"
+        assert backend.get(".1.2.6", context="") is None
+        assert backend.get(".1.2.*", context="") == b"foo"
+        assert backend.get(".1.2.3.*", context="") is None
+
+    def test_empty_file(self, tmp_path: Path) -> None:
+        path = tmp_path / "walk"
+        path.touch()
+
+        assert not _backend(path).walk(".1", context="")
+
+    def test_sidecar_index(self, tmp_path: Path) -> None:
+        path = tmp_path / "walk"
+        path.write_text(".1.2.3 foo\n.1.2.4 bar\n")
+        index_path = WalkIndex.index_path(path)
+
+        assert _backend(path).get(".1.2.3", context="") == b"foo"
+        assert index_path.exists()
+
+        # The index is reused ...
+        with mock.patch.object(WalkIndex, "_sorted_records") as sorted_records:
+            assert _backend(path).get(".1.2.4", context="") == b"bar"
+        sorted_records.assert_not_called()
+
+        # ... unless the walk changed
+        path.write_text(".1.2.3 foo\n.1.2.4 baz\n.1.2.5 new\n")
+        assert _backend(path).get(".1.2.4", context="") == b"baz"
+        assert _backend(path).get(".1.2.5", context="") == b"new"
+
+    def test_index_not_saved(self, tmp_path: Path) -> None:
+        path = tmp_path / "walk"
+        path.write_text(".1.2.3 foo\n")
+        with mock.patch.object(Path, "write_bytes", side_effect=PermissionError):
+            assert _backend(path).get(".1.2.3", context="") == b"foo"
+        assert not WalkIndex.index_path(path).exists()
+
+    def test_walk_is_not_read_again(self, tmp_path: Path) -> None:
+        path = tmp_path / "walk"
+        path.write_text(
+            "".join(
+                f'.1.3.6.1.2.1.{table}.1.{column}.{index} "some value {index}"\n'
+                for table in range(10)
+                for column in range(1, 6)
+                for index in range(1, 11)
+            )
+        )
+        backend = _backend(path)
+        backend.get(".1.3.6.1.2.1.0.1.1.1", context="")  # build the index
+
+        with (
+            mock.patch.object(WalkIndex, "open", wraps=WalkIndex.open) as open_index,
+            mock.patch.object(StoredWalkSNMPBackend, "read_walk_from_path") as read_walk,
+        ):
+            for table in range(10):
+                for column in (1, 5):
+                    oid = f".1.3.6.1.2.1.{table}.1.{column}"
+                    assert len(backend.walk(oid, context="")) == 10
+        open_index.assert_not_called()
+        read_walk.assert_not_called()
+
+    def test_broken_index(self, tmp_path: Path) -> None:
+        path = tmp_path / "walk"
+        path.write_text(".1.2.3 foo\n.1.2.4 bar\n")
+        assert _backend(path).get(".1.2.3", context="") == b"foo"
+
+        index_path = WalkIndex.index_path(path)
+        index_path.write_bytes(index_path.read_bytes()[:-3])
+        assert _backend(path).get(".1.2.4", context="") == b"bar"
+        index_path.write_bytes(b"")
+        assert _backend(path).get(".1.2.4", context="") == b"bar"
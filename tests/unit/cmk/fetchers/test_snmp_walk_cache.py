@@ -9,6 +9,8 @@ import logging
 from collections.abc import Iterable, MutableMapping
 from pathlib import Path
 
+import pytest
+
 from cmk.snmplib import SNMPRowInfo
 
 from cmk.fetchers._snmp import WalkCache
@@ -48,3 +50,61 @@ class TestWalkCache:
         assert (fetchoid, "12c3d4a", True) in cache
         cache.save()
         assert path in cache.mock_stored_on_fs
+
+    def test_save_and_load(self, tmp_path: Path) -> None:
+        rowinfo = [(".1.2.3.1", b"value"), (".1.2.3.2", b"\x00\xff"), (".1.2.3.3", b"")]
+        cache = WalkCache(tmp_path, logging.getLogger("test"))
+        cache[(".1.2.3", "12c3d4a", True)] = rowinfo
+        cache[(".1.2.4", "12c3d4a", False)] = [(".1.2.4.1", b"not saved")]
+        cache.save()
+
+        cache = WalkCache(tmp_path, logging.getLogger("test"))
+        cache.load()
+        assert list(cache) == [(".1.2.3", "12c3d4a", True)]
+        assert cache[(".1.2.3", "12c3d4a", True)] == rowinfo
+
+    def test_clear(self, tmp_path: Path) -> None:
+        rowinfo = [(".1.2.3.1", b"value")]
+        cache = WalkCache(tmp_path, logging.getLogger("test"))
+        cache[(".1.2.3", "12c3d4a", True)] = rowinfo
+        cache.save()
+        cache = WalkCache(tmp_path, logging.getLogger("test"))
+        cache.load()
+
+        cache.clear()
+
+        assert not list(tmp_path.iterdir())
+        assert not cache
+        cache.save()
+        assert not list(tmp_path.iterdir())
+
+    def test_load_legacy_format(self, tmp_path: Path) -> None:
+        (tmp_path / "OID.1.2.3-12c3d4a").write_text("[('.1.2.3.1', b'value')]\n")
+        cache = WalkCache(tmp_path, logging.getLogger("test"))
+        cache.load()
+        assert cache[(".1.2.3", "12c3d4a", True)] == [(".1.2.3.1", b"value")]
+
+    def test_broken_file_is_not_cached(self, tmp_path: Path) -> None:
+        (tmp_path / "OID.1.2.3-12c3d4a").write_bytes(b"CMKOIDS1 broken")
+        cache = WalkCache(tmp_path, logging.getLogger("test"))
+        cache.load()
+        assert (".1.2.3", "12c3d4a", True) in cache
+        with pytest.raises(KeyError):
+            _ = cache[(".1.2.3", "12c3d4a", True)]
+        assert not cache
+
+    def test_only_fetched_rows_are_saved(self, tmp_path: Path) -> None:
+        cache = MockWalkCache(
+            {
+                "OID.1.2.3-12c3d4a": [(".1.2.3.1", b"3")],
+                "OID.1.2.4-12c3d4a": [(".1.2.4.1", b"4")],
+                "OID.1.2.5-12c3d4a": [(".1.2.5.1", b"5")],
+            },
+            tmp_path,
+        )
+        cache.load()
+        _ = cache[(".1.2.3", "12c3d4a", True)]
+        cache[(".1.2.4", "12c3d4a", True)] = [(".1.2.4.1", b"fetched")]
+        cache.mock_stored_on_fs.clear()
+        cache.save()
+        assert cache.mock_stored_on_fs == {"OID.1.2.4-12c3d4a": [(".1.2.4.1", b"fetched")]}
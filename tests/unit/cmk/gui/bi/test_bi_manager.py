@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+from types import SimpleNamespace
+
+import pytest
+
+from cmk.utils.user import UserId
+
+from cmk.gui.bi import bi_manager
+
+from cmk.bi.data_fetcher import BIStatusCache
+
+
+def test_status_caches_are_bounded(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(bi_manager, "_status_caches", {})
+    now = 1000.0
+    monkeypatch.setattr(bi_manager, "time", SimpleNamespace(monotonic=lambda: now))
+
+    def status_cache_of(user_id: str) -> BIStatusCache:
+        monkeypatch.setattr(bi_manager, "user", SimpleNamespace(id=UserId(user_id)))
+        return bi_manager._get_status_cache()
+
+    first = status_cache_of("user0")
+    for number in range(1, bi_manager._MAX_STATUS_CACHES):
+        status_cache_of(f"user{number}")
+    assert status_cache_of("user0") is first
+    assert len(bi_manager._status_caches) == bi_manager._MAX_STATUS_CACHES
+
+    # The cache of the user seen longest ago makes room for the one of a new user
+    status_cache_of("new")
+    assert len(bi_manager._status_caches) == bi_manager._MAX_STATUS_CACHES
+    assert "user1" not in bi_manager._status_caches
+    assert status_cache_of("user0") is first
+
+    # The caches not used for a full refresh interval are dropped
+    now += first.max_age / 2
+    status_cache_of("user0")
+    now += first.max_age
+    assert status_cache_of("user0") is first
+    assert list(bi_manager._status_caches) == ["user0"]
@@ -4,7 +4,9 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import datetime
+import os
 from collections.abc import Mapping, Sequence
+from pathlib import Path
 from typing import Any, NamedTuple
 from zoneinfo import ZoneInfo
 
@@ -18,8 +20,17 @@ import cmk.ccc.version as cmk_version
 
 import cmk.utils.tags
 from cmk.utils import paths
+from cmk.utils.hostaddress import HostName
+from cmk.utils.inventory_index import InventoryIndex
 from cmk.utils.livestatus_helpers.testing import MockLiveStatusConnection
-from cmk.utils.structured_data import deserialize_tree
+from cmk.utils.structured_data import (
+    deserialize_tree,
+    make_meta,
+    MutableTree,
+    SDKey,
+    SDNodeName,
+    TreeStore,
+)
 
 from cmk.gui.bi import _filters as bi_filters
 from cmk.gui.type_defs import Rows, VisualContext
@@ -1263,6 +1274,63 @@ def test_filters_filter_inv_table(test: FilterTableTest) -> None:
                 assert row["host_inventory"] == expected_row["host_inventory"]
 
 
+def test_filters_filter_inv_via_index(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, request_context: None
+) -> None:
+    monkeypatch.setattr(paths, "inventory_output_dir", str(tmp_path / "inventory"))
+    monkeypatch.setattr(paths, "status_data_dir", str(tmp_path / "status_data"))
+    monkeypatch.setattr(paths, "inventory_index_file", tmp_path / "index.sqlite")
+    tree_store = TreeStore(tmp_path / "inventory")
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    for host_name, vendor, version in (
+        ("indexed", "bla", "1.0"),
+        ("other", "blu", "2.0"),
+        ("outdated", "blu", "2.0"),
+    ):
+        tree = MutableTree()
+        tree.add(path=(SDNodeName("software"), SDNodeName("os")), pairs=[{SDKey("vendor"): vendor}])
+        tree.add(
+            path=(SDNodeName("software"), SDNodeName("packages")),
+            key_columns=[SDKey("name")],
+            rows=[{SDKey("name"): "bash", SDKey("version"): version}],
+        )
+        tree_store.save(host_name=HostName(host_name), tree=tree, meta=make_meta(do_archive=False))
+        index.update(
+            HostName(host_name),
+            tree,
+            mtime_ns=(tmp_path / "inventory" / host_name).stat().st_mtime_ns,
+        )
+
+    # The tree changed after it was indexed: it has to be loaded
+    tree = MutableTree()
+    tree.add(path=(SDNodeName("software"), SDNodeName("os")), pairs=[{SDKey("vendor"): "bla"}])
+    tree_store.save(host_name=HostName("outdated"), tree=tree, meta=make_meta(do_archive=False))
+    os.utime(tmp_path / "inventory" / "outdated", ns=(0, 0))
+
+    rows = [{"host_name": h} for h in ("indexed", "other", "outdated", "unknown")]
+    assert filter_registry["inv_software_os_vendor"].filter_table(
+        {"inv_software_os_vendor": {"inv_software_os_vendor": "bla"}}, rows
+    ) == [{"host_name": "indexed"}, rows[2]]
+    assert "host_inventory" not in rows[0]
+    assert rows[2]["host_inventory"] == tree_store.load(host_name=HostName("outdated"))
+
+    assert [
+        row["host_name"]
+        for row in filter_registry["invswpac"].filter_table(
+            {
+                "invswpac": {
+                    "invswpac_host_name": "bash",
+                    "invswpac_host_version_from": "1.5",
+                    "invswpac_host_version_to": "",
+                    "invswpac_host_negate": "",
+                    "invswpac_host_match": "exact",
+                }
+            },
+            rows,
+        )
+    ] == ["other"]
+
+
 # Filter form is not really checked. Only checking that no exception occurs
 def test_filters_display_with_empty_request(
     live: MockLiveStatusConnection, request_context: None, patch_theme: None
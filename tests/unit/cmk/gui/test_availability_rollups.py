@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import re
+import time
+from collections.abc import Sequence
+from pathlib import Path
+
+import pytest
+
+from livestatus import Query, SiteId
+
+import cmk.utils.paths
+
+from cmk.gui import availability
+from cmk.gui.availability_rollups import AvailabilityRollups, day_boundaries
+
+_SITE = SiteId("heute")
+_DAY = 86400
+
+# host name, service description, spans of (from, until, state, in_downtime, in_service_period)
+_History = Sequence[tuple[str, str, Sequence[tuple[int, int, int, int, int]]]]
+
+
+def _midnight() -> int:
+    tm = time.localtime(time.time() - 30 * _DAY)
+    return int(time.mktime((tm.tm_year, tm.tm_mon, tm.tm_mday, 0, 0, 0, 0, 0, -1)))
+
+
+def _history(start: int) -> _History:
+    return [
+        ("heute", "", [(start - _DAY, start + 10 * _DAY, 0, 0, 1)]),
+        (
+            "heute",
+            "CPU load",
+            [
+                (start - _DAY, start + 3600, 0, 0, 1),
+                (start + 3600, start + 2 * _DAY + 7200, 2, 0, 1),
+                (start + 2 * _DAY + 7200, start + 3 * _DAY, 2, 1, 1),
+                (start + 3 * _DAY, start + 5 * _DAY + 60, 1, 0, 0),
+                (start + 5 * _DAY + 60, start + 10 * _DAY, 0, 0, 1),
+            ],
+        ),
+        (
+            "gestern",
+            "Memory",
+            [
+                (start - _DAY, start + _DAY // 2, 3, 0, 1),
+                (start + _DAY // 2, start + 10 * _DAY, 0, 0, 1),
+            ],
+        ),
+    ]
+
+
+def _statehist(history: _History, from_time: int, until_time: int) -> list[list[object]]:
+    """The rows of the statehist table with the availability columns, clipped to the time range"""
+    rows: list[list[object]] = []
+    for host_name, service_description, spans in history:
+        for span_from, span_until, state, in_downtime, in_service_period in spans:
+            span_from, span_until = max(span_from, from_time), min(span_until, until_time)
+            if span_from < span_until:
+                rows.append(
+                    [
+                        host_name,
+                        service_description,
+                        span_until - span_from,
+                        span_from,
+                        span_until,
+                        state,
+                        0,
+                        in_downtime,
+                        0,
+                        1,
+                        in_service_period,
+                        0,
+                    ]
+                )
+    return rows
+
+
+def _roll_up(path: Path, history: _History, boundaries: Sequence[int]) -> None:
+    rollups = AvailabilityRollups(path)
+    for day, day_end in zip(boundaries, boundaries[1:]):
+        durations: dict[tuple[object, ...], int] = {}
+        for row in _statehist(history, day, day_end):
+            key = (row[0], row[1], *row[5:])
+            durations[key] = durations.get(key, 0) + row[2]  # type: ignore[operator]
+        rollups.save_day(
+            _SITE, day, day_end, [(*key, duration) for key, duration in durations.items()]
+        )
+
+
+def test_day_boundaries() -> None:
+    start = _midnight()
+    assert not day_boundaries(start + 1, start + _DAY)
+    assert not day_boundaries(start, start + _DAY - 1)
+    boundaries = day_boundaries(start - 1, start + 3 * _DAY + 1)
+    assert len(boundaries) == 4
+    assert boundaries[0] == start
+    assert all(time.localtime(boundary)[3:6] == (0, 0, 0) for boundary in boundaries)
+
+
+def test_rollups_store(tmp_path: Path) -> None:
+    rollups = AvailabilityRollups(tmp_path / "rollups.sqlite")
+    assert not rollups.rolled_up_days([_SITE])
+    assert not rollups.durations([_SITE], 0, 2 * _DAY, services=True)
+
+    key = (0, 0, 0, 0, 1, 1, 0)
+    rollups.save_day(_SITE, 0, _DAY, [("heute", "CPU load", *key, 100), ("heute", "", *key, 50)])
+    rollups.save_day(_SITE, _DAY, 2 * _DAY, [("heute", "CPU load", *key, 200)])
+    rollups.save_day(SiteId("gestern"), _DAY, 2 * _DAY, [])
+    assert rollups.rolled_up_days([_SITE]) == {(0, _DAY), (_DAY, 2 * _DAY)}
+    assert rollups.rolled_up_days([_SITE, SiteId("gestern")]) == {(_DAY, 2 * _DAY)}
+
+    assert rollups.durations([_SITE], 0, 2 * _DAY, services=True) == [
+        (_SITE, "heute", "CPU load", key, 300)
+    ]
+    assert rollups.durations([_SITE], _DAY, 2 * _DAY, services=False) == []
+
+    # Rolling up a day again replaces it
+    rollups.save_day(_SITE, 0, _DAY, [("heute", "CPU load", *key, 10)])
+    assert rollups.durations([_SITE], 0, 2 * _DAY, services=True) == [
+        (_SITE, "heute", "CPU load", key, 210)
+    ]
+    assert rollups.durations([_SITE], 0, 2 * _DAY, services=False) == []
+
+    rollups.remove_days_before(_DAY)
+    assert rollups.rolled_up_days([_SITE]) == {(_DAY, 2 * _DAY)}
+    assert rollups.durations([_SITE], 0, 2 * _DAY, services=True) == [
+        (_SITE, "heute", "CPU load", key, 200)
+    ]
+
+
+@pytest.mark.parametrize("what", ["host", "service"])
+@pytest.mark.parametrize(
+    "from_days, until_days, rolled_up_days",
+    [
+        pytest.param(0.5, 8.5, (0, 10), id="edges on both sides"),
+        pytest.param(0, 8, (0, 10), id="whole days"),
+        pytest.param(0.2, 9, (2, 6), id="partially rolled up"),
+    ],
+)
+def test_availability_from_rollups(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    what: availability.AVObjectType,
+    from_days: float,
+    until_days: float,
+    rolled_up_days: tuple[int, int],
+) -> None:
+    start = _midnight()
+    history = _history(start)
+    monkeypatch.setattr(cmk.utils.paths, "availability_rollups_file", tmp_path / "rollups.sqlite")
+    monkeypatch.setattr(availability, "load_annotations", lambda: {})
+    boundaries = day_boundaries(start, start + 10 * _DAY)
+    _roll_up(
+        cmk.utils.paths.availability_rollups_file,
+        history,
+        boundaries[rolled_up_days[0] : rolled_up_days[1] + 1],
+    )
+
+    queries: list[str] = []
+
+    def query_livestatus(query: Query, **_kwargs: object) -> list[list[object]]:
+        queries.append(str(query))
+        from_time, until_time = map(int, re.findall(r"Filter: time [<>]=? (\d+)", str(query)))
+        services = "Filter: service_description !=\n" in str(query)
+        return [
+            [_SITE, *row]
+            for row in _statehist(history, from_time, until_time)
+            if bool(row[1]) is services
+        ]
+
+    monkeypatch.setattr(availability, "query_livestatus", query_livestatus)
+
+    def compute(use_rollups: bool) -> dict[tuple[str, str], tuple[object, ...]]:
+        avoptions = availability.get_default_avoptions(
+            (start + from_days * _DAY, start + until_days * _DAY)
+        )
+        avoptions["use_rollups"] = use_rollups
+        av_rawdata, exceeded_log_row_limit = availability.get_availability_rawdata(
+            what, {}, "", [_SITE], None, False, False, avoptions
+        )
+        assert not exceeded_log_row_limit
+        return {
+            (entry["host"], entry["service"]): (
+                entry["states"],
+                entry["total_duration"],
+                entry["considered_duration"],
+            )
+            for entry in availability.compute_availability(what, av_rawdata, avoptions)
+        }
+
+    expected = compute(False)
+    assert len(queries) == 1
+    assert compute(True) == expected
+    assert len(queries) == (3 if from_days % 1 else 2)
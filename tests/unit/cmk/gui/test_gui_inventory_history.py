@@ -3,6 +3,7 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import os
 from pathlib import Path
 
 import pytest
@@ -11,7 +12,7 @@ from cmk.ccc.exceptions import MKGeneralException
 
 import cmk.utils
 from cmk.utils.hostaddress import HostName
-from cmk.utils.structured_data import deserialize_tree, serialize_tree
+from cmk.utils.structured_data import deserialize_tree, serialize_tree, TreeOrArchiveStore
 
 from cmk.gui.inventory._history import get_history, load_delta_tree, load_latest_delta_tree
 
@@ -114,6 +115,42 @@ def test_get_history(request_context: None) -> None:
         assert delta_cache_filename == expected_delta_cache_filename
 
 
+def test_get_history_from_archived_deltas(request_context: None) -> None:
+    hostname = HostName("inv-host")
+    tree_or_archive_store = TreeOrArchiveStore(
+        cmk.utils.paths.inventory_output_dir,
+        cmk.utils.paths.inventory_archive_dir,
+    )
+    for timestamp, raw_tree in enumerate(
+        [{"inv": "attr-0"}, {"inv": "attr-1"}, {"inv-2": "attr"}, {"inv": "attr-3"}]
+    ):
+        cmk.ccc.store.save_object_to_file(
+            tree_file := Path(cmk.utils.paths.inventory_output_dir, hostname),
+            serialize_tree(deserialize_tree(raw_tree)),
+        )
+        os.utime(tree_file, (timestamp, timestamp))
+        tree_or_archive_store.archive(host_name=hostname)
+    # current tree
+    cmk.ccc.store.save_object_to_file(
+        Path(cmk.utils.paths.inventory_output_dir, hostname),
+        serialize_tree(deserialize_tree({"inv": "attr"})),
+    )
+
+    history, corrupted_history_files = get_history(hostname)
+
+    assert [(entry.new, entry.changed, entry.removed) for entry in history] == [
+        (1, 0, 0),
+        (0, 1, 0),
+        (1, 0, 1),
+        (1, 0, 1),
+        (0, 1, 0),
+    ]
+    assert len(corrupted_history_files) == 0
+    # The deltas stored in the archive are not cached again
+    assert not Path(cmk.utils.paths.inventory_delta_cache_dir, hostname, "1_2").exists()
+    assert not Path(cmk.utils.paths.inventory_delta_cache_dir, hostname, "2_3").exists()
+
+
 def test_get_history_corrupted_files() -> None:
     hostname = HostName("inv-host")
     archive_dir = Path(cmk.utils.paths.inventory_archive_dir, hostname)
@@ -3,8 +3,35 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import functools
+import time
+from collections.abc import Callable, Mapping
+from typing import Any
+
+import pytest
+
+from cmk.gui.painter.v1.helpers import get_perfdata_nth_value
+from cmk.gui.type_defs import Row, Rows
+from cmk.gui.utils import savefloat
 from cmk.gui.view import View
-from cmk.gui.views.page_show_view import _get_needed_regular_columns
+from cmk.gui.views.page_show_view import _get_needed_regular_columns, _sort_data
+from cmk.gui.views.sorter import (
+    cmp_insensitive_string,
+    cmp_ip_address,
+    cmp_num_split,
+    cmp_simple_number,
+    cmp_simple_string,
+    cmp_string_list,
+    sorter_registry,
+    SorterEntry,
+)
+from cmk.gui.views.sorter.sorters import (
+    cmp_date,
+    cmp_host_state_equiv,
+    cmp_log_what,
+    cmp_service_name,
+    cmp_state_equiv,
+)
 from cmk.gui.visuals.filter import Filter
 
 
@@ -67,3 +94,174 @@ def test_get_needed_regular_columns(view: View) -> None:
             "some_column",
         ]
     )
+
+
+def _cmp(v1: Any, v2: Any) -> int:
+    return (v1 > v2) - (v1 < v2)
+
+
+def _cmp_ips(ip1: str, ip2: str) -> int:
+    def split_ip(ip: str) -> tuple:
+        try:
+            return tuple(int(part) for part in ip.split("."))
+        except ValueError:
+            return (255, 255, 255, 255, ip)
+
+    return _cmp(split_ip(ip1), split_ip(ip2))
+
+
+def _custom_variable(row: Row, name: str) -> str:
+    return dict(zip(row["host_custom_variable_names"], row["host_custom_variable_values"])).get(
+        name, ""
+    )
+
+
+def _num_problems(row: Row) -> int:
+    return row["host_num_services"] - row["host_num_services_ok"] - row["host_num_services_pending"]
+
+
+# The compare functions of the sorters before they were ported to sort keys
+_LEGACY_COMPARE: Mapping[str, Callable[[Row, Row], int]] = {
+    "svcstate": lambda r1, r2: _cmp(cmp_state_equiv(r1), cmp_state_equiv(r2)),
+    "hoststate": lambda r1, r2: _cmp(cmp_host_state_equiv(r1), cmp_host_state_equiv(r2)),
+    "site_host": lambda r1, r2: _cmp(r1["site"], r2["site"]) or cmp_num_split("host_name", r1, r2),
+    "svcdescr": lambda r1, r2: cmp_service_name("service_description", r1, r2),
+    "host_labels": lambda r1, r2: _cmp(
+        sorted(r1["host_labels"].items()), sorted(r2["host_labels"].items())
+    ),
+    "svc_perf_val02": lambda r1, r2: _cmp(
+        savefloat(get_perfdata_nth_value(r1, 1, True)),
+        savefloat(get_perfdata_nth_value(r2, 1, True)),
+    ),
+    "host_custom_variable": lambda r1, r2: cmp_insensitive_string(
+        _custom_variable(r1, "FOO"), _custom_variable(r2, "FOO")
+    ),
+    "host_ipv4_address": lambda r1, r2: _cmp_ips(
+        _custom_variable(r1, "ADDRESS_4"), _custom_variable(r2, "ADDRESS_4")
+    ),
+    "num_problems": lambda r1, r2: _cmp(_num_problems(r1), _num_problems(r2)),
+    "stateage": lambda r1, r2: cmp_simple_number("service_last_state_change", r1, r2),
+    "svcoutput": lambda r1, r2: cmp_simple_string("service_plugin_output", r1, r2),
+    "svc_contacts": lambda r1, r2: cmp_string_list("service_contacts", r1, r2),
+    "svc_next_check": lambda r1, r2: cmp_simple_number("service_next_check", r2, r1),
+    "alias": lambda r1, r2: cmp_num_split("host_alias", r1, r2),
+    "host_address": lambda r1, r2: cmp_ip_address("host_address", r1, r2),
+    "log_what": lambda r1, r2: cmp_log_what("log_type", r1, r2),
+    "log_date": lambda r1, r2: cmp_date("log_time", r1, r2),
+}
+
+
+def _rows(num_rows: int) -> Rows:
+    names = ["Host10", "host2", "Host2", "host1", "srv-01.b", "srv-1.a", "Srv-10"]
+    services = ["Check_MK", "Check_MK Discovery", "CPU load", "cpu load", "Interface 10"]
+    services += ["Interface 2", "Filesystem /srv/10", "Filesystem /Srv/9"]
+    addresses = ["10.0.0.10", "10.0.0.2", "10.0.0.2", "192.168.1.1", "myhost", ""]
+    log_types = ["HOST ALERT", "SERVICE ALERT", "HOST DOWNTIME ALERT", "CURRENT SERVICE STATE"]
+    log_types += ["EXTERNAL COMMAND", "SERVICE NOTIFICATION", "HOST NOTIFICATION"]
+    return [
+        {
+            "site": f"site{row % 3}",
+            "host_name": names[row % len(names)],
+            "host_alias": names[row * 3 % len(names)],
+            "host_address": addresses[row % len(addresses)],
+            "host_state": row % 3,
+            "host_has_been_checked": int(row % 7 != 0),
+            "host_labels": {f"label{row % 2}": f"value{row % 5}"} if row % 4 else {},
+            "host_custom_variable_names": ["FOO", "ADDRESS_4"][: row % 3],
+            "host_custom_variable_values": [
+                ["abc", "ABC", "b", ""][row % 4],
+                addresses[row * 5 % len(addresses)],
+            ][: row % 3],
+            "host_num_services": 10 + row % 6,
+            "host_num_services_ok": row % 9,
+            "host_num_services_pending": row % 2,
+            "service_description": services[row % len(services)],
+            "service_state": row % 4,
+            "service_has_been_checked": int(row % 11 != 0),
+            "service_last_state_change": row * 7 % 13,
+            "service_next_check": row * 5 % 17,
+            "service_plugin_output": ["OK - fine", "ok - fine", "CRIT - down", "", "b"][row % 5],
+            "service_contacts": [["b"], ["a", "c"], [], ["A"]][row % 4],
+            "service_perf_data": (
+                f"load1={row % 3} load5={row * 3 % 7}.5ms;5;10 load15=1" if row % 5 else ""
+            ),
+            "log_type": log_types[row % len(log_types)],
+            "log_time": 1700000000 + row * 7919 % 200 * 37000,
+            "JOIN": {"CPU load": {"service_last_state_change": row % 5}} if row % 2 else {},
+        }
+        for row in range(num_rows)
+    ]
+
+
+def _sort_legacy(rows: Rows, sorters: list[SorterEntry]) -> Rows:
+    def compare(r1: Row, r2: Row) -> int:
+        for entry in sorters:
+            row1, row2 = r1, r2
+            if entry.join_key:
+                row1, row2 = r1["JOIN"].get(entry.join_key), r2["JOIN"].get(entry.join_key)
+                if row1 is None or row2 is None:
+                    if c := (row1 is not None) - (row2 is not None):
+                        return -c if entry.negate else c
+                    continue
+            if c := _LEGACY_COMPARE[entry.sorter.ident](row1, row2):
+                return -c if entry.negate else c
+        return 0
+
+    return sorted(rows, key=functools.cmp_to_key(compare))
+
+
+@pytest.mark.usefixtures("request_context")
+@pytest.mark.parametrize("negate", [False, True])
+@pytest.mark.parametrize("ident", sorted(_LEGACY_COMPARE))
+def test_sort_data_by_key(ident: str, negate: bool) -> None:
+    sorter = sorter_registry[ident]
+    assert sorter.key is not None
+    sorters = [
+        SorterEntry(
+            sorter, negate, None, {"ident": "foo"} if ident == "host_custom_variable" else None
+        )
+    ]
+    rows = _rows(200)
+    data = list(rows)
+    _sort_data(data, sorters)
+    assert data == _sort_legacy(rows, sorters)
+    assert data != rows
+
+
+@pytest.mark.usefixtures("request_context")
+def test_sort_data_by_many_keys() -> None:
+    sorters = [
+        SorterEntry(sorter_registry["svcstate"], True, None, None),
+        SorterEntry(sorter_registry["stateage"], False, "CPU load", None),
+        SorterEntry(sorter_registry["site_host"], False, None, None),
+        SorterEntry(sorter_registry["svcdescr"], True, None, None),
+    ]
+    rows = _rows(500)
+    data = list(rows)
+    _sort_data(data, sorters)
+    assert data == _sort_legacy(rows, sorters)
+
+
+@pytest.mark.slow
+@pytest.mark.usefixtures("request_context")
+def test_benchmark_sort_data() -> None:
+    sorters = [
+        SorterEntry(sorter_registry["svcstate"], True, None, None),
+        SorterEntry(sorter_registry["stateage"], False, "CPU load", None),
+        SorterEntry(sorter_registry["site_host"], False, None, None),
+        SorterEntry(sorter_registry["svcdescr"], True, None, None),
+    ]
+    rows = _rows(50000)
+
+    start = time.perf_counter()
+    _sort_data(list(rows), sorters)
+    by_key = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _sort_legacy(rows, sorters)
+    by_compare_function = time.perf_counter() - start
+
+    print(
+        f"\nSorting {len(rows)} rows: {by_key:.2f}s by key,"
+        f" {by_compare_function:.2f}s by the original compare functions"
+    )
@@ -118,6 +118,8 @@ def test_registered_configvars() -> None:
         "housekeeping_interval",
         "sqlite_housekeeping_interval",
         "sqlite_freelist_size",
+        "sqlite_write_batch_size",
+        "sqlite_write_interval",
         "user_security_notification_duration",
         "http_proxies",
         "inventory_check_autotrigger",
@@ -186,6 +188,7 @@ def test_registered_configvars() -> None:
         "trusted_certificate_authorities",
         "ui_theme",
         "use_dns_cache",
+        "compress_data_source_cache",
         "snmp_backend_default",
         "use_inline_snmp",
         "use_new_descriptions_for",
@@ -28,11 +28,13 @@ from cmk.snmplib import (
     BackendSNMPTree,
     ensure_str,
     get_snmp_table,
+    get_snmp_table_walks,
     SNMPBackend,
     SNMPBackendEnum,
     SNMPContextConfig,
     SNMPContextTimeout,
     SNMPHostConfig,
+    SNMPRowInfo,
     SNMPTable,
     SNMPVersion,
     SpecialColumn,
@@ -262,3 +264,33 @@ def test_walk_raises_on_timeout_without_snmpv3_context_stop_on_timeout() -> None
         )
 
     assert type(excinfo.value) is SNMPContextTimeout  # pylint: disable=unidiomatic-typecheck
+
+
+def test_get_snmp_table_walks() -> None:
+    backend = SNMPTestBackend(SNMPConfig, logger)
+    tree = BackendSNMPTree(
+        base=".1.2.3",
+        oids=[
+            BackendOIDSpec(SpecialColumn.END, "string", False),
+            BackendOIDSpec("4", "string", False),
+            BackendOIDSpec("5", "string", True),
+        ],
+    )
+    walk_cache: dict[tuple[str, str, bool], SNMPRowInfo] = {}
+
+    assert get_snmp_table_walks(
+        section_name=SectionName("unit_test"), tree=tree, walk_cache=walk_cache, backend=backend
+    ) == [(".1.2.3.4", ""), (".1.2.3.5", "")]
+
+    _snmp_table.get_snmpwalk(
+        SectionName("unit_test"),
+        tree.base,
+        ".1.2.3.5",
+        walk_cache=walk_cache,
+        save_walk_cache=True,
+        backend=backend,
+        log=logger.debug,
+    )
+    assert get_snmp_table_walks(
+        section_name=SectionName("unit_test"), tree=tree, walk_cache=walk_cache, backend=backend
+    ) == [(".1.2.3.4", "")]
@@ -41,3 +41,18 @@ def test_old_files_are_converted(tmp_path: Path) -> None:
     with vsm.namespace(service):
         assert vsm.active_service_interface
         assert vsm.active_service_interface["user-key"] == 42
+
+
+def test_journals_are_ignored(tmp_path: Path) -> None:
+    host = HostAddress("heute")
+    ValueStoreManager.STORAGE_PATH = tmp_path
+    vsm = ValueStoreManager(host)
+    with vsm.namespace(ServiceID(CheckPluginName("plugin"), "item")):
+        assert vsm.active_service_interface is not None
+        vsm.active_service_interface["user-key"] = 42
+    vsm.save()
+    content = (tmp_path / str(host)).read_bytes()
+
+    ConvertCounters.convert_counter_files(tmp_path, getLogger())
+
+    assert (tmp_path / str(host)).read_bytes() == content
@@ -3,8 +3,15 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+from collections.abc import Sequence
+from pathlib import Path
 
-from cmk.utils.prediction import estimate_levels
+from livestatus import RRDResponse
+
+from cmk.utils.prediction import estimate_levels, make_updated_predictions, PredictionStore
+from cmk.utils.prediction._plugin_interface import PredictionCache
+
+from cmk.agent_based.prediction_backend import PredictionInfo, PredictionParameters
 
 
 def test_estimate_levels_absolute() -> None:
@@ -45,3 +52,89 @@ def test_estimate_levels_lower_ubound() -> None:
     )
 
     assert estimate_levels(42.0, 1.0, "lower", ("stdev", (2.3, 3.2)), (38.5, 50.0)) == (38.5, 38.8)
+
+
+_NOW = 1700000000
+
+
+def _write_info(store: PredictionStore, direction: str, levels: float) -> PredictionInfo:
+    meta = PredictionInfo.model_validate(
+        {
+            "valid_interval": (_NOW - 3600, _NOW + 3600),
+            "metric": "load1",
+            "direction": direction,
+            "params": PredictionParameters(
+                period="hour", horizon=3, levels=("absolute", (levels, 2 * levels))
+            ),
+        }
+    )
+    path = Path(store.meta_file_path_template.format(meta=meta))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(meta.model_dump_json())
+    return meta
+
+
+class _RecordedData:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, Sequence[tuple[int, int]]]] = []
+
+    def __call__(
+        self, rpn: str, windows: Sequence[tuple[int, int]]
+    ) -> Sequence[RRDResponse | None]:
+        self.calls.append((rpn, windows))
+        return [RRDResponse(range(start, start + 180, 60), [1.0, 2.0, 3.0]) for start, _ in windows]
+
+
+def test_make_updated_predictions_computes_once(tmp_path: Path) -> None:
+    store = PredictionStore(tmp_path)
+    upper = _write_info(store, "upper", 1.0)
+    lower = _write_info(store, "lower", 1.0)
+    get_recorded_data = _RecordedData()
+    cache = PredictionCache()
+
+    predictions = make_updated_predictions(store, get_recorded_data, _NOW, cache)
+
+    # one batched request for all windows of the horizon, shared by both directions
+    assert [(rpn, len(windows)) for rpn, windows in get_recorded_data.calls] == [("load1.max", 3)]
+    assert predictions[hash(upper)][1] is not None
+    assert predictions[hash(lower)][1] is not None
+    assert store.load_prediction(upper) == store.load_prediction(lower) is not None
+    assert len(cache) == 1
+
+    # served from the cache
+    assert make_updated_predictions(store, get_recorded_data, _NOW, cache) == predictions
+    assert len(get_recorded_data.calls) == 1
+
+    # served from the files by other processes
+    assert (
+        make_updated_predictions(store, get_recorded_data, _NOW, PredictionCache()) == predictions
+    )
+    assert len(get_recorded_data.calls) == 1
+
+
+def test_make_updated_predictions_recomputes_changed_parameters(tmp_path: Path) -> None:
+    store = PredictionStore(tmp_path)
+    _write_info(store, "upper", 1.0)
+    get_recorded_data = _RecordedData()
+    cache = PredictionCache()
+    make_updated_predictions(store, get_recorded_data, _NOW, cache)
+
+    # The levels do not affect the prediction data.
+    meta = _write_info(store, "upper", 5.0)
+    predictions = make_updated_predictions(store, get_recorded_data, _NOW, cache)
+    assert predictions[hash(meta)][1] == (7.0, 12.0)
+    assert len(get_recorded_data.calls) == 1
+    assert store.load_prediction(meta) is not None
+
+
+def test_prediction_cache_eviction(tmp_path: Path) -> None:
+    cache = PredictionCache(maxsize=1)
+    for name in ("a", "b"):
+        _write_info(store := PredictionStore(tmp_path / name), "upper", 1.0)
+        make_updated_predictions(store, _RecordedData(), _NOW, cache)
+        assert len(cache) == 1
+
+    cache.evict(_NOW + 3599)
+    assert len(cache) == 1
+    cache.evict(_NOW + 3600)
+    assert not cache
@@ -6,6 +6,9 @@
 # pylint: disable=protected-access
 
 import json
+import math
+import random
+from collections.abc import Iterable, Sequence
 
 import pytest
 
@@ -13,7 +16,67 @@ from tests.testlib.repo import repo_path
 
 from livestatus import RRDResponse
 
-from cmk.utils.prediction import _prediction
+from cmk.utils.prediction import _prediction, _statistics
+
+
+def _reference_forward_fill_resample(
+    current_range: range, values: Sequence[float | None], new_range: range
+) -> Sequence[float | None]:
+    if current_range == new_range:
+        return values
+
+    idx_max = len(values) - 1
+    return [
+        values[max(0, min(int((t - current_range.start) / current_range.step), idx_max))]
+        for t in new_range
+    ]
+
+
+def _reference_data_stats(
+    slices: Iterable[Iterable[float | None]],
+) -> list[_prediction.DataStat | None]:
+    def from_values(values: Sequence[float]) -> _prediction.DataStat:
+        average = sum(values) / float(len(values))
+        return _prediction.DataStat(
+            average=average,
+            min_=min(values),
+            max_=max(values),
+            stdev=(
+                None
+                if len(values) == 1
+                else math.sqrt(
+                    abs(sum(p**2 for p in values) - average**2 * len(values))
+                    / float(len(values) - 1)
+                )
+            ),
+        )
+
+    return [
+        from_values(point_line)
+        if (point_line := [x for x in time_column if x is not None])
+        else None
+        for time_column in zip(*slices)
+    ]
+
+
+def _reference_calculate_data_for_prediction(
+    youngest_range: range,
+    raw_slices: Sequence[tuple[range, Sequence[float | None], int]],
+) -> _prediction.PredictionData:
+    """The pure Python implementation the vectorized one has to agree with"""
+    slices = [
+        _reference_forward_fill_resample(
+            current_range,
+            values,
+            range(youngest_range.start - shift, youngest_range.stop - shift, youngest_range.step),
+        )
+        for current_range, values, shift in raw_slices
+    ]
+    return _prediction.PredictionData(
+        points=_reference_data_stats(slices),
+        start=youngest_range.start,
+        step=youngest_range.step,
+    )
 
 
 def _load_fake_rrd_response(start: int, end: int) -> RRDResponse:
@@ -210,3 +273,51 @@ def test_calculate_data_for_prediction(
     assert len(expected_reference.points) == len(data_for_pred.points)
     for cal, ref in zip(data_for_pred.points, expected_reference.points):
         assert cal == pytest.approx(ref, rel=1e-12, abs=1e-12)
+
+    assert data_for_pred == _reference_calculate_data_for_prediction(raw_slices[0][0], raw_slices)
+
+
+def _make_random_slices(
+    rng: random.Random, youngest_range: range, count: int
+) -> list[tuple[range, list[float | None], int]]:
+    raw_slices: list[tuple[range, list[float | None], int]] = []
+    for n in range(count):
+        shift = n * 86400
+        # older slices have a coarser resolution
+        step = youngest_range.step * rng.choice((1, 1, 5, 20))
+        window = range(youngest_range.start - shift, youngest_range.stop - shift, step)
+        values: list[float | None] = [
+            None
+            if rng.random() < 0.1
+            else rng.choice((rng.random() * 10 ** rng.randint(-3, 9), 0.0))
+            for _t in window
+        ]
+        raw_slices.append((window, values, shift))
+    return raw_slices
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_calculate_data_for_prediction_is_equivalent(seed: int) -> None:
+    rng = random.Random(seed)
+    youngest_range = range(1700000000, 1700000000 + 3600 * rng.randint(1, 24), 60)
+    raw_slices = _make_random_slices(rng, youngest_range, rng.randint(1, 15))
+
+    assert _prediction._calculate_data_for_prediction(
+        youngest_range, raw_slices
+    ) == _reference_calculate_data_for_prediction(youngest_range, raw_slices)
+
+
+@pytest.mark.parametrize(
+    "slices",
+    [
+        [],
+        [[]],
+        [[None, None]],
+        [[1.0, None, 3.0], [None, None, -3.0], [2.0, None, 0.0]],
+        [[1e16, 1.0, -1e16], [1.0, 1e16, 1.0], [-1e16, -1e16, 1e16]],
+        [[0.1] * 3, [0.2] * 3, [0.3] * 3, [0.7, 0.1, None]],
+        [[1.0, 2.0, 3.0], [4.0, 5.0]],
+    ],
+)
+def test_data_stats_is_equivalent(slices: list[list[float | None]]) -> None:
+    assert _statistics.data_stats(slices) == _reference_data_stats(slices)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+import random
+from collections.abc import Mapping, Sequence
+
+from cmk.utils.hostaddress import HostName
+from cmk.utils.labels import BuiltinHostLabelsStore, Labels
+from cmk.utils.rulesets.host_bitmap_index import HostBitmapIndex
+from cmk.utils.rulesets.ruleset_matcher import (
+    LabelManager,
+    matches_host_name,
+    matches_host_tags,
+    matches_labels,
+    RuleConditionsSpec,
+    RulesetMatcher,
+    TagCondition,
+)
+from cmk.utils.tags import TagGroupID, TagID
+
+
+def test_host_bitmap_index_roundtrip() -> None:
+    hosts = [HostName(f"host{i}") for i in range(20)]
+    index = HostBitmapIndex(hosts, {}, {})
+
+    assert len(index) == 20
+    assert index.hosts_of_bits(0) == set()
+    assert index.hosts_of_bits(index.all_hosts) == set(hosts)
+    assert index.hosts_of_bits(index.bits_of_hosts(hosts[3:7])) == set(hosts[3:7])
+    assert index.bits_of_hosts(["unknown"]) == 0
+
+
+def test_host_bitmap_index_tags_and_folders() -> None:
+    index = HostBitmapIndex(
+        [HostName("a"), HostName("b"), HostName("c")],
+        {
+            HostName("a"): {(TagGroupID("criticality"), TagID("prod"))},
+            HostName("b"): {(TagGroupID("criticality"), TagID("test"))},
+            HostName("c"): {(TagGroupID("criticality"), TagID("prod"))},
+        },
+        {HostName("a"): "/lvl1/", HostName("b"): "/lvl1/lvl2/"},
+    )
+
+    prod = index.tag_bits(TagGroupID("criticality"), TagID("prod"))
+    assert index.hosts_of_bits(prod) == {"a", "c"}
+    assert index.tag_bits(TagGroupID("criticality"), TagID("dmz")) == 0
+    assert index.hosts_of_bits(index.folder_bits("/")) == {"a", "b", "c"}
+    assert index.hosts_of_bits(index.folder_bits("/lvl1/")) == {"a", "b"}
+    assert index.hosts_of_bits(index.folder_bits("/lvl1/lvl2/")) == {"b"}
+
+
+def test_host_bitmap_index_labels_are_indexed_lazily() -> None:
+    requested = []
+
+    def labels_of_host(hostname: HostName) -> Labels:
+        requested.append(hostname)
+        return {"os": "linux"} if hostname == "a" else {}
+
+    index = HostBitmapIndex([HostName("a"), HostName("b"), HostName("c")], {}, {})
+    candidates = index.bits_of_hosts(["a", "b"])
+
+    assert index.hosts_of_bits(index.label_bits(("os", "linux"), candidates, labels_of_host)) == {
+        "a"
+    }
+    assert index.label_bits(("os", "linux"), candidates, labels_of_host)
+    assert sorted(requested) == ["a", "b"]
+
+
+def _synthetic_config(
+    num_hosts: int, seed: int
+) -> tuple[
+    Mapping[HostName, Mapping[TagGroupID, TagID]],
+    Mapping[HostName, str],
+    Mapping[HostName, Labels],
+]:
+    rand = random.Random(seed)
+    host_tags = {}
+    host_paths = {}
+    host_labels = {}
+    for i in range(num_hosts):
+        hostname = HostName(f"host{i:06d}")
+        host_tags[hostname] = {
+            TagGroupID(f"grp{g}"): TagID(f"tag{g}_{rand.randrange(4)}") for g in range(8)
+        }
+        host_paths[hostname] = f"/dc{rand.randrange(5)}/rack{rand.randrange(20)}/"
+        host_labels[hostname] = {f"lbl{l}": f"val{rand.randrange(3)}" for l in range(4)}
+    return host_tags, host_paths, host_labels
+
+
+def _synthetic_conditions(num_rules: int, seed: int) -> Sequence[RuleConditionsSpec]:
+    rand = random.Random(seed)
+    conditions: list[RuleConditionsSpec] = []
+    for _ in range(num_rules):
+        condition: RuleConditionsSpec = {}
+        tag_conditions: dict[TagGroupID, TagCondition] = {}
+        for g in rand.sample(range(8), rand.randrange(3)):
+            match rand.randrange(4):
+                case 0:
+                    tag_conditions[TagGroupID(f"grp{g}")] = TagID(f"tag{g}_{rand.randrange(4)}")
+                case 1:
+                    tag_conditions[TagGroupID(f"grp{g}")] = {"$ne": TagID(f"tag{g}_0")}
+                case 2:
+                    tag_conditions[TagGroupID(f"grp{g}")] = {
+                        "$or": [TagID(f"tag{g}_1"), TagID(f"tag{g}_2")]
+                    }
+                case 3:
+                    tag_conditions[TagGroupID(f"grp{g}")] = {"$nor": [TagID(f"tag{g}_3")]}
+        if tag_conditions:
+            condition["host_tags"] = tag_conditions
+        if rand.randrange(3) == 0:
+            condition["host_label_groups"] = [
+                ("and", [("and", f"lbl{rand.randrange(4)}:val0"), ("or", "lbl0:val1")]),
+                ("not", [("and", f"lbl{rand.randrange(4)}:val2")]),
+            ]
+        match rand.randrange(5):
+            case 0:
+                condition["host_name"] = [f"host{rand.randrange(1000):06d}" for _ in range(5)]
+            case 1:
+                condition["host_name"] = {"$nor": [{"$regex": "host0001"}]}
+            case 2:
+                condition["host_name"] = [{"$regex": ".*7$"}, "host000001"]
+        if rand.randrange(2) == 0:
+            condition["host_folder"] = f"/dc{rand.randrange(5)}/"
+        conditions.append(condition)
+    return conditions
+
+
+def _matcher(
+    host_tags: Mapping[HostName, Mapping[TagGroupID, TagID]],
+    host_paths: Mapping[HostName, str],
+    host_labels: Mapping[HostName, Labels],
+) -> RulesetMatcher:
+    return RulesetMatcher(
+        host_tags=dict(host_tags),
+        host_paths=host_paths,
+        label_manager=LabelManager(
+            explicit_host_labels=dict(host_labels),
+            host_label_rules=(),
+            service_label_rules=(),
+            discovered_labels_of_service=lambda *args, **kw: {},
+        ),
+        all_configured_hosts=frozenset(host_tags),
+        clusters_of={},
+        nodes_of={},
+        builtin_host_labels_store=BuiltinHostLabelsStore(),
+    )
+
+
+def _reference_matching_hosts(
+    condition: RuleConditionsSpec,
+    host_tags: Mapping[HostName, Mapping[TagGroupID, TagID]],
+    host_paths: Mapping[HostName, str],
+    host_labels: Mapping[HostName, Labels],
+) -> set[HostName]:
+    """Evaluates the conditions host by host, like RulesetOptimizer used to do"""
+    if (hostlist := condition.get("host_name")) == []:
+        return set()
+    folder = condition.get("host_folder", "/")
+    return {
+        hostname
+        for hostname, tags in host_tags.items()
+        if host_paths.get(hostname, "/").startswith(folder)
+        and matches_host_tags(set(tags.items()), condition.get("host_tags", {}))
+        and matches_labels(host_labels[hostname], condition.get("host_label_groups", []))
+        and matches_host_name(hostlist, hostname)
+    }
+
+
+def test_all_matching_hosts_equals_per_host_matching() -> None:
+    host_tags, host_paths, host_labels = _synthetic_config(500, seed=4711)
+    optimizer = _matcher(host_tags, host_paths, host_labels).ruleset_optimizer
+
+    for condition in _synthetic_conditions(200, seed=42):
+        assert optimizer._all_matching_hosts(
+            condition, with_foreign_hosts=False
+        ) == _reference_matching_hosts(condition, host_tags, host_paths, host_labels), condition
+
+
+def test_all_matching_hosts_respects_processed_hosts() -> None:
+    host_tags, host_paths, host_labels = _synthetic_config(50, seed=1)
+    optimizer = _matcher(host_tags, host_paths, host_labels).ruleset_optimizer
+    optimizer.set_all_processed_hosts({HostName("host000001"), HostName("host000002")})
+
+    assert optimizer._all_matching_hosts({}, with_foreign_hosts=False) == {
+        "host000001",
+        "host000002",
+    }
+    assert optimizer._all_matching_hosts({}, with_foreign_hosts=True) == set(host_tags)
+
+
+def test_all_matching_hosts_many_hosts() -> None:
+    host_tags, host_paths, host_labels = _synthetic_config(5000, seed=4711)
+    optimizer = _matcher(host_tags, host_paths, host_labels).ruleset_optimizer
+
+    for condition in _synthetic_conditions(50, seed=42):
+        assert optimizer._all_matching_hosts(
+            condition, with_foreign_hosts=False
+        ) == _reference_matching_hosts(condition, host_tags, host_paths, host_labels), condition
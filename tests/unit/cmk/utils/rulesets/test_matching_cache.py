@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+from collections.abc import Mapping
+from pathlib import Path
+
+import pytest
+
+from cmk.utils.hostaddress import HostName
+from cmk.utils.labels import BuiltinHostLabelsStore
+from cmk.utils.rulesets.matching_cache import RulesetMatchingCache, RulesetMatchingCacheStore
+from cmk.utils.rulesets.ruleset_matcher import (
+    LabelManager,
+    RuleConditionsSpec,
+    RulesetMatcher,
+    RulesetOptimizer,
+)
+from cmk.utils.tags import TagGroupID, TagID
+
+_PROD: RuleConditionsSpec = {"host_tags": {TagGroupID("criticality"): TagID("prod")}}
+_LVL1: RuleConditionsSpec = {"host_folder": "/lvl1/"}
+
+
+def _optimizer(
+    host_tags: Mapping[HostName, Mapping[TagGroupID, TagID]],
+    host_paths: Mapping[HostName, str],
+) -> RulesetOptimizer:
+    return RulesetMatcher(
+        host_tags=dict(host_tags),
+        host_paths=host_paths,
+        label_manager=LabelManager(
+            explicit_host_labels={},
+            host_label_rules=(),
+            service_label_rules=(),
+            discovered_labels_of_service=lambda *args, **kw: {},
+        ),
+        all_configured_hosts=frozenset(host_tags),
+        clusters_of={},
+        nodes_of={},
+        builtin_host_labels_store=BuiltinHostLabelsStore(),
+    ).ruleset_optimizer
+
+
+def _tags(criticality: str) -> Mapping[TagGroupID, TagID]:
+    return {TagGroupID("criticality"): TagID(criticality)}
+
+
+def _count_evaluations(monkeypatch: pytest.MonkeyPatch, optimizer: RulesetOptimizer) -> list[int]:
+    evaluated_hosts = []
+    matching_host_bits = optimizer._matching_host_bits
+
+    def _tracked(condition: RuleConditionsSpec, hosts: int) -> int:
+        evaluated_hosts.append(hosts.bit_count())
+        return matching_host_bits(condition, hosts)
+
+    monkeypatch.setattr(optimizer, "_matching_host_bits", _tracked)
+    return evaluated_hosts
+
+
+def test_store_read_not_existing_file(tmp_path: Path) -> None:
+    assert RulesetMatchingCacheStore(tmp_path / "cache").read() is None
+
+
+def test_store_read_broken_file(tmp_path: Path) -> None:
+    (tmp_path / "cache").write_bytes(b"no pickle")
+    assert RulesetMatchingCacheStore(tmp_path / "cache").read() is None
+
+
+def test_store_write_and_read(tmp_path: Path) -> None:
+    store = RulesetMatchingCacheStore(tmp_path / "cache")
+    store.write(
+        RulesetMatchingCache(
+            hosts=(HostName("a"), HostName("b")),
+            host_fingerprints=(b"1", b"2"),
+            condition_bits={"cond": 0b10},
+        )
+    )
+    assert store.read() == RulesetMatchingCache(
+        hosts=("a", "b"), host_fingerprints=(b"1", b"2"), condition_bits={"cond": 0b10}
+    )
+
+
+def test_unchanged_config_reuses_previous_results(monkeypatch: pytest.MonkeyPatch) -> None:
+    host_tags = {HostName("a"): _tags("prod"), HostName("b"): _tags("test")}
+    first = _optimizer(host_tags, {})
+    first.use_matching_cache(None)
+    assert first._all_matching_hosts(_PROD, with_foreign_hosts=False) == {"a"}
+
+    second = _optimizer(host_tags, {})
+    second.use_matching_cache(first.dump_matching_cache())
+    evaluated_hosts = _count_evaluations(monkeypatch, second)
+
+    assert second._all_matching_hosts(_PROD, with_foreign_hosts=False) == {"a"}
+    assert not evaluated_hosts
+
+
+def test_only_changed_hosts_are_evaluated(monkeypatch: pytest.MonkeyPatch) -> None:
+    first = _optimizer(
+        {
+            HostName("a"): _tags("prod"),
+            HostName("b"): _tags("test"),
+            HostName("c"): _tags("test"),
+            HostName("d"): _tags("prod"),
+        },
+        {},
+    )
+    first.use_matching_cache(None)
+    assert first._all_matching_hosts(_PROD, with_foreign_hosts=False) == {"a", "d"}
+    assert first._all_matching_hosts(_LVL1, with_foreign_hosts=False) == set()
+
+    second = _optimizer(
+        {
+            HostName("a"): _tags("test"),
+            HostName("b"): _tags("prod"),
+            HostName("c"): _tags("test"),
+            HostName("d"): _tags("prod"),
+        },
+        {HostName("c"): "/lvl1/sub/"},
+    )
+    second.use_matching_cache(first.dump_matching_cache())
+    evaluated_hosts = _count_evaluations(monkeypatch, second)
+
+    assert second._all_matching_hosts(_PROD, with_foreign_hosts=False) == {"b", "d"}
+    assert second._all_matching_hosts(_LVL1, with_foreign_hosts=False) == {"c"}
+    assert evaluated_hosts == [3, 3]
+
+
+def test_added_and_removed_hosts() -> None:
+    first = _optimizer({HostName("a"): _tags("prod"), HostName("b"): _tags("prod")}, {})
+    first.use_matching_cache(None)
+    assert first._all_matching_hosts(_PROD, with_foreign_hosts=False) == {"a", "b"}
+
+    second = _optimizer({HostName("b"): _tags("prod"), HostName("c"): _tags("prod")}, {})
+    second.use_matching_cache(first.dump_matching_cache())
+
+    assert second._all_matching_hosts(_PROD, with_foreign_hosts=False) == {"b", "c"}
+
+
+def test_processed_hosts_restrict_cached_results() -> None:
+    host_tags = {HostName("a"): _tags("prod"), HostName("b"): _tags("prod")}
+    first = _optimizer(host_tags, {})
+    first.use_matching_cache(None)
+    assert first._all_matching_hosts(_PROD, with_foreign_hosts=False) == {"a", "b"}
+
+    second = _optimizer(host_tags, {})
+    second.set_all_processed_hosts({HostName("a")})
+    second.use_matching_cache(first.dump_matching_cache())
+
+    assert second._all_matching_hosts(_PROD, with_foreign_hosts=False) == {"a"}
+    assert second._all_matching_hosts(_PROD, with_foreign_hosts=True) == {"a", "b"}
+
+
+def test_label_conditions_are_not_cached() -> None:
+    optimizer = _optimizer({HostName("a"): {}}, {})
+    optimizer.use_matching_cache(None)
+    optimizer._all_matching_hosts(
+        {"host_label_groups": [("and", [("and", "os:linux")])]}, with_foreign_hosts=False
+    )
+    assert not optimizer.dump_matching_cache().condition_bits
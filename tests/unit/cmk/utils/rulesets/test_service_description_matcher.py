@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+# pylint: disable=protected-access
+
+from collections.abc import Sequence
+
+import pytest
+
+from cmk.utils.hostaddress import HostName
+from cmk.utils.labels import BuiltinHostLabelsStore
+from cmk.utils.rulesets.conditions import HostOrServiceConditions
+from cmk.utils.rulesets.ruleset_matcher import (
+    LabelManager,
+    matches_service_conditions,
+    matches_service_description_condition,
+    RulesetMatcher,
+    RulesetMatchObject,
+    RulesetOptimizer,
+    RuleSpec,
+)
+from cmk.utils.rulesets.service_description_matcher import ServiceDescriptionMatcher
+
+_PATTERNS: Sequence[HostOrServiceConditions | None] = [
+    None,
+    [],
+    ["Interface "],
+    ["CPU load$"],
+    ["CPU"],
+    [{"$regex": "Interface [0-9]+$"}],
+    {"$nor": ["Interface 1"]},
+    {"$nor": []},
+    {"$nor": [{"$regex": ".*load"}, "Filesystem"]},
+    [{"$regex": "(?i)memory"}],
+    [r"OMD ([a-z]+) \1"],
+    ["Filesystem /", {"$regex": ".*swap"}],
+    [""],
+]
+
+
+@pytest.mark.parametrize(
+    "service_description",
+    [
+        "Interface 1",
+        "Interface 12",
+        "Interface 1 Ethernet",
+        "CPU load",
+        "CPU load average",
+        "CPU utilization",
+        "Memory",
+        "MEMORY used",
+        "OMD stable stable",
+        "OMD stable heute",
+        "Filesystem /var",
+        "Filesystem swap",
+        "",
+    ],
+)
+def test_matching_rules_equals_single_rule_matching(service_description: str) -> None:
+    matcher = ServiceDescriptionMatcher(_PATTERNS)
+    match_object = RulesetMatchObject(HostName("heute"), service_description)
+
+    assert matcher.matching_rules(service_description) == [
+        index
+        for index, patterns in enumerate(_PATTERNS)
+        if matches_service_description_condition(
+            RulesetOptimizer._convert_pattern_list(patterns), match_object
+        )
+    ]
+
+
+def test_matching_rules_are_cached() -> None:
+    matcher = ServiceDescriptionMatcher([["CPU"]])
+    assert matcher.matching_rules("CPU load") is matcher.matching_rules("CPU load")
+
+
+def _interface_ruleset(num_rules: int) -> Sequence[RuleSpec[int]]:
+    ruleset: list[RuleSpec[int]] = []
+    for index in range(num_rules):
+        match index % 20:
+            case 0 | 1 | 2 | 3 | 4 | 5 | 6 | 7 | 8 | 9:
+                service_description: HostOrServiceConditions = [f"Interface {index}$"]
+            case 10 | 11 | 12 | 13 | 14:
+                service_description = [f"Interface {index}"]
+            case 15 | 16 | 17 | 18:
+                service_description = [{"$regex": f"Interface {index}[0-9]$"}]
+            case _:
+                service_description = {"$nor": [f"Interface {index}"]}
+        ruleset.append(
+            {
+                "id": str(index),
+                "value": index,
+                "condition": {"service_description": service_description},
+            }
+        )
+    return ruleset
+
+
+def test_interface_heavy_host_equals_per_rule_matching() -> None:
+    hostname = HostName("switch")
+    matcher = RulesetMatcher(
+        host_tags={hostname: {}},
+        host_paths={},
+        label_manager=LabelManager(
+            explicit_host_labels={},
+            host_label_rules=(),
+            service_label_rules=(),
+            discovered_labels_of_service=lambda *args, **kw: {},
+        ),
+        all_configured_hosts=frozenset([hostname]),
+        clusters_of={},
+        nodes_of={},
+        builtin_host_labels_store=BuiltinHostLabelsStore(),
+    )
+    ruleset = _interface_ruleset(400)
+    match_objects = [
+        RulesetMatchObject(hostname, f"Interface {index}", {}) for index in range(1000)
+    ]
+    preprocessed = matcher.ruleset_optimizer.get_service_ruleset(ruleset, False)
+
+    expected = [
+        [
+            value
+            for _id, value, _hosts, label_groups, _cache_id, pattern in preprocessed
+            if matches_service_conditions(pattern, label_groups, match_object)
+        ]
+        for match_object in match_objects
+    ]
+
+    assert [
+        list(matcher.get_service_ruleset_values(match_object, ruleset))
+        for match_object in match_objects
+    ] == expected
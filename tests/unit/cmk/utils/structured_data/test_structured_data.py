@@ -5,6 +5,7 @@
 
 import ast
 import gzip
+import os
 import shutil
 from collections.abc import Iterable, Mapping, Sequence
 from pathlib import Path
@@ -20,13 +21,17 @@ from cmk.utils.structured_data import (
     _make_meta_and_raw_tree,
     _MutableAttributes,
     _MutableTable,
+    _restore_tree,
     _serialize_retention_interval,
+    ArchivedDelta,
     deserialize_delta_tree,
     deserialize_tree,
     ImmutableAttributes,
     ImmutableDeltaTree,
     ImmutableTable,
     ImmutableTree,
+    load_archive_entry,
+    load_archived_tree,
     make_meta,
     MutableTree,
     parse_from_unzipped,
@@ -43,6 +48,7 @@ from cmk.utils.structured_data import (
     SDRetentionFilterChoices,
     serialize_delta_tree,
     serialize_tree,
+    TreeOrArchiveStore,
     TreeStore,
     UpdateResult,
 )
@@ -1267,6 +1273,116 @@ def test_compare_real_trees(
     assert (stats["new"], stats["changed"], stats["removed"]) == result
 
 
+@pytest.mark.parametrize(
+    "tree_name_left, tree_name_right",
+    [
+        (
+            HostName("tree_old_addresses_arrays_memory"),
+            HostName("tree_new_addresses_arrays_memory"),
+        ),
+        (HostName("tree_old_addresses"), HostName("tree_new_addresses")),
+        (HostName("tree_old_arrays"), HostName("tree_new_arrays")),
+        (HostName("tree_old_interfaces"), HostName("tree_new_interfaces")),
+        (HostName("tree_old_memory"), HostName("tree_new_memory")),
+        (HostName("tree_old_heute"), HostName("tree_new_heute")),
+        (HostName("tree_old_heute"), HostName("tree_old_interfaces")),
+    ],
+)
+def test_restore_real_trees(tree_name_left: HostName, tree_name_right: HostName) -> None:
+    tree_store = _get_tree_store()
+    left = tree_store.load(host_name=tree_name_left)
+    right = tree_store.load(host_name=tree_name_right)
+    assert _restore_tree(left, left.difference(right)) == right
+    assert _restore_tree(right, right.difference(left)) == left
+
+
+def _make_archived_tree(version: int) -> MutableTree:
+    tree = MutableTree()
+    tree.add(
+        path=(SDNodeName("software"), SDNodeName("os")),
+        pairs=[{SDKey("version"): f"1.{version // 2}"}],
+    )
+    tree.add(
+        path=(SDNodeName("software"), SDNodeName("packages")),
+        key_columns=[SDKey("name")],
+        rows=[
+            {SDKey("name"): f"package-{n}", SDKey("version"): f"{n}.{version // (n + 1)}"}
+            for n in range(version, version + 20)
+        ],
+    )
+    return tree
+
+
+def _archive_trees(tmp_path: Path, host_name: HostName, count: int) -> TreeOrArchiveStore:
+    tree_store = TreeOrArchiveStore(tmp_path / "inventory", tmp_path / "inventory_archive")
+    for version in range(count):
+        tree_store.save(
+            host_name=host_name, tree=_make_archived_tree(version), meta=make_meta(do_archive=True)
+        )
+        os.utime(tmp_path / "inventory" / str(host_name), (version, version))
+        tree_store.archive(host_name=host_name)
+    return tree_store
+
+
+def test_archive_stores_deltas(tmp_path: Path) -> None:
+    host_name = HostName("heute")
+    tree_store = _archive_trees(tmp_path, host_name, 2 * TreeOrArchiveStore.KEYFRAME_INTERVAL + 3)
+
+    archive_dir = tmp_path / "inventory_archive" / str(host_name)
+    for version in range(2 * TreeOrArchiveStore.KEYFRAME_INTERVAL + 3):
+        entry = load_archive_entry(archive_dir / str(version))
+        is_keyframe = (
+            version % TreeOrArchiveStore.KEYFRAME_INTERVAL == 0
+            or version == 2 * TreeOrArchiveStore.KEYFRAME_INTERVAL + 2
+        )
+        assert isinstance(entry, ImmutableTree) is is_keyframe
+        assert load_archived_tree(archive_dir / str(version)) == _make_archived_tree(version)
+
+        if isinstance(entry, ArchivedDelta):
+            assert entry.next_timestamp == version + 1
+            assert (
+                entry.stats
+                == ImmutableTree.difference(
+                    load_archived_tree(archive_dir / str(version + 1)),
+                    load_archived_tree(archive_dir / str(version)),
+                ).get_stats()
+            )
+
+    assert tree_store.load_previous(host_name=host_name) == _make_archived_tree(
+        2 * TreeOrArchiveStore.KEYFRAME_INTERVAL + 2
+    )
+
+
+def test_archive_keeps_tree_if_not_restorable(tmp_path: Path) -> None:
+    host_name = HostName("heute")
+    tree_store = TreeOrArchiveStore(tmp_path / "inventory", tmp_path / "inventory_archive")
+    for version, key_columns in enumerate([[SDKey("name")], [SDKey("name")], [SDKey("id")]]):
+        tree = MutableTree()
+        tree.add(
+            path=(SDNodeName("software"), SDNodeName("packages")),
+            key_columns=key_columns,
+            rows=[{SDKey("name"): "package", SDKey("id"): str(version)}],
+        )
+        tree_store.save(host_name=host_name, tree=tree, meta=make_meta(do_archive=True))
+        os.utime(tmp_path / "inventory" / str(host_name), (version, version))
+        tree_store.archive(host_name=host_name)
+
+    archive_dir = tmp_path / "inventory_archive" / str(host_name)
+    assert isinstance(load_archive_entry(archive_dir / "0"), ImmutableTree)
+    assert isinstance(load_archive_entry(archive_dir / "1"), ImmutableTree)
+    assert isinstance(load_archive_entry(archive_dir / "2"), ImmutableTree)
+
+
+def test_load_archived_tree_missing_next(tmp_path: Path) -> None:
+    host_name = HostName("heute")
+    _archive_trees(tmp_path, host_name, 3)
+
+    archive_dir = tmp_path / "inventory_archive" / str(host_name)
+    (archive_dir / "2").unlink()
+    with pytest.raises(FileNotFoundError):
+        load_archived_tree(archive_dir / "1")
+
+
 @pytest.mark.parametrize(
     "tree_name, edges_t, edges_f",
     [
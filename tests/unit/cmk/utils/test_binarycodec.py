@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import pickle
+
+import pytest
+
+from cmk.utils import binarycodec
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        None,
+        True,
+        False,
+        0,
+        -42,
+        2**62,
+        "",
+        "äöü \udcff",
+        "x" * 1000,
+        b"",
+        b"\x00\xff" * 200,
+        [],
+        (),
+        [1, "a", None],
+        ("x", b"y"),
+        list(range(300)),
+        ["a", "", "a\0b"],
+        ["ä"] * 300,
+        [b"a", b"", b"\0"],
+        [["a", "b"], [], ["c"]],
+        [[""], ["\0", "x" * 300]],
+        [[], []],
+        [("oid", b"value")],
+        [[["table"], ["with", [1, 2]]]],
+    ],
+)
+def test_roundtrip(obj: object) -> None:
+    decoded = binarycodec.decode(binarycodec.encode(obj))
+    assert decoded == obj
+    assert type(decoded) is type(obj)
+
+
+def test_table_is_smaller_than_pickle() -> None:
+    table = [f"{n} some|agent|output|{n * n}".split("|") for n in range(1000)]
+    assert len(binarycodec.encode(table)) < len(pickle.dumps(table))
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"?",
+        b"s\x05abc",
+        b"z\x01\x00\x00\x00\x01i",
+        b"NN",
+        b"xi" + bytes(8),
+        b"ws\x00",
+        b"y\x01\x00\x00\x00\x01s\x01a",
+        b"r\x01\x00\x00\x00\x01s\x01a",
+        pytest.param(b"l\x01" * 100000 + b"N", id="deeply nested"),
+    ],
+)
+def test_invalid_data(data: bytes) -> None:
+    with pytest.raises(ValueError):
+        binarycodec.decode(data)
+
+
+def test_unsupported_type() -> None:
+    with pytest.raises(TypeError):
+        binarycodec.encode({"a": 1})
+
+
+@pytest.mark.parametrize("value", [2**63, -(2**63) - 1])
+def test_integer_out_of_range(value: int) -> None:
+    with pytest.raises(ValueError):
+        binarycodec.encode(value)
@@ -45,6 +45,12 @@ class TestCpuTracking:
     def test_sub_now_now(self, now: Snapshot, null: Snapshot) -> None:
         assert now - now == null
 
+    def test_div_null(self, null: Snapshot) -> None:
+        assert null / 3 == null
+
+    def test_div_now(self, now: Snapshot) -> None:
+        assert now / 4 + now / 4 + now / 4 + now / 4 == now
+
     def test_json_serialization_null(self, null: Snapshot) -> None:
         assert Snapshot.deserialize(json_identity(null.serialize())) == null
 
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# Copyright (C) 2024 Checkmk GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import re
+from pathlib import Path
+
+from cmk.ccc import store
+
+from cmk.utils.hostaddress import HostName
+from cmk.utils.inventory_index import InventoryIndex
+from cmk.utils.structured_data import MutableTree, SDKey, SDNodeName, serialize_tree
+
+_OS = (SDNodeName("software"), SDNodeName("os"))
+_PACKAGES = (SDNodeName("software"), SDNodeName("packages"))
+
+
+def _make_tree(os_name: str, packages: dict[str, str], *, virtual: bool = False) -> MutableTree:
+    tree = MutableTree()
+    tree.add(
+        path=_OS,
+        pairs=[{SDKey("name"): os_name, SDKey("virtual"): virtual, SDKey("cores"): 4}],
+    )
+    tree.add(
+        path=_PACKAGES,
+        key_columns=[SDKey("name")],
+        rows=[{SDKey("name"): n, SDKey("version"): v} for n, v in packages.items()],
+    )
+    return tree
+
+
+def test_missing_index(tmp_path: Path) -> None:
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    assert not index.indexed_hosts()
+    assert not index.attribute_values(_OS, SDKey("name"))
+    assert not index.find_rows(_PACKAGES, SDKey("name"), "bash")
+    assert not (tmp_path / "index.sqlite").exists()
+
+
+def test_update_and_query(tmp_path: Path) -> None:
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    index.update(HostName("a"), _make_tree("Debian", {"bash": "5.1", "zsh": "5.8"}), mtime_ns=1)
+    index.update(HostName("b"), _make_tree("Ubuntu", {"bash": "5.2"}, virtual=True), mtime_ns=2)
+
+    assert index.indexed_hosts() == {HostName("a"): 1, HostName("b"): 2}
+    assert index.attribute_values(_OS, SDKey("name")) == {
+        HostName("a"): "Debian",
+        HostName("b"): "Ubuntu",
+    }
+    virtual = index.attribute_values(_OS, SDKey("virtual"))
+    assert virtual == {HostName("a"): False, HostName("b"): True}
+    assert all(isinstance(v, bool) for v in virtual.values())
+    assert index.attribute_values(_OS, SDKey("cores")) == {
+        HostName("a"): 4,
+        HostName("b"): 4,
+    }
+    assert not index.attribute_values(_OS, SDKey("unknown"))
+    assert not index.attribute_values((SDNodeName("hardware"),), SDKey("name"))
+
+    assert index.find_rows(_PACKAGES, SDKey("name"), "bash") == {
+        HostName("a"): [{"name": "bash", "version": "5.1"}],
+        HostName("b"): [{"name": "bash", "version": "5.2"}],
+    }
+    assert index.find_rows(_PACKAGES, SDKey("name"), re.compile("sh$")) == {
+        HostName("a"): [{"name": "bash", "version": "5.1"}, {"name": "zsh", "version": "5.8"}],
+        HostName("b"): [{"name": "bash", "version": "5.2"}],
+    }
+    assert index.find_rows(_PACKAGES, SDKey("version"), re.compile("^5.8")) == {
+        HostName("a"): [{"name": "zsh", "version": "5.8"}],
+    }
+
+
+def test_keys_differing_in_case(tmp_path: Path) -> None:
+    tree = MutableTree()
+    tree.add(path=_OS, pairs=[{SDKey("name"): "Debian", SDKey("Name"): "debian"}])
+    tree.add(
+        path=_PACKAGES,
+        key_columns=[SDKey("name")],
+        rows=[
+            {SDKey("name"): "bash", SDKey("Name"): "Bash", SDKey("version"): None},
+            {SDKey("name"): "zsh", SDKey("version"): "5.8"},
+        ],
+    )
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    index.update(HostName("a"), tree, mtime_ns=1)
+
+    assert index.attribute_values(_OS, SDKey("name")) == {HostName("a"): "Debian"}
+    assert index.attribute_values(_OS, SDKey("Name")) == {HostName("a"): "debian"}
+    assert index.find_rows(_PACKAGES, SDKey("name"), re.compile("sh")) == {
+        HostName("a"): [
+            {"name": "bash", "Name": "Bash", "version": None},
+            {"name": "zsh", "Name": None, "version": "5.8"},
+        ],
+    }
+
+
+def test_update_replaces_entries(tmp_path: Path) -> None:
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    index.update(HostName("a"), _make_tree("Debian", {"bash": "5.1", "zsh": "5.8"}), mtime_ns=1)
+    tree = MutableTree()
+    tree.add(path=_OS, pairs=[{SDKey("kernel"): "6.1"}])
+    index.update(HostName("a"), tree, mtime_ns=3)
+
+    assert index.indexed_hosts() == {HostName("a"): 3}
+    assert not index.attribute_values(_OS, SDKey("name"))
+    assert index.attribute_values(_OS, SDKey("kernel")) == {HostName("a"): "6.1"}
+    assert not index.find_rows(_PACKAGES, SDKey("name"), "bash")
+
+
+def test_remove(tmp_path: Path) -> None:
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    index.update(HostName("a"), _make_tree("Debian", {"bash": "5.1"}), mtime_ns=1)
+    index.update(HostName("b"), _make_tree("Ubuntu", {"bash": "5.2"}), mtime_ns=2)
+    index.remove(HostName("a"))
+
+    assert index.indexed_hosts() == {HostName("b"): 2}
+    assert index.attribute_values(_OS, SDKey("name")) == {HostName("b"): "Ubuntu"}
+    assert list(index.find_rows(_PACKAGES, SDKey("name"), "bash")) == ["b"]
+
+
+def test_rebuild(tmp_path: Path) -> None:
+    tree_dir = tmp_path / "inventory"
+    tree_dir.mkdir()
+    for host_name, os_name in (("a", "Debian"), ("b", "Ubuntu")):
+        store.save_object_to_file(
+            tree_dir / host_name, serialize_tree(_make_tree(os_name, {"bash": "5.1"}))
+        )
+    (tree_dir / "a.gz").write_bytes(b"")
+    (tree_dir / ".last").touch()
+
+    index = InventoryIndex(tmp_path / "index.sqlite")
+    index.update(HostName("gone"), _make_tree("SUSE", {"bash": "4.4"}), mtime_ns=1)
+
+    assert index.rebuild(tree_dir) == 2
+    assert index.indexed_hosts() == {
+        HostName("a"): (tree_dir / "a").stat().st_mtime_ns,
+        HostName("b"): (tree_dir / "b").stat().st_mtime_ns,
+    }
+    assert index.attribute_values(_OS, SDKey("name")) == {
+        HostName("a"): "Debian",
+        HostName("b"): "Ubuntu",
+    }
+    assert list(index.find_rows(_PACKAGES, SDKey("name"), "bash")) == ["a", "b"]
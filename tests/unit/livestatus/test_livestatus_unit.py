@@ -8,13 +8,17 @@
 # pylint: disable=redefined-outer-name
 
 import errno
+import json
 import socket
 import ssl
-from collections.abc import Sequence
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
 from contextlib import closing
 from pathlib import Path
 
 import pytest
+from opentelemetry import trace
 from pytest import MonkeyPatch
 
 import livestatus
@@ -25,6 +29,8 @@ from omdlib.certs import CertificateAuthority  # pylint: disable=wrong-import-or
 from cmk.utils.certs import root_cert_path, RootCA
 from cmk.utils.livestatus_helpers.testing import MockLiveStatusConnection
 
+from cmk.livestatus_client import _ResponseRowParser, _SiteResponse
+
 
 # Override top level fixture to make livestatus connects possible here
 @pytest.fixture(autouse=True, scope="module")
@@ -341,3 +347,255 @@ def test_livestatus_lql(
     result: str,
 ) -> None:
     assert livestatus.livestatus_lql(*args) == result
+
+
+def test_get_rrd_data_batch(monkeypatch: MonkeyPatch) -> None:
+    queries = []
+
+    def query(query: livestatus.QueryTypes, add_headers: str = "") -> livestatus.LivestatusResponse:
+        queries.append(f"{query}{add_headers}")
+        return livestatus.LivestatusResponse(
+            [livestatus.LivestatusRow([[10, 13, 1, 1.0, None, 3.0], [0, 0, 0]])]
+        )
+
+    connection = livestatus.SingleSiteConnection("unix:/tmp/xyz")
+    monkeypatch.setattr(connection, "query", query)
+
+    assert livestatus.get_rrd_data_batch(
+        connection, "heute", "CPU load", "load1.max", [(11, 12), (1, 2)]
+    ) == [livestatus.RRDResponse(range(10, 13), [1.0, None, 3.0]), None]
+    assert queries == [
+        "GET services\n"
+        "Columns: rrddata:m1:load1.max:11:12:1:400 rrddata:m2:load1.max:1:2:1:400\n"
+        "Filter: host_name = heute\n"
+        "Filter: service_description = CPU load\n"
+        "OutputFormat: python\n"
+        "ColumnHeaders: off\n"
+    ]
+
+
+def test_get_rrd_data_batch_not_found(monkeypatch: MonkeyPatch) -> None:
+    connection = livestatus.SingleSiteConnection("unix:/tmp/xyz")
+    monkeypatch.setattr(
+        connection, "query", lambda query, add_headers="": livestatus.LivestatusResponse([])
+    )
+
+    assert not livestatus.get_rrd_data_batch(connection, "heute", "CPU load", "load1.max", [])
+    assert livestatus.get_rrd_data_batch(
+        connection, "heute", "CPU load", "load1.max", [(11, 12), (1, 2)]
+    ) == [None, None]
+    assert livestatus.get_rrd_data(connection, "heute", "CPU load", "load1.max", 11, 12) is None
+
+
+def _serve_one_query(
+    sock: socket.socket, response: bytes | None, delay: float, header: bytes | None = None
+) -> None:
+    conn, _addr = sock.accept()
+    with conn:
+        data = b""
+        while not data.endswith(b"\n\n"):
+            if not (packet := conn.recv(4096)):
+                return
+            data += packet
+        if response is None:
+            # Keep the connection open without answering until the client hangs up
+            conn.recv(4096)
+            return
+        time.sleep(delay)
+        conn.sendall(b"200 %11d\n" % len(response) if header is None else header)
+        conn.sendall(response)
+
+
+@pytest.fixture
+def site_servers() -> Iterator[Callable[[bytes | None, float], livestatus.SiteConfiguration]]:
+    servers: list[tuple[socket.socket, threading.Thread]] = []
+
+    def start(response: bytes | None, delay: float) -> livestatus.SiteConfiguration:
+        sock = socket.socket(socket.AF_INET)
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(1)
+        thread = threading.Thread(target=_serve_one_query, args=(sock, response, delay))
+        thread.start()
+        servers.append((sock, thread))
+        return livestatus.SiteConfiguration(socket="tcp:127.0.0.1:%d" % sock.getsockname()[1])
+
+    yield start
+
+    for sock, thread in servers:
+        thread.join(timeout=5)
+        sock.close()
+
+
+def test_multisite_query_receives_responses_concurrently(
+    site_servers: Callable[[bytes | None, float], livestatus.SiteConfiguration],
+) -> None:
+    live = livestatus.MultiSiteConnection(
+        livestatus.SiteConfigurations(
+            {
+                livestatus.SiteId("slow"): site_servers(b'[["slow"]]\n', 0.5),
+                livestatus.SiteId("fast"): site_servers(b'[["fast"]]\n', 0),
+            }
+        )
+    )
+    live.set_prepend_site(True)
+
+    assert list(live.iter_query("GET hosts\nColumns: name\n")) == [
+        ["fast", "fast"],
+        ["slow", "slow"],
+    ]
+    assert not live.dead_sites()
+
+
+def test_multisite_query_site_response_timeout(
+    site_servers: Callable[[bytes | None, float], livestatus.SiteConfiguration],
+) -> None:
+    live = livestatus.MultiSiteConnection(
+        livestatus.SiteConfigurations(
+            {
+                livestatus.SiteId("first"): site_servers(None, 0),
+                livestatus.SiteId("second"): site_servers(b'[["second"]]\n', 0),
+            }
+        )
+    )
+    live.set_response_timeout(sites={livestatus.SiteId("first"): 0.2})
+
+    assert live.query("GET hosts\nColumns: name\n") == [["second"]]
+    assert list(live.dead_sites()) == ["first"]
+    assert [c.id for c in live.connections] == ["second"]
+    live.disconnect()
+
+
+def test_multisite_query_malformed_response_header(
+    site_servers: Callable[[bytes | None, float], livestatus.SiteConfiguration],
+) -> None:
+    sock = socket.socket(socket.AF_INET)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(1)
+    thread = threading.Thread(
+        target=_serve_one_query, args=(sock, b'[["first"]]\n', 0, b"XXXXXXXXXXXXXXXX")
+    )
+    thread.start()
+    try:
+        live = livestatus.MultiSiteConnection(
+            livestatus.SiteConfigurations(
+                {
+                    livestatus.SiteId("first"): livestatus.SiteConfiguration(
+                        socket="tcp:127.0.0.1:%d" % sock.getsockname()[1]
+                    ),
+                    livestatus.SiteId("second"): site_servers(b'[["second"]]\n', 0),
+                }
+            )
+        )
+
+        assert live.query("GET hosts\nColumns: name\n") == [["second"]]
+        assert list(live.dead_sites()) == ["first"]
+        live.disconnect()
+    finally:
+        thread.join(timeout=5)
+        sock.close()
+
+
+def test_site_response_does_not_wait_for_the_data() -> None:
+    client, server = socket.socketpair()
+    with client, server:
+        # A blocking read would fail instead of waiting for the data
+        client.settimeout(0)
+        connection = livestatus.SingleSiteConnection("unix:/tmp/livestatus")
+        connection.socket = client
+        response = _SiteResponse(
+            livestatus.ConnectedSite(
+                livestatus.SiteId("site"), livestatus.SiteConfiguration({}), connection
+            ),
+            "GET hosts\n",
+            trace.INVALID_SPAN,
+            None,
+        )
+
+        server.sendall(b"200 %11d\n" % 9)
+        assert response.receive() is None
+        server.sendall(b'[["a"]]\n')
+        assert response.receive() is None
+        server.sendall(b"\n")
+        assert response.receive() == b'[["a"]]\n\n'
+
+
+@pytest.mark.parametrize("packet_size", [1, 3, 7, 4096])
+@pytest.mark.parametrize(
+    "raw_response",
+    [
+        b'[["heute", "CPU load", 0],\n["heute", "Memory", 1],\n["gestern", "\\u00e4", 2]]\n',
+        # Single line responses are rendered by the testing connection
+        b'[["heute", "CPU load", 0], ["heute", "Memory", 1], ["gestern", "\\u00e4", 2]]',
+    ],
+)
+def test_parse_raw_response_rows(packet_size: int, raw_response: bytes) -> None:
+    query = livestatus.Query(
+        livestatus.QuerySpecification(table="services", columns=["host_name", "description"])
+    )
+    connection = livestatus.SingleSiteConnection("unix:/tmp/xyz")
+
+    assert list(
+        connection.parse_raw_response_rows(
+            (raw_response[i : i + packet_size] for i in range(0, len(raw_response), packet_size)),
+            query,
+        )
+    ) == connection.parse_raw_response(raw_response, query)
+
+
+@pytest.mark.parametrize(
+    "raw_response, expected",
+    [
+        (b"[]\n", []),
+        (b"[[1, b'\\x00'],\n[2, {'a': (1, 2)}]]\n", [[1, b"\x00"], [2, {"a": (1, 2)}]]),
+    ],
+)
+def test_parse_raw_response_rows_python(raw_response: bytes, expected: list) -> None:
+    connection = livestatus.SingleSiteConnection("unix:/tmp/xyz")
+    assert (
+        list(connection.parse_raw_response_rows([raw_response], livestatus.Query("GET hosts")))
+        == expected
+    )
+
+
+@pytest.mark.parametrize("raw_response", [b"", b"[[1],\n[2\n", b"[1]]\n"])
+def test_parse_raw_response_rows_malformed(raw_response: bytes) -> None:
+    connection = livestatus.SingleSiteConnection("unix:/tmp/xyz")
+    with pytest.raises(livestatus.MKLivestatusQueryError):
+        list(connection.parse_raw_response_rows([raw_response], livestatus.Query("GET hosts")))
+
+
+def test_single_site_iter_table(
+    site_servers: Callable[[bytes | None, float], livestatus.SiteConfiguration],
+) -> None:
+    site = site_servers(b'[["heute", 0],\n["gestern", 1]]\n', 0)
+    connection = livestatus.SingleSiteConnection(site["socket"])
+    connection.set_prepend_site(True)
+
+    assert list(connection.iter_table("GET hosts\nColumns: name state\n")) == [
+        [b"", "heute", 0],
+        [b"", "gestern", 1],
+    ]
+    connection.disconnect()
+
+
+def _services_response(num_rows: int) -> bytes:
+    return b"[%s]\n" % b",\n".join(
+        b'["host%d", "Service %d", 0, 1700000000, "OK - Everything is fine"]' % (i % 1000, i)
+        for i in range(num_rows)
+    )
+
+
+@pytest.mark.parametrize("packet_size", [1, 100, 4096])
+def test_parse_raw_response_rows_bounded_buffer(packet_size: int) -> None:
+    raw_response = _services_response(1000)
+    longest_line = max(len(line) + 1 for line in raw_response.split(b"\n"))
+    parser = _ResponseRowParser(json.loads)
+
+    num_rows = 0
+    for i in range(0, len(raw_response), packet_size):
+        num_rows += len(parser.feed(raw_response[i : i + packet_size]))
+        # Only the held back line and the incomplete line of the packet are buffered
+        assert len(parser._data) < 2 * longest_line
+    num_rows += len(parser.close())
+
+    assert num_rows == 1000